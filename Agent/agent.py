@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -19,65 +20,158 @@ from tool.hardware_adjustment.entry import HardwareAdjustmentTool
 from tool.writing_docker_initial.entry import WritingDockerInitialTool
 from tool.writing_docker_revision.entry import WritingDockerRevisionTool
 from tool.summarize.entry import SummarizeTool
+from tool.fused_revision.entry import FusedRevisionTool, fused_mode_enabled, apply_pending_dockerfile
+from tool.failure_kb.entry import FailureKnowledgeBaseTool, learn_from_history
+from tool.iteration_control.entry import IterationController, ACTION_ABORT
 from tool.stats.entry import StatsTool
+from tool.stats.usage import set_iteration
+from tool.llm.routing import record_route_outcome
+from tool.run_state.manifest import RunManifest
+from tool.run_state.entry import (RunJournal, PHASE_SCAN, PHASE_HARDWARE, PHASE_PLAN, PHASE_ADJUST,
+                                  STEP_WRITE, STEP_RUN, STEP_SUMMARIZE, STEP_UPDATE, STEP_CONTROL)
 
 
 
   
 
-if __name__ == "__main__":
-    verbose = False
+def run_phase(journal, name, message, action):
+    """Run a setup phase unless the interrupted run already completed it"""
+    if journal.phase_done(name):
+        print(f"{message} (done in the interrupted run, skipped)")
+        return
+    print(message)
+    action()
+    journal.complete_phase(name)
+
 
-    start_time = time.time()
-    print("Starting envgym execution...")
+def run_step(journal, iteration, step, action):
+    """Run an iteration step unless the interrupted run already completed it"""
+    if journal.step_done(iteration, step):
+        print("Step already completed in the interrupted run, skipped")
+        return
+    action()
+    journal.complete_step(iteration, step)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a working Docker environment for the repository in the current directory")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Ignore envgym/run_state.json and start over instead of resuming an interrupted run")
+    parser.add_argument("--force", action="store_true",
+                        help="Run even if a previous successful run had the same fingerprint")
+    # Unrecognized options (e.g. --mode=envgym from older instructions) are ignored as before
+    args, _ = parser.parse_known_args()
 
-    print("Recording session start stats...")
-    StatsTool(verbose=verbose).run("start")
+    verbose = False
 
-    print("Initializing envgym directory")
-    create_envgym_directory()
+    # Same repository, model, prompts and tools as a previous successful run: reuse its result
+    manifest = RunManifest()
+    previous = None if args.force else manifest.previous_success()
+    if previous and manifest.reuse(previous):
+        print(f"Unchanged since the successful run of {previous.get('timestamp')} "
+              f"(fingerprint {manifest.fingerprint}), reusing its result; use --force to run again")
+        sys.exit(0)
+
+    # Resumes after a crash or reboot at the first phase or iteration step that did not complete
+    journal = RunJournal(fresh=args.fresh)
+
+    if journal.resumed:
+        start_time = journal.start_time
+        print(f"Continuing envgym execution, {journal.describe()}")
+        changed = journal.changed_artifacts()
+        if changed:
+            print(f"Warning: modified since the interrupted run: {', '.join(changed)}")
+    else:
+        start_time = time.time()
+        print("Starting envgym execution...")
+
+        print("Recording session start stats...")
+        StatsTool(verbose=verbose).run("start")
+
+        print("Initializing envgym directory")
+        create_envgym_directory()
     
-    print("Mapping the whole repo")
-    ScanningTool(verbose=verbose).run()
+    run_phase(journal, PHASE_SCAN, "Mapping the whole repo", lambda: ScanningTool(verbose=verbose).run())
 
-    print("Checking the hardware")
-    HardwareCheckingTool().run()
+    run_phase(journal, PHASE_HARDWARE, "Checking the hardware", lambda: HardwareCheckingTool().run())
 
-    print("Planning the whole project")
-    PlanningTool().run()
+    run_phase(journal, PHASE_PLAN, "Planning the whole project", lambda: PlanningTool().run())
     
-    print("Adjusting plan based on hardware")
-    HardwareAdjustmentTool(verbose=verbose).run()
+    run_phase(journal, PHASE_ADJUST, "Adjusting plan based on hardware",
+              lambda: HardwareAdjustmentTool(verbose=verbose).run())
     
-    Exec_Repeat = 20
-    for i in range(Exec_Repeat):
-        print(f"=== Iteration {i+1} ===")
-        print(f"\n--- Step 1: Write Dockerfile (Iteration {i+1}) ---")
+    # Fused mode: one LLM call per iteration writes next.txt and the next dockerfile
+    fused_mode = fused_mode_enabled()
+    
+    # Stops early on stalls, A->B->A cycles and exhausted time/token budgets
+    controller = IterationController(start_time=start_time, verbose=verbose, resume=journal.resumed)
+    
+    def write_dockerfile(i):
         if i == 0:
             print("Writing initial dockerfile based on plan...")
             WritingDockerInitialTool(verbose=verbose).run()
+        elif fused_mode and apply_pending_dockerfile():
+            print("Using dockerfile revised together with the previous summary...")
+        elif FailureKnowledgeBaseTool(verbose=verbose).run()["applied"]:
+            print("Applied a known fix from the failure knowledge base...")
         else:
             print("Revising dockerfile based on logs and recommendations...")
             WritingDockerRevisionTool(verbose=verbose).run()
 
+    def summarize_progress():
+        if fused_mode and not check_success_status():
+            print("Summarizing current progress and revising dockerfile...")
+            FusedRevisionTool(verbose=verbose).run()
+        else:
+            print("Summarizing current progress...")
+            SummarizeTool(verbose=verbose).run()
+
+    Exec_Repeat = 20
+    finish_reason = "iteration limit reached"
+    for i in range(journal.next_iteration - 1, Exec_Repeat):
+        within_budget, budget_reason = controller.within_budget()
+        if not within_budget:
+            print(f"Stopping before iteration {i+1}: {budget_reason}")
+            controller.stop(budget_reason)
+            finish_reason = budget_reason
+            break
+        print(f"=== Iteration {i+1} ===")
+        set_iteration(i+1)
+        print(f"\n--- Step 1: Write Dockerfile (Iteration {i+1}) ---")
+        run_step(journal, i+1, STEP_WRITE, lambda: write_dockerfile(i))
+
         print(f"\n--- Step 2: Run Dockerfile (Iteration {i+1}) ---")
-        run_dockerfile_with_logs()
+        run_step(journal, i+1, STEP_RUN, run_dockerfile_with_logs)
 
         print(f"\n--- Step 3: Summarize Progress (Iteration {i+1}) ---")
-        print("Summarizing current progress...")
-        SummarizeTool(verbose=verbose).run()
+        run_step(journal, i+1, STEP_SUMMARIZE, summarize_progress)
 
         print(f"\n--- Step 4: Update Status (Iteration {i+1}) ---")
-        update_log_files(i+1,verbose=True)
+        run_step(journal, i+1, STEP_UPDATE, lambda: update_log_files(i+1,verbose=True))
         
         if check_success_status():
+            finish_reason = "success"
+            break
+        
+        action = controller.record(i+1)["action"]
+        journal.complete_step(i+1, STEP_CONTROL)
+        if action == ACTION_ABORT:
+            print(f"Stopping after iteration {i+1}: no progress after escalation")
+            finish_reason = controller.stopped
             break
     
 
+    print("Learning fixes from this run's history...")
+    print(learn_from_history(verbose=verbose)["message"])
+
     print("Recording session end stats...")
     StatsTool(verbose=verbose).run("end")
 
+    journal.finish(finish_reason)
+    manifest.record(check_success_status(), finish_reason)
+    # Per-route latency and tokens next to the outcome, compared across runs by tool/llm/routing.py
+    record_route_outcome(check_success_status(), since=controller.started_at)
+
     end_time = time.time()
     print_execution_summary(start_time, end_time)
  
-
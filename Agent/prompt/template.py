@@ -0,0 +1,55 @@
+"""
+Prompt layout for provider prefix caching.
+Providers cache the longest prompt prefix they have recently seen and bill it at
+the cached-input rate, so a prompt should start with everything that is the same
+for every repository. A PromptTemplate puts the role and the instructions in the
+system message and the per-repository data in the user message, ordered from the
+parts that stay fixed during a run (directory tree, plan) to the ones that change
+every iteration (dockerfile, log, next steps), followed by a short closing line.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+
+class PromptTemplate:
+    """Static instructions first, per-repository data last"""
+
+    def __init__(self, instructions: str, sections: List[Tuple[str, Optional[str]]], closing: str = ""):
+        """
+        Args:
+            instructions: Task instructions, identical for every repository
+            sections: (name, heading) pairs in prompt order, most stable first; a section without a
+                      heading is inserted as is (already formatted blocks such as the examples)
+            closing: Reminder after the data, e.g. the expected answer format
+        """
+        self.instructions = instructions.strip()
+        self.sections = sections
+        self.closing = closing.strip()
+
+    def system_content(self, role: str) -> str:
+        return f"{role}\n\n{self.instructions}" if self.instructions else role
+
+    def user_content(self, **values) -> str:
+        names = [name for name, _ in self.sections]
+        unknown = sorted(set(values) - set(names))
+        if unknown:
+            raise ValueError(f"Unknown prompt sections: {', '.join(unknown)}")
+        parts = []
+        for name, heading in self.sections:
+            value = values.get(name)
+            if value is None or not str(value).strip():
+                continue
+            parts.append(f"{heading}\n{value}" if heading else str(value).strip())
+        if self.closing:
+            parts.append(self.closing)
+        return "\n\n".join(parts)
+
+    def messages(self, role: str, **values) -> List[Dict[str, str]]:
+        """Chat messages: system = role + instructions, user = data sections + closing"""
+        return [
+            {"role": "system", "content": self.system_content(role)},
+            {"role": "user", "content": self.user_content(**values)}
+        ]
+
+
+__all__ = ['PromptTemplate']
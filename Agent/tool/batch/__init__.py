@@ -0,0 +1 @@
+# Batch Tool Module 
@@ -0,0 +1,381 @@
+"""
+Sweep-wide batch mode for the setup phase.
+Scanning and planning are independent across repositories, so instead of one
+interactive call at a time per repository, the scan prompts of all repositories
+are collected into one JSONL batch, and planning runs in rounds: round k holds
+the k-th plan update of every repository. Each batch goes to the provider's batch
+endpoint (/v1/batches) or to a local stand-in that runs the requests
+concurrently under the shared rate limit. Results are written back into every
+repository's envgym/ and recorded in its run-state journal, so agent.py resumes
+each repository after the completed phases.
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add Agent directory to path for importing tool modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.scanning.entry import ScanningTool
+from tool.planning.entry import PlanningTool
+from tool.initial.entry import create_envgym_directory
+from tool.stats.entry import StatsTool
+from tool.stats.usage import record_usage
+from tool.llm.entry import chat_completion
+from tool.llm.routing import route_models
+from tool.run_state.entry import RunJournal, PHASE_SCAN, PHASE_PLAN
+from tool.run_state.manifest import RunManifest
+
+DEFAULT_DATA_DIR = Path(__file__).parent.parent.parent.parent / "data"
+BATCH_ENDPOINT = "/v1/chat/completions"
+BACKEND_LOCAL = "local"
+BACKEND_OPENAI = "openai"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_POLL_INTERVAL = 30
+DEFAULT_BATCH_TIMEOUT = 24 * 3600
+# Tool clients leave retries to limited_call(); file uploads and polling here bypass it and keep the SDK's retries
+BATCH_CLIENT_RETRIES = 2
+FINAL_BATCH_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+@contextmanager
+def in_directory(path: Path):
+    """Tools read and write envgym/ relative to the working directory"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "").strip() or default)
+    except ValueError:
+        print(f"Warning: {name} must be a number, using {default}")
+        return default
+
+
+def batch_line(request: Dict) -> Dict:
+    """One request in the provider's batch input format"""
+    body = {"model": request["model"], "messages": request["messages"]}
+    if request.get("temperature") is not None:
+        body["temperature"] = request["temperature"]
+    return {"custom_id": request["custom_id"], "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+class LocalBatchBackend:
+    """Stand-in for a batch endpoint: runs the requests concurrently under the shared rate limit"""
+
+    name = BACKEND_LOCAL
+
+    def __init__(self, client, concurrency: Optional[int] = None):
+        self.client = client
+        self.concurrency = concurrency or _env_int("LLM_BATCH_CONCURRENCY", DEFAULT_CONCURRENCY)
+
+    def _run_one(self, request: Dict) -> Dict:
+        try:
+            # The repository's own usage file keeps its stats complete; routing and fallbacks apply as usual
+            response = chat_completion(self.client, request["tool"], request["default_model"], request["messages"],
+                                       request.get("temperature"), usage_file=request["usage_file"])
+            return {"content": response.choices[0].message.content, "error": None}
+        except Exception as e:
+            return {"content": None, "error": str(e)}
+
+    def submit(self, requests: List[Dict], name: str) -> Dict[str, Dict]:
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as pool:
+            results = list(pool.map(self._run_one, requests))
+        return {request["custom_id"]: result for request, result in zip(requests, results)}
+
+
+class OpenAIBatchBackend:
+    """Provider batch endpoint: upload the JSONL, poll the batch, download the results"""
+
+    name = BACKEND_OPENAI
+
+    def __init__(self, client, batch_dir: Path, poll_interval: Optional[int] = None, timeout: Optional[int] = None):
+        self.client = client.with_options(max_retries=BATCH_CLIENT_RETRIES)
+        self.batch_dir = batch_dir
+        self.poll_interval = poll_interval or _env_int("LLM_BATCH_POLL_SECONDS", DEFAULT_POLL_INTERVAL)
+        self.timeout = timeout or _env_int("LLM_BATCH_TIMEOUT_SECONDS", DEFAULT_BATCH_TIMEOUT)
+
+    def submit(self, requests: List[Dict], name: str) -> Dict[str, Dict]:
+        input_path = self.batch_dir / f"{name}.input.jsonl"
+        start = time.time()
+        with open(input_path, 'rb') as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=batch_file.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window="24h", metadata={"description": f"envgym {name}"})
+        print(f"Submitted batch {batch.id} ({len(requests)} requests), polling every {self.poll_interval}s...")
+        while batch.status not in FINAL_BATCH_STATES:
+            if time.time() - start > self.timeout:
+                self.client.batches.cancel(batch.id)
+                raise TimeoutError(f"batch {batch.id} did not finish within {self.timeout}s")
+            time.sleep(self.poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        print(f"Batch {batch.id} {batch.status} after {time.time() - start:.0f}s")
+
+        by_id = {request["custom_id"]: request for request in requests}
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                request = by_id.get(item.get("custom_id"))
+                if request is None:
+                    continue
+                response = item.get("response") or {}
+                body = response.get("body") or {}
+                if response.get("status_code") == 200 and body.get("choices"):
+                    record_usage(request["tool"], request["model"], body, time.time() - start,
+                                 request["usage_file"], route=request["route"])
+                    results[request["custom_id"]] = {"content": body["choices"][0]["message"]["content"],
+                                                     "error": None}
+                else:
+                    error = item.get("error") or body.get("error") or f"status {response.get('status_code')}"
+                    results[request["custom_id"]] = {"content": None, "error": json.dumps(error)}
+        for custom_id in by_id:
+            results.setdefault(custom_id, {"content": None, "error": f"no result (batch {batch.status})"})
+        return results
+
+
+class BatchRunner:
+    """Runs the scanning and planning phases of many repositories as batches"""
+
+    def __init__(self, repos: List[Path], backend: str = BACKEND_LOCAL, batch_dir: Optional[Path] = None,
+                 force: bool = False, verbose: bool = False):
+        self.repos = list(dict.fromkeys(Path(repo).resolve() for repo in repos))
+        # Repositories of a sweep can share a basename; the index keeps their batch requests apart
+        self.request_ids = {repo: f"{index}-{repo.name}" for index, repo in enumerate(self.repos)}
+        self.backend_name = backend
+        self.force = force
+        self.verbose = verbose
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.batch_dir = Path(batch_dir or DEFAULT_DATA_DIR / "batches" / stamp)
+        self.journals: Dict[Path, RunJournal] = {}
+        # Prompts only depend on the working directory, one instance serves every repository
+        self.scanner = ScanningTool(verbose=verbose)
+        self.planner = PlanningTool()
+        if backend == BACKEND_OPENAI:
+            self.backend = OpenAIBatchBackend(self.scanner.client, self.batch_dir)
+        else:
+            self.backend = LocalBatchBackend(self.scanner.client)
+
+    # ---- batches ----
+
+    def _request(self, repo: Path, custom_id: str, tool: str, messages: List[Dict[str, str]], tool_instance) -> Dict:
+        route, models = route_models(tool, tool_instance.model)
+        return {
+            "custom_id": custom_id,
+            "tool": tool,
+            "route": route,
+            "model": models[0],
+            "default_model": tool_instance.model,
+            "messages": messages,
+            "temperature": tool_instance.temperature,
+            "usage_file": str(repo / "envgym" / "usage.jsonl")
+        }
+
+    def _submit(self, requests: List[Dict], name: str) -> Dict[str, Dict]:
+        if not requests:
+            return {}
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.batch_dir / f"{name}.input.jsonl", 'w', encoding='utf-8') as f:
+            for request in requests:
+                f.write(json.dumps(batch_line(request), ensure_ascii=False) + "\n")
+        print(f"Running batch {name}: {len(requests)} requests ({self.backend.name} backend)")
+        try:
+            results = self.backend.submit(requests, name)
+        except Exception as e:
+            if self.backend.name == BACKEND_LOCAL:
+                raise
+            # Gateways without a batch endpoint: keep going with the local stand-in
+            print(f"Warning: batch endpoint failed ({e}), switching to the local backend")
+            self.backend = LocalBatchBackend(self.scanner.client)
+            results = self.backend.submit(requests, name)
+        with open(self.batch_dir / f"{name}.output.jsonl", 'w', encoding='utf-8') as f:
+            for custom_id, result in results.items():
+                f.write(json.dumps({"custom_id": custom_id, **result}, ensure_ascii=False) + "\n")
+        failed = [custom_id for custom_id, result in results.items() if result["error"]]
+        if failed:
+            print(f"Batch {name}: {len(failed)} requests failed, those repositories are left to agent.py")
+        return results
+
+    # ---- phases ----
+
+    def prepare(self) -> List[Path]:
+        """Open each repository's journal; repositories unchanged since a successful run are skipped"""
+        ready = []
+        for repo in self.repos:
+            with in_directory(repo):
+                if not self.force and RunManifest().previous_success():
+                    print(f"{repo.name}: unchanged since its last successful run, skipped")
+                    continue
+                journal = RunJournal()
+                if not journal.resumed:
+                    StatsTool(verbose=self.verbose).run("start")
+                    create_envgym_directory()
+                    # The run's clock starts when agent.py picks the repository up
+                    journal.state["start_time"] = None
+                    journal.save()
+                self.journals[repo] = journal
+                ready.append(repo)
+        return ready
+
+    def run_scan(self, repos: List[Path]) -> List[Path]:
+        """One batch with the scan prompt of every repository that has not been scanned"""
+        requests = []
+        scans: Dict[Path, Dict] = {}
+        for repo in repos:
+            with in_directory(repo):
+                if self.journals[repo].phase_done(PHASE_SCAN):
+                    continue
+                scan = self.scanner.prepare_scan()
+                if "documents" in scan:
+                    # The manifest detector settled it; nothing to send
+                    print(f"{repo.name}: {len(scan['documents'])} configuration files from the manifest detector")
+                    self.scanner.save_documents(scan["documents"])
+                    self.journals[repo].complete_phase(PHASE_SCAN)
+                    continue
+                scans[repo] = scan
+                requests.append(self._request(repo, self.request_ids[repo], "scanning", scan["messages"], self.scanner))
+
+        results = self._submit(requests, "scan") if requests else {}
+        scanned = []
+        for repo in repos:
+            result = results.get(self.request_ids[repo])
+            with in_directory(repo):
+                if result is None:
+                    if self.journals[repo].phase_done(PHASE_SCAN):
+                        scanned.append(repo)
+                    continue
+                try:
+                    documents = self.scanner.parse_documents(result["content"]) if not result["error"] else []
+                    if scans[repo]["candidates"] is not None:
+                        documents = self.scanner.select_candidates(documents, scans[repo])
+                except Exception as e:
+                    print(f"{repo.name}: could not parse the scan result: {e}")
+                    documents = []
+                if not documents:
+                    print(f"{repo.name}: no configuration files found, left to agent.py")
+                    continue
+                self.scanner.save_documents(documents)
+                self.journals[repo].complete_phase(PHASE_SCAN)
+                scanned.append(repo)
+        return scanned
+
+    def run_plan(self, repos: List[Path]) -> List[Path]:
+        """Planning in rounds: the k-th file of every repository goes into the k-th batch"""
+        queues: Dict[Path, List[str]] = {}
+        plans: Dict[Path, Optional[str]] = {}
+        for repo in repos:
+            with in_directory(repo):
+                if self.journals[repo].phase_done(PHASE_PLAN):
+                    continue
+                try:
+                    documents = self.planner.order_documents(self.planner.load_documents())
+                except (OSError, ValueError) as e:
+                    print(f"{repo.name}: no document list to plan from ({e}), left to agent.py")
+                    continue
+                if not documents or not os.path.exists(documents[0]):
+                    print(f"{repo.name}: first planning file missing, left to agent.py")
+                    continue
+                queues[repo] = documents
+                plans[repo] = None
+
+        planned = []
+        round_number = 0
+        while queues:
+            requests = []
+            for repo, documents in queues.items():
+                with in_directory(repo):
+                    # Files that do not exist are skipped, as in the interactive planner
+                    while documents and plans[repo] is not None and not os.path.exists(documents[0]):
+                        documents.pop(0)
+                    if not documents:
+                        continue
+                    file_path = documents.pop(0)
+                    content = self.planner.read_file_content(file_path)
+                    if plans[repo] is None:
+                        messages = self.planner.initial_plan_messages(file_path, content)
+                    else:
+                        messages = self.planner.update_plan_messages(file_path, content, plans[repo])
+                    requests.append(self._request(repo, f"{self.request_ids[repo]}:{round_number}", "planning",
+                                                  messages, self.planner))
+
+            results = self._submit(requests, f"plan_{round_number}")
+            for repo in list(queues):
+                result = results.get(f"{self.request_ids[repo]}:{round_number}")
+                with in_directory(repo):
+                    if result is not None and result["error"]:
+                        del queues[repo]
+                        continue
+                    if result is not None:
+                        plans[repo] = result["content"]
+                        self.planner.save_plan(plans[repo])
+                    if not queues[repo]:
+                        self.journals[repo].complete_phase(PHASE_PLAN)
+                        planned.append(repo)
+                        del queues[repo]
+            round_number += 1
+        return planned
+
+    def run(self, phases: List[str]) -> Dict:
+        repos = self.prepare()
+        scanned = self.run_scan(repos) if PHASE_SCAN in phases else repos
+        planned = self.run_plan(scanned) if PHASE_PLAN in phases else []
+        summary = {
+            "success": True,
+            "repositories": len(repos),
+            "scanned": len(scanned) if PHASE_SCAN in phases else None,
+            "planned": len(planned) if PHASE_PLAN in phases else None,
+            "batch_dir": str(self.batch_dir)
+        }
+        print(f"Batch setup finished: {json.dumps(summary)}")
+        return summary
+
+
+__all__ = ['BatchRunner', 'LocalBatchBackend', 'OpenAIBatchBackend', 'batch_line']
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the scanning and planning phases of many repositories as batches; "
+                                                 "agent.py then resumes each repository after them")
+    parser.add_argument("repos", nargs="*", help="Repository directories (default: every directory in --data-dir)")
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="Directory holding the repositories")
+    parser.add_argument("--phase", choices=["scan", "plan", "all"], default="all")
+    parser.add_argument("--backend", choices=[BACKEND_LOCAL, BACKEND_OPENAI],
+                        default=os.getenv("LLM_BATCH_BACKEND", BACKEND_LOCAL),
+                        help="Provider batch endpoint or the local concurrent stand-in")
+    parser.add_argument("--force", action="store_true", help="Include repositories unchanged since a successful run")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output mode")
+    args = parser.parse_args()
+
+    if args.repos:
+        repos = [Path(repo) for repo in args.repos]
+    else:
+        repos = sorted(path for path in Path(args.data_dir).iterdir()
+                       if path.is_dir() and not path.name.startswith(('.', '__')) and path.name != "batches")
+    phases = [PHASE_SCAN, PHASE_PLAN] if args.phase == "all" else [args.phase]
+    BatchRunner(repos, backend=args.backend, force=args.force, verbose=args.verbose).run(phases)
+
+
+if __name__ == "__main__":
+    main()
+
@@ -5,6 +5,12 @@ Docker 执行器包
 
 from .docker_runner import DockerRunner, execute_dockerfile, print_execution_result
 from .entry import run_dockerfile_with_logs, execute_dockerfile_simple
+from .probes import load_probes, build_default_probes
+from .context import ContextBuilder
+from .engine_api import DockerEngineClient, DockerEngineError
+from .prefetch import DockerfilePrefetcher
+from .validation import DockerfileValidator, validate_dockerfile
+from .optimizer import DockerfileOptimizer
 
 __version__ = "1.0.0"
 __author__ = "EnvGym Team"
@@ -14,5 +20,14 @@ __all__ = [
     'execute_dockerfile', 
     'print_execution_result',
     'run_dockerfile_with_logs',
-    'execute_dockerfile_simple'
+    'execute_dockerfile_simple',
+    'load_probes',
+    'build_default_probes',
+    'ContextBuilder',
+    'DockerEngineClient',
+    'DockerEngineError',
+    'DockerfilePrefetcher',
+    'DockerfileValidator',
+    'validate_dockerfile',
+    'DockerfileOptimizer'
 ] 
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+Last-good-layer checkpoints for failed builds.
+When a build fails, the image of the deepest successful step (taken from the
+classic builder's "Step N/M" / " ---> <id>" output) is tagged as a checkpoint and
+described in envgym/checkpoint.json. A later Dockerfile that keeps the same leading
+instructions is built FROM the checkpoint so only the failing tail is rebuilt.
+"""
+
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+CHECKPOINT_FILE = "checkpoint.json"
+RESUME_DOCKERFILE = "resume.dockerfile"
+CHECKPOINT_REPO_PREFIX = "envgym_checkpoint_"
+
+STEP_PATTERN = re.compile(r'^Step (\d+)/(\d+) : (.*)$')
+LAYER_PATTERN = re.compile(r'^ ---> ([0-9a-f]{12,64})\s*$')
+
+
+def parse_instructions(dockerfile_text: str) -> List[Dict]:
+    """
+    Split a Dockerfile into instructions with their source line ranges
+
+    Returns:
+        list: {"text": normalized single-line instruction, "keyword", "start", "end"} (0-based lines)
+    """
+    instructions = []
+    lines = dockerfile_text.splitlines()
+    current = []
+    start = None
+    for index, raw in enumerate(lines):
+        stripped = raw.strip()
+        if not current and (not stripped or stripped.startswith('#')):
+            continue
+        if current and stripped.startswith('#'):
+            continue
+        if start is None:
+            start = index
+        if stripped.endswith('\\'):
+            current.append(stripped[:-1].strip())
+            continue
+        current.append(stripped)
+        text = " ".join(part for part in current if part)
+        instructions.append({"text": text, "keyword": text.split(None, 1)[0].upper(), "start": start, "end": index})
+        current = []
+        start = None
+    if current:
+        text = " ".join(part for part in current if part)
+        instructions.append({"text": text, "keyword": text.split(None, 1)[0].upper(), "start": start, "end": len(lines) - 1})
+    return instructions
+
+
+def resumable(instructions: List[Dict]) -> bool:
+    """Checkpoints are only used for single-stage Dockerfiles without heredocs"""
+    froms = [item for item in instructions if item["keyword"] == "FROM"]
+    return len(froms) == 1 and not any('<<' in item["text"] for item in instructions)
+
+
+def parse_build_steps(build_output: str) -> List[Dict]:
+    """
+    Parse classic builder output into steps
+
+    Returns:
+        list: {"step", "total", "instruction", "image_id"} with image_id None for steps that did not finish
+    """
+    steps = []
+    for line in build_output.splitlines():
+        step_match = STEP_PATTERN.match(line.strip())
+        if step_match:
+            steps.append({
+                "step": int(step_match.group(1)),
+                "total": int(step_match.group(2)),
+                "instruction": step_match.group(3).strip(),
+                "image_id": None
+            })
+            continue
+        layer_match = LAYER_PATTERN.match(line.rstrip())
+        if layer_match and steps:
+            steps[-1]["image_id"] = layer_match.group(1)
+    return steps
+
+
+def checkpoint_image_name(repo_name: str) -> str:
+    """Checkpoint image reference for a repository, e.g. envgym_checkpoint_tokio-rs_tokio:latest"""
+    slug = re.sub(r'[^a-z0-9_.-]+', '-', repo_name.lower()).strip('-.') or "repo"
+    return f"{CHECKPOINT_REPO_PREFIX}{slug}:latest"
+
+
+def find_checkpoint_step(steps: List[Dict], instructions: List[Dict],
+                         step_map: Optional[List[Optional[int]]] = None) -> Optional[Tuple[int, str]]:
+    """
+    Find the deepest successful step of a failed build in terms of the full Dockerfile
+
+    Args:
+        steps: parsed build steps
+        instructions: instructions of the full Dockerfile
+        step_map: built instruction index -> full Dockerfile instruction index (None for
+                  lines that only exist in the resume Dockerfile); identity when None
+
+    Returns:
+        tuple: (full instruction index, image id) or None when there is nothing worth keeping
+    """
+    if not steps or not resumable(instructions):
+        return None
+    built_total = len(step_map) if step_map is not None else len(instructions)
+    if steps[0]["total"] != built_total:
+        return None
+
+    from_index = next(i for i, item in enumerate(instructions) if item["keyword"] == "FROM")
+    for step in reversed(steps):
+        if not step["image_id"]:
+            continue
+        built_index = step["step"] - 1
+        full_index = step_map[built_index] if step_map is not None else built_index
+        if full_index is None:
+            continue
+        if full_index >= len(instructions):
+            return None
+        # The builder echoes the instruction, the keyword must line up with our parse
+        if step_map is None and step["instruction"].split(None, 1)[0].upper() != instructions[full_index]["keyword"]:
+            return None
+        if full_index <= from_index:
+            return None
+        return full_index, step["image_id"]
+    return None
+
+
+def build_checkpoint(dockerfile_text: str, full_index: int, image: str, image_id: str,
+                     failed_step: Optional[Dict] = None) -> Dict:
+    """Checkpoint record covering instructions[0..full_index] of the Dockerfile"""
+    instructions = parse_instructions(dockerfile_text)
+    lines = dockerfile_text.splitlines()
+    return {
+        "image": image,
+        "image_id": image_id,
+        "step": full_index + 1,
+        "total_steps": len(instructions),
+        "failed_instruction": failed_step["instruction"] if failed_step else None,
+        "prefix": [item["text"] for item in instructions[:full_index + 1]],
+        "prefix_text": "\n".join(lines[:instructions[full_index]["end"] + 1]),
+        "created_at": datetime.now().isoformat()
+    }
+
+
+def load_checkpoint(output_dir: Path) -> Optional[Dict]:
+    checkpoint_file = Path(output_dir) / CHECKPOINT_FILE
+    if not checkpoint_file.exists():
+        return None
+    try:
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+
+
+def save_checkpoint(output_dir: Path, checkpoint: Dict):
+    with open(Path(output_dir) / CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2, ensure_ascii=False)
+
+
+def prepare_resume(dockerfile_text: str, checkpoint: Dict) -> Optional[Tuple[str, List[Optional[int]]]]:
+    """
+    Build a resume Dockerfile when the Dockerfile still starts with the checkpointed instructions
+
+    Returns:
+        tuple: (resume Dockerfile text, step_map) or None when the checkpoint does not apply
+    """
+    instructions = parse_instructions(dockerfile_text)
+    prefix = checkpoint.get("prefix") or []
+    if not resumable(instructions) or len(instructions) <= len(prefix):
+        return None
+    if [item["text"] for item in instructions[:len(prefix)]] != prefix:
+        return None
+
+    lines = dockerfile_text.splitlines()
+    from_index = next(i for i, item in enumerate(instructions) if item["keyword"] == "FROM")
+    # ARG values are not stored in the image, so stage ARGs from the prefix are re-declared
+    stage_args = [item for item in instructions[from_index + 1:len(prefix)] if item["keyword"] == "ARG"]
+
+    resume_lines = [f"# Resumed from checkpoint: steps 1-{len(prefix)} of envgym.dockerfile",
+                    f"FROM {checkpoint['image']}"]
+    step_map: List[Optional[int]] = [len(prefix) - 1]
+    for item in stage_args:
+        resume_lines.append(item["text"])
+        step_map.append(None)
+    tail_start = instructions[len(prefix)]["start"]
+    resume_lines.extend(lines[tail_start:])
+    step_map.extend(range(len(prefix), len(instructions)))
+    return "\n".join(resume_lines) + "\n", step_map
+
+
+def expand_checkpoint_reference(dockerfile_text: str, checkpoint: Optional[Dict]) -> str:
+    """
+    Replace a leading `FROM <checkpoint image>` with the checkpointed instructions
+
+    Lets the revision model write only the remaining steps while envgym.dockerfile
+    always stays a complete, standalone Dockerfile.
+    """
+    if not checkpoint:
+        return dockerfile_text
+    image = checkpoint["image"]
+    image_names = {image, image.rsplit(':', 1)[0]}
+    instructions = parse_instructions(dockerfile_text)
+    first_from = next((item for item in instructions if item["keyword"] == "FROM"), None)
+    if first_from is None:
+        return dockerfile_text
+    parts = first_from["text"].split()
+    if len(parts) < 2 or parts[1] not in image_names:
+        return dockerfile_text
+
+    lines = dockerfile_text.splitlines()
+    expanded = lines[:first_from["start"]] + [checkpoint["prefix_text"]] + lines[first_from["end"] + 1:]
+    return "\n".join(expanded).strip("\n") + "\n"
+
+
+def format_checkpoint_prompt(checkpoint: Optional[Dict]) -> str:
+    """Prompt section offering the revision model to resume from the checkpoint"""
+    if not checkpoint:
+        return ""
+    failed = f" The build failed afterwards at: `{checkpoint['failed_instruction']}`." if checkpoint.get("failed_instruction") else ""
+    return f"""
+CHECKPOINT AVAILABLE:
+The first {checkpoint['step']} of {checkpoint['total_steps']} instructions of the current dockerfile built successfully and are saved as the image `{checkpoint['image']}`.{failed}
+If the fix does not require changing those first {checkpoint['step']} instructions, you may start the revised dockerfile with `FROM {checkpoint['image']}` followed by ONLY the remaining instructions; it will be expanded back into the full dockerfile and only the remaining steps are rebuilt.
+If an earlier instruction must change, write the complete dockerfile as usual.
+"""
+
+
+__all__ = ['parse_instructions', 'parse_build_steps', 'find_checkpoint_step', 'build_checkpoint',
+           'load_checkpoint', 'save_checkpoint', 'prepare_resume', 'expand_checkpoint_reference',
+           'format_checkpoint_prompt', 'checkpoint_image_name', 'CHECKPOINT_FILE', 'RESUME_DOCKERFILE']
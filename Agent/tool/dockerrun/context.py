@@ -0,0 +1,497 @@
+"""
+Minimal build context construction for the Docker build phase.
+Instead of sending the whole repository, the context tarball only contains the
+paths referenced by COPY/ADD (and RUN --mount=type=bind) sources, filtered by a
+generated ignore list plus the repository's own .dockerignore. The tarball is
+cached by content hash so unchanged contexts are not rebuilt between iterations.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shlex
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+CONTEXT_CACHE_DIR = Path(tempfile.gettempdir()) / "envgym_context"
+CONTEXT_CACHE_KEEP = 2
+GENERATED_IGNORE_FILE = "context.dockerignore"
+FALLBACK_DOCKERFILE_NAME = ".envgym.dockerfile"
+
+# Paths that are never needed inside the image but are expensive to ship
+DEFAULT_IGNORE_PATTERNS = [
+    ".git",
+    "envgym",
+    "**/node_modules",
+    "target",
+    "**/__pycache__",
+    "**/*.pyc",
+    ".pytest_cache",
+    ".mypy_cache",
+    ".tox",
+    ".venv",
+    "**/.DS_Store",
+]
+
+# Build tools that derive the version from git metadata, so .git must stay in the context
+GIT_VERSION_MARKERS = ["setuptools_scm", "setuptools-scm", "versioneer", "hatch-vcs", "pbr=True"]
+GIT_VERSION_FILES = ["pyproject.toml", "setup.py", "setup.cfg"]
+
+# git subcommands that read the repository's own metadata (installing git or cloning does not)
+RUN_GIT_PATTERN = re.compile(r'(^|[\s;&|(])git\s+(submodule|describe|rev-parse|log|status|diff|ls-files|'
+                             r'show|tag|checkout|branch|reset|stash|lfs)\b')
+MOUNT_SOURCE_PATTERN = re.compile(r'--mount=(\S+)')
+
+
+def _logical_lines(dockerfile_text: str) -> List[str]:
+    """Join backslash continuations and drop comments"""
+    lines = []
+    current = ""
+    for raw in dockerfile_text.splitlines():
+        stripped = raw.strip()
+        if not current and (not stripped or stripped.startswith('#')):
+            continue
+        if stripped.startswith('#'):
+            continue
+        if stripped.endswith('\\'):
+            current += stripped[:-1] + " "
+            continue
+        current += stripped
+        lines.append(current)
+        current = ""
+    if current.strip():
+        lines.append(current)
+    return lines
+
+
+def _split_args(rest: str) -> List[str]:
+    """Split instruction arguments, supporting both JSON and shell forms"""
+    rest = rest.strip()
+    if rest.startswith('['):
+        try:
+            value = json.loads(rest)
+            if isinstance(value, list):
+                return [str(item) for item in value]
+        except json.JSONDecodeError:
+            pass
+    try:
+        return shlex.split(rest)
+    except ValueError:
+        return rest.split()
+
+
+def parse_context_sources(dockerfile_text: str) -> Tuple[List[str], bool]:
+    """
+    Collect the build context paths a Dockerfile reads
+
+    Returns:
+        tuple: (source patterns relative to the context root, whether git is used in RUN)
+        A source of "." means the whole context is required.
+    """
+    sources = []
+    uses_git = False
+
+    for line in _logical_lines(dockerfile_text):
+        parts = line.split(None, 1)
+        if len(parts) < 2:
+            continue
+        instruction, rest = parts[0].upper(), parts[1]
+
+        if instruction == "RUN":
+            if RUN_GIT_PATTERN.search(rest):
+                uses_git = True
+            for mount in MOUNT_SOURCE_PATTERN.findall(rest):
+                options = dict(item.split('=', 1) for item in mount.split(',') if '=' in item)
+                if options.get("type", "bind") == "bind" and "from" not in options:
+                    sources.append(options.get("source", options.get("src", ".")))
+            continue
+
+        if instruction not in ("COPY", "ADD"):
+            continue
+        if '<<' in rest:
+            # Heredoc content is inline, it does not read from the context
+            continue
+
+        args = _split_args(rest)
+        flags = [arg for arg in args if arg.startswith('--')]
+        paths = [arg for arg in args if not arg.startswith('--')]
+        if any(flag.startswith('--from') for flag in flags) or len(paths) < 2:
+            continue
+        for source in paths[:-1]:
+            if instruction == "ADD" and re.match(r'^(https?://|git@)', source):
+                continue
+            sources.append(source)
+
+    return sources, uses_git
+
+
+def _normalize_source(source: str) -> Optional[str]:
+    """Normalize a source path; None means it cannot be resolved statically"""
+    if '$' in source:
+        return None
+    source = source.lstrip('/')
+    source = os.path.normpath(source) if source else "."
+    if source.startswith('..'):
+        return "."
+    return source
+
+
+def _pattern_to_regex(pattern: str) -> re.Pattern:
+    """Translate a .dockerignore pattern into a regex matching the path or its descendants"""
+    pattern = pattern.strip().lstrip('/')
+    if pattern.startswith('./'):
+        pattern = pattern[2:]
+    pattern = pattern.rstrip('/')
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == '*':
+            regex += "[^/]*"
+        elif char == '?':
+            regex += "[^/]"
+        elif char == '[':
+            end = pattern.find(']', i)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                regex += pattern[i:end + 1].replace('\\', '\\\\')
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return re.compile(f"^{regex}(?:/.*)?$")
+
+
+class IgnoreMatcher:
+    """.dockerignore semantics: last matching pattern wins, "!" re-includes"""
+
+    def __init__(self, patterns: List[str]):
+        self.rules = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            negate = pattern.startswith('!')
+            if negate:
+                pattern = pattern[1:].strip()
+            if pattern:
+                self.rules.append((_pattern_to_regex(pattern), negate))
+        self.has_negations = any(negate for _, negate in self.rules)
+
+    def ignored(self, rel_path: str) -> bool:
+        result = False
+        for regex, negate in self.rules:
+            if regex.match(rel_path):
+                result = not negate
+        return result
+
+
+def _read_dockerignore(root: Path) -> List[str]:
+    dockerignore = root / ".dockerignore"
+    if not dockerignore.exists():
+        return []
+    try:
+        return dockerignore.read_text(encoding='utf-8', errors='replace').splitlines()
+    except OSError:
+        return []
+
+
+def _needs_git(root: Path, uses_git: bool) -> bool:
+    """Keep .git when RUN calls git or the build derives versions from git metadata"""
+    if uses_git:
+        return True
+    for name in GIT_VERSION_FILES:
+        path = root / name
+        if path.exists():
+            try:
+                content = path.read_text(encoding='utf-8', errors='replace')
+            except OSError:
+                continue
+            if any(marker in content for marker in GIT_VERSION_MARKERS):
+                return True
+    return False
+
+
+def default_ignore_patterns(root: Path, uses_git: bool) -> List[str]:
+    """Default ignore list, keeping .git when the build needs it"""
+    patterns = list(DEFAULT_IGNORE_PATTERNS)
+    if _needs_git(root, uses_git):
+        patterns.remove(".git")
+    return patterns
+
+
+def generate_ignore_patterns(root: Path, uses_git: bool) -> List[str]:
+    """Generated ignore list: defaults followed by the repo .dockerignore"""
+    return default_ignore_patterns(root, uses_git) + _read_dockerignore(root)
+
+
+class ContextBuilder:
+    """Builds and caches the minimal context tarball for one repository"""
+
+    def __init__(self, root: str = ".", cache_dir: Optional[Path] = None):
+        self.root = Path(root).resolve()
+        repo_key = hashlib.sha256(str(self.root).encode()).hexdigest()[:16]
+        self.cache_dir = Path(cache_dir or CONTEXT_CACHE_DIR) / f"{self.root.name}_{repo_key}"
+        self.index_file = self.cache_dir / "index.json"
+
+    def _load_index(self) -> Dict[str, list]:
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _file_hash(self, path: Path, rel_path: str, index: Dict[str, list], new_index: Dict[str, list]) -> str:
+        """sha256 of a file, reusing the cached hash while size and mtime are unchanged"""
+        stat = path.lstat()
+        cached = index.get(rel_path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            digest = cached[2]
+        elif path.is_symlink():
+            digest = hashlib.sha256(os.readlink(path).encode()).hexdigest()
+        else:
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+        new_index[rel_path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def _expand_sources(self, sources: List[str]) -> List[str]:
+        """Resolve source patterns to existing relative paths; "." when the whole tree is needed"""
+        resolved = set()
+        for source in sources:
+            normalized = _normalize_source(source)
+            if normalized is None or normalized == ".":
+                return ["."]
+            if any(char in normalized for char in "*?["):
+                for match in self.root.glob(normalized):
+                    resolved.add(match.relative_to(self.root).as_posix())
+            elif (self.root / normalized).exists() or (self.root / normalized).is_symlink():
+                resolved.add(Path(normalized).as_posix())
+        return sorted(resolved)
+
+    def _collect_entries(self, sources: List[str], default_matcher: IgnoreMatcher,
+                         repo_matcher: IgnoreMatcher) -> Tuple[List[str], int]:
+        """Walk the sources and return (sorted relative paths to include, excluded count)"""
+        entries = set()
+        excluded = 0
+
+        def add_parents(rel_path: str):
+            parent = Path(rel_path).parent
+            while str(parent) not in (".", ""):
+                entries.add(parent.as_posix())
+                parent = parent.parent
+
+        for source in sources:
+            # An explicitly named source bypasses the default ignores (but not the repo's)
+            explicit = source != "." and default_matcher.ignored(source)
+
+            def ignored(rel_path: str) -> bool:
+                if repo_matcher.ignored(rel_path):
+                    return True
+                return not explicit and default_matcher.ignored(rel_path)
+
+            source_path = self.root / source
+            if source != "." and ignored(source):
+                excluded += 1
+                continue
+            if not source_path.is_dir() or source_path.is_symlink():
+                entries.add(source)
+                add_parents(source)
+                continue
+
+            if source != ".":
+                entries.add(source)
+                add_parents(source)
+            for dirpath, dirnames, filenames in os.walk(source_path):
+                rel_dir = Path(dirpath).relative_to(self.root).as_posix()
+                kept_dirs = []
+                for dirname in sorted(dirnames):
+                    rel_path = dirname if rel_dir == "." else f"{rel_dir}/{dirname}"
+                    if ignored(rel_path) and not (repo_matcher.has_negations or default_matcher.has_negations):
+                        excluded += 1
+                        continue
+                    kept_dirs.append(dirname)
+                    if not ignored(rel_path):
+                        entries.add(rel_path)
+                dirnames[:] = kept_dirs
+                for filename in filenames:
+                    rel_path = filename if rel_dir == "." else f"{rel_dir}/{filename}"
+                    if ignored(rel_path):
+                        excluded += 1
+                        continue
+                    entries.add(rel_path)
+
+        return sorted(entries), excluded
+
+    def _prune_cache(self, keep: str):
+        tarballs = sorted(self.cache_dir.glob("*.tar"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for tarball in tarballs[CONTEXT_CACHE_KEEP:]:
+            if tarball.name != keep:
+                try:
+                    tarball.unlink()
+                except OSError:
+                    pass
+
+    def warm(self, raw_sources: List[str]) -> int:
+        """
+        Hash the files of some COPY/ADD sources ahead of the build
+
+        Used while the Dockerfile is still being generated: the hashes are merged into
+        the index so the following build() only has to stat these files.
+
+        Returns:
+            int: number of files hashed or confirmed unchanged
+        """
+        sources = self._expand_sources(raw_sources)
+        default_matcher = IgnoreMatcher(default_ignore_patterns(self.root, False))
+        repo_matcher = IgnoreMatcher(_read_dockerignore(self.root))
+        entries, _ = self._collect_entries(sources, default_matcher, repo_matcher)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        index = self._load_index()
+        new_index = dict(index)
+        hashed = 0
+        for rel_path in entries:
+            path = self.root / rel_path
+            if path.is_dir() and not path.is_symlink():
+                continue
+            try:
+                self._file_hash(path, rel_path, index, new_index)
+            except OSError:
+                continue
+            hashed += 1
+
+        tmp_index = self.index_file.with_suffix(".json.tmp")
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump(new_index, f)
+        os.replace(tmp_index, self.index_file)
+        return hashed
+
+    def build(self, dockerfile_path: str, ignore_output: Optional[Path] = None, minimal: bool = True) -> Dict:
+        """
+        Build (or reuse) the context tarball for a Dockerfile
+
+        Args:
+            dockerfile_path: Dockerfile path, added to the tarball so `-f` resolves inside it
+            ignore_output: Where to write the generated ignore list for inspection
+            minimal: False packs the whole directory with only the repo .dockerignore applied,
+                     like `docker build .` would
+
+        Returns:
+            dict: tarball path, dockerfile name inside the tarball, hash, files, bytes, cached, sources
+        """
+        start = time.time()
+        dockerfile = Path(dockerfile_path).resolve()
+        dockerfile_text = dockerfile.read_text(encoding='utf-8', errors='replace')
+
+        raw_sources, uses_git = parse_context_sources(dockerfile_text)
+        sources = self._expand_sources(raw_sources) if minimal else ["."]
+        default_patterns = default_ignore_patterns(self.root, uses_git) if minimal else []
+        repo_patterns = _read_dockerignore(self.root)
+        patterns = default_patterns + repo_patterns
+        default_matcher = IgnoreMatcher(default_patterns)
+        repo_matcher = IgnoreMatcher(repo_patterns)
+
+        if ignore_output is not None:
+            try:
+                Path(ignore_output).write_text(
+                    "# Generated by EnvGym: paths excluded from the Docker build context\n"
+                    + "\n".join(patterns) + "\n", encoding='utf-8')
+            except OSError:
+                pass
+
+        entries, excluded = self._collect_entries(sources, default_matcher, repo_matcher)
+
+        try:
+            dockerfile_arcname = dockerfile.relative_to(self.root).as_posix()
+        except ValueError:
+            dockerfile_arcname = FALLBACK_DOCKERFILE_NAME
+
+        # Content hash over paths, modes and file hashes (file hashes memoized by size/mtime)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        index = self._load_index()
+        new_index: Dict[str, list] = {}
+        context_hash = hashlib.sha256()
+        context_hash.update(f"dockerfile:{dockerfile_arcname}:{hashlib.sha256(dockerfile_text.encode()).hexdigest()}\n".encode())
+        file_count = 0
+        for rel_path in entries:
+            path = self.root / rel_path
+            if path.is_dir() and not path.is_symlink():
+                context_hash.update(f"{rel_path}/\0dir\n".encode())
+                continue
+            digest = self._file_hash(path, rel_path, index, new_index)
+            context_hash.update(f"{rel_path}\0{path.lstat().st_mode:o}\0{digest}\n".encode())
+            file_count += 1
+        digest = context_hash.hexdigest()
+
+        tarball = self.cache_dir / f"{digest}.tar"
+        cached = tarball.exists()
+        if not cached:
+            tmp_tarball = tarball.with_suffix(".tar.tmp")
+            with tarfile.open(tmp_tarball, 'w') as tar:
+                for rel_path in entries:
+                    if rel_path == dockerfile_arcname:
+                        continue
+                    info = tar.gettarinfo(str(self.root / rel_path), arcname=rel_path)
+                    info.uid = info.gid = 0
+                    info.uname = info.gname = ""
+                    if info.isfile():
+                        with open(self.root / rel_path, 'rb') as f:
+                            tar.addfile(info, f)
+                    else:
+                        tar.addfile(info)
+                info = tar.gettarinfo(str(dockerfile), arcname=dockerfile_arcname)
+                info.uid = info.gid = 0
+                info.uname = info.gname = ""
+                with open(dockerfile, 'rb') as f:
+                    tar.addfile(info, f)
+            os.replace(tmp_tarball, tarball)
+        else:
+            os.utime(tarball)
+
+        with open(self.index_file, 'w', encoding='utf-8') as f:
+            json.dump(new_index, f)
+        self._prune_cache(tarball.name)
+
+        return {
+            "tarball": str(tarball),
+            "dockerfile": dockerfile_arcname,
+            "hash": digest,
+            "files": file_count,
+            "excluded": excluded,
+            "bytes": tarball.stat().st_size,
+            "cached": cached,
+            "sources": sources,
+            "seconds": round(time.time() - start, 2)
+        }
+
+
+def format_context_report(context: Dict) -> str:
+    """One-line summary of the build context that was sent"""
+    size_mb = context["bytes"] / (1024 * 1024)
+    sources = "whole repository" if context["sources"] == ["."] else ", ".join(context["sources"][:10])
+    if len(context["sources"]) > 10:
+        sources += f", ... ({len(context['sources'])} paths)"
+    return (f"{context['files']} files, {size_mb:.2f} MB sent"
+            f"{' (cached tarball)' if context['cached'] else ''}, {context['excluded']} paths excluded; "
+            f"sources: {sources or 'none'}")
+
+
+__all__ = ['ContextBuilder', 'parse_context_sources', 'generate_ignore_patterns',
+           'format_context_report', 'DEFAULT_IGNORE_PATTERNS']
@@ -7,7 +7,9 @@ import sys
 import os
 import subprocess
 import json
+import re
 import time
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Optional, List, Tuple
@@ -16,22 +18,79 @@ from typing import Dict, Optional, List, Tuple
 project_root = Path(__file__).resolve().parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+try:
+    from .probes import format_probe_report
+    from .context import ContextBuilder, format_context_report, GENERATED_IGNORE_FILE
+    from .engine_api import DockerEngineClient, DockerEngineError
+    from .checkpoint import (parse_instructions, parse_build_steps, find_checkpoint_step, build_checkpoint,
+                             load_checkpoint, save_checkpoint, prepare_resume, checkpoint_image_name,
+                             CHECKPOINT_FILE, RESUME_DOCKERFILE)
+    from .timeouts import (TimeoutModel, detect_ecosystem, record_metrics, format_limits,
+                           PHASE_BUILD, PHASE_RUN, KILLED_TIMEOUT)
+except ImportError:
+    from probes import format_probe_report
+    from context import ContextBuilder, format_context_report, GENERATED_IGNORE_FILE
+    from engine_api import DockerEngineClient, DockerEngineError
+    from checkpoint import (parse_instructions, parse_build_steps, find_checkpoint_step, build_checkpoint,
+                            load_checkpoint, save_checkpoint, prepare_resume, checkpoint_image_name,
+                            CHECKPOINT_FILE, RESUME_DOCKERFILE)
+    from timeouts import (TimeoutModel, detect_ecosystem, record_metrics, format_limits,
+                          PHASE_BUILD, PHASE_RUN, KILLED_TIMEOUT)
+
+BUILD_TIMEOUT = 1500
+BUILD_ERROR_TAIL_LINES = 30
+# 只有 BuildKit 支持的语法：syntax 指令、heredoc、RUN --mount/--network/--security、COPY/ADD --chmod/--link/--parents 等
+BUILDKIT_SYNTAX_PATTERN = re.compile(
+    r'^\s*#\s*syntax\s*=|^\s*(RUN|COPY|ADD)\s+.*(?<!<)<<(?!<)-?\s*["\']?\w+|'
+    r'^\s*RUN\s+(--\S+\s+)*--(mount|network|security)=|'
+    r'^\s*(COPY|ADD)\s+(--\S+\s+)*--(chmod|link|parents|exclude|checksum|keep-git-dir)\b',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def requires_buildkit(dockerfile_text: str) -> bool:
+    """Dockerfile 是否使用了经典构建器不支持的语法"""
+    return bool(BUILDKIT_SYNTAX_PATTERN.search(dockerfile_text))
+
+
 class DockerRunner:
     """Docker 运行器类，负责构建和运行 Docker 容器"""
     
-    def __init__(self, output_dir: Optional[str] = None):
+    def __init__(self, output_dir: Optional[str] = None, backend: Optional[str] = None):
         """
         初始化 Docker 运行器
         
         Args:
             output_dir: 输出目录路径，默认为 dockerrun 目录
+            backend: "cli"（docker 命令行，默认使用 BuildKit）、"api"（通过 unix socket 调用 Engine API）
+                     或 "auto"（socket 可用时使用 API），默认读取环境变量 DOCKER_BACKEND，未设置时为 "cli"。
+                     API 后端的 /build 使用经典构建器，使用 BuildKit 语法的 Dockerfile 仍交给 CLI 构建
         """
         if output_dir is None:
             output_dir = Path(__file__).parent / "output"
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        # 最近一次构建发送的上下文信息（最小上下文模式下）
+        self.last_context: Optional[Dict] = None
+        # 最近一次构建的结构化消息（仅 API 后端）
+        self.last_build_messages: List[Dict] = []
+        # 最近一次构建的耗时统计 {"duration", "killed", "max_gap"}，用于学习超时
+        self.last_build_stats: Dict = {}
+        
+        # 选择后端：默认 CLI；显式选择 api/auto 且 socket 可用时使用 Engine API
+        backend = (backend or os.getenv("DOCKER_BACKEND", "cli")).strip().lower()
+        self.engine: Optional[DockerEngineClient] = None
+        if backend in ("api", "auto"):
+            engine = DockerEngineClient()
+            if engine.available():
+                self.engine = engine
+            elif backend == "api":
+                print(f"Warning: Docker Engine API not reachable at {engine.socket_path}, falling back to docker CLI")
+        self.backend = "api" if self.engine else "cli"
         
-    def build_image(self, dockerfile_path: str, image_name: Optional[str] = None, build_context: Optional[str] = None) -> Tuple[bool, str, str]:
+    def build_image(self, dockerfile_path: str, image_name: Optional[str] = None, build_context: Optional[str] = None,
+                    minimal_context: bool = True, timeout: int = BUILD_TIMEOUT,
+                    stall_timeout: Optional[int] = None) -> Tuple[bool, str, str]:
         """
         构建 Docker 镜像
         
@@ -39,10 +98,15 @@ class DockerRunner:
             dockerfile_path: Dockerfile 路径
             image_name: 镜像名称，默认自动生成
             build_context: 构建上下文路径，默认为当前工作目录
+            minimal_context: 只发送 COPY/ADD 引用的路径（按内容哈希缓存的 tar 包），而不是整个目录；
+                             默认开启，与 execute_dockerfile/run_dockerfile_with_logs 一致
+            timeout: 构建总超时时间（秒）
+            stall_timeout: 没有任何输出超过该秒数时视为卡住并终止构建，None 表示只使用总超时
             
         Returns:
             tuple: (是否成功, 标准输出, 错误输出)
         """
+        self.last_build_stats = {}
         dockerfile_path = Path(dockerfile_path)
         if not dockerfile_path.exists():
             return False, "", f"Dockerfile 不存在: {dockerfile_path}"
@@ -55,6 +119,16 @@ class DockerRunner:
         if build_context is None:
             build_context = "."
         
+        if self.engine:
+            try:
+                buildkit_only = requires_buildkit(dockerfile_path.read_text(encoding='utf-8', errors='ignore'))
+            except OSError:
+                buildkit_only = False
+            if not buildkit_only:
+                return self._build_image_api(dockerfile_path, image_name, build_context, minimal_context,
+                                             timeout, stall_timeout)
+            print("Dockerfile uses BuildKit-only syntax, building with the docker CLI instead of the Engine API")
+        
         build_cmd = [
             "docker", "build", 
             "-t", image_name,
@@ -62,22 +136,152 @@ class DockerRunner:
             str(build_context)
         ]
         
+        # 最小上下文：通过 stdin 发送 tar 包，-f 指向 tar 包内的 Dockerfile
+        self.last_context = None
+        if minimal_context:
+            try:
+                self.last_context = ContextBuilder(build_context).build(
+                    str(dockerfile_path), self.output_dir / GENERATED_IGNORE_FILE)
+                build_cmd = [
+                    "docker", "build",
+                    "-t", image_name,
+                    "-f", self.last_context["dockerfile"],
+                    "-"
+                ]
+            except Exception as e:
+                print(f"Warning: Could not build minimal context, sending {build_context}: {e}")
+                self.last_context = None
+        
         try:
-            result = subprocess.run(
-                build_cmd,
-                capture_output=True,
-                text=True,
-                timeout=1500  # 5分钟超时
-            )
+            if self.last_context:
+                with open(self.last_context["tarball"], 'rb') as context_file:
+                    returncode, stdout, stderr = self._run_watched(build_cmd, context_file, timeout, stall_timeout)
+            else:
+                returncode, stdout, stderr = self._run_watched(build_cmd, None, timeout, stall_timeout)
             
-            success = result.returncode == 0
-            return success, result.stdout, result.stderr
+            killed = self.last_build_stats.get("killed")
+            if killed == "timeout":
+                return False, stdout, f"{stderr}\nDocker build timeout ({timeout} seconds)".lstrip()
+            if killed == "stall":
+                return False, stdout, f"{stderr}\nDocker build stalled (no output for {stall_timeout} seconds)".lstrip()
+            return returncode == 0, stdout, stderr
             
-        except subprocess.TimeoutExpired:
-            return False, "", "Docker build timeout (5 minutes)"
         except Exception as e:
             return False, "", f"Docker build exception: {str(e)}"
     
+    def _run_watched(self, cmd: List[str], stdin_file, timeout: int,
+                     stall_timeout: Optional[int]) -> Tuple[Optional[int], str, str]:
+        """
+        运行命令并监视输出：超过总超时或超过 stall_timeout 秒没有任何输出时终止进程
+        
+        结果统计（耗时、是否被终止、最长无输出间隔）写入 self.last_build_stats
+        
+        Returns:
+            tuple: (返回码，被终止时为 None, 标准输出, 错误输出)
+        """
+        start = time.time()
+        state = {"last_output": start, "max_gap": 0.0}
+        lock = threading.Lock()
+        chunks = {"stdout": [], "stderr": []}
+        process = subprocess.Popen(cmd, stdin=stdin_file or subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, errors="replace")
+        
+        def reader(stream, name):
+            for line in iter(stream.readline, ''):
+                now = time.time()
+                with lock:
+                    state["max_gap"] = max(state["max_gap"], now - state["last_output"])
+                    state["last_output"] = now
+                chunks[name].append(line)
+            stream.close()
+        
+        readers = [threading.Thread(target=reader, args=(process.stdout, "stdout"), daemon=True),
+                   threading.Thread(target=reader, args=(process.stderr, "stderr"), daemon=True)]
+        for thread in readers:
+            thread.start()
+        
+        killed = None
+        while process.poll() is None:
+            now = time.time()
+            with lock:
+                silent = now - state["last_output"]
+            if now - start > timeout:
+                killed = "timeout"
+            elif stall_timeout and silent > stall_timeout:
+                killed = "stall"
+            if killed:
+                process.kill()
+                break
+            time.sleep(1)
+        process.wait()
+        duration = time.time() - start
+        for thread in readers:
+            thread.join(timeout=5)
+        
+        self.last_build_stats = {"duration": duration, "killed": killed, "max_gap": state["max_gap"]}
+        return (None if killed else process.returncode), "".join(chunks["stdout"]), "".join(chunks["stderr"])
+    
+    def _build_image_api(self, dockerfile_path: Path, image_name: str, build_context: str,
+                         minimal_context: bool, timeout: int = BUILD_TIMEOUT,
+                         stall_timeout: Optional[int] = None) -> Tuple[bool, str, str]:
+        """
+        通过 Engine API 构建镜像（经典构建器），流式读取 JSON 消息
+        
+        Returns:
+            tuple: (是否成功, 构建输出, 错误信息（失败步骤及其最后几行输出）)
+        """
+        self.last_context = None
+        self.last_build_messages = []
+        try:
+            context = ContextBuilder(build_context).build(
+                str(dockerfile_path), self.output_dir / GENERATED_IGNORE_FILE, minimal=minimal_context)
+        except Exception as e:
+            return False, "", f"Docker build exception: failed to create build context: {str(e)}"
+        if minimal_context:
+            self.last_context = context
+        
+        output_lines = []
+        step_start = 0
+        current_step = ""
+        error = ""
+        start = last_message = time.time()
+        max_gap = 0.0
+        try:
+            for message in self.engine.build(context["tarball"], image_name, context["dockerfile"],
+                                             timeout=timeout, stall_timeout=stall_timeout):
+                max_gap = max(max_gap, time.time() - last_message)
+                last_message = time.time()
+                self.last_build_messages.append(message)
+                if "stream" in message:
+                    text = message["stream"]
+                    if text.startswith("Step "):
+                        current_step = text.strip()
+                        step_start = len(output_lines)
+                    output_lines.extend(text.rstrip("\n").split("\n"))
+                elif "status" in message:
+                    output_lines.append(f"{message['status']} {message.get('progress', '')}".rstrip())
+                elif "error" in message:
+                    error = message.get("errorDetail", {}).get("message") or message["error"]
+        except DockerEngineError as e:
+            error = str(e)
+        
+        killed = None
+        if error.startswith("Docker build timeout"):
+            killed = "timeout"
+        elif error.startswith("Docker build stalled"):
+            killed = "stall"
+        self.last_build_stats = {"duration": time.time() - start, "killed": killed, "max_gap": max_gap}
+        stdout = "\n".join(output_lines)
+        if not error:
+            return True, stdout, ""
+        
+        # 错误信息：失败的步骤、该步骤最后几行输出、守护进程返回的错误
+        stderr_lines = [f"ERROR: {error}"]
+        if current_step:
+            stderr_lines.append(f"Failed step: {current_step}")
+        stderr_lines.extend(output_lines[step_start + 1:][-BUILD_ERROR_TAIL_LINES:])
+        return False, stdout, "\n".join(stderr_lines)
+    
     def run_container(self, image_name: str, command: Optional[str] = None, 
                      timeout: int = 1500) -> Tuple[bool, str, str]:
         """
@@ -91,6 +295,13 @@ class DockerRunner:
         Returns:
             tuple: (是否成功, 标准输出, 错误输出)
         """
+        if self.engine:
+            try:
+                exit_code, stdout, stderr = self.engine.run(image_name, [command] if command else None, timeout)
+                return exit_code == 0, stdout, stderr
+            except DockerEngineError as e:
+                return False, "", f"Container runtime exception: {str(e)}"
+        
         run_cmd = ["docker", "run", "--rm"]
         
         if command:
@@ -113,7 +324,160 @@ class DockerRunner:
             return False, "", f"Container runtime timeout ({timeout} seconds)"
         except Exception as e:
             return False, "", f"Container runtime exception: {str(e)}"
-    
+
+    def start_probe_container(self, image_name: str) -> Tuple[bool, str, str]:
+        """
+        启动一个长期运行的容器，供 docker exec 执行探测命令
+
+        Args:
+            image_name: 镜像名称
+
+        Returns:
+            tuple: (是否成功, 容器ID, 错误输出)
+        """
+        if self.engine:
+            try:
+                container_id = self.engine.create_container(
+                    image_name, ["-f", "/dev/null"], entrypoint=["tail"], auto_remove=True)
+                self.engine.start_container(container_id)
+                return True, container_id, ""
+            except DockerEngineError as e:
+                return False, "", str(e)
+
+        start_cmd = [
+            "docker", "run", "-d", "--rm",
+            "--entrypoint", "tail",
+            image_name, "-f", "/dev/null"
+        ]
+
+        try:
+            result = subprocess.run(start_cmd, capture_output=True, text=True, timeout=120)
+            if result.returncode != 0:
+                return False, "", result.stderr
+            return True, result.stdout.strip(), ""
+        except subprocess.TimeoutExpired:
+            return False, "", "Probe container start timeout (120 seconds)"
+        except Exception as e:
+            return False, "", f"Probe container start exception: {str(e)}"
+
+    def exec_probe(self, container_id: str, probe: Dict, shell: str = "sh") -> Dict:
+        """
+        在容器中执行单个探测命令
+
+        Args:
+            container_id: 容器ID
+            probe: 探测定义 (name, command, timeout, required)
+            shell: 执行命令使用的 shell
+
+        Returns:
+            dict: 结构化的探测结果
+        """
+        timeout = probe.get("timeout", 60)
+        exec_cmd = ["docker", "exec", container_id, shell, "-c", probe["command"]]
+        result = {
+            "name": probe["name"],
+            "command": probe["command"],
+            "required": probe.get("required", False),
+            "success": False,
+            "exit_code": None,
+            "timed_out": False,
+            "duration": 0.0,
+            "stdout": "",
+            "stderr": ""
+        }
+
+        start = time.time()
+        if self.engine:
+            try:
+                exit_code, stdout, stderr = self.engine.exec_run(container_id, [shell, "-c", probe["command"]], timeout)
+                result["exit_code"] = exit_code
+                result["success"] = exit_code == 0
+                result["stdout"] = stdout[-2000:]
+                result["stderr"] = stderr[-2000:]
+            except DockerEngineError as e:
+                if "timeout" in e.message.lower():
+                    result["timed_out"] = True
+                    result["stderr"] = f"Probe timeout ({timeout} seconds)"
+                else:
+                    result["stderr"] = f"Probe exception: {str(e)}"
+            result["duration"] = round(time.time() - start, 3)
+            return result
+
+        try:
+            completed = subprocess.run(exec_cmd, capture_output=True, text=True, timeout=timeout)
+            result["exit_code"] = completed.returncode
+            result["success"] = completed.returncode == 0
+            result["stdout"] = completed.stdout[-2000:]
+            result["stderr"] = completed.stderr[-2000:]
+        except subprocess.TimeoutExpired:
+            result["timed_out"] = True
+            result["stderr"] = f"Probe timeout ({timeout} seconds)"
+        except Exception as e:
+            result["stderr"] = f"Probe exception: {str(e)}"
+        result["duration"] = round(time.time() - start, 3)
+
+        return result
+
+    def stop_container(self, container_id: str) -> bool:
+        """
+        强制删除容器
+
+        Args:
+            container_id: 容器ID
+
+        Returns:
+            bool: 是否成功删除
+        """
+        if self.engine:
+            try:
+                self.engine.remove_container(container_id, force=True)
+                return True
+            except DockerEngineError:
+                return False
+
+        try:
+            result = subprocess.run(
+                ["docker", "rm", "-f", container_id],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+            return result.returncode == 0
+        except Exception:
+            return False
+
+    def run_probes(self, image_name: str, probes: List[Dict]) -> Tuple[bool, str, str, List[Dict]]:
+        """
+        在同一个长期运行的容器中依次执行探测命令，每个命令有独立的超时
+
+        Args:
+            image_name: 镜像名称
+            probes: 探测定义列表
+
+        Returns:
+            tuple: (必需探测是否全部通过, 标准输出报告, 错误输出, 结构化探测结果列表)
+        """
+        started, container_id, start_error = self.start_probe_container(image_name)
+        if not started:
+            return False, "", f"Failed to start probe container: {start_error}", []
+
+        probe_results = []
+        try:
+            # 优先使用 bash，镜像中没有 bash 时退回 sh
+            shell_check = self.exec_probe(container_id, {"name": "bash", "command": "true", "timeout": 10}, shell="bash")
+            shell = "bash" if shell_check["success"] else "sh"
+
+            for probe in probes:
+                probe_results.append(self.exec_probe(container_id, probe, shell=shell))
+        finally:
+            self.stop_container(container_id)
+
+        success = all(r["success"] for r in probe_results if r["required"])
+        report = format_probe_report(probe_results, include_output=False)
+        failed = [r for r in probe_results if not r["success"]]
+        errors = format_probe_report(failed) if failed else ""
+        return success, report, errors, probe_results
+
     def cleanup_image(self, image_name: str) -> bool:
         """
         清理 Docker 镜像
@@ -124,6 +488,13 @@ class DockerRunner:
         Returns:
             bool: 是否成功删除
         """
+        if self.engine:
+            try:
+                self.engine.remove_image(image_name)
+                return True
+            except DockerEngineError:
+                return False
+
         try:
             result = subprocess.run(
                 ["docker", "rmi", image_name],
@@ -134,8 +505,206 @@ class DockerRunner:
         except Exception:
             return False
     
+    def image_exists(self, image_name: str) -> bool:
+        """
+        检查镜像是否存在
+        
+        Args:
+            image_name: 镜像名称或 ID
+            
+        Returns:
+            bool: 是否存在
+        """
+        if self.engine:
+            try:
+                self.engine.inspect_image(image_name)
+                return True
+            except DockerEngineError:
+                return False
+        
+        try:
+            result = subprocess.run(
+                ["docker", "image", "inspect", image_name],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+            return result.returncode == 0
+        except Exception:
+            return False
+    
+    def tag_image(self, image_id: str, image_ref: str) -> bool:
+        """
+        给镜像打标签
+        
+        Args:
+            image_id: 镜像 ID
+            image_ref: 目标引用 (name:tag)
+            
+        Returns:
+            bool: 是否成功
+        """
+        if self.engine:
+            repo, tag = image_ref.rsplit(':', 1)
+            try:
+                self.engine.tag_image(image_id, repo, tag)
+                return True
+            except DockerEngineError:
+                return False
+        
+        try:
+            result = subprocess.run(
+                ["docker", "tag", image_id, image_ref],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+            return result.returncode == 0
+        except Exception:
+            return False
+    
+    def pull_image(self, image_ref: str, timeout: int = BUILD_TIMEOUT) -> Tuple[bool, str]:
+        """
+        拉取镜像（用于在 Dockerfile 生成过程中提前拉取基础镜像）
+        
+        Args:
+            image_ref: 镜像引用，例如 python:3.11-slim 或 ubuntu@sha256:...
+            timeout: 超时时间（秒）
+            
+        Returns:
+            Tuple[bool, str]: (是否成功, 错误信息)
+        """
+        if self.engine:
+            if '@' in image_ref:
+                repo, tag = image_ref.split('@', 1)
+            elif ':' in image_ref.rsplit('/', 1)[-1]:
+                repo, tag = image_ref.rsplit(':', 1)
+            else:
+                repo, tag = image_ref, "latest"
+            try:
+                self.engine.pull_image(repo, tag, timeout)
+                return True, ""
+            except DockerEngineError as e:
+                return False, str(e)
+        
+        try:
+            result = subprocess.run(
+                ["docker", "pull", image_ref],
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+            return result.returncode == 0, result.stderr.strip()
+        except subprocess.TimeoutExpired:
+            return False, f"Image pull timeout ({timeout} seconds)"
+        except Exception as e:
+            return False, str(e)
+
+    def supports_buildkit(self) -> bool:
+        """
+        构建是否使用 BuildKit（决定能否使用 RUN --mount=type=cache）
+
+        API 后端使用经典构建器；CLI 后端在 DOCKER_BUILDKIT 未禁用且安装了 buildx 时默认使用 BuildKit
+
+        Returns:
+            bool: 是否支持 BuildKit
+        """
+        if self.engine:
+            return False
+        setting = os.getenv("DOCKER_BUILDKIT", "").strip()
+        if setting:
+            return setting != "0"
+        try:
+            result = subprocess.run(
+                ["docker", "buildx", "version"],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            return result.returncode == 0
+        except Exception:
+            return False
+
+    def resume_from_checkpoint(self, dockerfile_path: str) -> Tuple[str, Optional[List], Optional[Dict]]:
+        """
+        Dockerfile 仍以检查点覆盖的指令开头时，生成从检查点镜像继续构建的 resume.dockerfile
+        
+        Args:
+            dockerfile_path: 完整 Dockerfile 路径
+            
+        Returns:
+            tuple: (实际构建的 Dockerfile 路径, 指令映射, 使用的检查点)，不可用时返回原路径和 None
+        """
+        resume_path = self.output_dir / RESUME_DOCKERFILE
+        if resume_path.exists():
+            resume_path.unlink()
+        
+        checkpoint = load_checkpoint(self.output_dir)
+        if not checkpoint:
+            return dockerfile_path, None, None
+        try:
+            dockerfile_text = Path(dockerfile_path).read_text(encoding='utf-8')
+        except OSError:
+            return dockerfile_path, None, None
+        
+        resume = prepare_resume(dockerfile_text, checkpoint)
+        if not resume or not self.image_exists(checkpoint["image"]):
+            return dockerfile_path, None, None
+        
+        resume_text, step_map = resume
+        resume_path.write_text(resume_text, encoding='utf-8')
+        return str(resume_path), step_map, checkpoint
+    
+    def update_checkpoint(self, dockerfile_path: str, build_success: bool, build_output: str,
+                          step_map: Optional[List] = None) -> Optional[Dict]:
+        """
+        构建失败时把最深的成功步骤打标签为检查点镜像并写入 checkpoint.json；构建成功时清除检查点
+        
+        只有经典构建器的输出（"Step N/M" 与 " ---> <id>"）带有中间镜像 ID，BuildKit 输出时不创建检查点
+        
+        Args:
+            dockerfile_path: 完整 Dockerfile 路径
+            build_success: 构建是否成功
+            build_output: 构建输出
+            step_map: 使用 resume.dockerfile 时的指令映射
+            
+        Returns:
+            dict: 新的检查点，没有创建时返回 None
+        """
+        checkpoint_file = self.output_dir / CHECKPOINT_FILE
+        if build_success:
+            previous = load_checkpoint(self.output_dir)
+            if previous:
+                self.cleanup_image(previous["image"])
+            if checkpoint_file.exists():
+                checkpoint_file.unlink()
+            return None
+        
+        try:
+            dockerfile_text = Path(dockerfile_path).read_text(encoding='utf-8')
+        except OSError:
+            return None
+        
+        steps = parse_build_steps(build_output)
+        found = find_checkpoint_step(steps, parse_instructions(dockerfile_text), step_map)
+        if not found:
+            return None
+        
+        full_index, image_id = found
+        image_ref = checkpoint_image_name(Path.cwd().name)
+        if not self.tag_image(image_id, image_ref):
+            return None
+        
+        failed_step = steps[-1] if not steps[-1]["image_id"] else None
+        checkpoint = build_checkpoint(dockerfile_text, full_index, image_ref, image_id, failed_step)
+        save_checkpoint(self.output_dir, checkpoint)
+        return checkpoint
+    
     def save_results(self, dockerfile_path: str, build_result: Tuple[bool, str, str], 
-                    run_result: Tuple[bool, str, str], image_name: str) -> str:
+                    run_result: Tuple[bool, str, str], image_name: str,
+                    probe_results: Optional[List[Dict]] = None,
+                    context_info: Optional[Dict] = None,
+                    checkpoint_info: Optional[Dict] = None) -> str:
         """
         保存执行结果到文件
         
@@ -144,6 +713,9 @@ class DockerRunner:
             build_result: 构建结果
             run_result: 运行结果
             image_name: 镜像名称
+            probe_results: 结构化探测结果（使用探测运行阶段时）
+            context_info: 构建上下文信息（使用最小上下文时）
+            checkpoint_info: 检查点信息 {"resumed_from": 使用的检查点, "saved": 新保存的检查点}
             
         Returns:
             str: 结果文件路径
@@ -156,10 +728,12 @@ class DockerRunner:
             "timestamp": timestamp,
             "dockerfile_path": str(dockerfile_path),
             "image_name": image_name,
+            "backend": self.backend,
             "build": {
                 "success": build_result[0],
                 "stdout": build_result[1],
-                "stderr": build_result[2]
+                "stderr": build_result[2],
+                "duration": round(self.last_build_stats["duration"], 1) if self.last_build_stats.get("duration") else None
             },
             "run": {
                 "success": run_result[0],
@@ -167,6 +741,17 @@ class DockerRunner:
                 "stderr": run_result[2]
             }
         }
+        if probe_results is not None:
+            result_data["run"]["probes"] = probe_results
+        if checkpoint_info is not None:
+            result_data["build"]["checkpoint"] = {
+                key: ({k: v for k, v in value.items() if k not in ("prefix", "prefix_text")} if value else None)
+                for key, value in checkpoint_info.items()
+            }
+        if context_info is not None:
+            result_data["build"]["context"] = {
+                key: value for key, value in context_info.items() if key != "tarball"
+            }
         
         try:
             with open(result_file, 'w', encoding='utf-8') as f:
@@ -207,6 +792,16 @@ Image Name: {image_name}
 === Build Log ===
 Build Status: {'Success' if build_result[0] else 'Failed'}
 """
+                if context_info:
+                    log_summary_content += f"Build Context: {format_context_report(context_info)}\n"
+                if checkpoint_info and checkpoint_info.get("resumed_from"):
+                    resumed = checkpoint_info["resumed_from"]
+                    log_summary_content += (f"Resumed from checkpoint {resumed['image']}: steps 1-{resumed['step']} "
+                                            f"of the Dockerfile were not rebuilt\n")
+                if checkpoint_info and checkpoint_info.get("saved"):
+                    saved = checkpoint_info["saved"]
+                    log_summary_content += (f"Checkpoint saved as {saved['image']}: steps 1-{saved['step']} "
+                                            f"of {saved['total_steps']} built successfully\n")
                 
                 # 只在失败时显示错误信息，成功时保持简洁
                 if not build_result[0]:
@@ -274,8 +869,13 @@ Build Status: {'Success' if build_result[0] else 'Failed'}
 Runtime Status: {'Success' if run_result[0] else 'Failed'}
 """
                 
+                # 探测运行阶段：列出每个探测命令的结果，失败的附带输出
+                if probe_results:
+                    log_summary_content += f"Probe Results:\n{format_probe_report(probe_results)}\n"
+                    if not run_result[0]:
+                        log_summary_content += "Required probes failed.\n"
                 # 只在失败时显示错误信息，成功时显示关键输出
-                if not run_result[0]:
+                elif not run_result[0]:
                     log_summary_content += f"Runtime Error:\n{run_result[2]}\n"
                 elif run_result[1]:
                     # 如果运行成功且有输出，显示输出（但可能截断很长的输出）
@@ -311,7 +911,9 @@ Runtime Status: {'Success' if run_result[0] else 'Failed'}
 
 
 def execute_dockerfile(dockerfile_path: str, output_dir: Optional[str] = None, 
-                      cleanup: bool = True, verbose: bool = False) -> Dict:
+                      cleanup: bool = True, verbose: bool = False,
+                      probes: Optional[List[Dict]] = None,
+                      minimal_context: bool = True) -> Dict:
     """
     执行 Dockerfile 的主函数
     
@@ -320,6 +922,8 @@ def execute_dockerfile(dockerfile_path: str, output_dir: Optional[str] = None,
         output_dir: 输出目录路径
         cleanup: 是否在完成后清理镜像
         verbose: 是否启用详细输出
+        probes: 探测命令列表，提供时在长期运行的容器中逐个执行，否则运行镜像默认 CMD
+        minimal_context: 只发送 Dockerfile 引用的文件作为构建上下文
         
     Returns:
         dict: 执行结果详情
@@ -329,19 +933,50 @@ def execute_dockerfile(dockerfile_path: str, output_dir: Optional[str] = None,
     if verbose:
         print(f"Starting to process Dockerfile: {dockerfile_path}")
     
-    # Build image
+    # 根据历史耗时估计本仓库的构建/运行超时（仓库历史 > 同生态历史 > 默认值）
+    repo_name = Path.cwd().name
+    ecosystem = detect_ecosystem(".")
+    timeout_model = TimeoutModel()
+    build_limits = timeout_model.estimate(PHASE_BUILD, repo_name, ecosystem)
+    run_limits = timeout_model.estimate(PHASE_RUN, repo_name, ecosystem)
+    if verbose:
+        print(f"Build limits ({ecosystem}): {format_limits(build_limits)}")
+    
+    # Build image (from the last checkpoint when the Dockerfile still starts with its instructions)
     image_name = f"envgym_test_{int(time.time())}"
-    build_success, build_stdout, build_stderr = runner.build_image(dockerfile_path, image_name, ".")
+    build_path, step_map, resumed_from = runner.resume_from_checkpoint(dockerfile_path)
+    build_success, build_stdout, build_stderr = runner.build_image(
+        build_path, image_name, ".", minimal_context,
+        timeout=build_limits["timeout"], stall_timeout=build_limits["stall_timeout"])
+    if runner.last_build_stats:
+        record_metrics(repo_name, ecosystem, PHASE_BUILD, runner.last_build_stats["duration"], build_success,
+                       runner.last_build_stats["killed"], build_limits, runner.last_build_stats["max_gap"],
+                       resumed=resumed_from is not None)
+    saved_checkpoint = runner.update_checkpoint(dockerfile_path, build_success, build_stdout, step_map)
+    checkpoint_info = {"resumed_from": resumed_from, "saved": saved_checkpoint}
     
     if verbose:
+        if runner.last_context:
+            print(f"Build context: {format_context_report(runner.last_context)}")
+        if resumed_from:
+            print(f"Resumed from checkpoint {resumed_from['image']} (steps 1-{resumed_from['step']})")
+        if saved_checkpoint:
+            print(f"Checkpoint saved: {saved_checkpoint['image']} (steps 1-{saved_checkpoint['step']})")
         print(f"Build result: {'Success' if build_success else 'Failed'}")
         if build_stderr and verbose:
             print(f"Build error: {build_stderr}")
     
     # Run container
     run_success, run_stdout, run_stderr = False, "", ""
+    probe_results = None
     if build_success:
-        run_success, run_stdout, run_stderr = runner.run_container(image_name)
+        run_start = time.time()
+        if probes:
+            run_success, run_stdout, run_stderr, probe_results = runner.run_probes(image_name, probes)
+        else:
+            run_success, run_stdout, run_stderr = runner.run_container(image_name, timeout=run_limits["timeout"])
+        run_killed = KILLED_TIMEOUT if "Container runtime timeout" in run_stderr else None
+        record_metrics(repo_name, ecosystem, PHASE_RUN, time.time() - run_start, run_success, run_killed, run_limits)
         if verbose:
             print(f"Runtime result: {'Success' if run_success else 'Failed'}")
             if run_stdout:
@@ -354,7 +989,10 @@ def execute_dockerfile(dockerfile_path: str, output_dir: Optional[str] = None,
         dockerfile_path, 
         (build_success, build_stdout, build_stderr),
         (run_success, run_stdout, run_stderr),
-        image_name
+        image_name,
+        probe_results,
+        runner.last_context,
+        checkpoint_info
     )
     
     # Cleanup image
@@ -372,7 +1010,10 @@ def execute_dockerfile(dockerfile_path: str, output_dir: Optional[str] = None,
         "run_output": run_stdout,
         "run_error": run_stderr,
         "result_file": result_file,
-        "image_name": image_name
+        "image_name": image_name,
+        "probe_results": probe_results or [],
+        "context": runner.last_context,
+        "checkpoint": checkpoint_info
     }
 
 
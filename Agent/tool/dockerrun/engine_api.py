@@ -0,0 +1,353 @@
+"""
+Minimal Docker Engine API client over the unix socket.
+Talks HTTP to /var/run/docker.sock directly instead of forking the docker CLI:
+short requests reuse one persistent connection, build output is streamed as JSON
+messages and container output is demultiplexed into stdout/stderr.
+"""
+
+import http.client
+import json
+import os
+import socket
+import struct
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+DEFAULT_SOCKET_PATH = "/var/run/docker.sock"
+DEFAULT_TIMEOUT = 60
+
+
+class DockerEngineError(Exception):
+    """Error returned by the Docker Engine API (or a failure to reach it)"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+    def __str__(self):
+        return f"[{self.status}] {self.message}" if self.status else self.message
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def default_socket_path() -> str:
+    """Socket path from DOCKER_HOST (unix:// only), else the default socket"""
+    docker_host = os.getenv("DOCKER_HOST", "")
+    if docker_host.startswith("unix://"):
+        return docker_host[len("unix://"):]
+    return DEFAULT_SOCKET_PATH
+
+
+def demux_stream(data: bytes) -> Tuple[str, str]:
+    """Split a multiplexed (non-TTY) container stream into stdout and stderr"""
+    stdout, stderr = [], []
+    offset = 0
+    while offset + 8 <= len(data):
+        stream_type, length = struct.unpack(">BxxxL", data[offset:offset + 8])
+        payload = data[offset + 8:offset + 8 + length]
+        (stderr if stream_type == 2 else stdout).append(payload)
+        offset += 8 + length
+    if offset < len(data) and not stdout and not stderr:
+        # Not multiplexed (TTY container): everything is stdout
+        stdout.append(data)
+    return (b"".join(stdout).decode("utf-8", errors="replace"),
+            b"".join(stderr).decode("utf-8", errors="replace"))
+
+
+class DockerEngineClient:
+    """Lightweight Docker Engine API client"""
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._conn: Optional[UnixHTTPConnection] = None
+
+    # ---- transport ----
+
+    def available(self) -> bool:
+        """True when the socket exists and the daemon answers /_ping"""
+        if not os.path.exists(self.socket_path):
+            return False
+        try:
+            return self.ping()
+        except (DockerEngineError, OSError):
+            return False
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _url(self, path: str, params: Optional[Dict] = None) -> str:
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+            return f"{path}?{urlencode(params)}"
+        return path
+
+    @staticmethod
+    def _raise_for_status(response: http.client.HTTPResponse, body: bytes):
+        if response.status < 400:
+            return
+        try:
+            message = json.loads(body.decode("utf-8", errors="replace")).get("message", "")
+        except (json.JSONDecodeError, AttributeError):
+            message = body.decode("utf-8", errors="replace").strip()
+        raise DockerEngineError(message or response.reason, response.status)
+
+    def _request(self, method: str, path: str, params: Optional[Dict] = None,
+                 body=None, headers: Optional[Dict] = None) -> Tuple[int, bytes]:
+        """Short request on the persistent connection, reconnecting once if it went stale"""
+        url = self._url(path, params)
+        headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = UnixHTTPConnection(self.socket_path, self.timeout)
+            try:
+                self._conn.request(method, url, body=body, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                self._raise_for_status(response, data)
+                return response.status, data
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError,
+                    http.client.CannotSendRequest, http.client.ResponseNotReady):
+                self.close()
+                if attempt:
+                    raise DockerEngineError(f"Lost connection to {self.socket_path}")
+            except FileNotFoundError:
+                self.close()
+                raise DockerEngineError(f"Docker socket not found: {self.socket_path}")
+            except OSError as e:
+                self.close()
+                raise DockerEngineError(f"Docker API request failed: {method} {path}: {e}")
+        raise DockerEngineError(f"Docker API request failed: {method} {path}")
+
+    def _json(self, method: str, path: str, params: Optional[Dict] = None, body=None):
+        _, data = self._request(method, path, params, body)
+        return json.loads(data) if data else {}
+
+    def _stream(self, method: str, path: str, params: Optional[Dict] = None, body=None,
+                headers: Optional[Dict] = None, timeout: Optional[float] = None):
+        """Open a dedicated connection for a long-running streamed response"""
+        conn = UnixHTTPConnection(self.socket_path, timeout)
+        try:
+            conn.request(method, self._url(path, params), body=body, headers=headers or {})
+            response = conn.getresponse()
+        except FileNotFoundError:
+            conn.close()
+            raise DockerEngineError(f"Docker socket not found: {self.socket_path}")
+        except OSError as e:
+            conn.close()
+            raise DockerEngineError(f"Docker API request failed: {method} {path}: {e}")
+        if response.status >= 400:
+            data = response.read()
+            conn.close()
+            self._raise_for_status(response, data)
+        return conn, response
+
+    # ---- system ----
+
+    def ping(self) -> bool:
+        _, data = self._request("GET", "/_ping")
+        return data.strip() == b"OK"
+
+    def version(self) -> Dict:
+        return self._json("GET", "/version")
+
+    def info(self) -> Dict:
+        return self._json("GET", "/info")
+
+    # ---- images ----
+
+    def build(self, context_tarball: str, tag: str, dockerfile: str = "Dockerfile",
+              timeout: Optional[float] = None, labels: Optional[Dict[str, str]] = None,
+              on_message: Optional[Callable[[Dict], None]] = None,
+              stall_timeout: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Build an image from a context tarball, yielding the JSON messages as they arrive
+
+        This is the classic builder (no BuildKit session): heredocs, RUN --mount and
+        COPY --chmod are not supported, so DockerRunner sends such Dockerfiles to the CLI.
+
+        Messages are the daemon's build stream: {"stream": ...}, {"aux": {"ID": ...}},
+        {"status": ...} for pulls and {"error": ..., "errorDetail": ...} on failure.
+        A build that exceeds `timeout` seconds, or sends nothing for `stall_timeout`
+        seconds, raises DockerEngineError.
+        """
+        params = {"t": tag, "dockerfile": dockerfile, "rm": 1, "forcerm": 1}
+        if labels:
+            params["labels"] = json.dumps(labels)
+        headers = {
+            "Content-Type": "application/x-tar",
+            "Content-Length": str(os.path.getsize(context_tarball))
+        }
+        deadline = time.time() + timeout if timeout else None
+
+        with open(context_tarball, "rb") as body:
+            # The socket timeout bounds the wait for each line, i.e. the time without output
+            conn, response = self._stream("POST", "/build", params, body, headers, stall_timeout or timeout)
+        try:
+            while True:
+                if deadline and time.time() > deadline:
+                    raise DockerEngineError(f"Docker build timeout ({int(timeout)} seconds)")
+                try:
+                    line = response.readline()
+                except socket.timeout:
+                    if stall_timeout:
+                        raise DockerEngineError(f"Docker build stalled (no output for {int(stall_timeout)} seconds)")
+                    raise DockerEngineError(f"Docker build timeout ({int(timeout)} seconds)")
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    message = {"stream": line.decode("utf-8", errors="replace") + "\n"}
+                if on_message:
+                    on_message(message)
+                yield message
+        finally:
+            conn.close()
+
+    def pull_image(self, image: str, tag: str = "latest", timeout: Optional[float] = None) -> List[Dict]:
+        """Pull an image (`docker pull image:tag`), returning the progress messages"""
+        conn, response = self._stream("POST", "/images/create", {"fromImage": image, "tag": tag}, timeout=timeout)
+        messages = []
+        try:
+            for line in response:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if message.get("error"):
+                    raise DockerEngineError(message["error"])
+                messages.append(message)
+        except socket.timeout:
+            raise DockerEngineError(f"Image pull timeout ({int(timeout)} seconds)")
+        finally:
+            conn.close()
+        return messages
+
+    def tag_image(self, image: str, repo: str, tag: str = "latest"):
+        self._request("POST", f"/images/{quote(image, safe='')}/tag", {"repo": repo, "tag": tag})
+
+    def inspect_image(self, image: str) -> Dict:
+        return self._json("GET", f"/images/{quote(image, safe='')}/json")
+
+    def remove_image(self, image: str, force: bool = False, noprune: bool = False) -> List[Dict]:
+        return self._json("DELETE", f"/images/{quote(image, safe='')}",
+                          {"force": int(force), "noprune": int(noprune)})
+
+    # ---- containers ----
+
+    def create_container(self, image: str, cmd: Optional[List[str]] = None,
+                         entrypoint: Optional[List[str]] = None, auto_remove: bool = False) -> str:
+        config = {
+            "Image": image,
+            "AttachStdout": True,
+            "AttachStderr": True,
+            "Tty": False,
+            "HostConfig": {"AutoRemove": auto_remove}
+        }
+        if cmd is not None:
+            config["Cmd"] = cmd
+        if entrypoint is not None:
+            config["Entrypoint"] = entrypoint
+        return self._json("POST", "/containers/create", body=config)["Id"]
+
+    def start_container(self, container_id: str):
+        self._request("POST", f"/containers/{container_id}/start")
+
+    def wait_container(self, container_id: str, timeout: Optional[float] = None) -> int:
+        """Block until the container exits and return its exit code"""
+        conn, response = self._stream("POST", f"/containers/{container_id}/wait", timeout=timeout)
+        try:
+            data = response.read()
+        except socket.timeout:
+            raise DockerEngineError(f"Container runtime timeout ({int(timeout)} seconds)")
+        finally:
+            conn.close()
+        result = json.loads(data) if data else {}
+        if result.get("Error") and result["Error"].get("Message"):
+            raise DockerEngineError(result["Error"]["Message"])
+        return int(result.get("StatusCode", -1))
+
+    def logs(self, container_id: str) -> Tuple[str, str]:
+        _, data = self._request("GET", f"/containers/{container_id}/logs", {"stdout": 1, "stderr": 1})
+        return demux_stream(data)
+
+    def kill_container(self, container_id: str):
+        self._request("POST", f"/containers/{container_id}/kill")
+
+    def remove_container(self, container_id: str, force: bool = True):
+        self._request("DELETE", f"/containers/{container_id}", {"force": int(force)})
+
+    def run(self, image: str, cmd: Optional[List[str]] = None, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+        """Equivalent of `docker run --rm image [cmd]`: returns (exit code, stdout, stderr)"""
+        container_id = self.create_container(image, cmd)
+        try:
+            self.start_container(container_id)
+            try:
+                exit_code = self.wait_container(container_id, timeout)
+            except DockerEngineError:
+                try:
+                    self.kill_container(container_id)
+                except DockerEngineError:
+                    pass
+                raise
+            stdout, stderr = self.logs(container_id)
+            return exit_code, stdout, stderr
+        finally:
+            try:
+                self.remove_container(container_id)
+            except DockerEngineError:
+                pass
+
+    # ---- exec ----
+
+    def exec_run(self, container_id: str, cmd: List[str], timeout: Optional[float] = None) -> Tuple[int, str, str]:
+        """Run a command in a running container: returns (exit code, stdout, stderr)"""
+        exec_id = self._json("POST", f"/containers/{container_id}/exec", body={
+            "Cmd": cmd,
+            "AttachStdout": True,
+            "AttachStderr": True,
+            "Tty": False
+        })["Id"]
+
+        body = json.dumps({"Detach": False, "Tty": False}).encode("utf-8")
+        conn, response = self._stream("POST", f"/exec/{exec_id}/start", body=body,
+                                      headers={"Content-Type": "application/json"}, timeout=timeout)
+        try:
+            data = response.read()
+        except socket.timeout:
+            raise DockerEngineError(f"Exec timeout ({int(timeout)} seconds)")
+        finally:
+            conn.close()
+        stdout, stderr = demux_stream(data)
+        exit_code = self._json("GET", f"/exec/{exec_id}/json").get("ExitCode")
+        return (exit_code if exit_code is not None else -1), stdout, stderr
+
+
+__all__ = ['DockerEngineClient', 'DockerEngineError', 'default_socket_path', 'demux_stream']
@@ -14,13 +14,21 @@ sys.path.insert(0, str(project_root))
 # Import our Docker execution tools
 try:
     from .docker_runner import execute_dockerfile, print_execution_result, DockerRunner
+    from .probes import load_probes, DEFAULT_PROBE_TIMEOUT
+    from .validation import validate_dockerfile, has_errors, format_findings
+    from .optimizer import optimize_dockerfile_file, format_optimizer_report
 except ImportError:
     from docker_runner import execute_dockerfile, print_execution_result, DockerRunner
+    from probes import load_probes, DEFAULT_PROBE_TIMEOUT
+    from validation import validate_dockerfile, has_errors, format_findings
+    from optimizer import optimize_dockerfile_file, format_optimizer_report
 
 # Re-export main functions for use by other modules
 __all__ = ['execute_dockerfile', 'print_execution_result', 'DockerRunner', 'run_dockerfile_with_logs']
 
-def run_dockerfile_with_logs(dockerfile_path=None, output_dir=None, verbose=True, cleanup=True):
+def run_dockerfile_with_logs(dockerfile_path=None, output_dir=None, verbose=True, cleanup=True,
+                             use_probes=True, probe_timeout=DEFAULT_PROBE_TIMEOUT, minimal_context=True,
+                             validate=True, optimize=True):
     """
     Execute Dockerfile and record complete logs convenience function
     Defaults to using envgym/envgym.dockerfile and overwrites envgym/log.txt
@@ -30,6 +38,13 @@ def run_dockerfile_with_logs(dockerfile_path=None, output_dir=None, verbose=True
         output_dir: Output directory path (default: same as dockerfile directory to save log.txt there)
         verbose: Whether to show detailed output
         cleanup: Whether to cleanup images after completion
+        use_probes: Run probe commands (envgym/probes.json or defaults) via docker exec instead of the image CMD
+        probe_timeout: Default timeout in seconds for each probe command
+        minimal_context: Send only the paths referenced by COPY/ADD as the build context
+        validate: Check the Dockerfile against the repository first and skip the build when
+                  it is certainly broken (the findings are written to log.txt instead)
+        optimize: Rewrite the Dockerfile in place for layer reuse first (merged apt-get layers,
+                  manifests before sources, BuildKit cache mounts); report in optimizer.json
         
     Returns:
         dict: Execution result details
@@ -68,7 +83,9 @@ def run_dockerfile_with_logs(dockerfile_path=None, output_dir=None, verbose=True
             'run_output': '',
             'run_error': '',
             'result_file': '',
-            'image_name': ''
+            'image_name': '',
+            'probe_results': [],
+            'context': None
         }
     
     if not output_full_path.exists():
@@ -81,7 +98,9 @@ def run_dockerfile_with_logs(dockerfile_path=None, output_dir=None, verbose=True
             'run_output': '',
             'run_error': '',
             'result_file': '',
-            'image_name': ''
+            'image_name': '',
+            'probe_results': [],
+            'context': None
         }
     
     if verbose:
@@ -98,11 +117,31 @@ def run_dockerfile_with_logs(dockerfile_path=None, output_dir=None, verbose=True
         relative_dockerfile = dockerfile_full_path.relative_to(working_dir)
         relative_output = output_full_path.relative_to(working_dir)
         
+        if optimize:
+            try:
+                buildkit = DockerRunner(str(relative_output)).supports_buildkit()
+                report = optimize_dockerfile_file(str(relative_dockerfile), str(relative_output), buildkit=buildkit)
+                print(f"Dockerfile optimizer: {format_optimizer_report(report)}")
+            except Exception as e:
+                print(f"Warning: Dockerfile optimizer failed, building the Dockerfile as written: {e}")
+        
+        findings = validate_dockerfile(str(relative_dockerfile)) if validate else []
+        if findings:
+            print(f"Pre-flight validation:\n{format_findings(findings, relative_dockerfile.name)}")
+        if has_errors(findings):
+            return reject_dockerfile(str(relative_dockerfile), str(relative_output), findings)
+        
+        probes = load_probes(working_dir, output_full_path, probe_timeout) if use_probes else None
+        if verbose and probes:
+            print(f"Run phase: {len(probes)} probe commands")
+        
         result = execute_dockerfile(
             dockerfile_path=str(relative_dockerfile),
             output_dir=str(relative_output),
             cleanup=cleanup,
-            verbose=verbose
+            verbose=verbose,
+            probes=probes,
+            minimal_context=minimal_context
         )
         
         # If both build and run are successful, write SUCCESS to status.txt
@@ -116,12 +155,57 @@ def run_dockerfile_with_logs(dockerfile_path=None, output_dir=None, verbose=True
             except Exception as e:
                 if verbose:
                     print(f"Failed to write to status.txt: {e}")
+        elif findings:
+            # Warnings did not block the build, but may explain its failure
+            append_findings_to_log(output_full_path / 'log.txt', findings, relative_dockerfile.name)
         
+        result['validation'] = findings
         return result
     finally:
         # Always restore original working directory
         os.chdir(original_cwd)
 
+def reject_dockerfile(dockerfile_path, output_dir, findings):
+    """
+    Record a Dockerfile rejected by pre-flight validation as a failed build without building it
+    
+    The findings take the place of the build error in log.txt/log_complete.txt, so the
+    summary and revision steps see them like any other build failure.
+    """
+    print("Build skipped: the Dockerfile failed pre-flight validation")
+    # Findings first: the log parsers take the first specific error line as the cause
+    report = (f"{format_findings(findings, Path(dockerfile_path).name)}\n"
+              f"ERROR: pre-flight validation rejected the Dockerfile, the build was skipped")
+    runner = DockerRunner(output_dir)
+    result_file = runner.save_results(
+        dockerfile_path,
+        (False, "", report),
+        (False, "", "Not run: the image was not built"),
+        "(not built)"
+    )
+    return {
+        'success': False,
+        'build_success': False,
+        'run_success': False,
+        'build_output': '',
+        'build_error': report,
+        'run_output': '',
+        'run_error': '',
+        'result_file': result_file,
+        'image_name': '',
+        'probe_results': [],
+        'context': None,
+        'validation': findings
+    }
+
+def append_findings_to_log(log_path, findings, dockerfile_name):
+    """Append non-blocking validation findings to log.txt"""
+    try:
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(f"\n=== Pre-flight Validation ===\n{format_findings(findings, dockerfile_name)}\n")
+    except OSError as e:
+        print(f"Failed to append validation findings to {log_path}: {e}")
+
 def execute_dockerfile_simple(dockerfile_path=None):
     """
     Simplified version of Dockerfile execution function
@@ -0,0 +1,536 @@
+"""
+Deterministic Dockerfile optimizer run between the writing tools and the build.
+LLM-written Dockerfiles rebuild far more than they need to between iterations:
+apt-get update and install are split over several layers, recommended packages are
+installed, and `COPY . .` comes before dependency installation so any edit to the
+repository invalidates the dependency layers. The optimizer rewrites the Dockerfile
+in a cache-friendly order. The same commands run and the same dependencies are
+installed, but the image is not identical: apt no longer installs recommended
+packages, which makes it smaller and can drop a tool that was only pulled in as
+a recommendation. ca-certificates is added for curl, wget, git and gnupg, and
+installs that include python3-pip keep their recommends (the compiler toolchain).
+
+- consecutive apt-get RUN layers are merged into one with --no-install-recommends
+- dependency installs that only read manifests (requirements.txt, package.json,
+  go.mod, pom.xml, Gemfile) are moved before the full source COPY, with a COPY of
+  just those manifests in front of them
+- with BuildKit, pip/npm/yarn download caches, the cargo crate download cache and
+  the Go build cache are kept across builds with RUN --mount=type=cache
+
+The rewrite is idempotent, so running it on every iteration keeps the Dockerfile
+(and with it the checkpoint prefix) stable.
+"""
+
+import json
+import re
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .checkpoint import parse_instructions
+    from .context import IgnoreMatcher, _read_dockerignore, _split_args
+except ImportError:
+    from checkpoint import parse_instructions
+    from context import IgnoreMatcher, _read_dockerignore, _split_args
+
+REPORT_FILE = "optimizer.json"
+
+APT_TOOLS = {"apt-get", "apt"}
+APT_CLEANUP_PATHS = ("/var/lib/apt/lists", "/var/cache/apt")
+ASSUME_YES_FLAGS = {"-y", "--yes", "--assume-yes", "-qy", "-yq", "-qqy", "-yqq"}
+# Without recommends these packages cannot verify TLS certificates
+NEEDS_CA_CERTIFICATES = {"curl", "wget", "git", "gnupg", "gpg"}
+# python3-pip recommends the compiler toolchain and headers that source builds rely on
+KEEP_RECOMMENDS = {"python3-pip"}
+FULL_CONTEXT_SOURCES = {".", "./"}
+PACKAGE_SPEC_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.\-\[\],<>=!~*]*$')
+NPM_LIFECYCLE_SCRIPTS = {"preinstall", "install", "postinstall", "prepare", "prepublish"}
+
+
+def _read(path: Path) -> str:
+    try:
+        return path.read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return ""
+
+
+def _segments(command: str) -> Optional[List[List[str]]]:
+    """Token lists of an `a && b && c` command; None for anything with other shell syntax"""
+    if re.search(r'[;|`"\'<>(){}]|\$\(', command):
+        return None
+    segments = []
+    for part in command.split("&&"):
+        tokens = part.split()
+        if not tokens:
+            return None
+        segments.append(tokens)
+    return segments
+
+
+def _strip_assignments(tokens: List[str]) -> Tuple[List[str], List[str]]:
+    """(leading VAR=value assignments, remaining tokens)"""
+    index = 0
+    while index < len(tokens) and re.match(r'^[A-Za-z_][A-Za-z0-9_]*=', tokens[index]):
+        index += 1
+    return tokens[:index], tokens[index:]
+
+
+class DockerfileOptimizer:
+    """Cache-friendly rewrite of one Dockerfile"""
+
+    def __init__(self, root: str = ".", buildkit: bool = False):
+        self.root = Path(root).resolve()
+        self.buildkit = buildkit
+        self.repo_matcher = IgnoreMatcher(_read_dockerignore(self.root))
+        self.changes: List[str] = []
+
+    # ---- Dockerfile blocks ----
+
+    def _blocks(self, dockerfile_text: str) -> Tuple[List[Dict], List[str]]:
+        """
+        Instructions with their source lines; comments and blank lines travel with the next instruction
+
+        Returns:
+            tuple: (blocks {"keyword", "text", "lead", "body"}, trailing lines)
+        """
+        lines = dockerfile_text.splitlines()
+        blocks = []
+        position = 0
+        for item in parse_instructions(dockerfile_text):
+            blocks.append({
+                "keyword": item["keyword"],
+                "text": item["text"],
+                "lead": lines[position:item["start"]],
+                "body": lines[item["start"]:item["end"] + 1]
+            })
+            position = item["end"] + 1
+        return blocks, lines[position:]
+
+    @staticmethod
+    def _set_body(block: Dict, text: str):
+        block["body"] = text.splitlines()
+        block["text"] = " ".join(part.strip().rstrip('\\').strip() for part in block["body"] if part.strip())
+
+    @staticmethod
+    def _stages(blocks: List[Dict]) -> List[Tuple[int, int]]:
+        """(start, end) block ranges of each build stage"""
+        starts = [index for index, block in enumerate(blocks) if block["keyword"] == "FROM"]
+        return [(start, starts[number + 1] if number + 1 < len(starts) else len(blocks))
+                for number, start in enumerate(starts)]
+
+    # ---- apt layers ----
+
+    def _apt_commands(self, block: Dict) -> Optional[Dict]:
+        """Packages, flags and cleanup of a RUN made only of apt-get update/install/clean steps"""
+        if block["keyword"] != "RUN":
+            return None
+        command = block["text"][3:].strip()
+        if command.startswith('[') or command.startswith('--'):
+            return None
+        segments = _segments(command)
+        if segments is None:
+            return None
+        result = {"packages": [], "flags": [], "assignments": [], "cleanup": False, "install": False}
+        for segment in segments:
+            assignments, tokens = _strip_assignments(segment)
+            if not tokens:
+                return None
+            if tokens[0] in APT_TOOLS:
+                arguments = tokens[1:]
+                subcommand = next((token for token in arguments if not token.startswith('-')), None)
+                if subcommand == "update":
+                    continue
+                if subcommand in ("clean", "autoclean"):
+                    result["cleanup"] = True
+                    continue
+                if subcommand != "install":
+                    return None
+                result["install"] = True
+                result["assignments"].extend(item for item in assignments if item not in result["assignments"])
+                index = 0
+                seen_install = False
+                while index < len(arguments):
+                    token = arguments[index]
+                    if token == "install" and not seen_install:
+                        seen_install = True
+                    elif token == "-o" and index + 1 < len(arguments):
+                        flag = f"-o {arguments[index + 1]}"
+                        if flag not in result["flags"]:
+                            result["flags"].append(flag)
+                        index += 1
+                    elif token.startswith('-'):
+                        if token not in ASSUME_YES_FLAGS and token != "--no-install-recommends" \
+                                and token not in result["flags"]:
+                            result["flags"].append(token)
+                    elif token not in result["packages"]:
+                        result["packages"].append(token)
+                    index += 1
+                result["no_recommends"] = "--no-install-recommends" in arguments
+            elif tokens[0] == "rm" and all(token.startswith('-') or token.startswith(APT_CLEANUP_PATHS)
+                                           for token in tokens[1:]):
+                result["cleanup"] = True
+            else:
+                return None
+        return result
+
+    def _apt_instruction(self, group: List[Dict], later_install: bool) -> str:
+        packages, flags, assignments = [], [], []
+        for commands in group:
+            packages.extend(package for package in commands["packages"] if package not in packages)
+            flags.extend(flag for flag in commands["flags"] if flag not in flags)
+            assignments.extend(item for item in commands["assignments"] if item not in assignments)
+        # A later install may rely on package lists that an update at the end of the group left behind
+        cleanup = any(commands["cleanup"] for commands in group) and (group[-1]["cleanup"] or not later_install)
+        names = {package.split('=', 1)[0] for package in packages}
+        if not names & KEEP_RECOMMENDS:
+            flags.insert(0, "--no-install-recommends")
+            if names & NEEDS_CA_CERTIFICATES and "ca-certificates" not in names:
+                packages.append("ca-certificates")
+        prefix = " ".join(assignments + ["apt-get", "install", "-y"] + flags)
+        lines = [f"RUN apt-get update && {prefix} \\"]
+        lines.extend(f"    {package} \\" for package in packages)
+        if cleanup:
+            lines.append("    && rm -rf /var/lib/apt/lists/*")
+        else:
+            lines[-1] = lines[-1][:-2]
+        return "\n".join(lines)
+
+    def merge_apt_layers(self, blocks: List[Dict]) -> List[Dict]:
+        """Merge consecutive apt-get RUNs of a stage and skip recommended packages"""
+        result = []
+        index = 0
+        while index < len(blocks):
+            commands = self._apt_commands(blocks[index])
+            if commands is None:
+                result.append(blocks[index])
+                index += 1
+                continue
+            group = [(blocks[index], commands)]
+            while index + len(group) < len(blocks):
+                following = self._apt_commands(blocks[index + len(group)])
+                if following is None:
+                    break
+                group.append((blocks[index + len(group)], following))
+            if not any(item["install"] for _, item in group):
+                result.extend(block for block, _ in group)
+                index += len(group)
+                continue
+
+            later_install = False
+            for block in blocks[index + len(group):]:
+                if block["keyword"] == "FROM":
+                    break
+                later_install = later_install or bool(re.search(r'\bapt(-get)?\s+(\S+\s+)*install\b', block["text"]))
+            merged = dict(group[0][0])
+            merged["lead"] = [line for block, _ in group for line in block["lead"]]
+            self._set_body(merged, self._apt_instruction([item for _, item in group], later_install))
+            if len(group) > 1:
+                self.changes.append(f"merged {len(group)} apt-get layers into one")
+                result.append(merged)
+            elif not commands.get("no_recommends", True) and "--no-install-recommends" in merged["text"]:
+                self.changes.append("apt-get install: added --no-install-recommends")
+                result.append(merged)
+            else:
+                result.append(group[0][0])
+            index += len(group)
+        return result
+
+    # ---- dependency hoisting ----
+
+    def _exists(self, rel_path: str) -> bool:
+        return (self.root / rel_path).is_file() and not self.repo_matcher.ignored(rel_path)
+
+    def _requirement_files(self, rel_path: str, seen: Optional[List[str]] = None) -> Optional[List[str]]:
+        """The requirements file and the files it includes, None when it installs local paths"""
+        seen = seen if seen is not None else []
+        if rel_path in seen:
+            return seen
+        if not self._exists(rel_path):
+            return None
+        seen.append(rel_path)
+        base = PurePosixPath(rel_path).parent
+        for raw in _read(self.root / rel_path).splitlines():
+            line = raw.split(' #', 1)[0].strip()
+            if not line or line.startswith('#'):
+                continue
+            match = re.match(r'^(-r|-c|--requirement|--constraint)[\s=]+(\S+)$', line)
+            if match:
+                if self._requirement_files((base / match.group(2)).as_posix(), seen) is None:
+                    return None
+                continue
+            if line.startswith(('-e', '--editable', '.', '/', 'file:')) or ' @ file:' in line or \
+                    re.match(r'^[^\s=<>~!]*/', line):
+                return None
+        return seen
+
+    def _package_json_manifests(self, lock_files: List[str]) -> Optional[List[str]]:
+        try:
+            package = json.loads(_read(self.root / "package.json") or "null")
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(package, dict) or package.get("workspaces"):
+            return None
+        if NPM_LIFECYCLE_SCRIPTS & set(package.get("scripts") or {}):
+            return None
+        for section in ("dependencies", "devDependencies", "optionalDependencies"):
+            for spec in (package.get(section) or {}).values():
+                if str(spec).startswith(("file:", "link:", "workspace:", ".", "/")):
+                    return None
+        return ["package.json"] + [name for name in lock_files if self._exists(name)]
+
+    def _dependency_manifests(self, segment: List[str]) -> Optional[List[str]]:
+        """Manifest files one install command reads, None when it may read other sources"""
+        tokens = segment
+        if len(tokens) >= 3 and re.match(r'^python[\d.]*$', tokens[0]) and tokens[1] == "-m":
+            tokens = tokens[2:]
+        command = tokens[0]
+        arguments = tokens[1:]
+
+        if re.match(r'^pip[\d.]*$', command) and arguments[:1] == ["install"]:
+            manifests = []
+            index = 1
+            while index < len(arguments):
+                token = arguments[index]
+                if token in ("-r", "--requirement", "-c", "--constraint") and index + 1 < len(arguments):
+                    files = self._requirement_files(arguments[index + 1])
+                    if files is None:
+                        return None
+                    manifests.extend(item for item in files if item not in manifests)
+                    index += 1
+                elif token in ("-i", "--index-url", "--extra-index-url", "--trusted-host") and index + 1 < len(arguments):
+                    index += 1
+                elif token.startswith('-'):
+                    if token in ("-e", "--editable") or token.startswith(("--requirement=", "--constraint=")):
+                        return None
+                elif not PACKAGE_SPEC_PATTERN.match(token) or '/' in token or (self.root / token).exists():
+                    return None
+                index += 1
+            return manifests
+
+        flags_only = all(token.startswith('-') for token in arguments[1:])
+        if command == "npm" and arguments[:1] in (["ci"], ["install"], ["i"]) and flags_only:
+            return self._package_json_manifests(["package-lock.json", "npm-shrinkwrap.json"])
+        if command == "yarn" and arguments[:1] in ([], ["install"]) and flags_only:
+            if (self.root / ".yarnrc.yml").exists():
+                return None
+            return self._package_json_manifests(["yarn.lock"])
+        if command == "go" and arguments[:2] == ["mod", "download"] and all(
+                token.startswith('-') for token in arguments[2:]):
+            go_mod = _read(self.root / "go.mod")
+            if not go_mod or re.search(r'=>\s*\.{0,2}/', go_mod):
+                return None
+            return [name for name in ("go.mod", "go.sum") if self._exists(name)]
+        if command == "mvn" and any(token.startswith("dependency:") for token in arguments) and all(
+                token.startswith(('-', "dependency:")) for token in arguments):
+            pom = _read(self.root / "pom.xml")
+            if not pom or "<modules>" in pom:
+                return None
+            return ["pom.xml"]
+        if command == "bundle" and arguments[:1] == ["install"] and flags_only:
+            gemfile = _read(self.root / "Gemfile")
+            if not gemfile or re.search(r'^\s*gemspec|path:', gemfile, re.MULTILINE):
+                return None
+            return [name for name in ("Gemfile", "Gemfile.lock") if self._exists(name)]
+        return None
+
+    def _run_manifests(self, block: Dict) -> Optional[List[str]]:
+        """Manifests of a RUN made only of dependency installs that read nothing but manifests"""
+        if block["keyword"] != "RUN":
+            return None
+        command = block["text"][3:].strip()
+        if command.startswith('['):
+            return None
+        while command.startswith('--mount='):
+            if "type=cache" not in command.split(None, 1)[0]:
+                return None
+            command = command.split(None, 1)[1] if ' ' in command else ""
+        segments = _segments(command)
+        if not segments:
+            return None
+        manifests = []
+        for segment in segments:
+            _, tokens = _strip_assignments(segment)
+            found = self._dependency_manifests(tokens) if tokens else None
+            if found is None:
+                return None
+            manifests.extend(item for item in found if item not in manifests)
+        return manifests
+
+    def hoist_dependencies(self, blocks: List[Dict], start: int, end: int) -> List[Dict]:
+        """Move manifest-only dependency installs of a stage in front of its full source COPY"""
+        stage = blocks[start:end]
+        workdir = "/"
+        for index, block in enumerate(stage):
+            if block["keyword"] == "WORKDIR":
+                target = block["text"].split(None, 1)[1].strip().strip('"') if ' ' in block["text"] else "/"
+                workdir = str(PurePosixPath(workdir) / target)
+                continue
+            if block["keyword"] not in ("COPY", "ADD"):
+                continue
+            args = _split_args(block["text"].split(None, 1)[1] if ' ' in block["text"] else "")
+            flags = [arg for arg in args if arg.startswith('--')]
+            paths = [arg for arg in args if not arg.startswith('--')]
+            if len(paths) != 2 or paths[0] not in FULL_CONTEXT_SOURCES or '$' in paths[1] or \
+                    any(not flag.startswith(("--chown", "--chmod")) for flag in flags):
+                continue
+            destination = str(PurePosixPath(workdir) / paths[1])
+
+            # Instructions up to the dependency installs must not read the copied sources
+            position, run_workdir = index + 1, workdir
+            while position < len(stage) and stage[position]["keyword"] in ("ENV", "ARG", "LABEL", "EXPOSE", "WORKDIR"):
+                if stage[position]["keyword"] == "WORKDIR":
+                    target = stage[position]["text"].split(None, 1)[1].strip().strip('"')
+                    run_workdir = str(PurePosixPath(run_workdir) / target)
+                position += 1
+            if '$' in run_workdir or run_workdir != destination:
+                return blocks
+            manifests, hoisted_end = [], position
+            while hoisted_end < len(stage):
+                found = self._run_manifests(stage[hoisted_end])
+                if found is None:
+                    break
+                manifests.extend(item for item in found if item not in manifests)
+                hoisted_end += 1
+            if hoisted_end == position:
+                return blocks
+
+            reordered = stage[index + 1:hoisted_end] + [dict(block, lead=[])] + stage[hoisted_end:]
+            if manifests:
+                copy_target = paths[1] if paths[1].endswith('/') else f"{paths[1]}/"
+                manifest_copy = " ".join(["COPY"] + flags + manifests + [copy_target])
+                reordered.insert(0, dict(block, keyword="COPY", body=[manifest_copy], text=manifest_copy))
+                reordered[0]["lead"] = block["lead"]
+            else:
+                reordered[0] = dict(reordered[0], lead=block["lead"] + reordered[0]["lead"])
+            self.changes.append(f"moved {hoisted_end - position} dependency install layer(s) before the full "
+                                f"source COPY" + (f" (copying {', '.join(manifests)} first)" if manifests else ""))
+            return blocks[:start] + stage[:index] + reordered + blocks[end:]
+        return blocks
+
+    # ---- cache mounts ----
+
+    def _cache_targets(self, command: str, home: Dict[str, str]) -> List[str]:
+        targets = []
+        if re.search(r'(^|[\s&])(python[\d.]* -m )?pip[\d.]* install\b', command):
+            targets.append("/root/.cache/pip")
+        if re.search(r'(^|[\s&])npm (ci|install|i)\b', command):
+            targets.append("/root/.npm")
+        if re.search(r'(^|[\s&])yarn(\s+install\b|\s*(&&|$))', command):
+            targets.append("/usr/local/share/.cache/yarn")
+        if re.search(r'(^|[\s&])cargo (build|install|fetch|test)\b', command):
+            # Only the crate downloads: the extracted sources stay in the image for later cargo runs
+            targets.append(f"{home['cargo']}/registry/cache")
+        if re.search(r'(^|[\s&])go (build|install|test)\b', command):
+            targets.append("/root/.cache/go-build")
+        return targets
+
+    def add_cache_mounts(self, blocks: List[Dict], start: int, end: int) -> List[Dict]:
+        """Keep package download caches across builds (BuildKit only, root stages only)"""
+        image = blocks[start]["text"].split()[1].lower() if len(blocks[start]["text"].split()) > 1 else ""
+        home = {"cargo": "/usr/local/cargo" if image.startswith("rust") else "/root/.cargo"}
+        for block in blocks[start + 1:end]:
+            if block["keyword"] == "USER":
+                # Cache mounts are owned by root; a different user could not write to them
+                break
+            if block["keyword"] == "ENV":
+                match = re.search(r'CARGO_HOME[= ]\s*["\']?([^\s"\']+)', block["text"])
+                if match and '$' not in match.group(1):
+                    home["cargo"] = match.group(1)
+                continue
+            if block["keyword"] != "RUN":
+                continue
+            command = block["text"][3:].strip()
+            if command.startswith('[') or "--mount=" in command:
+                continue
+            targets = self._cache_targets(command, home)
+            if not targets:
+                continue
+            mounts = " ".join(f"--mount=type=cache,target={target}" for target in targets)
+            body = list(block["body"])
+            body[0] = re.sub(r'^(\s*RUN)\s+', lambda m: f"{m.group(1)} {mounts} ", body[0], count=1, flags=re.IGNORECASE)
+            # --no-cache-dir would bypass the mounted pip cache
+            body = [re.sub(r'\s--no-cache-dir\b', '', line) for line in body]
+            self._set_body(block, "\n".join(body))
+            self.changes.append(f"cache mount for {', '.join(targets)}")
+        return blocks
+
+    # ---- driver ----
+
+    @staticmethod
+    def reusable_runs(blocks: List[Dict]) -> Tuple[int, int]:
+        """(RUN layers not invalidated by a source edit, all RUN layers)"""
+        reusable, total = 0, 0
+        full_copy_seen = False
+        for block in blocks:
+            if block["keyword"] == "FROM":
+                full_copy_seen = False
+            elif block["keyword"] in ("COPY", "ADD") and not re.search(r'--from', block["text"]):
+                paths = [arg for arg in _split_args(block["text"].split(None, 1)[-1]) if not arg.startswith('--')]
+                if any(path in FULL_CONTEXT_SOURCES for path in paths[:-1]):
+                    full_copy_seen = True
+            elif block["keyword"] == "RUN":
+                total += 1
+                reusable += 0 if full_copy_seen else 1
+        return reusable, total
+
+    def optimize(self, dockerfile_text: str) -> Tuple[str, Dict]:
+        """
+        Rewrite a Dockerfile for layer reuse
+
+        Returns:
+            tuple: (optimized text, report {"changed", "changes", "layers_before", "layers_after",
+                    "rebuilt_runs_before", "rebuilt_runs_after", "cached_runs_after", "buildkit"})
+        """
+        self.changes = []
+        blocks, trailing = self._blocks(dockerfile_text)
+        layers_before = sum(1 for block in blocks if block["keyword"] in ("RUN", "COPY", "ADD"))
+        reusable_before, total_before = self.reusable_runs(blocks)
+
+        # Heredocs are not split into instructions correctly; leave such Dockerfiles alone
+        if blocks and '<<' not in dockerfile_text:
+            blocks = self.merge_apt_layers(blocks)
+            for start, end in reversed(self._stages(blocks)):
+                blocks = self.hoist_dependencies(blocks, start, end)
+            if self.buildkit:
+                for start, end in self._stages(blocks):
+                    blocks = self.add_cache_mounts(blocks, start, end)
+
+        lines = [line for block in blocks for line in block["lead"] + block["body"]] + trailing
+        optimized = "\n".join(lines) + ("\n" if dockerfile_text.endswith("\n") else "")
+        reusable_after, total = self.reusable_runs(blocks)
+        report = {
+            "changed": optimized != dockerfile_text,
+            "changes": list(self.changes),
+            "layers_before": layers_before,
+            "layers_after": sum(1 for block in blocks if block["keyword"] in ("RUN", "COPY", "ADD")),
+            # RUN layers a repository edit invalidates (everything after the full source COPY)
+            "rebuilt_runs_before": total_before - reusable_before,
+            "rebuilt_runs_after": total - reusable_after,
+            "cached_runs_after": reusable_after,
+            "buildkit": self.buildkit
+        }
+        return (optimized if report["changed"] else dockerfile_text), report
+
+
+def optimize_dockerfile_file(dockerfile_path: str, output_dir: str, root: str = ".", buildkit: bool = False) -> Dict:
+    """Optimize a Dockerfile in place and write the report to <output_dir>/optimizer.json"""
+    path = Path(dockerfile_path)
+    original = _read(path)
+    optimized, report = DockerfileOptimizer(root, buildkit).optimize(original)
+    if report["changed"]:
+        path.write_text(optimized, encoding='utf-8')
+    with open(Path(output_dir) / REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def format_optimizer_report(report: Dict) -> str:
+    """One-line summary for the console"""
+    if not report.get("changed"):
+        return "no changes"
+    return (f"{'; '.join(report['changes'])} | layers {report['layers_before']} -> {report['layers_after']}, "
+            f"RUN layers rebuilt after a source edit {report['rebuilt_runs_before']} -> "
+            f"{report['rebuilt_runs_after']}")
+
+
+__all__ = ['DockerfileOptimizer', 'optimize_dockerfile_file', 'format_optimizer_report']
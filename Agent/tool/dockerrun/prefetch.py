@@ -0,0 +1,193 @@
+"""
+Early work on a Dockerfile that is still being generated.
+DockerfilePrefetcher is fed the streamed LLM answer: as soon as a FROM line is
+complete the base image is pulled in the background, and the files named by
+COPY/ADD sources are hashed into the context cache, so the build that follows
+finds the base image local and the context index warm.
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+try:
+    from .context import ContextBuilder, parse_context_sources
+    from .checkpoint import CHECKPOINT_REPO_PREFIX
+except ImportError:
+    from context import ContextBuilder, parse_context_sources
+    from checkpoint import CHECKPOINT_REPO_PREFIX
+
+ARG_REFERENCE_PATTERN = re.compile(r'\$\{([A-Za-z_][A-Za-z0-9_]*)(?::-([^}]*))?\}|\$([A-Za-z_][A-Za-z0-9_]*)')
+WARM_WAIT_TIMEOUT = 60
+
+
+class DockerfilePrefetcher:
+    """Watch a streamed Dockerfile and prepare its base images and build context"""
+
+    def __init__(self, root: str = ".", output_dir: str = "envgym", verbose: bool = False):
+        self.root = root
+        self.output_dir = output_dir
+        self.verbose = verbose
+        self._partial = ""
+        self._logical = ""
+        self._global_args: Dict[str, str] = {}
+        self._stages = set()
+        self._seen_from = False
+        self._runner = None
+        self._context_builder: Optional[ContextBuilder] = None
+        self._warm_executor: Optional[ThreadPoolExecutor] = None
+        self._warm_futures = []
+        self._warmed_sources = set()
+        self._lock = threading.Lock()
+        self.pulls: Dict[str, Optional[str]] = {}
+
+    # ---- stream input ----
+
+    def feed(self, delta: str):
+        """on_delta callback for chat_completion_stream(): consume one chunk of the answer"""
+        self._partial += delta
+        while "\n" in self._partial:
+            line, self._partial = self._partial.split("\n", 1)
+            self._physical_line(line)
+
+    def _physical_line(self, raw: str):
+        stripped = raw.strip()
+        if stripped.startswith("```"):
+            return
+        if not self._logical and (not stripped or stripped.startswith("#")):
+            return
+        if self._logical and stripped.startswith("#"):
+            return
+        if stripped.endswith("\\"):
+            self._logical += stripped[:-1] + " "
+            return
+        line = (self._logical + stripped).strip()
+        self._logical = ""
+        if line:
+            self._instruction(line)
+
+    def _instruction(self, line: str):
+        parts = line.split(None, 1)
+        keyword = parts[0].upper()
+        rest = parts[1] if len(parts) > 1 else ""
+        if keyword == "ARG" and not self._seen_from:
+            # Only ARGs before the first FROM can parameterize FROM lines
+            name, _, value = rest.strip().partition("=")
+            self._global_args[name.strip()] = value.strip().strip('"').strip("'")
+        elif keyword == "FROM":
+            self._seen_from = True
+            self._from_line(rest)
+        elif keyword in ("COPY", "ADD"):
+            self._copy_line(line)
+
+    # ---- base images ----
+
+    def _substitute_args(self, value: str) -> str:
+        def replace(match):
+            name = match.group(1) or match.group(3)
+            if name in self._global_args and self._global_args[name]:
+                return self._global_args[name]
+            if match.group(2) is not None:
+                return match.group(2)
+            return match.group(0)
+        return ARG_REFERENCE_PATTERN.sub(replace, value)
+
+    def _from_line(self, rest: str):
+        args = [arg for arg in rest.split() if not arg.startswith("--")]
+        if not args:
+            return
+        image = self._substitute_args(args[0])
+        if len(args) >= 3 and args[1].lower() == "as":
+            self._stages.add(args[2].lower())
+        if ("$" in image or image.lower() == "scratch" or image.lower() in self._stages
+                or image.startswith(CHECKPOINT_REPO_PREFIX)):
+            return
+        with self._lock:
+            if image in self.pulls:
+                return
+            self.pulls[image] = None
+        thread = threading.Thread(target=self._pull, args=(image,), daemon=True)
+        thread.start()
+
+    def _pull(self, image: str):
+        try:
+            runner = self._get_runner()
+            if runner.image_exists(image):
+                status = "cached"
+            else:
+                if self.verbose:
+                    print(f"[prefetch] Pulling base image {image} while the dockerfile is generated...")
+                success, error = runner.pull_image(image)
+                status = "pulled" if success else f"failed: {error.splitlines()[-1] if error else 'unknown error'}"
+        except Exception as e:
+            status = f"failed: {e}"
+        with self._lock:
+            self.pulls[image] = status
+        if self.verbose:
+            print(f"[prefetch] Base image {image}: {status}")
+
+    def _get_runner(self):
+        with self._lock:
+            if self._runner is None:
+                try:
+                    from .docker_runner import DockerRunner
+                except ImportError:
+                    from docker_runner import DockerRunner
+                self._runner = DockerRunner(output_dir=self.output_dir)
+            return self._runner
+
+    # ---- build context ----
+
+    def _copy_line(self, line: str):
+        sources, _ = parse_context_sources(line)
+        new_sources = [source for source in sources if source not in self._warmed_sources]
+        if not new_sources:
+            return
+        self._warmed_sources.update(new_sources)
+        if self._warm_executor is None:
+            self._context_builder = ContextBuilder(self.root)
+            # One worker: index.json updates are serialized
+            self._warm_executor = ThreadPoolExecutor(max_workers=1)
+        self._warm_futures.append(self._warm_executor.submit(self._context_builder.warm, new_sources))
+
+    # ---- end of stream ----
+
+    def finish(self) -> Dict:
+        """
+        Flush the last line and wait for the context warm-up (pulls keep running)
+
+        Returns:
+            dict: {"pulls": {image: status or None while running}, "warmed_files": n, "sources": [...]}
+        """
+        if self._partial:
+            self._physical_line(self._partial)
+            self._partial = ""
+        if self._logical:
+            line, self._logical = self._logical.strip(), ""
+            if line:
+                self._instruction(line)
+
+        warmed_files = 0
+        if self._warm_executor is not None:
+            done, _ = wait(self._warm_futures, timeout=WARM_WAIT_TIMEOUT)
+            for future in done:
+                try:
+                    warmed_files += future.result()
+                except Exception as e:
+                    if self.verbose:
+                        print(f"[prefetch] Context warm-up failed: {e}")
+            self._warm_executor.shutdown(wait=False)
+
+        with self._lock:
+            pulls = dict(self.pulls)
+        return {"pulls": pulls, "warmed_files": warmed_files, "sources": sorted(self._warmed_sources)}
+
+
+def format_prefetch_report(report: Dict) -> str:
+    """One-line summary of what was prepared during generation"""
+    pulls = ", ".join(f"{image} ({status or 'in progress'})" for image, status in report["pulls"].items()) or "none"
+    return f"Prefetch: base images {pulls}; {report['warmed_files']} context files hashed"
+
+
+__all__ = ['DockerfilePrefetcher', 'format_prefetch_report']
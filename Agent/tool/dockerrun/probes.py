@@ -0,0 +1,157 @@
+"""
+Probe command construction for the container run phase.
+Probes are short shell commands executed inside one long-lived container via
+`docker exec`, each with its own timeout, instead of relying on the image CMD.
+"""
+
+import json
+import shlex
+from pathlib import Path
+from typing import Dict, List
+
+DEFAULT_PROBE_TIMEOUT = 60
+MAX_TEST_FILE_PROBES = 8
+MAX_IMPORT_PROBES = 3
+
+# (marker files, probe name, command, required) - a toolchain probe is added when any marker exists at the repo root.
+# Maven, Gradle and CMake are often provided by a wrapper (./mvnw, ./gradlew) or installed outside PATH (a venv,
+# /opt), so their probes try the wrapper first and only inform; the interpreters and Go/Cargo are required
+TOOLCHAIN_PROBES = [
+    (["requirements.txt", "setup.py", "pyproject.toml", "setup.cfg", "Pipfile", "environment.yml"],
+     "python_version", "python3 --version || python --version", True),
+    (["package.json"], "node_version", "node --version", True),
+    (["Cargo.toml"], "cargo_version", "cargo --version", True),
+    (["go.mod"], "go_version", "go version", True),
+    (["pom.xml"], "maven_version", "./mvnw -v || mvn -v", False),
+    (["build.gradle", "build.gradle.kts"], "gradle_version", "./gradlew --version || gradle --version || java -version",
+     False),
+    (["CMakeLists.txt"], "cmake_version", "cmake --version", False),
+]
+
+NON_PACKAGE_DIRS = {"test", "tests", "docs", "doc", "examples", "example", "scripts", "benchmarks", "envgym"}
+
+
+def make_probe(name: str, command: str, timeout: int = DEFAULT_PROBE_TIMEOUT, required: bool = False) -> Dict:
+    """Create a probe definition"""
+    return {
+        "name": name,
+        "command": command,
+        "timeout": timeout,
+        "required": required
+    }
+
+
+def _python_import_probes(repo_dir: Path, timeout: int) -> List[Dict]:
+    """Import checks for top-level Python packages (repo root and src/ layout)"""
+    probes = []
+    for base in (repo_dir, repo_dir / "src"):
+        if not base.is_dir():
+            continue
+        for item in sorted(base.iterdir()):
+            if len(probes) >= MAX_IMPORT_PROBES:
+                return probes
+            if (item.is_dir() and not item.name.startswith('.')
+                    and item.name not in NON_PACKAGE_DIRS
+                    and item.name.isidentifier()
+                    and (item / "__init__.py").exists()):
+                probes.append(make_probe(
+                    f"import_{item.name}",
+                    f"python3 -c {shlex.quote('import ' + item.name)}",
+                    timeout
+                ))
+    return probes
+
+
+def _test_file_command(test_file: str) -> str:
+    """Pick a cheap command that exercises a test file without running the full suite"""
+    quoted = shlex.quote(test_file)
+    name = Path(test_file).name
+    if name.endswith(".py"):
+        if name.startswith("test_") or name.endswith("_test.py"):
+            return f"python3 -m pytest --collect-only -q {quoted} || python3 -m py_compile {quoted}"
+        return f"python3 -m py_compile {quoted}"
+    if name.endswith(".sh"):
+        return f"bash -n {quoted}"
+    if name.endswith((".js", ".mjs", ".cjs")):
+        return f"node --check {quoted}"
+    return f"test -e {quoted}"
+
+
+def load_test_files(envgym_dir: Path) -> List[str]:
+    """Load test file list from envgym/test.json"""
+    test_json = envgym_dir / "test.json"
+    if not test_json.exists():
+        return []
+    try:
+        with open(test_json, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return []
+    if isinstance(data, dict):
+        data = data.get("files", [])
+    return [item for item in data if isinstance(item, str)]
+
+
+def build_default_probes(repo_dir: Path, envgym_dir: Path, timeout: int = DEFAULT_PROBE_TIMEOUT) -> List[Dict]:
+    """
+    Build the default probe list for a repository
+
+    Shell and language toolchain probes are required; build tool probes (Maven,
+    Gradle, CMake), import checks and test file probes are informational and
+    only reported in the logs.
+    """
+    probes = [make_probe("shell", "pwd && ls", timeout, required=True)]
+
+    for markers, name, command, required in TOOLCHAIN_PROBES:
+        if any((repo_dir / marker).exists() for marker in markers):
+            probes.append(make_probe(name, command, timeout, required=required))
+
+    if any((repo_dir / marker).exists() for marker in TOOLCHAIN_PROBES[0][0]):
+        probes.extend(_python_import_probes(repo_dir, timeout))
+
+    for test_file in load_test_files(envgym_dir)[:MAX_TEST_FILE_PROBES]:
+        probes.append(make_probe(f"test:{test_file}", _test_file_command(test_file), timeout))
+
+    return probes
+
+
+def load_probes(repo_dir: Path, envgym_dir: Path, timeout: int = DEFAULT_PROBE_TIMEOUT) -> List[Dict]:
+    """
+    Load probes from envgym/probes.json if present, otherwise build the defaults
+
+    probes.json is a list of {"name", "command", "timeout"?, "required"?} objects.
+    """
+    probes_file = envgym_dir / "probes.json"
+    if probes_file.exists():
+        try:
+            with open(probes_file, 'r', encoding='utf-8') as f:
+                custom = json.load(f)
+            probes = [
+                make_probe(item.get("name", f"probe_{i}"), item["command"],
+                           int(item.get("timeout", timeout)), bool(item.get("required", False)))
+                for i, item in enumerate(custom) if isinstance(item, dict) and item.get("command")
+            ]
+            if probes:
+                return probes
+        except (json.JSONDecodeError, OSError, ValueError) as e:
+            print(f"Warning: Could not load {probes_file}: {e}")
+    return build_default_probes(repo_dir, envgym_dir, timeout)
+
+
+def format_probe_report(probe_results: List[Dict], include_output: bool = True) -> str:
+    """Format structured probe results as readable text"""
+    lines = []
+    for result in probe_results:
+        status = "PASS" if result["success"] else ("TIMEOUT" if result.get("timed_out") else "FAIL")
+        required = "required" if result.get("required") else "optional"
+        lines.append(f"[{status}] {result['name']} ({required}, {result['duration']:.1f}s, exit={result['exit_code']}): {result['command']}")
+        if include_output and not result["success"]:
+            output = (result.get("stderr") or result.get("stdout") or "").strip()
+            if output:
+                for line in output.split('\n')[-10:]:
+                    lines.append(f"    {line}")
+    return "\n".join(lines)
+
+
+__all__ = ['DEFAULT_PROBE_TIMEOUT', 'make_probe', 'build_default_probes', 'load_probes',
+           'load_test_files', 'format_probe_report']
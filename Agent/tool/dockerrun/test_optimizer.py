@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for the Dockerfile optimizer
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# Add current directory to path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from optimizer import DockerfileOptimizer, format_optimizer_report
+
+DOCKERFILE = """FROM python:3.11-slim
+# system packages
+RUN apt-get update
+RUN apt-get install -y git curl
+RUN DEBIAN_FRONTEND=noninteractive apt-get install -y build-essential && rm -rf /var/lib/apt/lists/*
+WORKDIR /app
+COPY . .
+ENV PYTHONUNBUFFERED=1
+RUN pip install --no-cache-dir -r requirements.txt
+RUN npm ci
+RUN python setup.py build_ext --inplace
+CMD ["python", "-m", "pytest"]
+"""
+
+
+def make_repo(root: Path):
+    (root / "requirements.txt").write_text("flask==3.0.0\n-r requirements-base.txt\n")
+    (root / "requirements-base.txt").write_text("requests\n")
+    (root / "package.json").write_text(json.dumps({"name": "demo", "dependencies": {"left-pad": "1.3.0"}}))
+    (root / "package-lock.json").write_text("{}")
+    return root
+
+
+def test_rewrite(tmp_path: Path):
+    """apt layers are merged, dependency installs move before the source COPY"""
+    root = make_repo(tmp_path)
+    print("=== Rewrite ===")
+    optimized, report = DockerfileOptimizer(str(root)).optimize(DOCKERFILE)
+    print(optimized)
+    print(format_optimizer_report(report))
+    assert report["changed"] and report["layers_before"] == 7 and report["layers_after"] == 6
+    assert report["rebuilt_runs_before"] == 3 and report["rebuilt_runs_after"] == 1
+    assert ("RUN apt-get update && DEBIAN_FRONTEND=noninteractive apt-get install -y --no-install-recommends \\\n"
+            "    git \\\n    curl \\\n    build-essential \\\n    ca-certificates \\\n"
+            "    && rm -rf /var/lib/apt/lists/*\n") in optimized
+    lines = optimized.splitlines()
+    assert lines.index("COPY requirements.txt requirements-base.txt package.json package-lock.json ./") < \
+        lines.index("RUN npm ci") < lines.index("COPY . .") < lines.index("RUN python setup.py build_ext --inplace")
+    assert "--mount" not in optimized, "no cache mounts without BuildKit"
+
+    again, report = DockerfileOptimizer(str(root)).optimize(optimized)
+    assert again == optimized and not report["changed"], "the rewrite is idempotent"
+    print("Rewrite test passed")
+
+
+def test_cache_mounts(tmp_path: Path):
+    """BuildKit cache mounts replace --no-cache-dir; non-root stages are left alone"""
+    root = make_repo(tmp_path)
+    print("\n=== Cache mounts ===")
+    optimized, report = DockerfileOptimizer(str(root), buildkit=True).optimize(DOCKERFILE)
+    print(optimized)
+    assert "RUN --mount=type=cache,target=/root/.cache/pip pip install -r requirements.txt" in optimized
+    assert "RUN --mount=type=cache,target=/root/.npm npm ci" in optimized
+    assert DockerfileOptimizer(str(root), buildkit=True).optimize(optimized)[0] == optimized
+
+    rust = "FROM rust:1.75\nUSER builder\nRUN cargo build --release\n"
+    assert DockerfileOptimizer(str(root), buildkit=True).optimize(rust)[0] == rust
+    rust = "FROM rust:1.75\nRUN cargo build --release\n"
+    assert "--mount=type=cache,target=/usr/local/cargo/registry/cache cargo build" in \
+        DockerfileOptimizer(str(root), buildkit=True).optimize(rust)[0]
+    print("Cache mounts test passed")
+
+
+def test_unsafe_moves(tmp_path: Path):
+    """Installs that read sources, and apt lists a later install needs, are kept"""
+    root = make_repo(tmp_path)
+    print("\n=== Unsafe moves ===")
+    editable = "FROM python:3.11\nWORKDIR /app\nCOPY . .\nRUN pip install -e .\n"
+    assert DockerfileOptimizer(str(root)).optimize(editable)[0] == editable
+
+    (root / "package.json").write_text(json.dumps({"name": "demo", "scripts": {"postinstall": "node build.js"}}))
+    npm = "FROM node:20\nWORKDIR /app\nCOPY . .\nRUN npm ci\n"
+    assert DockerfileOptimizer(str(root)).optimize(npm)[0] == npm
+
+    later = ("FROM debian:12\nRUN apt-get install -y git && rm -rf /var/lib/apt/lists/*\nRUN apt-get update\n"
+             "RUN echo build\nRUN apt-get install -y zip\n")
+    optimized = DockerfileOptimizer(str(root)).optimize(later)[0]
+    print(optimized)
+    assert optimized.splitlines()[3] == "    ca-certificates", "lists kept for the later install"
+    print("Unsafe moves test passed")
+
+
+if __name__ == "__main__":
+    for test in (test_rewrite, test_cache_mounts, test_unsafe_moves):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("\nAll optimizer tests passed")
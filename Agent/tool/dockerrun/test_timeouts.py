@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for the adaptive build timeouts
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add current directory to path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from timeouts import TimeoutModel, record_metrics, PHASE_BUILD, KILLED_STALL, KILLED_TIMEOUT
+
+os.environ.pop("BUILD_TIMEOUT", None)
+os.environ.pop("BUILD_STALL_TIMEOUT", None)
+
+
+def estimate(path: Path, ecosystem: str):
+    return TimeoutModel(path).estimate(PHASE_BUILD, "repo", ecosystem)
+
+
+def test_failed_builds(tmp_path: Path):
+    """An early failure does not shrink the limits; successful builds do"""
+    print("=== Failed builds ===")
+    path = tmp_path / "metrics.jsonl"
+    record_metrics("repo", "cpp", PHASE_BUILD, 25, False, None, {}, max_gap=10, path=path)
+    limits = estimate(path, "cpp")
+    print(limits)
+    assert limits["timeout"] == 3600 and limits["stall_timeout"] == 900
+
+    record_metrics("repo", "cpp", PHASE_BUILD, 400, True, None, {}, max_gap=60, path=path)
+    limits = estimate(path, "cpp")
+    print(limits)
+    assert limits["timeout"] == 800 and limits["stall_timeout"] == 180 and limits["expected"] == 400
+    print("Failed builds test passed")
+
+
+def test_killed_builds(tmp_path: Path):
+    """A wall-clock kill doubles the timeout; a stall kill doubles the stall limit and makes room for it"""
+    print("\n=== Killed builds ===")
+    path = tmp_path / "metrics.jsonl"
+    record_metrics("repo", "go", PHASE_BUILD, 100, True, None, {}, max_gap=30, path=path)
+    limits = estimate(path, "go")
+    assert limits["timeout"] == 300 and limits["stall_timeout"] == 180
+
+    stall_limits = []
+    for _ in range(3):
+        record_metrics("repo", "go", PHASE_BUILD, 200, False, KILLED_STALL, limits, max_gap=limits["stall_timeout"],
+                       path=path)
+        limits = estimate(path, "go")
+        stall_limits.append(limits["stall_timeout"])
+        assert limits["timeout"] > 200 + limits["stall_timeout"] - 1
+    print(f"stall limits after stall kills: {stall_limits}")
+    assert stall_limits == [360, 720, 1440]
+
+    record_metrics("repo", "go", PHASE_BUILD, 1640, False, KILLED_TIMEOUT, limits, path=path)
+    assert estimate(path, "go")["timeout"] == 3280
+    print("Killed builds test passed")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "failed").mkdir()
+        (Path(tmp) / "killed").mkdir()
+        test_failed_builds(Path(tmp) / "failed")
+        test_killed_builds(Path(tmp) / "killed")
+    print("\nAll timeout tests passed")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for the pre-flight Dockerfile validator
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add current directory to path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from validation import DockerfileValidator, parse_dockerfile, has_errors, format_findings
+
+
+def make_repo(root: Path):
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "src" / "pkg" / "__init__.py").write_text("")
+    (root / "requirements.txt").write_text("requests\n")
+    (root / "secrets.env").write_text("TOKEN=x\n")
+    (root / ".dockerignore").write_text("*.env\n")
+    return root
+
+
+def rules(findings, severity=None):
+    return [item["rule"] for item in findings if severity is None or item["severity"] == severity]
+
+
+def test_clean_dockerfile(tmp_path: Path):
+    """A well-formed Dockerfile produces no findings"""
+    root = make_repo(tmp_path)
+    print("=== Clean Dockerfile ===")
+    dockerfile = """# syntax=docker/dockerfile:1
+ARG PY=3.12
+FROM python:${PY}-slim AS base
+ENV DEBIAN_FRONTEND=noninteractive
+RUN apt-get update && apt-get install -y --no-install-recommends \\
+    # build tools
+    build-essential tzdata \\
+    && rm -rf /var/lib/apt/lists/*
+WORKDIR /app
+COPY requirements.txt ./
+RUN pip install -r requirements.txt
+COPY . .
+WORKDIR /app/src/pkg
+RUN <<EOF
+echo "heredoc lines are not instructions"
+apt-get install -y foo
+EOF
+FROM base
+COPY --from=base /app /srv
+CMD ["python", "-c", "print('ok')"]
+"""
+    findings = DockerfileValidator(str(root)).validate(dockerfile)
+    print(format_findings(findings) or "(no findings)")
+    assert findings == [], findings
+    assert [item["keyword"] for item in parse_dockerfile(dockerfile)][-4:] == ["RUN", "FROM", "COPY", "CMD"]
+    print("Clean Dockerfile test passed")
+
+
+def test_broken_dockerfile(tmp_path: Path):
+    """Missing sources, ignored files, missing -y and shell syntax are errors"""
+    root = make_repo(tmp_path)
+    print("\n=== Broken Dockerfile ===")
+    dockerfile = """FROM ubuntu:22.04
+RUN apt-get update && apt-get install git tzdata
+COPY requirement.txt /app/
+COPY secrets.env /app/
+COPY . /app
+WORKDIR /app/source
+RUN echo "unterminated
+pip install -r requirements.txt
+COPY --from=builder /out /out
+"""
+    findings = DockerfileValidator(str(root)).validate(dockerfile)
+    report = format_findings(findings)
+    print(report)
+    assert has_errors(findings)
+    errors = rules(findings, "error")
+    assert errors == ["missing-yes", "interactive-prompt", "missing-source", "ignored-source",
+                      "shell-syntax", "unknown-instruction", "undefined-stage"], errors
+    assert rules(findings, "warning") == ["missing-workdir"]
+    assert "did you mean 'requirements.txt'" in report
+    assert "ERROR: envgym.dockerfile:3:" in report
+    print("Broken Dockerfile test passed")
+
+
+def test_warnings_only(tmp_path: Path):
+    """Possible prompts are warnings and do not block the build"""
+    root = make_repo(tmp_path)
+    print("\n=== Warnings only ===")
+    dockerfile = """FROM debian:12
+RUN apt-get update && apt-get install -qy curl
+RUN yes | conda create -n env python=3.11 && conda install numpy
+CMD ['bash']
+"""
+    findings = DockerfileValidator(str(root)).validate(dockerfile)
+    print(format_findings(findings))
+    assert not has_errors(findings)
+    assert rules(findings) == ["interactive-prompt", "missing-yes", "exec-form"], rules(findings)
+    print("Warnings only test passed")
+
+
+def test_docker_accepts(tmp_path: Path):
+    """Dockerfiles that Docker builds are not rejected: apt -qq, blank continuation lines, comments"""
+    root = make_repo(tmp_path)
+    print("\n=== Accepted by Docker ===")
+    dockerfile = """FROM debian:12
+ENV DEBIAN_FRONTEND=noninteractive
+RUN apt-get update -qq && apt-get install -qq curl
+RUN apt-get -q -q install wget && apt-get install -o APT::Get::Assume-Yes=true git
+RUN echo 'APT::Get::Assume-Yes "true";' > /etc/apt/apt.conf.d/90assumeyes
+RUN apt-get install make
+RUN apt-get install -y \\
+    build-essential \\
+
+    cmake
+RUN echo hi # don't
+"""
+    findings = DockerfileValidator(str(root)).validate(dockerfile)
+    print(format_findings(findings) or "(no findings)")
+    assert findings == [], findings
+    assert [item["keyword"] for item in parse_dockerfile(dockerfile)][-2:] == ["RUN", "RUN"]
+    assert "cmake" in parse_dockerfile(dockerfile)[-2]["args"]
+
+    findings = DockerfileValidator(str(root)).validate("FROM debian:12\nRUN apt-get install -q curl\n")
+    assert rules(findings, "error") == ["missing-yes"], findings
+    print("Accepted by Docker test passed")
+
+
+if __name__ == "__main__":
+    for test in (test_clean_dockerfile, test_broken_dockerfile, test_warnings_only, test_docker_accepts):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("\nAll validation tests passed")
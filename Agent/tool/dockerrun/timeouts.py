@@ -0,0 +1,220 @@
+"""
+Adaptive build and run timeouts learned from recorded durations.
+Every build and run appends a record (repository, ecosystem, duration, longest
+stretch without output, whether it was killed) to a metrics file shared by all
+repositories of a sweep. The next build of the same repository, or of another
+repository of the same ecosystem, gets a wall-clock limit derived from how long
+successful builds actually take, plus a stall limit derived from the longest
+silent stretch seen in them. Failed builds (which stop early) and killed builds
+can only raise the limits. Hung builds are cut after the stall limit instead of
+running into the wall clock; slow C++ or Rust builds are not killed at a limit
+sized for Python packages.
+"""
+
+import json
+import math
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_METRICS_PATH = Path(__file__).parent.parent.parent.parent / "data" / "build_metrics.jsonl"
+
+PHASE_BUILD = "build"
+PHASE_RUN = "run"
+KILLED_TIMEOUT = "timeout"
+KILLED_STALL = "stall"
+
+# Limits before any history exists, by ecosystem (seconds)
+DEFAULT_TIMEOUTS = {
+    PHASE_BUILD: {"cpp": 3600, "rust": 3600, "java": 2400, "go": 1800, "default": 1500},
+    PHASE_RUN: {"cpp": 1800, "rust": 1800, "java": 1800, "default": 1500},
+}
+DEFAULT_STALL_TIMEOUT = 900
+MIN_TIMEOUT = 300
+MAX_TIMEOUT = 4 * 3600
+MIN_STALL_TIMEOUT = 180
+MAX_STALL_TIMEOUT = 1800
+MIN_ECOSYSTEM_SAMPLES = 3
+MAX_SAMPLES = 50
+TIMEOUT_FACTOR = 2.0
+STALL_FACTOR = 3.0
+
+# Manifest -> ecosystem, checked in order (a C++ project with a setup.py builds like C++)
+ECOSYSTEM_MARKERS = [
+    ("Cargo.toml", "rust"),
+    ("CMakeLists.txt", "cpp"),
+    ("meson.build", "cpp"),
+    ("configure.ac", "cpp"),
+    ("go.mod", "go"),
+    ("pom.xml", "java"),
+    ("build.gradle", "java"),
+    ("build.gradle.kts", "java"),
+    ("package.json", "node"),
+    ("Gemfile", "ruby"),
+    ("pyproject.toml", "python"),
+    ("setup.py", "python"),
+    ("requirements.txt", "python"),
+    ("Makefile", "cpp"),
+]
+
+
+def metrics_path() -> Path:
+    """Metrics location, shared by all repositories of a sweep (BUILD_METRICS_PATH overrides)"""
+    return Path(os.getenv("BUILD_METRICS_PATH") or DEFAULT_METRICS_PATH)
+
+
+def detect_ecosystem(root: str = ".") -> str:
+    root_path = Path(root)
+    for marker, ecosystem in ECOSYSTEM_MARKERS:
+        if (root_path / marker).exists():
+            return ecosystem
+    return "other"
+
+
+def load_metrics(path: Optional[Path] = None) -> List[Dict]:
+    path = Path(path or metrics_path())
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def record_metrics(repo: str, ecosystem: str, phase: str, duration: float, success: bool,
+                   killed: Optional[str], limits: Dict, max_gap: Optional[float] = None,
+                   resumed: bool = False, path: Optional[Path] = None):
+    """Append one build or run measurement; failures to record never affect the build"""
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "repo": repo,
+        "ecosystem": ecosystem,
+        "phase": phase,
+        "duration": round(duration, 1),
+        "success": success,
+        "killed": killed,
+        "timeout": limits.get("timeout"),
+        "stall_timeout": limits.get("stall_timeout"),
+        "max_gap": round(max_gap, 1) if max_gap is not None else None,
+        "resumed": resumed
+    }
+    path = Path(path or metrics_path())
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One line per append keeps concurrent sweeps from interleaving records
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Warning: could not record build metrics: {e}")
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _env_seconds(name: str) -> Optional[int]:
+    value = os.getenv(name, "").strip()
+    if not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        print(f"Warning: {name} must be a number of seconds, got: {value}")
+        return None
+
+
+class TimeoutModel:
+    """Estimates build/run limits for a repository from its own history, else its ecosystem's"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.records = load_metrics(path)
+
+    def _samples(self, phase: str, repo: str, ecosystem: str):
+        repo_samples = [item for item in self.records if item.get("phase") == phase and item.get("repo") == repo]
+        if repo_samples:
+            return repo_samples[-MAX_SAMPLES:], "repo"
+        ecosystem_samples = [item for item in self.records
+                             if item.get("phase") == phase and item.get("ecosystem") == ecosystem]
+        if len(ecosystem_samples) >= MIN_ECOSYSTEM_SAMPLES:
+            return ecosystem_samples[-MAX_SAMPLES:], "ecosystem"
+        return [], "default"
+
+    def estimate(self, phase: str, repo: str, ecosystem: str) -> Dict:
+        """
+        Limits for the next build or run
+
+        Returns:
+            dict: {"timeout": wall-clock seconds, "stall_timeout": seconds without output,
+                   "basis": "repo" | "ecosystem" | "default" | "env", "expected": typical duration or None}
+        """
+        defaults = DEFAULT_TIMEOUTS[phase]
+        timeout = defaults.get(ecosystem, defaults["default"])
+        stall_timeout = DEFAULT_STALL_TIMEOUT
+        expected = None
+
+        samples, basis = self._samples(phase, repo, ecosystem)
+        if samples:
+            # Only successful, complete builds measure the real duration. Failed builds stop early and
+            # resumed builds skip the cached steps: their durations only bound the real one from below
+            finished = [item for item in samples if not item.get("killed")]
+            complete = [item for item in finished if item.get("success") and not item.get("resumed")]
+            durations = [item["duration"] for item in complete]
+            if durations:
+                expected = _percentile(durations, 0.9)
+                timeout = max(expected * TIMEOUT_FACTOR, max(durations) * 1.25)
+            lower_bounds = [item["duration"] for item in finished if item not in complete]
+            if lower_bounds:
+                timeout = max(timeout, max(lower_bounds) * TIMEOUT_FACTOR)
+            # Killed at the wall clock: the build needed more, double the limit it had
+            killed_limits = [item["timeout"] for item in samples
+                             if item.get("killed") == KILLED_TIMEOUT and item.get("timeout")]
+            if killed_limits and basis == "repo":
+                timeout = max(timeout, max(killed_limits) * TIMEOUT_FACTOR)
+
+            # Same for silent stretches: successful builds size the stall limit, failed ones can only raise it
+            gaps = [item["max_gap"] for item in complete if item.get("max_gap") is not None]
+            if gaps:
+                stall_timeout = max(gaps) * STALL_FACTOR
+            partial_gaps = [item["max_gap"] for item in finished
+                            if item not in complete and item.get("max_gap") is not None]
+            if partial_gaps:
+                stall_timeout = max(stall_timeout, max(partial_gaps) * STALL_FACTOR)
+            # Killed for silence: a step needs longer without output, double the stall limit it had
+            stalled = [item for item in samples if item.get("killed") == KILLED_STALL and item.get("stall_timeout")]
+            if stalled and basis == "repo":
+                stall_timeout = max(stall_timeout, max(item["stall_timeout"] for item in stalled) * TIMEOUT_FACTOR)
+                # and leave room for that silent stretch after the point where the build was killed
+                timeout = max(timeout, max(item["duration"] for item in stalled) + stall_timeout)
+
+        timeout = int(min(MAX_TIMEOUT, max(MIN_TIMEOUT, timeout)))
+        stall_timeout = int(min(MAX_STALL_TIMEOUT, timeout, max(MIN_STALL_TIMEOUT, stall_timeout)))
+
+        # Explicit settings win over the model
+        prefix = "BUILD" if phase == PHASE_BUILD else "RUN"
+        env_timeout, env_stall = _env_seconds(f"{prefix}_TIMEOUT"), _env_seconds(f"{prefix}_STALL_TIMEOUT")
+        if env_timeout or env_stall:
+            basis = "env"
+            timeout = env_timeout or timeout
+            stall_timeout = min(env_stall or stall_timeout, timeout)
+
+        return {"timeout": timeout, "stall_timeout": stall_timeout, "basis": basis,
+                "expected": round(expected) if expected is not None else None}
+
+
+def format_limits(limits: Dict) -> str:
+    expected = f", typical {limits['expected']}s" if limits.get("expected") else ""
+    return (f"timeout {limits['timeout']}s, stall {limits['stall_timeout']}s "
+            f"(from {limits['basis']} history{expected})" if limits["basis"] in ("repo", "ecosystem")
+            else f"timeout {limits['timeout']}s, stall {limits['stall_timeout']}s ({limits['basis']})")
+
+
+__all__ = ['TimeoutModel', 'detect_ecosystem', 'record_metrics', 'load_metrics', 'format_limits',
+           'PHASE_BUILD', 'PHASE_RUN', 'KILLED_TIMEOUT', 'KILLED_STALL']
@@ -0,0 +1,375 @@
+"""
+Pre-flight static validation of a Dockerfile against the repository.
+Before a build is spent, the Dockerfile is parsed and checked for problems that
+are certain to fail (or hang) minutes into the build: COPY/ADD sources that do
+not exist in the repository or are excluded by its .dockerignore, unknown
+instructions, package manager installs without -y and interactive prompts.
+Errors reject the candidate; the findings are written to log.txt in place of a
+build log so the revision step sees them.
+"""
+
+import difflib
+import json
+import re
+import shlex
+from pathlib import Path, PurePosixPath
+from typing import Dict, List
+
+try:
+    from .context import IgnoreMatcher, _normalize_source, _read_dockerignore, _split_args
+except ImportError:
+    from context import IgnoreMatcher, _normalize_source, _read_dockerignore, _split_args
+
+SEVERITY_ERROR = "error"
+SEVERITY_WARNING = "warning"
+
+KNOWN_INSTRUCTIONS = {
+    "FROM", "RUN", "CMD", "LABEL", "MAINTAINER", "EXPOSE", "ENV", "ADD", "COPY", "ENTRYPOINT",
+    "VOLUME", "USER", "WORKDIR", "ARG", "ONBUILD", "STOPSIGNAL", "HEALTHCHECK", "SHELL",
+}
+EXEC_FORM_INSTRUCTIONS = {"RUN", "CMD", "ENTRYPOINT", "SHELL"}
+HEREDOC_PATTERN = re.compile(r'<<-?\s*["\']?([A-Za-z_][A-Za-z0-9_]*)["\']?')
+COMMAND_SEPARATOR = re.compile(r'(&&|\|\||;|\|)')
+
+# Package managers that ask for confirmation unless told not to
+PACKAGE_MANAGERS = {
+    "apt-get": {"install", "upgrade", "dist-upgrade", "full-upgrade", "remove", "purge", "autoremove"},
+    "apt": {"install", "upgrade", "full-upgrade", "remove", "purge", "autoremove"},
+    "aptitude": {"install", "upgrade", "remove", "purge"},
+    "yum": {"install", "update", "upgrade", "remove", "groupinstall"},
+    "dnf": {"install", "update", "upgrade", "remove", "groupinstall"},
+    "microdnf": {"install", "update", "upgrade", "remove"},
+    "zypper": {"install", "in", "update", "up", "remove", "rm"},
+    "conda": {"install", "create", "update", "remove"},
+    "mamba": {"install", "create", "update", "remove"},
+}
+ASSUME_YES_FLAGS = {"-y", "--yes", "--assume-yes", "--assumeyes", "-n", "--non-interactive"}
+# apt's Assume-Yes option, given with -o or written to apt.conf by an earlier RUN
+APT_ASSUME_YES = re.compile(r'APT::Get::Assume-?Yes[\s="\']*(true|yes|1)\b', re.IGNORECASE)
+# Packages whose debconf questions block the build without DEBIAN_FRONTEND=noninteractive
+PROMPTING_PACKAGES = {"tzdata", "keyboard-configuration", "console-setup", "krb5-config", "postfix"}
+
+
+def _finding(severity: str, line: int, rule: str, message: str) -> Dict:
+    return {"severity": severity, "line": line, "rule": rule, "message": message}
+
+
+def parse_dockerfile(dockerfile_text: str) -> List[Dict]:
+    """
+    Split a Dockerfile into instructions, keeping heredoc bodies with their instruction
+
+    Returns:
+        list: {"keyword", "args", "line" (1-based), "heredoc": body lines}
+    """
+    instructions = []
+    lines = dockerfile_text.splitlines()
+    index = 0
+    while index < len(lines):
+        stripped = lines[index].strip()
+        if not stripped or stripped.startswith('#'):
+            index += 1
+            continue
+        start = index
+        parts = []
+        while True:
+            stripped = lines[index].strip()
+            # Docker only warns about blank lines inside a continuation
+            if (not stripped or stripped.startswith('#')) and parts:
+                index += 1
+            elif stripped.endswith('\\'):
+                parts.append(stripped[:-1].strip())
+                index += 1
+            else:
+                parts.append(stripped)
+                index += 1
+                break
+            if index >= len(lines):
+                break
+        text = " ".join(part for part in parts if part)
+        heredoc = []
+        for delimiter in HEREDOC_PATTERN.findall(text):
+            while index < len(lines) and lines[index].strip() != delimiter:
+                heredoc.append(lines[index])
+                index += 1
+            index += 1
+        keyword, _, args = text.partition(" ")
+        instructions.append({"keyword": keyword.upper(), "args": args.strip(), "line": start + 1,
+                             "heredoc": heredoc})
+    return instructions
+
+
+def _split_commands(command: str) -> List[List[str]]:
+    """Shell command split at &&, ||, ; and |, each as a token list (separator first)"""
+    segments = []
+    separator = ""
+    for part in COMMAND_SEPARATOR.split(command):
+        if COMMAND_SEPARATOR.fullmatch(part):
+            separator = part
+            continue
+        tokens = part.split()
+        if tokens:
+            segments.append([separator] + tokens)
+    return segments
+
+
+def _quiet_level(flags: List[str]) -> int:
+    """apt quiet level from -q, -qq, -q=2 and --quiet"""
+    level = 0
+    for flag in flags:
+        match = re.fullmatch(r'(?:-q|--quiet)=(\d+)', flag)
+        if match:
+            level = int(match.group(1))
+        elif flag == "--quiet":
+            level += 1
+        elif re.fullmatch(r'-[a-zA-Z]+', flag):
+            level += flag.count('q')
+    return level
+
+
+def _assumes_yes(manager: str, flags: List[str]) -> bool:
+    if any(flag in ASSUME_YES_FLAGS or re.fullmatch(r'-[a-zA-Z]*y[a-zA-Z]*', flag) for flag in flags):
+        return True
+    # apt-get -qq implies -y
+    return manager in ("apt-get", "apt") and _quiet_level(flags) >= 2
+
+
+class DockerfileValidator:
+    """Static checks of one Dockerfile against the repository it is built from"""
+
+    def __init__(self, root: str = "."):
+        self.root = Path(root).resolve()
+        self.repo_matcher = IgnoreMatcher(_read_dockerignore(self.root))
+
+    def _suggest(self, rel_path: str) -> str:
+        """' (did you mean ...)' for a missing path with a close sibling"""
+        parent = self.root / PurePosixPath(rel_path).parent
+        try:
+            names = [item.name for item in parent.iterdir()]
+        except OSError:
+            return ""
+        matches = difflib.get_close_matches(PurePosixPath(rel_path).name, names, n=1, cutoff=0.6)
+        if not matches:
+            return ""
+        suggestion = (PurePosixPath(rel_path).parent / matches[0]).as_posix()
+        return f" (did you mean '{suggestion}'?)"
+
+    def _source_exists(self, normalized: str) -> bool:
+        if any(char in normalized for char in "*?["):
+            return any(True for _ in self.root.glob(normalized))
+        path = self.root / normalized
+        return path.exists() or path.is_symlink()
+
+    def check_copy(self, instruction: Dict, stages: List[str], workdir: str, findings: List[Dict]) -> List:
+        """Check COPY/ADD sources; returns (source dir, image path) for the repository directories copied"""
+        keyword, line = instruction["keyword"], instruction["line"]
+        if instruction["heredoc"]:
+            return []
+        args = _split_args(instruction["args"])
+        flags = [arg for arg in args if arg.startswith('--')]
+        paths = [arg for arg in args if not arg.startswith('--')]
+        if len(paths) < 2:
+            findings.append(_finding(SEVERITY_ERROR, line, "syntax",
+                                     f"{keyword} needs at least one source and a destination"))
+            return []
+
+        from_flag = next((flag.split('=', 1)[1] for flag in flags if flag.startswith('--from=')), None)
+        if from_flag is not None:
+            if (from_flag.lower() not in stages and not from_flag.isdigit()
+                    and not any(char in from_flag for char in ":/$")):
+                findings.append(_finding(SEVERITY_ERROR, line, "undefined-stage",
+                                         f"{keyword} --from={from_flag} does not name an earlier build stage"))
+            return []
+
+        mappings = []
+        destination = paths[-1] if paths[-1].startswith('/') else f"{workdir}/{paths[-1]}"
+        for source in paths[:-1]:
+            if keyword == "ADD" and re.match(r'^(https?://|git@)', source):
+                continue
+            normalized = _normalize_source(source)
+            if normalized is None:
+                continue
+            if normalized == ".":
+                mappings.append((".", destination))
+                continue
+            if not self._source_exists(normalized):
+                findings.append(_finding(SEVERITY_ERROR, line, "missing-source",
+                                         f"{keyword} source '{source}' does not exist in the repository"
+                                         f"{self._suggest(normalized)}"))
+                continue
+            if self.repo_matcher.ignored(normalized):
+                findings.append(_finding(SEVERITY_ERROR, line, "ignored-source",
+                                         f"{keyword} source '{source}' is excluded by the repository's .dockerignore"))
+                continue
+            if (self.root / normalized).is_dir():
+                mappings.append((normalized, destination))
+        # Variables in the destination cannot be resolved statically
+        return [mapping for mapping in mappings if '$' not in mapping[1]]
+
+    def check_workdir(self, instruction: Dict, workdir: str, mappings: List, findings: List[Dict]) -> str:
+        """Resolve WORKDIR and check directories expected from a copied repository directory"""
+        target = instruction["args"].strip().strip('"').strip("'")
+        if not target:
+            findings.append(_finding(SEVERITY_ERROR, instruction["line"], "syntax", "WORKDIR without a path"))
+            return workdir
+        if '$' in target:
+            return workdir
+        resolved = PurePosixPath(target if target.startswith('/') else f"{workdir}/{target}")
+        resolved_text = str(resolved)
+
+        # The latest COPY into an enclosing directory decides what WORKDIR lands in
+        for source, destination in reversed(mappings):
+            try:
+                relative = resolved.relative_to(PurePosixPath(destination))
+            except ValueError:
+                continue
+            if str(relative) == ".":
+                continue
+            rel_path = (PurePosixPath(source) / relative).as_posix() if source != "." else relative.as_posix()
+            if not (self.root / rel_path).is_dir():
+                findings.append(_finding(SEVERITY_WARNING, instruction["line"], "missing-workdir",
+                                         f"WORKDIR {target} expects '{rel_path}' from the copied repository, "
+                                         f"which has no such directory{self._suggest(rel_path)}"))
+            break
+        return resolved_text
+
+    def check_run(self, instruction: Dict, noninteractive: bool, findings: List[Dict], apt_assume_yes: bool = False):
+        """Shell syntax, confirmation prompts and debconf questions in a RUN instruction"""
+        line = instruction["line"]
+        command = re.sub(r'--(mount|network|security)=\S+\s*', '', instruction["args"]).strip()
+        if not command and not instruction["heredoc"]:
+            findings.append(_finding(SEVERITY_ERROR, line, "syntax", "RUN without a command"))
+            return
+        if command.startswith('['):
+            return
+        if not instruction["heredoc"]:
+            try:
+                shlex.split(command, comments=True)
+            except ValueError as e:
+                findings.append(_finding(SEVERITY_ERROR, line, "shell-syntax", f"RUN command is not valid shell: {e}"))
+                return
+        if instruction["heredoc"]:
+            command = command + " ; " + " ; ".join(instruction["heredoc"])
+
+        inline_noninteractive = "DEBIAN_FRONTEND=noninteractive" in command
+        previous = []
+        for segment in _split_commands(command):
+            separator, tokens = segment[0], segment[1:]
+            piped_yes = separator == "|" and previous[:1] == ["yes"]
+            previous = tokens
+            # Skip sudo and leading variable assignments (DEBIAN_FRONTEND=noninteractive apt-get ...)
+            words = list(tokens)
+            while words and (words[0] in ("sudo", "env") or re.match(r'^[A-Za-z_][A-Za-z0-9_]*=', words[0])):
+                words.pop(0)
+            if not words:
+                continue
+            manager = words[0].rsplit('/', 1)[-1]
+            if manager not in PACKAGE_MANAGERS:
+                continue
+            flags = [word for word in words[1:] if word.startswith('-')]
+            arguments = [word for word in words[1:] if not word.startswith('-')]
+            subcommand = arguments[0] if arguments else ""
+            if subcommand not in PACKAGE_MANAGERS[manager]:
+                continue
+            apt_yes = manager in ("apt-get", "apt") and (apt_assume_yes or any(APT_ASSUME_YES.search(word)
+                                                                            for word in words))
+            if not _assumes_yes(manager, flags) and not piped_yes and not apt_yes:
+                severity = SEVERITY_WARNING if manager in ("conda", "mamba") else SEVERITY_ERROR
+                findings.append(_finding(severity, line, "missing-yes",
+                                         f"'{manager} {subcommand}' without -y waits for a confirmation "
+                                         f"the build cannot give"))
+            if manager in ("apt-get", "apt", "aptitude") and subcommand == "install" \
+                    and not (noninteractive or inline_noninteractive):
+                packages = {word.split('=', 1)[0] for word in arguments[1:]}
+                prompting = sorted(packages & PROMPTING_PACKAGES)
+                if prompting:
+                    findings.append(_finding(SEVERITY_ERROR, line, "interactive-prompt",
+                                             f"installing {', '.join(prompting)} without "
+                                             f"DEBIAN_FRONTEND=noninteractive stops at a configuration prompt"))
+                else:
+                    findings.append(_finding(SEVERITY_WARNING, line, "interactive-prompt",
+                                             "apt install without DEBIAN_FRONTEND=noninteractive can stop at a "
+                                             "debconf prompt (e.g. tzdata pulled in as a dependency)"))
+        for options in re.findall(r'(?:^|[\s;&|])adduser\s+([^;&|]*)', command):
+            if "--disabled-password" not in options and "-D" not in options.split():
+                findings.append(_finding(SEVERITY_WARNING, line, "interactive-prompt",
+                                         "adduser without --disabled-password asks for a password"))
+
+    def validate(self, dockerfile_text: str) -> List[Dict]:
+        """
+        Run all checks
+
+        Returns:
+            list: findings {"severity": "error" | "warning", "line", "rule", "message"} sorted by line
+        """
+        findings = []
+        instructions = parse_dockerfile(dockerfile_text)
+        if not instructions:
+            return [_finding(SEVERITY_ERROR, 1, "syntax", "the Dockerfile has no instructions")]
+
+        first = next((item for item in instructions if item["keyword"] != "ARG"), None)
+        if first is None or first["keyword"] != "FROM":
+            findings.append(_finding(SEVERITY_ERROR, first["line"] if first else 1, "syntax",
+                                     "the first instruction (after global ARGs) must be FROM"))
+
+        stages: List[str] = []
+        workdir, mappings, noninteractive, apt_assume_yes = "/", [], False, False
+        for instruction in instructions:
+            keyword, args, line = instruction["keyword"], instruction["args"], instruction["line"]
+            if keyword not in KNOWN_INSTRUCTIONS:
+                findings.append(_finding(SEVERITY_ERROR, line, "unknown-instruction",
+                                         f"unknown instruction '{keyword}' (a shell command outside RUN, or a "
+                                         f"continuation line missing its trailing backslash?)"))
+                continue
+            if not args and not instruction["heredoc"]:
+                findings.append(_finding(SEVERITY_ERROR, line, "syntax", f"{keyword} without arguments"))
+                continue
+            if keyword in EXEC_FORM_INSTRUCTIONS and args.startswith('['):
+                try:
+                    json.loads(args)
+                except json.JSONDecodeError:
+                    findings.append(_finding(SEVERITY_WARNING, line, "exec-form",
+                                             f"{keyword} looks like exec form but is not valid JSON (use double "
+                                             f"quotes); Docker runs it as a shell string"))
+
+            if keyword == "FROM":
+                match = re.search(r'\s+AS\s+(\S+)\s*$', args, re.IGNORECASE)
+                if match:
+                    stages.append(match.group(1).lower())
+                # apt.conf written in an earlier stage may be inherited (FROM <stage>), so Assume-Yes is kept
+                workdir, mappings, noninteractive = "/", [], False
+            elif keyword in ("COPY", "ADD"):
+                mappings.extend(self.check_copy(instruction, stages, workdir, findings))
+            elif keyword == "WORKDIR":
+                workdir = self.check_workdir(instruction, workdir, mappings, findings)
+            elif keyword in ("ENV", "ARG") and re.search(r'DEBIAN_FRONTEND[= ]\s*["\']?noninteractive', args):
+                noninteractive = True
+            elif keyword == "RUN":
+                self.check_run(instruction, noninteractive, findings, apt_assume_yes)
+                if "apt.conf" in args and APT_ASSUME_YES.search(" ".join([args] + instruction["heredoc"])):
+                    apt_assume_yes = True
+
+        findings.sort(key=lambda item: item["line"])
+        return findings
+
+
+def validate_dockerfile(dockerfile_path: str, root: str = ".") -> List[Dict]:
+    """Validate a Dockerfile file against the repository at root"""
+    try:
+        dockerfile_text = Path(dockerfile_path).read_text(encoding='utf-8', errors='replace')
+    except OSError as e:
+        return [_finding(SEVERITY_ERROR, 1, "syntax", f"cannot read {dockerfile_path}: {e}")]
+    return DockerfileValidator(root).validate(dockerfile_text)
+
+
+def has_errors(findings: List[Dict]) -> bool:
+    return any(item["severity"] == SEVERITY_ERROR for item in findings)
+
+
+def format_findings(findings: List[Dict], dockerfile_name: str = "envgym.dockerfile") -> str:
+    """One line per finding, in the 'ERROR: file:line: message' form the log parsers recognise"""
+    return "\n".join(f"{item['severity'].upper()}: {dockerfile_name}:{item['line']}: {item['message']}"
+                     for item in findings)
+
+
+__all__ = ['DockerfileValidator', 'parse_dockerfile', 'validate_dockerfile', 'has_errors', 'format_findings',
+           'SEVERITY_ERROR', 'SEVERITY_WARNING']
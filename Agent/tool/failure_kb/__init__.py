@@ -0,0 +1 @@
+# Failure Knowledge Base Tool Module 
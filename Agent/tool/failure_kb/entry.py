@@ -0,0 +1,302 @@
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add Agent directory to path for importing tool modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.failure_kb.rules import (BUILTIN_RULES, error_signature, failure_output, failing_instruction_index,
+                                   semantic_patch, apply_semantic_patch)
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; updates are then only serialised within the process
+    fcntl = None
+
+DEFAULT_KB_PATH = Path(__file__).parent.parent.parent.parent / "data" / "failure_kb.json"
+STATE_PATH = "envgym/failure_fixes.json"
+DOCKERFILE_PATH = "envgym/envgym.dockerfile"
+LOG_PATHS = ["envgym/log_complete.txt", "envgym/log.txt"]
+HISTORY_PATH = "envgym/history.txt"
+
+# Larger changes are rewrites, not fixes that transfer to other repositories
+MAX_LEARNED_PACKAGES = 8
+MAX_LEARNED_ENV = 3
+MAX_ENTRY_SOURCES = 20
+
+_local_lock = threading.Lock()
+
+
+def kb_path() -> Path:
+    """Knowledge base location, shared by all repositories of a sweep (FAILURE_KB_PATH overrides)"""
+    return Path(os.getenv("FAILURE_KB_PATH") or DEFAULT_KB_PATH)
+
+
+def load_kb(path: Optional[Path] = None) -> Dict:
+    path = Path(path or kb_path())
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict) and isinstance(data.get("entries"), dict):
+            return data
+    except (OSError, json.JSONDecodeError):
+        pass
+    return {"version": 1, "entries": {}}
+
+
+def save_kb(kb: Dict, path: Optional[Path] = None):
+    path = Path(path or kb_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(kb, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def locked_kb(path: Optional[Path] = None):
+    """
+    Hold the knowledge base lock from load to save, so parallel sweep runs do not drop each other's patches
+
+    The lock is taken on a sidecar .lock file: save_kb replaces the knowledge base file itself,
+    and readers (load_kb alone) keep seeing either the old or the new version.
+    """
+    path = Path(path or kb_path())
+    with _local_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.with_name(path.name + ".lock"), 'a+', encoding='utf-8') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield path
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def parse_history(history_text: str) -> List[Dict[str, str]]:
+    """
+    Split envgym/history.txt into iterations
+
+    Returns:
+        list: {"iteration", "LOG", "DOCKERFILE", "STATUS", ...} with the section contents unindented
+    """
+    iterations = []
+    current = None
+    section = None
+    for line in history_text.splitlines():
+        if line.startswith("=== Iteration "):
+            parts = line.split()
+            current = {"iteration": parts[2] if len(parts) > 2 else str(len(iterations) + 1)}
+            section = None
+        elif line.startswith("--- End of Iteration"):
+            if current is not None:
+                iterations.append(current)
+            current = None
+            section = None
+        elif current is not None and not line.startswith("  ") and line.endswith(":") and line[:-1].isupper():
+            section = line[:-1]
+            current[section] = ""
+        elif current is not None and section and line.startswith("  "):
+            current[section] += line[2:] + "\n"
+    return iterations
+
+
+def learn_from_history(history_path: str = HISTORY_PATH, kb_file: Optional[Path] = None,
+                       repo_name: Optional[str] = None, verbose: bool = False) -> Dict:
+    """
+    Record the Dockerfile changes that resolved a failure signature in this run
+
+    An iteration whose failure signature disappears in the next iteration (the next build
+    succeeded or failed further on) contributes the transferable part of its Dockerfile
+    change: added system packages and ENV lines.
+
+    Returns:
+        dict: {"success", "learned": number of patches recorded, "message"}
+    """
+    history_file = Path(history_path)
+    if not history_file.exists():
+        return {"success": False, "learned": 0, "message": f"{history_path} not found"}
+
+    repo_name = repo_name or Path.cwd().name
+    iterations = parse_history(history_file.read_text(encoding='utf-8', errors='replace'))
+    learned = 0
+    with locked_kb(kb_file):
+        kb = load_kb(kb_file)
+
+        for previous, current in zip(iterations, iterations[1:]):
+            if not previous.get("LOG") or not previous.get("DOCKERFILE") or not current.get("DOCKERFILE"):
+                continue
+            signature = error_signature(previous["LOG"])
+            if signature is None:
+                continue
+            next_signature = error_signature(current.get("LOG", ""))
+            if next_signature is not None and next_signature[0] == signature[0]:
+                continue
+
+            patch = semantic_patch(previous["DOCKERFILE"], current["DOCKERFILE"])
+            if not patch["packages"] and not patch["env"]:
+                continue
+            if len(patch["packages"]) > MAX_LEARNED_PACKAGES or len(patch["env"]) > MAX_LEARNED_ENV:
+                continue
+
+            source = f"{repo_name}:{previous['iteration']}"
+            entry = kb["entries"].setdefault(signature[0], {
+                "error": signature[1],
+                "patches": [],
+            })
+            existing = next((item for item in entry["patches"]
+                             if item["packages"] == patch["packages"] and item["env"] == patch["env"]), None)
+            if existing is None:
+                existing = {**patch, "successes": 0, "sources": []}
+                entry["patches"].append(existing)
+            if source in existing["sources"]:
+                continue
+            existing["successes"] += 1
+            existing["sources"] = (existing["sources"] + [source])[-MAX_ENTRY_SOURCES:]
+            existing["last_seen"] = datetime.now().isoformat()
+            entry["patches"].sort(key=lambda item: item["successes"], reverse=True)
+            learned += 1
+            if verbose:
+                print(f"Learned fix for '{signature[1]}': packages={patch['packages']} env={patch['env']}")
+
+        if learned:
+            save_kb(kb, kb_file)
+    return {"success": True, "learned": learned, "message": f"Learned {learned} fixes from {history_path}"}
+
+
+class FailureKnowledgeBaseTool:
+    """Fix recurring build failures with known Dockerfile patches, without an LLM round trip"""
+
+    def __init__(self, verbose: bool = False, kb_file: Optional[Path] = None):
+        self.verbose = verbose
+        self.kb_file = kb_file
+
+    def read_file_content(self, file_path: str) -> str:
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        except OSError:
+            return ""
+
+    def load_log(self) -> str:
+        """Full execution log, falling back to the summary log"""
+        for path in LOG_PATHS:
+            content = self.read_file_content(path)
+            if content.strip():
+                return content
+        return ""
+
+    def load_state(self) -> Dict:
+        try:
+            with open(STATE_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"applied": []}
+
+    def save_state(self, state: Dict):
+        os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+        with open(STATE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+
+    def candidate_fixes(self, signature_id: str) -> List[Dict]:
+        """Built-in rules first, then patches learned for this exact signature"""
+        candidates = [{"id": rule["id"], "description": rule["description"], "apply": rule["apply"]}
+                      for rule in BUILTIN_RULES]
+        entry = load_kb(self.kb_file)["entries"].get(signature_id)
+        for index, patch in enumerate(entry["patches"] if entry else []):
+            def apply(dockerfile_text, log_text, failing_index, patch=patch):
+                return apply_semantic_patch(dockerfile_text, patch, failing_index)
+            candidates.append({
+                "id": f"learned-{index}",
+                "description": f"Learned fix ({patch['successes']} successes): packages={patch['packages']} env={patch['env']}",
+                "apply": apply
+            })
+        return candidates
+
+    def run(self) -> Dict:
+        """
+        Try to fix the last failure deterministically
+
+        Returns:
+            dict: {"success", "applied", "rule", "signature", "message"}; applied is False when
+                  the revision tool (LLM) has to handle the failure
+        """
+        try:
+            log_text = self.load_log()
+            dockerfile_text = self.read_file_content(DOCKERFILE_PATH)
+            if not log_text or not dockerfile_text:
+                return {"success": False, "applied": False, "message": "No execution log or dockerfile"}
+
+            signature = error_signature(log_text)
+            if signature is None:
+                return {"success": True, "applied": False, "message": "No failure signature found"}
+            signature_id, normalized = signature
+            if self.verbose:
+                print(f"Failure signature {signature_id}: {normalized}")
+
+            failure_text = failure_output(log_text)
+            failing_index = failing_instruction_index(dockerfile_text, log_text)
+            state = self.load_state()
+            tried = {(item["signature"], item["rule"]) for item in state.get("applied", [])}
+
+            for fix in self.candidate_fixes(signature_id):
+                # A fix that already ran for this signature evidently did not resolve it
+                if (signature_id, fix["id"]) in tried:
+                    continue
+                patched = fix["apply"](dockerfile_text, failure_text, failing_index)
+                if not patched or patched == dockerfile_text:
+                    continue
+
+                with open(DOCKERFILE_PATH, 'w', encoding='utf-8') as f:
+                    f.write(patched)
+                state.setdefault("applied", []).append({
+                    "signature": signature_id,
+                    "error": normalized,
+                    "rule": fix["id"],
+                    "description": fix["description"],
+                    "timestamp": datetime.now().isoformat()
+                })
+                self.save_state(state)
+                print(f"Known failure fixed without LLM: {fix['description']}")
+                return {"success": True, "applied": True, "rule": fix["id"], "signature": signature_id,
+                        "message": fix["description"]}
+
+            return {"success": True, "applied": False, "signature": signature_id,
+                    "message": "No known fix for this failure"}
+
+        except Exception as e:
+            print(f"Error during failure knowledge base lookup: {str(e)}")
+            if self.verbose:
+                import traceback
+                traceback.print_exc()
+            return {"success": False, "applied": False, "message": str(e)}
+
+
+def main(verbose: bool = False, learn: bool = False):
+    """Main entry point for failure knowledge base tool"""
+    if learn:
+        result = learn_from_history(verbose=verbose)
+    else:
+        result = FailureKnowledgeBaseTool(verbose=verbose).run()
+    print(result["message"])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Apply known fixes for recurring Docker build failures")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                       help="Enable verbose output mode")
+    parser.add_argument("--learn", action="store_true",
+                       help="Learn fixes from envgym/history.txt instead of applying one")
+
+    args = parser.parse_args()
+    main(verbose=args.verbose, learn=args.learn)
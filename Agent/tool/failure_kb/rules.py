@@ -0,0 +1,410 @@
+"""
+Failure signatures and deterministic Dockerfile fixes.
+Build logs are reduced to a normalized primary error line (the signature), and
+recurring failures (missing commands and headers, PEP 668, Rust toolchain too
+old) are matched by built-in rules whose patches edit the Dockerfile directly.
+"""
+
+import hashlib
+import os
+import re
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Add Agent directory to path for importing tool modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.dockerrun.checkpoint import parse_instructions
+
+ANSI_PATTERN = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+BUILDKIT_PREFIX_PATTERN = re.compile(r'^#\d+\s+\d+(\.\d+)?\s+')
+ERROR_LINE_PATTERN = re.compile(r'error[:\[]|\bERROR\b|not found|No such file|cannot |Could not|fatal:|^E: |'
+                                r'externally-managed-environment|Unable to locate package|requires rustc',
+                                re.IGNORECASE)
+# Wrapper lines that only say "the command failed", never the cause
+GENERIC_ERROR_PATTERN = re.compile(r'returned a non-zero code|did not complete successfully|'
+                                   r'^ERROR: failed to solve|exit code: \d+$|^Failed step:', re.IGNORECASE)
+
+# Command -> Debian package providing it
+COMMAND_PACKAGES = {
+    "unzip": "unzip", "zip": "zip", "git": "git", "curl": "curl", "wget": "wget",
+    "make": "build-essential", "gcc": "build-essential", "g++": "build-essential",
+    "cc": "build-essential", "c++": "build-essential", "cmake": "cmake",
+    "pkg-config": "pkg-config", "xz": "xz-utils", "bzip2": "bzip2", "patch": "patch",
+    "file": "file", "ps": "procps", "which": "debianutils", "python3": "python3",
+    "pip3": "python3-pip", "sudo": "sudo", "gpg": "gnupg", "ssh": "openssh-client",
+    "rsync": "rsync", "jq": "jq", "ninja": "ninja-build", "autoconf": "autoconf",
+    "automake": "automake", "libtool": "libtool", "libtoolize": "libtool",
+    "protoc": "protobuf-compiler", "clang": "clang", "java": "default-jdk",
+    "javac": "default-jdk", "mvn": "maven", "perl": "perl", "tar": "tar", "gzip": "gzip",
+}
+
+# Missing C header -> Debian development package
+HEADER_PACKAGES = {
+    "Python.h": "python3-dev", "ffi.h": "libffi-dev", "openssl/ssl.h": "libssl-dev",
+    "openssl/opensslv.h": "libssl-dev", "zlib.h": "zlib1g-dev", "bzlib.h": "libbz2-dev",
+    "lzma.h": "liblzma-dev", "sqlite3.h": "libsqlite3-dev", "readline/readline.h": "libreadline-dev",
+    "yaml.h": "libyaml-dev", "libxml/xmlversion.h": "libxml2-dev", "curl/curl.h": "libcurl4-openssl-dev",
+    "pg_config.h": "libpq-dev", "libpq-fe.h": "libpq-dev", "mysql.h": "default-libmysqlclient-dev",
+    "jpeglib.h": "libjpeg-dev", "png.h": "libpng-dev", "gmp.h": "libgmp-dev",
+}
+
+# Debian package -> Alpine package where the names differ
+ALPINE_PACKAGES = {
+    "build-essential": "build-base", "xz-utils": "xz", "python3-pip": "py3-pip",
+    "libssl-dev": "openssl-dev", "zlib1g-dev": "zlib-dev", "libbz2-dev": "bzip2-dev",
+    "liblzma-dev": "xz-dev", "libsqlite3-dev": "sqlite-dev", "libreadline-dev": "readline-dev",
+    "libyaml-dev": "yaml-dev", "libxml2-dev": "libxml2-dev", "libcurl4-openssl-dev": "curl-dev",
+    "libpq-dev": "postgresql-dev", "default-libmysqlclient-dev": "mariadb-dev",
+    "libjpeg-dev": "jpeg-dev", "libpng-dev": "libpng-dev", "libgmp-dev": "gmp-dev",
+    "ninja-build": "ninja", "protobuf-compiler": "protobuf", "default-jdk": "openjdk17",
+    "debianutils": "which", "python3-dev": "python3-dev", "libffi-dev": "libffi-dev",
+}
+
+# Base images where apt-get is available even without an install line in the Dockerfile
+APT_BASE_PATTERN = re.compile(r'^(?:[\w.-]+(?::\d+)?/)*(ubuntu|debian|python|node|rust|golang|openjdk|'
+                              r'eclipse-temurin|maven|gradle|ruby|php|buildpack-deps|perl|r-base)\b')
+APT_INSTALL_PATTERN = re.compile(r'\b(?:apt-get|apt)\s+(?:-\S+\s+)*install((?:\s+-{1,2}[\w-]+(?:=\S+)?)*)')
+APK_INSTALL_PATTERN = re.compile(r'\bapk\s+(?:-\S+\s+)*add((?:\s+-{1,2}[\w-]+(?:=\S+)?)*)')
+PACKAGE_TOKEN_PATTERN = re.compile(r'^[a-z0-9][a-z0-9.+-]*(?:[=:][\w.:~+-]+)?$')
+
+MAX_SIGNATURE_LENGTH = 200
+
+
+# ---- signatures ----
+
+def normalize_error(line: str) -> str:
+    """Strip volatile parts (ids, paths, numbers, timing prefixes) from an error line"""
+    text = ANSI_PATTERN.sub('', line).strip()
+    text = BUILDKIT_PREFIX_PATTERN.sub('', text)
+    # Compiler locations (src/foo.c:12:3:) differ between repositories
+    text = re.sub(r'^[\w./@+-]+:\d+(:\d+)?:\s*', '', text)
+    text = re.sub(r'\b[0-9a-f]{12,64}\b', '<id>', text)
+    text = re.sub(r'(?<![\w.])/(?:[\w.@+-]+/)+[\w.@+-]*', '<path>', text)
+    text = re.sub(r'\d+(\.\d+)*', 'N', text)
+    text = re.sub(r'\s+', ' ', text).lower()
+    return text[:MAX_SIGNATURE_LENGTH]
+
+
+def error_section(log_text: str) -> str:
+    """The part of an execution log that explains the failure (build error, else runtime error)"""
+    build_failed = re.search(r'Build Status: Failed', log_text)
+    markers = [("Build Error:", "=== Runtime Log ===")] if build_failed else []
+    markers += [("Runtime Error:", "=== Execution End ==="), ("Probe Results:", "=== Execution End ===")]
+    for start_marker, end_marker in markers:
+        start = log_text.find(start_marker)
+        if start == -1:
+            continue
+        end = log_text.find(end_marker, start)
+        section = log_text[start + len(start_marker):end if end != -1 else None]
+        if build_failed and start_marker == "Build Error:":
+            # Classic builder output goes to stdout, the cause is often only there
+            output_start = log_text.find("Build Output:")
+            if output_start != -1 and output_start < start:
+                section = log_text[output_start + len("Build Output:"):start] + "\n" + section
+        if section.strip():
+            return section
+    return ""
+
+
+def _failing_step_output(section: str) -> str:
+    """Narrow a build log to the failing step: the last classic "Step N/M", or BuildKit's error excerpt"""
+    steps = list(re.finditer(r'^Step \d+/\d+ : ', section, re.MULTILINE))
+    if steps:
+        return section[steps[-1].start():]
+    excerpt = section.find("------")
+    if excerpt != -1:
+        return section[excerpt:]
+    return section
+
+
+def failure_output(log_text: str) -> str:
+    """Output of the failing step, the text rules and signatures are derived from"""
+    return _failing_step_output(error_section(log_text))
+
+
+def primary_error_line(log_text: str) -> Optional[str]:
+    """Most specific error line of the failure section"""
+    section = failure_output(log_text)
+    candidates = [line.strip() for line in section.splitlines()
+                  if line.strip() and ERROR_LINE_PATTERN.search(line)]
+    specific = [line for line in candidates if not GENERIC_ERROR_PATTERN.search(line)]
+    if specific:
+        return specific[0]
+    return candidates[0] if candidates else None
+
+
+def error_signature(log_text: str) -> Optional[Tuple[str, str]]:
+    """
+    Signature of a failed execution log
+
+    Returns:
+        tuple: (signature id, normalized error line) or None when the log shows no failure
+    """
+    line = primary_error_line(log_text)
+    if not line:
+        return None
+    normalized = normalize_error(line)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+# ---- Dockerfile edits ----
+
+def _stage_bounds(instructions: List[Dict], failing_index: Optional[int]) -> Tuple[int, int]:
+    """(FROM index, end index) of the stage that contains the failing instruction (else the last stage)"""
+    froms = [i for i, item in enumerate(instructions) if item["keyword"] == "FROM"]
+    if not froms:
+        return 0, len(instructions)
+    start = froms[-1]
+    if failing_index is not None:
+        start = max((i for i in froms if i <= failing_index), default=froms[0])
+    later = [i for i in froms if i > start]
+    return start, later[0] if later else len(instructions)
+
+
+def failing_instruction_index(dockerfile_text: str, log_text: str) -> Optional[int]:
+    """Locate the failing instruction from classic "Step N/M" or BuildKit "<file>:<line>" output"""
+    instructions = parse_instructions(dockerfile_text)
+    steps = re.findall(r'Step (\d+)/(\d+) : ', log_text)
+    if steps:
+        step, total = map(int, steps[-1])
+        if total == len(instructions):
+            return step - 1
+    line_refs = re.findall(r'envgym\.dockerfile:(\d+)', log_text)
+    if line_refs:
+        line_index = int(line_refs[-1]) - 1
+        for i, item in enumerate(instructions):
+            if item["start"] <= line_index <= item["end"]:
+                return i
+    return None
+
+
+def _package_names(instruction_text: str) -> set:
+    return {token.split('=')[0] for token in instruction_text.split() if PACKAGE_TOKEN_PATTERN.match(token)}
+
+
+def add_system_packages(dockerfile_text: str, packages: List[str], failing_index: Optional[int] = None) -> Optional[str]:
+    """
+    Add packages to the stage's apt-get/apk install line, or add an install step after FROM
+
+    Returns:
+        The patched Dockerfile, or None when nothing could (or had to) be added
+    """
+    instructions = parse_instructions(dockerfile_text)
+    if not instructions:
+        return None
+    start, end = _stage_bounds(instructions, failing_index)
+    stage = instructions[start:end]
+    lines = dockerfile_text.splitlines()
+
+    from_parts = [part for part in stage[0]["text"].split()[1:] if not part.startswith("--")] if stage else []
+    base_image = from_parts[0].lower() if from_parts else ""
+    uses_apk = any(APK_INSTALL_PATTERN.search(item["text"]) for item in stage) or "alpine" in base_image
+    if uses_apk:
+        packages = [ALPINE_PACKAGES.get(package, package) for package in packages]
+
+    installed = set()
+    for item in stage:
+        if item["keyword"] == "RUN" and (APT_INSTALL_PATTERN.search(item["text"]) or APK_INSTALL_PATTERN.search(item["text"])):
+            installed |= _package_names(item["text"])
+    missing = [package for package in dict.fromkeys(packages) if package not in installed]
+    if not missing:
+        return None
+
+    install_pattern = APK_INSTALL_PATTERN if uses_apk else APT_INSTALL_PATTERN
+    for item in stage:
+        if item["keyword"] != "RUN":
+            continue
+        for line_index in range(item["start"], item["end"] + 1):
+            match = install_pattern.search(lines[line_index])
+            if match:
+                lines[line_index] = lines[line_index][:match.end()] + " " + " ".join(missing) + lines[line_index][match.end():]
+                return "\n".join(lines) + "\n"
+
+    if uses_apk:
+        install = f"RUN apk add --no-cache {' '.join(missing)}"
+    elif APT_BASE_PATTERN.match(base_image):
+        install = (f"RUN apt-get update && apt-get install -y --no-install-recommends {' '.join(missing)} "
+                   f"&& rm -rf /var/lib/apt/lists/*")
+    else:
+        return None
+    insert_at = stage[0]["end"] + 1
+    return "\n".join(lines[:insert_at] + [install] + lines[insert_at:]) + "\n"
+
+
+def add_stage_env(dockerfile_text: str, env_lines: List[str], failing_index: Optional[int] = None) -> Optional[str]:
+    """Insert ENV lines right after the FROM of the failing stage (skipping ones already present)"""
+    instructions = parse_instructions(dockerfile_text)
+    if not instructions:
+        return None
+    start, end = _stage_bounds(instructions, failing_index)
+    present = {item["text"] for item in instructions[start:end] if item["keyword"] == "ENV"}
+    new_lines = [line for line in env_lines if line not in present]
+    if not new_lines:
+        return None
+    lines = dockerfile_text.splitlines()
+    insert_at = instructions[start]["end"] + 1
+    return "\n".join(lines[:insert_at] + new_lines + lines[insert_at:]) + "\n"
+
+
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in version.split('.') if part.isdigit())
+
+
+def bump_rust_toolchain(dockerfile_text: str, required: str) -> Optional[str]:
+    """Raise `FROM rust:<ver>` or the rustup toolchain to at least the required version"""
+    changed = False
+
+    def replace_from(match):
+        nonlocal changed
+        version, suffix = match.group(2), match.group(3) or ""
+        if _version_tuple(version) >= _version_tuple(required):
+            return match.group(0)
+        changed = True
+        return f"{match.group(1)}{required}{suffix}"
+
+    text = re.sub(r'(FROM\s+(?:--\S+\s+)*(?:docker\.io/)?(?:library/)?rust:)(\d+(?:\.\d+)*)([-\w.]*)',
+                  replace_from, dockerfile_text, flags=re.IGNORECASE)
+
+    def replace_toolchain(match):
+        nonlocal changed
+        if _version_tuple(match.group(2)) >= _version_tuple(required):
+            return match.group(0)
+        changed = True
+        return f"{match.group(1)}{required}"
+
+    text = re.sub(r'(--default-toolchain[= ]|rustup default |rustup toolchain install )(\d+\.\d+(?:\.\d+)?)',
+                  replace_toolchain, text)
+    return text if changed else None
+
+
+# ---- built-in rules ----
+
+def _missing_command_packages(log_text: str) -> List[str]:
+    packages = []
+    for command in re.findall(r'(?:^|[\s:])([\w.+-]+): (?:command )?not found', log_text, re.MULTILINE):
+        if command in COMMAND_PACKAGES:
+            packages.append(COMMAND_PACKAGES[command])
+    for command in re.findall(r'Please install [\'"`]?([\w.+-]+)', log_text):
+        if command in COMMAND_PACKAGES:
+            packages.append(COMMAND_PACKAGES[command])
+    return list(dict.fromkeys(packages))
+
+
+def _compiler_packages(log_text: str) -> List[str]:
+    if re.search(r"linker `cc` not found|error: command '[\w/.-]*gcc' failed|No CMAKE_C(XX)?_COMPILER could be found|"
+                 r"C compiler cannot create executables|no acceptable C compiler found|"
+                 r"[\w-]*gcc: (No such file or directory|not found)", log_text):
+        return ["build-essential"]
+    return []
+
+
+def _header_packages(log_text: str) -> List[str]:
+    packages = []
+    for header in re.findall(r'fatal error: ([\w./+-]+\.h): No such file or directory', log_text):
+        if header in HEADER_PACKAGES:
+            packages.append(HEADER_PACKAGES[header])
+    return list(dict.fromkeys(packages))
+
+
+def _openssl_packages(log_text: str) -> List[str]:
+    if re.search(r'Could not find directory of OpenSSL installation|Could not find openssl via pkg-config|'
+                 r'openssl-sys.*failed to run custom build command', log_text):
+        return ["pkg-config", "libssl-dev"]
+    return []
+
+
+def _required_rust_version(log_text: str) -> Optional[str]:
+    versions = re.findall(r'requires rustc (\d+\.\d+(?:\.\d+)?)', log_text)
+    if re.search(r'feature `edition2024` is required', log_text):
+        versions.append("1.85")
+    elif re.search(r'feature `edition2021` is required', log_text):
+        versions.append("1.56")
+    if not versions:
+        return None
+    return max(versions, key=_version_tuple)
+
+
+def _packages_rule(finder: Callable[[str], List[str]]):
+    def apply(dockerfile_text: str, log_text: str, failing_index: Optional[int]) -> Optional[str]:
+        packages = finder(log_text)
+        return add_system_packages(dockerfile_text, packages, failing_index) if packages else None
+    return apply
+
+
+def _pep668_rule(dockerfile_text: str, log_text: str, failing_index: Optional[int]) -> Optional[str]:
+    if "externally-managed-environment" not in log_text:
+        return None
+    return add_stage_env(dockerfile_text, ["ENV PIP_BREAK_SYSTEM_PACKAGES=1"], failing_index)
+
+
+def _rust_rule(dockerfile_text: str, log_text: str, failing_index: Optional[int]) -> Optional[str]:
+    required = _required_rust_version(log_text)
+    return bump_rust_toolchain(dockerfile_text, required) if required else None
+
+
+# Rules are tried in order; each returns the patched Dockerfile or None
+BUILTIN_RULES = [
+    {"id": "missing-command", "description": "Install the package providing a missing command",
+     "apply": _packages_rule(_missing_command_packages)},
+    {"id": "missing-compiler", "description": "Install build-essential for a missing C/C++ toolchain",
+     "apply": _packages_rule(_compiler_packages)},
+    {"id": "missing-header", "description": "Install the development package of a missing C header",
+     "apply": _packages_rule(_header_packages)},
+    {"id": "missing-openssl", "description": "Install pkg-config and libssl-dev for openssl-sys",
+     "apply": _packages_rule(_openssl_packages)},
+    {"id": "pep668", "description": "Allow pip installs into the externally managed system Python",
+     "apply": _pep668_rule},
+    {"id": "rust-toolchain", "description": "Raise the Rust toolchain to the version the crates require",
+     "apply": _rust_rule},
+]
+
+
+# ---- learned patches ----
+
+def install_packages(dockerfile_text: str) -> set:
+    """Packages named by apt-get/apk install steps"""
+    packages = set()
+    for item in parse_instructions(dockerfile_text):
+        if item["keyword"] != "RUN":
+            continue
+        for command in re.split(r'&&|;|\|\|', item["text"]):
+            if APT_INSTALL_PATTERN.search(command) or APK_INSTALL_PATTERN.search(command):
+                packages |= {name for name in _package_names(command)
+                             if name not in ("apt", "apt-get", "apk", "install", "add", "run")}
+    return packages
+
+
+def semantic_patch(before: str, after: str) -> Dict[str, List[str]]:
+    """The transferable part of a Dockerfile change: added system packages and ENV lines"""
+    before_env = {item["text"] for item in parse_instructions(before) if item["keyword"] == "ENV"}
+    after_env = [item["text"] for item in parse_instructions(after) if item["keyword"] == "ENV"]
+    return {
+        "packages": sorted(install_packages(after) - install_packages(before)),
+        "env": [line for line in after_env if line not in before_env]
+    }
+
+
+def apply_semantic_patch(dockerfile_text: str, patch: Dict[str, List[str]],
+                         failing_index: Optional[int] = None) -> Optional[str]:
+    text = dockerfile_text
+    changed = False
+    if patch.get("packages"):
+        patched = add_system_packages(text, patch["packages"], failing_index)
+        if patched:
+            text, changed = patched, True
+    if patch.get("env"):
+        if changed and failing_index is not None:
+            # A new install step inside the failing stage shifts the failing instruction down
+            failing_index += len(parse_instructions(text)) - len(parse_instructions(dockerfile_text))
+        patched = add_stage_env(text, patch["env"], failing_index)
+        if patched:
+            text, changed = patched, True
+    return text if changed else None
+
+
+__all__ = ['normalize_error', 'error_section', 'failure_output', 'primary_error_line', 'error_signature',
+           'failing_instruction_index', 'add_system_packages', 'add_stage_env', 'bump_rust_toolchain',
+           'semantic_patch', 'apply_semantic_patch', 'BUILTIN_RULES']
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test script for the failure knowledge base: signatures, built-in rules and learning from history
+"""
+
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add Agent directory to path
+agent_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(agent_dir))
+
+from tool.failure_kb.rules import (error_signature, failure_output, failing_instruction_index,
+                                   add_system_packages, bump_rust_toolchain, BUILTIN_RULES)
+from tool.failure_kb.entry import FailureKnowledgeBaseTool, learn_from_history, load_kb
+
+
+def make_log(build_output: str, build_error: str) -> str:
+    return f"""=== Docker Execution Log - 20250101_000000 ===
+Dockerfile: envgym/envgym.dockerfile
+Image Name: envgym_test
+
+=== Build Log ===
+Build Status: Failed
+Build Output:
+{build_output}
+
+Build Error:
+{build_error}
+
+=== Runtime Log ===
+Runtime Status: Failed
+Runtime Output:
+
+
+Runtime Error:
+
+
+=== Execution End ===
+"""
+
+
+DOCKERFILE = """FROM ubuntu:22.04
+RUN apt-get update && apt-get install -y --no-install-recommends \\
+    curl ca-certificates
+WORKDIR /app
+COPY . .
+RUN ./scripts/fetch.sh
+CMD ["/bin/bash"]
+"""
+
+UNZIP_LOG = make_log(
+    "Step 1/6 : FROM ubuntu:22.04\n ---> 3b418d7b466a\n"
+    "Step 2/6 : RUN apt-get update && apt-get install -y --no-install-recommends curl ca-certificates\n ---> 1a2b3c4d5e6f\n"
+    "Step 3/6 : WORKDIR /app\n ---> 2b3c4d5e6f7a\nStep 4/6 : COPY . .\n ---> 3c4d5e6f7a8b\n"
+    "Step 5/6 : RUN ./scripts/fetch.sh\n ---> Running in 9f8e7d6c5b4a\n/bin/sh: 1: unzip: not found",
+    "The command '/bin/sh -c ./scripts/fetch.sh' returned a non-zero code: 127")
+
+
+def test_signature():
+    """Signatures ignore ids and numbers and skip the generic wrapper line"""
+    print("=== Signature ===")
+    signature = error_signature(UNZIP_LOG)
+    print(f"signature: {signature}")
+    assert signature is not None and "unzip: not found" in signature[1]
+    other = UNZIP_LOG.replace("9f8e7d6c5b4a", "0123456789ab").replace("/bin/sh: 1:", "/bin/sh: 7:")
+    assert error_signature(other)[0] == signature[0]
+    assert failing_instruction_index(DOCKERFILE, UNZIP_LOG) == 4
+    print("Signature test passed")
+
+
+def test_builtin_rules():
+    """Missing command, PEP 668 and Rust toolchain rules patch the dockerfile"""
+    print("\n=== Built-in rules ===")
+    failure_text = failure_output(UNZIP_LOG)
+    patched = BUILTIN_RULES[0]["apply"](DOCKERFILE, failure_text, 4)
+    print(patched)
+    assert "--no-install-recommends unzip \\" in patched
+    assert BUILTIN_RULES[0]["apply"](patched, failure_text, 4) is None, "already installed"
+
+    assert add_system_packages("FROM alpine:3.19\nRUN echo hi\n", ["build-essential"]) == \
+        "FROM alpine:3.19\nRUN apk add --no-cache build-base\nRUN echo hi\n"
+    assert add_system_packages("FROM scratch\n", ["git"]) is None
+
+    pep668 = make_log("", "error: externally-managed-environment\n× This environment is externally managed")
+    pep_rule = next(rule for rule in BUILTIN_RULES if rule["id"] == "pep668")
+    patched = pep_rule["apply"]("FROM debian:12\nRUN pip install .\n", failure_output(pep668), None)
+    assert patched == "FROM debian:12\nENV PIP_BREAK_SYSTEM_PACKAGES=1\nRUN pip install .\n", patched
+
+    assert bump_rust_toolchain("FROM rust:1.65-slim\n", "1.74") == "FROM rust:1.74-slim\n"
+    assert bump_rust_toolchain("FROM rust:1.80\n", "1.74") is None
+    assert "--default-toolchain 1.74" in bump_rust_toolchain(
+        "RUN curl https://sh.rustup.rs | sh -s -- -y --default-toolchain 1.70.0\n", "1.74")
+    print("Built-in rules test passed")
+
+
+def test_tool_and_learning():
+    """The tool applies a fix once per signature; history transitions become learned patches"""
+    print("\n=== Tool and learning ===")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            kb_file = Path(tmp) / "kb.json"
+            os.makedirs("envgym")
+            Path("envgym/envgym.dockerfile").write_text(DOCKERFILE)
+            Path("envgym/log_complete.txt").write_text(UNZIP_LOG)
+
+            tool = FailureKnowledgeBaseTool(kb_file=kb_file)
+            result = tool.run()
+            print(result)
+            assert result["applied"] and result["rule"] == "missing-command"
+            assert "unzip" in Path("envgym/envgym.dockerfile").read_text()
+            # Same failure again: the fix was tried, the LLM has to take over
+            assert not tool.run()["applied"]
+
+            # Iteration 1 failed on a missing header, iteration 2 added the package and built
+            header_log = make_log("Step 1/2 : FROM python:3.12\nStep 2/2 : RUN pip install .\n"
+                                  "  src/ext.c:1:10: fatal error: foo/bar.h: No such file or directory", "")
+            history = ""
+            for number, (dockerfile, log) in enumerate([
+                    ("FROM python:3.12\nRUN pip install .\n", header_log),
+                    ("FROM python:3.12\nRUN apt-get update && apt-get install -y libfoo-dev\nRUN pip install .\n",
+                     "Build Status: Success\nRuntime Status: Success\n")], 1):
+                history += f"=== Iteration {number} - [2025-01-01 00:00:00] ===\nLOG:\n"
+                history += "".join(f"  {line}\n" for line in log.splitlines() if line.strip())
+                history += "DOCKERFILE:\n" + "".join(f"  {line}\n" for line in dockerfile.splitlines())
+                history += f"--- End of Iteration {number} ---\n\n"
+            Path("envgym/history.txt").write_text(history)
+
+            assert learn_from_history(kb_file=kb_file, repo_name="demo")["learned"] == 1
+            assert learn_from_history(kb_file=kb_file, repo_name="demo")["learned"] == 0, "deduplicated"
+            entry = next(iter(load_kb(kb_file)["entries"].values()))
+            print(entry)
+            assert entry["patches"][0]["packages"] == ["libfoo-dev"]
+
+            # Parallel runs of a sweep share the knowledge base: no run loses another's patch
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(lambda name: learn_from_history(kb_file=kb_file, repo_name=name),
+                              [f"repo{number}" for number in range(8)]))
+            assert next(iter(load_kb(kb_file)["entries"].values()))["patches"][0]["successes"] == 9
+
+            # Another repository hits the same failure: the learned patch applies
+            Path("envgym/envgym.dockerfile").write_text("FROM python:3.11\nRUN pip install -e .\n")
+            Path("envgym/log_complete.txt").write_text(header_log.replace("ext.c:1:10", "mod.c:4:2"))
+            Path("envgym/failure_fixes.json").unlink()
+            result = tool.run()
+            print(result)
+            assert result["applied"] and result["rule"] == "learned-0"
+            assert "libfoo-dev" in Path("envgym/envgym.dockerfile").read_text()
+        finally:
+            os.chdir(cwd)
+    print("Tool and learning test passed")
+
+
+if __name__ == "__main__":
+    test_signature()
+    test_builtin_rules()
+    test_tool_and_learning()
+    print("\nAll failure knowledge base tests passed")
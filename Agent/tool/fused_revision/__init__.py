@@ -0,0 +1 @@
+# Fused Summarize and Revision Tool Module 
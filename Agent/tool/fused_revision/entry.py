@@ -0,0 +1,287 @@
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+# Add Agent directory to path for importing prompt modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.llm.entry import chat_completion
+from tool.writing_docker_revision.entry import WritingDockerRevisionTool
+from tool.dockerrun.checkpoint import expand_checkpoint_reference, format_checkpoint_prompt
+from tool.iteration_control.entry import load_strategy, format_strategy_prompt
+from prompt.template import PromptTemplate
+
+NEXT_PATH = "envgym/next.txt"
+PENDING_DOCKERFILE_PATH = "envgym/next.dockerfile"
+DOCKERFILE_PATH = "envgym/envgym.dockerfile"
+
+FUSED_TEMPLATE = PromptTemplate(
+    instructions="""
+Do two things in one answer:
+1. Summarize the current progress and the next steps for modifying the dockerfile, in this format:
+current progress
+
+next step
+
+2. Write the revised dockerfile that applies those next steps.
+
+IMPORTANT REQUIREMENTS FOR THE DOCKERFILE:
+1. ONLY reference files and directories that exist in the directory tree provided below
+2. Do NOT add COPY or ADD commands for files that don't exist
+3. Verify all file paths against the directory structure
+4. Please create a Dockerfile that, when built, puts me in a /bin/bash cli setting at the root of the repository, with the repository installed and ready to use.
+""",
+    sections=[
+        ("directory_tree", "This is the current working directory structure:"),
+        ("format_info", None),
+        ("plan_content", "This is the complete plan:"),
+        ("strategy", None),
+        ("checkpoint", None),
+        ("dockerfile_content", "This is the current dockerfile:"),
+        ("log_content", "This is the previous Docker execution result log:"),
+    ],
+    closing="""Return ONLY a JSON object with exactly two string fields, no markdown formatting, no additional text:
+{"summary": "<current progress and next step>", "dockerfile": "<complete revised dockerfile content>"}"""
+)
+
+
+def fused_mode_enabled() -> bool:
+    """Check FUSED_REVISION in the environment / .env file"""
+    possible_env_paths = [
+        Path(__file__).parent.parent.parent / '.env',  # EnvGym/.env
+        Path(__file__).parent.parent.parent.parent / '.env',  # parent of EnvGym
+        Path.cwd() / '.env',  # Current working directory
+    ]
+    for env_path in possible_env_paths:
+        if env_path.exists():
+            load_dotenv(env_path)
+            break
+    return os.getenv("FUSED_REVISION", "false").strip('"').strip("'").lower() in ("1", "true", "yes", "on")
+
+
+def apply_pending_dockerfile() -> bool:
+    """
+    Promote envgym/next.dockerfile (written by the fused call of the previous iteration)
+    to envgym/envgym.dockerfile
+
+    Returns:
+        True if a pending dockerfile was applied, False if the revision tool still has to run
+    """
+    pending = Path(PENDING_DOCKERFILE_PATH)
+    if not pending.exists():
+        return False
+    content = pending.read_text(encoding='utf-8')
+    pending.unlink()
+    if not content.strip():
+        return False
+    with open(DOCKERFILE_PATH, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True
+
+
+def parse_fused_response(response_content: str) -> Optional[Dict[str, str]]:
+    """Parse {"summary": ..., "dockerfile": ...} from the model response"""
+    content = response_content.strip()
+    # Strip markdown code fences around the JSON object
+    fence = re.match(r'^```(?:json)?\s*\n(.*)\n```$', content, re.DOTALL)
+    if fence:
+        content = fence.group(1).strip()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        start, end = content.find('{'), content.rfind('}')
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(content[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(data, dict):
+        return None
+    summary = data.get("summary")
+    dockerfile = data.get("dockerfile")
+    if not isinstance(summary, str) or not isinstance(dockerfile, str):
+        return None
+    return {"summary": summary.strip(), "dockerfile": dockerfile.strip() + "\n"}
+
+
+class FusedRevisionTool(WritingDockerRevisionTool):
+    """Summarize progress and revise the dockerfile in a single LLM call"""
+
+    def load_plan(self) -> str:
+        """Load plan from envgym/plan.txt"""
+        plan_path = "envgym/plan.txt"
+        if not os.path.exists(plan_path):
+            return "Plan file not found"
+
+        return self.read_file_content(plan_path)
+
+    def summarize_and_revise(self, plan_content: str, dockerfile_content: str, log_content: str,
+                             directory_tree: str, is_json_format: bool = False, checkpoint: dict = None) -> str:
+        """Ask for the progress summary and the revised dockerfile as one JSON object"""
+
+        if is_json_format:
+            format_info = "Note: The directory tree is provided in JSON format with 'name', 'type', 'path', and 'children' fields."
+        else:
+            format_info = "Note: The directory tree is provided in traditional text tree format."
+
+        # Prepare system message based on language setting
+        if self.system_language.lower() in ['chinese', 'zh', '中文']:
+            system_msg = "你是一个专业的Docker配置专家和项目进度分析师，能够根据计划和失败日志总结进展并修改Dockerfile。只返回包含 summary 和 dockerfile 两个字段的JSON对象。"
+        else:
+            system_msg = "You are a professional Docker configuration expert and project progress analyst who can summarize progress from plans and failure logs and modify Dockerfiles accordingly. Return only a JSON object with the fields summary and dockerfile."
+
+        messages = FUSED_TEMPLATE.messages(
+            system_msg,
+            directory_tree=directory_tree,
+            format_info=format_info,
+            plan_content=plan_content,
+            strategy=format_strategy_prompt(load_strategy()),
+            checkpoint=format_checkpoint_prompt(checkpoint),
+            dockerfile_content=dockerfile_content,
+            log_content=log_content
+        )
+
+        if self.verbose:
+            print("\n" + "="*80)
+            print("AI Interaction Details - FULL CONVERSATION")
+            print("="*80)
+            print("\nSystem Message:")
+            print(messages[0]["content"])
+            print("\n" + "-"*80)
+            print("User Prompt (COMPLETE):")
+            print(messages[1]["content"])
+            print("\n" + "-"*80)
+            print("Request Details:")
+            print(f"Model: {self.model}")
+            print(f"Temperature: {self.temperature}")
+            print("Sending request to AI...")
+            print("-"*80)
+
+        response = chat_completion(
+            self.client,
+            "fused_revision",
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            response_format={"type": "json_object"}
+        )
+
+        response_content = response.choices[0].message.content.strip()
+
+        if self.verbose:
+            print("\nAI Response (COMPLETE):")
+            print(response_content)
+            print("\n" + "="*80)
+            print("End of AI Interaction")
+            print("="*80)
+
+        return response_content
+
+    def save_summary(self, summary_content: str):
+        """Save summary to envgym/next.txt"""
+        os.makedirs(os.path.dirname(NEXT_PATH), exist_ok=True)
+
+        with open(NEXT_PATH, 'w', encoding='utf-8') as f:
+            f.write(summary_content)
+
+    def save_pending_dockerfile(self, dockerfile_content: str):
+        """Save the revised dockerfile for the next iteration to envgym/next.dockerfile"""
+        os.makedirs(os.path.dirname(PENDING_DOCKERFILE_PATH), exist_ok=True)
+
+        with open(PENDING_DOCKERFILE_PATH, 'w', encoding='utf-8') as f:
+            f.write(dockerfile_content)
+
+    def run(self):
+        """Execute fused summarize-and-revise tool"""
+        try:
+            # A stale pending dockerfile must never be applied to a later iteration
+            if os.path.exists(PENDING_DOCKERFILE_PATH):
+                os.remove(PENDING_DOCKERFILE_PATH)
+
+            print("Loading plan, execution log and dockerfile...")
+            plan_content = self.load_plan()
+            log_content = self.load_failure_log()
+            dockerfile_content = self.load_current_dockerfile()
+
+            tree_format = "json" if self.use_json_tree else "text"
+            directory_tree = self.get_directory_tree(max_depth=self.max_depth, output_format=tree_format)
+            print(f"Directory structure obtained ({'JSON' if self.use_json_tree else 'text'} format, max depth: {self.max_depth})")
+
+            checkpoint = self.load_checkpoint()
+            if checkpoint:
+                print(f"Checkpoint available: {checkpoint['image']} (steps 1-{checkpoint['step']})")
+
+            if self.verbose:
+                print("\nLoaded content summary:")
+                print(f"Plan length: {len(plan_content)} characters")
+                print(f"Log length: {len(log_content)} characters")
+                print(f"Dockerfile length: {len(dockerfile_content)} characters")
+                print(f"Directory tree length: {len(directory_tree)} characters")
+
+            print("Summarizing progress and revising dockerfile in one request...")
+            response_content = self.summarize_and_revise(plan_content, dockerfile_content, log_content,
+                                                          directory_tree, self.use_json_tree, checkpoint)
+
+            result = parse_fused_response(response_content)
+            if result is None:
+                # Keep the iteration going: the raw answer becomes the summary and the
+                # revision tool writes the dockerfile on the next iteration
+                print("Warning: Could not parse fused response, falling back to separate revision")
+                self.save_summary(response_content)
+                return
+
+            self.save_summary(result["summary"])
+            print("Summary saved to envgym/next.txt")
+
+            revised_dockerfile = expand_checkpoint_reference(result["dockerfile"], checkpoint)
+            self.save_pending_dockerfile(revised_dockerfile)
+            print(f"Revised dockerfile saved to {PENDING_DOCKERFILE_PATH} for the next iteration")
+
+            if self.verbose:
+                print("\nGenerated summary preview:")
+                print("-" * 40)
+                print(result["summary"][:300] + "..." if len(result["summary"]) > 300 else result["summary"])
+                print("-" * 40)
+
+            print("Fused summarize and revision completed successfully!")
+
+        except Exception as e:
+            print(f"Error during execution: {str(e)}")
+            if self.verbose:
+                import traceback
+                traceback.print_exc()
+
+
+def main(verbose: bool = False, use_json_tree: bool = True, max_depth: int = None):
+    """Main entry point for fused summarize and revision tool"""
+    try:
+        tool = FusedRevisionTool(verbose=verbose, use_json_tree=use_json_tree, max_depth=max_depth)
+        tool.run()
+    except Exception as e:
+        print(f"Fused revision tool execution failed: {e}")
+        if verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize progress and revise Dockerfile in one LLM call")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                       help="Enable verbose output mode")
+    parser.add_argument("-j", "--json", action="store_true",
+                       help="Use JSON format for directory tree (more LLM-friendly)")
+    parser.add_argument("-d", "--depth", type=int, default=None,
+                       help="Maximum depth for directory tree (default: unlimited)")
+
+    args = parser.parse_args()
+    main(verbose=args.verbose, use_json_tree=args.json, max_depth=args.depth)
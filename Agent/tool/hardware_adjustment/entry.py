@@ -11,6 +11,26 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.llm.entry import chat_completion
+from prompt.template import PromptTemplate
+
+ADJUSTMENT_TEMPLATE = PromptTemplate(
+    instructions="""
+Please review the plan provided below and see if there are any parts that need to be adjusted based on the hardware information. Consider factors like:
+- CPU architecture compatibility (x86_64, ARM, etc.)
+- Memory requirements and available RAM
+- Storage space requirements
+- Operating system compatibility
+- Available development tools and versions
+- Paths and directories correctness
+""",
+    sections=[
+        ("hardware_info", "This is our hardware information:"),
+        ("plan_content", "This is our current plan:"),
+    ],
+    closing="Please adjust the current plan based on the hardware information. Please only answer the complete adjusted plan."
+)
+
 class HardwareAdjustmentTool:
     def __init__(self, verbose: bool = False):
         self.verbose = verbose
@@ -73,7 +93,8 @@ class HardwareAdjustmentTool:
         # Initialize OpenAI client
         self.client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0  # retries happen once, in limited_call(), under the shared rate limit
         )
         
         # Configuration settings
@@ -123,39 +144,27 @@ class HardwareAdjustmentTool:
     def adjust_plan_based_on_hardware(self, plan_content: str, hardware_info: str) -> str:
         """Adjust plan based on hardware information using AI"""
         
-        prompt = f"""This is our current plan:
-{plan_content}
-
-This is our hardware information:
-{hardware_info}
-
-Please review the plan and see if there are any parts that need to be adjusted based on the hardware information. Consider factors like:
-- CPU architecture compatibility (x86_64, ARM, etc.)
-- Memory requirements and available RAM
-- Storage space requirements
-- Operating system compatibility
-- Available development tools and versions
-- Paths and directories correctness
-
-
-Please adjust the current plan based on the hardware information.Please only answer the completeadjusted plan.
-"""
-        
         # Prepare system message based on language setting
         if self.system_language.lower() in ['chinese', 'zh', '中文']:
             system_msg = "你是一个专业的环境配置助手，能够根据硬件信息调整环境搭建计划，确保配置的兼容性和可行性。"
         else:
             system_msg = "You are a professional environment configuration assistant who can adjust environment setup plans based on hardware information to ensure compatibility and feasibility."
         
+        messages = ADJUSTMENT_TEMPLATE.messages(
+            system_msg,
+            hardware_info=hardware_info,
+            plan_content=plan_content
+        )
+        
         if self.verbose:
             print("\n" + "="*80)
             print("AI Interaction Details - FULL CONVERSATION")
             print("="*80)
             print("\nSystem Message:")
-            print(system_msg)
+            print(messages[0]["content"])
             print("\n" + "-"*80)
             print("User Prompt (COMPLETE):")
-            print(prompt)
+            print(messages[1]["content"])
             print("\n" + "-"*80)
             print("Request Details:")
             print(f"Model: {self.model}")
@@ -163,12 +172,11 @@ Please adjust the current plan based on the hardware information.Please only ans
             print("Sending request to AI...")
             print("-"*80)
             
-        response = self.client.chat.completions.create(
+        response = chat_completion(
+            self.client,
+            "hardware_adjustment",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
+            messages=messages,
             temperature=self.temperature
         )
         
@@ -15,6 +15,18 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.llm.entry import chat_completion
+from tool.dockerrun.engine_api import DockerEngineClient, DockerEngineError
+from prompt.template import PromptTemplate
+from prompt.hardware_checking import hardware_checking_prompt
+
+HARDWARE_TEMPLATE = PromptTemplate(
+    instructions=hardware_checking_prompt,
+    sections=[
+        ("hardware_info", "Here is the essential hardware information from the system:"),
+    ]
+)
+
 class HardwareCheckingTool:
     def __init__(self):
         # Try to load environment variables from multiple possible locations
@@ -73,7 +85,8 @@ class HardwareCheckingTool:
         # Initialize OpenAI client
         self.client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0  # retries happen once, in limited_call(), under the shared rate limit
         )
         
         # Configuration settings
@@ -181,6 +194,24 @@ class HardwareCheckingTool:
         """Check if Docker is running"""
         docker_info = {}
         
+        # Ask the daemon directly over the Engine API socket when it is reachable
+        engine = DockerEngineClient()
+        if engine.available():
+            try:
+                version = engine.version()
+                info = engine.info()
+                docker_info['installed'] = 'Yes'
+                docker_info['status'] = 'Running'
+                docker_info['version'] = f"Docker version {version.get('Version', 'unknown')} (API {version.get('ApiVersion', 'unknown')})"
+                docker_info['storage_driver'] = info.get('Driver', 'unknown')
+                docker_info['cpus'] = str(info.get('NCPU', 'unknown'))
+                docker_info['memory_gb'] = f"{info.get('MemTotal', 0) / (1024**3):.1f}"
+                return docker_info
+            except DockerEngineError as e:
+                print(f"Warning: Docker Engine API query failed, falling back to docker CLI: {e}")
+            finally:
+                engine.close()
+        
         # Check if Docker is installed
         if shutil.which('docker'):
             docker_info['installed'] = 'Yes'
@@ -222,23 +253,15 @@ class HardwareCheckingTool:
 
     def analyze_hardware_with_ai(self, hardware_info_text: str) -> str:
         """Use AI to analyze hardware information"""
-        from prompt.hardware_checking import hardware_checking_prompt
-        
-        prompt = f"""Here is the essential hardware information from the system:
-
-{hardware_info_text}
-
-{hardware_checking_prompt}
-"""
-        
         system_msg = "You are a Docker specialist. Provide only a concise list of key information that affects Dockerfile writing. No explanations or additional text."
+        
+        messages = HARDWARE_TEMPLATE.messages(system_msg, hardware_info=hardware_info_text)
             
-        response = self.client.chat.completions.create(
+        response = chat_completion(
+            self.client,
+            "hardware_checking",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
+            messages=messages,
             temperature=self.temperature
         )
         
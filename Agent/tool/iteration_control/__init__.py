@@ -0,0 +1 @@
+# Iteration Control Tool Module 
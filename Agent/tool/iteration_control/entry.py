@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Add Agent directory to path for importing tool modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.dockerrun.checkpoint import parse_instructions
+from tool.failure_kb.rules import error_signature
+from tool.stats.usage import load_usage_records
+
+STATE_PATH = "envgym/iteration_control.json"
+STRATEGY_PATH = "envgym/strategy.txt"
+DOCKERFILE_PATH = "envgym/envgym.dockerfile"
+LOG_PATHS = ["envgym/log_complete.txt", "envgym/log.txt"]
+
+DEFAULT_STALL_LIMIT = 3
+
+# Escalation ladder, one step per detected stall or cycle
+ACTION_CONTINUE = "continue"
+ACTION_CHANGE_STRATEGY = "change_strategy"
+ACTION_SWITCH_MODEL = "switch_model"
+ACTION_ABORT = "abort"
+
+
+def _env_number(name: str, cast=float) -> Optional[float]:
+    value = os.getenv(name, "").strip().strip('"').strip("'")
+    if not value:
+        return None
+    try:
+        number = cast(value)
+    except ValueError:
+        print(f"Warning: {name} must be a number, got: {value}")
+        return None
+    return number if number > 0 else None
+
+
+def dockerfile_fingerprint(dockerfile_text: str) -> str:
+    """Hash of the instructions, ignoring comments, blank lines and line wrapping"""
+    instructions = [item["text"] for item in parse_instructions(dockerfile_text)]
+    return hashlib.sha256("\n".join(instructions).encode()).hexdigest()[:16]
+
+
+class IterationController:
+    """Stops the build loop when iterations stop making progress or a budget runs out"""
+
+    def __init__(self, start_time: Optional[float] = None, verbose: bool = False, resume: bool = False):
+        self.verbose = verbose
+        possible_env_paths = [
+            Path(__file__).parent.parent.parent / '.env',  # EnvGym/.env
+            Path(__file__).parent.parent.parent.parent / '.env',  # parent of EnvGym
+            Path.cwd() / '.env',  # Current working directory
+        ]
+        for env_path in possible_env_paths:
+            if env_path.exists():
+                load_dotenv(env_path)
+                break
+
+        self.start_time = start_time or time.time()
+        self.started_at = datetime.fromtimestamp(self.start_time, timezone.utc).isoformat()
+        self.stall_limit = int(_env_number("STALL_LIMIT", int) or DEFAULT_STALL_LIMIT)
+        time_budget_minutes = _env_number("TIME_BUDGET_MINUTES")
+        self.time_budget = time_budget_minutes * 60 if time_budget_minutes else None
+        self.token_budget = _env_number("TOKEN_BUDGET", int)
+        self.fallback_model = os.getenv("FALLBACK_MODEL", "").strip().strip('"').strip("'") or None
+
+        self.history: List[Dict] = []
+        self.events: List[Dict] = []
+        self.level = 0
+        # Detection only looks at iterations after the last escalation
+        self.window_start = 0
+        self.stopped: Optional[str] = None
+
+        if resume:
+            # An interrupted run continues with its history, escalation level and strategy hint
+            self.load_state()
+        elif os.path.exists(STRATEGY_PATH):
+            # A strategy hint from an earlier run must not leak into this one
+            os.remove(STRATEGY_PATH)
+
+    # ---- budgets ----
+
+    def tokens_used(self) -> int:
+        return sum(int(record.get("total_tokens", 0)) for record in load_usage_records(since=self.started_at))
+
+    def within_budget(self) -> Tuple[bool, str]:
+        """Check the time and token budgets before starting another iteration"""
+        elapsed = time.time() - self.start_time
+        if self.time_budget and elapsed >= self.time_budget:
+            return False, f"time budget exhausted ({elapsed / 60:.1f} of {self.time_budget / 60:.1f} minutes)"
+        if self.token_budget:
+            used = self.tokens_used()
+            if used >= self.token_budget:
+                return False, f"token budget exhausted ({used} of {self.token_budget} tokens)"
+        return True, ""
+
+    def stop(self, reason: str):
+        self.stopped = reason
+        self.save_state()
+
+    # ---- progress detection ----
+
+    def fingerprint(self, iteration: int) -> Dict:
+        dockerfile_text = self._read(DOCKERFILE_PATH)
+        log_text = next((content for content in (self._read(path) for path in LOG_PATHS) if content.strip()), "")
+        signature = error_signature(log_text)
+        return {
+            "iteration": iteration,
+            "dockerfile": dockerfile_fingerprint(dockerfile_text),
+            "signature": signature[0] if signature else None,
+            "error": signature[1] if signature else None,
+            "model": os.getenv("MODEL")
+        }
+
+    def detect(self) -> Optional[str]:
+        """Name of the no-progress pattern the latest iteration completes, if any"""
+        window = self.history[self.window_start:]
+        if len(window) < 2:
+            return None
+        current, previous = window[-1], window[-2]
+        if current["dockerfile"] == previous["dockerfile"]:
+            return f"dockerfile unchanged since iteration {previous['iteration']}"
+        earlier = next((item for item in window[:-2] if item["dockerfile"] == current["dockerfile"]), None)
+        if earlier is not None:
+            return f"dockerfile cycled back to the version of iteration {earlier['iteration']}"
+        streak = 0
+        # The escalation baseline does not count towards a new stall
+        for item in reversed(window[1:] if self.window_start else window):
+            if item["signature"] != current["signature"]:
+                break
+            streak += 1
+        if current["signature"] and streak >= self.stall_limit:
+            return f"same error for {streak} iterations: {current['error']}"
+        return None
+
+    def record(self, iteration: int) -> Dict:
+        """
+        Fingerprint a finished (unsuccessful) iteration and decide how to continue
+
+        Returns:
+            dict: {"action": continue | change_strategy | switch_model | abort, "reason"}
+        """
+        entry = self.fingerprint(iteration)
+        previous = self.history[-1] if self.history else None
+        self.history.append(entry)
+
+        reason = self.detect()
+        if reason is None:
+            if previous and entry["signature"] != previous["signature"] and os.path.exists(STRATEGY_PATH):
+                # New error: the changed strategy got past the old one
+                os.remove(STRATEGY_PATH)
+            self.save_state()
+            return {"action": ACTION_CONTINUE, "reason": ""}
+
+        action = self.escalate(reason)
+        self.events.append({"iteration": iteration, "action": action, "reason": reason,
+                            "timestamp": datetime.now().isoformat()})
+        # The escalated iteration stays as the baseline the next one is compared against
+        self.window_start = len(self.history) - 1
+        if action == ACTION_ABORT:
+            self.stopped = reason
+        self.save_state()
+        print(f"Iteration controller: {reason} -> {action}")
+        return {"action": action, "reason": reason}
+
+    # ---- escalation ----
+
+    def escalate(self, reason: str) -> str:
+        self.level += 1
+        if self.level == 1:
+            self.write_strategy(reason)
+            return ACTION_CHANGE_STRATEGY
+        if self.level == 2 and self.fallback_model and self.fallback_model != os.getenv("MODEL"):
+            # Tools are created per iteration and read MODEL from the environment (.env never overrides it);
+            # per-tool routes are dropped so every call uses the fallback model
+            os.environ["MODEL"] = self.fallback_model
+            os.environ["MODEL_ROUTING"] = "off"
+            self.write_strategy(reason)
+            return ACTION_SWITCH_MODEL
+        return ACTION_ABORT
+
+    def write_strategy(self, reason: str):
+        tried_errors = []
+        for item in self.history:
+            if item["error"] and item["error"] not in tried_errors:
+                tried_errors.append(item["error"])
+        lines = [
+            f"The last iterations are not making progress: {reason}.",
+            "Do not repeat the previous approach. Change strategy substantially, for example a different base image,",
+            "installing the toolchain another way (official image, package manager or installer script), pinning",
+            "different versions, or building and testing a smaller part of the repository first.",
+        ]
+        if tried_errors:
+            lines.append("Errors already seen in this run:")
+            lines.extend(f"- {error}" for error in tried_errors[-5:])
+        with open(STRATEGY_PATH, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+    # ---- persistence ----
+
+    def _read(self, path: str) -> str:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        except OSError:
+            return ""
+
+    def load_state(self):
+        try:
+            with open(STATE_PATH, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.level = int(state.get("level", 0))
+        self.window_start = int(state.get("window_start", 0))
+        self.history = state.get("history", [])
+        self.events = state.get("events", [])
+        # Token usage keeps counting from the original start
+        self.started_at = state.get("started_at") or self.started_at
+        switched = any(event.get("action") == ACTION_SWITCH_MODEL for event in self.events)
+        if switched and self.fallback_model:
+            os.environ["MODEL"] = self.fallback_model
+            os.environ["MODEL_ROUTING"] = "off"
+
+    def save_state(self):
+        state = {
+            "started_at": self.started_at,
+            "stall_limit": self.stall_limit,
+            "time_budget_seconds": self.time_budget,
+            "token_budget": self.token_budget,
+            "level": self.level,
+            "window_start": self.window_start,
+            "history": self.history,
+            "events": self.events,
+            "stopped": self.stopped
+        }
+        os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+        with open(STATE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+
+
+def load_strategy() -> str:
+    """Strategy hint written by the controller, empty when the current approach is fine"""
+    try:
+        with open(STRATEGY_PATH, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def format_strategy_prompt(strategy: str) -> str:
+    """Prompt section for the revision step"""
+    if not strategy:
+        return ""
+    return f"\nSTRATEGY CHANGE REQUIRED:\n{strategy}\n"
+
+
+__all__ = ['IterationController', 'dockerfile_fingerprint', 'load_strategy', 'format_strategy_prompt',
+           'ACTION_CONTINUE', 'ACTION_CHANGE_STRATEGY', 'ACTION_SWITCH_MODEL', 'ACTION_ABORT']
@@ -0,0 +1,8 @@
+"""
+LLM call path shared by all tools
+"""
+
+from .entry import chat_completion, chat_completion_stream, streaming_enabled
+from .stream import JSONArrayStreamValidator
+
+__all__ = ['chat_completion', 'chat_completion_stream', 'streaming_enabled', 'JSONArrayStreamValidator']
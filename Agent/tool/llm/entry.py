@@ -0,0 +1,150 @@
+"""
+Shared LLM call path for all tools.
+Every chat completion goes through chat_completion() so token usage and cost
+are recorded locally from the response instead of queried from the gateway.
+chat_completion_stream() streams the answer and hands every delta to a callback,
+so callers can act on partial output before generation finishes. The model a
+tool asks for is only the default; routing.py picks the model per tool, and
+ratelimit.py paces and retries the request under the host-wide quota.
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+# Add Agent directory to path for importing tool modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.stats.usage import record_usage, USAGE_FILE
+from tool.llm.routing import route_models
+from tool.llm.ratelimit import limited_call
+
+
+def chat_completion(client, tool: str, model: str, messages: List[Dict[str, str]],
+                    temperature: float = None, usage_file: str = USAGE_FILE, **kwargs) -> Any:
+    """
+    Call client.chat.completions.create and record the usage of the response
+
+    Args:
+        client: OpenAI client of the calling tool
+        tool: Tool name used as the accounting key (e.g. "planning")
+        model: Model name passed to the API
+        messages: Chat messages
+        temperature: Sampling temperature, omitted when None
+        usage_file: Where the usage is recorded (another repository's envgym/usage.jsonl in batch mode)
+        **kwargs: Extra arguments forwarded to the API
+
+    Returns:
+        The raw chat completion response
+    """
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+
+    # The tool's route (MODEL_<TOOL> / MODEL_<CLASS>) decides the model; the next one is tried when a call fails
+    route, models = route_models(tool, model)
+    for index, candidate in enumerate(models):
+        start = time.time()
+        try:
+            response = limited_call(tool, messages, max_tokens=kwargs.get("max_tokens"),
+                                    call=lambda: client.chat.completions.create(model=candidate, messages=messages,
+                                                                                **kwargs))
+        except Exception as e:
+            record_usage(tool, candidate, None, time.time() - start, usage_file, route=route, fallback=index > 0,
+                         error=str(e))
+            if index == len(models) - 1:
+                raise
+            print(f"Warning: {tool} call to {candidate} failed ({e}), falling back to {models[index + 1]}")
+            continue
+        record_usage(tool, candidate, response, time.time() - start, usage_file, route=route, fallback=index > 0)
+        return response
+
+
+def streaming_enabled() -> bool:
+    """LLM_STREAM in the environment; streaming is on unless explicitly disabled"""
+    return os.getenv("LLM_STREAM", "true").strip('"').strip("'").lower() not in ("0", "false", "no", "off")
+
+
+def chat_completion_stream(client, tool: str, model: str, messages: List[Dict[str, str]],
+                           temperature: float = None, on_delta: Optional[Callable[[str], Optional[bool]]] = None,
+                           **kwargs) -> Any:
+    """
+    Streamed variant of chat_completion()
+
+    The answer is accumulated from the stream and returned in the shape of a regular
+    response (choices[0].message.content, usage), so callers read it the same way.
+    Usage comes from the final chunk (stream_options.include_usage). When streaming is
+    disabled or the gateway rejects the streamed request, a blocking call is made instead
+    and on_delta receives the whole answer at once.
+
+    Args:
+        on_delta: Called with each content delta; returning False stops the stream early
+                  (the partial answer is returned)
+    """
+    if not streaming_enabled():
+        response = chat_completion(client, tool, model, messages, temperature, **kwargs)
+        if on_delta:
+            on_delta(response.choices[0].message.content or "")
+        return response
+
+    request = dict(kwargs)
+    if temperature is not None:
+        request["temperature"] = temperature
+
+    # Only the route's primary model is streamed; its fallbacks are tried by the blocking call
+    route, models = route_models(tool, model)
+    start = time.time()
+    try:
+        stream = limited_call(tool, messages, max_tokens=request.get("max_tokens"),
+                              call=lambda: client.chat.completions.create(model=models[0], messages=messages,
+                                                                          stream=True,
+                                                                          stream_options={"include_usage": True},
+                                                                          **request))
+    except Exception as e:
+        record_usage(tool, models[0], None, time.time() - start, route=route, error=str(e))
+        print(f"Warning: streamed request failed ({e}), retrying without streaming")
+        response = chat_completion(client, tool, model, messages, temperature, **kwargs)
+        if on_delta:
+            on_delta(response.choices[0].message.content or "")
+        return response
+
+    parts = []
+    usage = None
+    finish_reason = None
+    stopped = False
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            finish_reason = choice.finish_reason or finish_reason
+            delta = getattr(choice.delta, "content", None)
+            if not delta:
+                continue
+            parts.append(delta)
+            if on_delta and on_delta(delta) is False:
+                stopped = True
+                break
+    finally:
+        if stopped and hasattr(stream, "close"):
+            stream.close()
+
+    response = SimpleNamespace(
+        model=models[0],
+        choices=[SimpleNamespace(
+            index=0,
+            message=SimpleNamespace(role="assistant", content="".join(parts)),
+            finish_reason="stop_early" if stopped else finish_reason
+        )],
+        usage=usage
+    )
+    record_usage(tool, models[0], response, time.time() - start, route=route)
+    return response
+
+
+__all__ = ['chat_completion', 'chat_completion_stream', 'streaming_enabled']
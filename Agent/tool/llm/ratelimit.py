@@ -0,0 +1,288 @@
+"""
+Host-wide rate limiting and retries for LLM calls.
+All agent processes on a host share two token buckets, requests per minute
+(LLM_RPM) and tokens per minute (LLM_TPM), kept in a small JSON file guarded by
+an flock, so parallel sweeps stay under the quota together instead of each
+process bursting on its own. Calls are admitted by priority: background analysis
+(scanning, hardware, summarize) leaves a reserve of the buckets to Dockerfile
+writing and waits while higher-priority calls are queued. 429s, 5xx and
+connection errors are retried with jittered exponential backoff; a 429 also
+drains the shared request bucket so every process backs off at once.
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the limiter is then per process
+    fcntl = None
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Dockerfile writing is on the critical path; background analysis can wait
+TOOL_PRIORITIES = {
+    "writing_docker_revision": PRIORITY_HIGH,
+    "fused_revision": PRIORITY_HIGH,
+    "writing_docker_initial": PRIORITY_HIGH,
+    "planning": PRIORITY_NORMAL,
+    "summarize": PRIORITY_LOW,
+    "scanning": PRIORITY_LOW,
+    "test_scanning": PRIORITY_LOW,
+    "hardware_checking": PRIORITY_LOW,
+    "hardware_adjustment": PRIORITY_LOW,
+}
+# Share of each bucket a priority class must leave for the classes above it
+PRIORITY_RESERVE = {PRIORITY_HIGH: 0.0, PRIORITY_NORMAL: 0.1, PRIORITY_LOW: 0.3}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+                    "ConnectionError", "Timeout", "ReadTimeout"}
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 60.0
+MAX_WAIT_SLICE = 5.0
+WAITER_TTL = 300
+DEFAULT_OUTPUT_TOKENS = 1000
+
+_local_lock = threading.Lock()
+
+
+def _env_int(name: str, minimum: int = 1) -> Optional[int]:
+    """Integer setting; None when unset, invalid or below minimum (e.g. LLM_RPM=0 means unlimited)"""
+    value = os.getenv(name, "").strip().strip('"').strip("'")
+    if not value:
+        return None
+    try:
+        number = int(float(value))
+    except ValueError:
+        print(f"Warning: {name} must be a number, got: {value}")
+        return None
+    return number if number >= minimum else None
+
+
+def state_path() -> str:
+    """Bucket state shared by all processes on the host (LLM_RATE_STATE_PATH overrides)"""
+    return os.getenv("LLM_RATE_STATE_PATH") or os.path.join(tempfile.gettempdir(), "envgym_llm_rate.json")
+
+
+def tool_priority(tool: str) -> int:
+    return TOOL_PRIORITIES.get(tool, PRIORITY_NORMAL)
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+    """Rough prompt + completion size used to reserve TPM before the call (about 4 characters per token)"""
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+    return prompt_chars // 4 + (max_tokens or DEFAULT_OUTPUT_TOKENS)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared through a locked state file"""
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, path: Optional[str] = None):
+        self.rpm = rpm if rpm is not None else _env_int("LLM_RPM")
+        self.tpm = tpm if tpm is not None else _env_int("LLM_TPM")
+        self.path = path or state_path()
+        self.waiter_id = f"{os.getpid()}:{threading.get_ident()}"
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm)
+
+    # ---- shared state ----
+
+    def _locked(self, update: Callable[[Dict], Any]) -> Any:
+        """Run update(state) under the host-wide lock and write the state back"""
+        with _local_lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'a+', encoding='utf-8') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or "{}")
+                    except json.JSONDecodeError:
+                        state = {}
+                    result = update(state)
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                    return result
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refill(self, state: Dict, now: float):
+        for name, capacity in (("requests", self.rpm), ("tokens", self.tpm)):
+            if not capacity:
+                state.pop(name, None)
+                continue
+            bucket = state.setdefault(name, {"level": capacity, "updated": now})
+            elapsed = max(0.0, now - bucket["updated"])
+            bucket["level"] = min(capacity, bucket["level"] + elapsed * capacity / 60.0)
+            bucket["updated"] = now
+
+    def _prune_waiters(self, state: Dict, now: float) -> Dict:
+        waiters = state.setdefault("waiters", {})
+        for key in list(waiters):
+            pid = int(key.split(":")[0])
+            if now - waiters[key]["since"] > WAITER_TTL or not _pid_alive(pid):
+                del waiters[key]
+        return waiters
+
+    # ---- admission ----
+
+    def _try_acquire(self, state: Dict, tokens: int, priority: int) -> float:
+        """Take from both buckets and return 0, or return how long to wait"""
+        now = time.time()
+        self._refill(state, now)
+        waiters = self._prune_waiters(state, now)
+        # Lower-priority calls wait while a more urgent one is queued anywhere on the host
+        if any(item["priority"] < priority for key, item in waiters.items() if key != self.waiter_id):
+            waiters.setdefault(self.waiter_id, {"priority": priority, "since": now})
+            return 1.0
+
+        wait = 0.0
+        for name, capacity, amount in (("requests", self.rpm, 1), ("tokens", self.tpm, min(tokens, self.tpm or 0))):
+            if not capacity:
+                continue
+            available = state[name]["level"] - PRIORITY_RESERVE[priority] * capacity
+            if available < amount:
+                wait = max(wait, (amount - available) * 60.0 / capacity)
+        if wait > 0:
+            waiters.setdefault(self.waiter_id, {"priority": priority, "since": now})
+            return wait
+
+        if self.rpm:
+            state["requests"]["level"] -= 1
+        if self.tpm:
+            state["tokens"]["level"] -= min(tokens, self.tpm)
+        waiters.pop(self.waiter_id, None)
+        return 0.0
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_NORMAL) -> float:
+        """Block until the call may start; returns the seconds spent waiting"""
+        if not self.enabled:
+            return 0.0
+        start = time.time()
+        while True:
+            wait = self._locked(lambda state: self._try_acquire(state, tokens, priority))
+            if wait <= 0:
+                return time.time() - start
+            time.sleep(min(wait, MAX_WAIT_SLICE) + random.uniform(0, 0.25))
+
+    def settle(self, reserved: int, actual: int):
+        """Correct the token bucket once the real usage of a call is known"""
+        if not self.tpm or not actual:
+            return
+
+        def update(state):
+            self._refill(state, time.time())
+            state["tokens"]["level"] = min(self.tpm, state["tokens"]["level"] + min(reserved, self.tpm) - actual)
+
+        self._locked(update)
+
+    def throttle(self):
+        """The endpoint answered 429: empty the shared request bucket so every process slows down"""
+        if not self.rpm:
+            return
+
+        def update(state):
+            self._refill(state, time.time())
+            state["requests"]["level"] = min(state["requests"]["level"], 0.0)
+
+        self._locked(update)
+
+
+# ---- retries ----
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Retry-After header of a rate-limited response, in seconds"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """Full-jitter exponential backoff, at least the server's Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+    hinted = retry_after(error) if error is not None else None
+    return max(delay, hinted or 0.0)
+
+
+def limited_call(tool: str, messages: List[Dict[str, str]], call: Callable[[], Any],
+                 max_tokens: Optional[int] = None, limiter: Optional[RateLimiter] = None) -> Any:
+    """
+    Run one API call under the shared rate limit, retrying transient failures
+
+    Args:
+        tool: Calling tool, decides the priority class
+        call: Performs the request; its exception is raised once retries are exhausted
+    """
+    limiter = limiter or RateLimiter()
+    priority = tool_priority(tool)
+    reserved = estimate_tokens(messages, max_tokens)
+    # 0 disables retries; the OpenAI clients are created with max_retries=0 so this is the only retry layer
+    max_retries = _env_int("LLM_MAX_RETRIES", minimum=0)
+    if max_retries is None:
+        max_retries = DEFAULT_MAX_RETRIES
+    attempt = 0
+    while True:
+        limiter.acquire(reserved, priority)
+        try:
+            response = call()
+        except Exception as e:
+            if not is_retryable(e) or attempt >= max_retries:
+                raise
+            if _status_code(e) == 429 or type(e).__name__ == "RateLimitError":
+                limiter.throttle()
+            delay = backoff_delay(attempt, e)
+            print(f"Warning: {tool} call failed ({type(e).__name__}: {e}), retry {attempt + 1}/{max_retries} "
+                  f"in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        usage = getattr(response, "usage", None)
+        actual = getattr(usage, "total_tokens", None) if usage is not None else None
+        if isinstance(usage, dict):
+            actual = usage.get("total_tokens")
+        limiter.settle(reserved, int(actual or 0))
+        return response
+
+
+__all__ = ['RateLimiter', 'limited_call', 'is_retryable', 'backoff_delay', 'estimate_tokens', 'tool_priority',
+           'PRIORITY_HIGH', 'PRIORITY_NORMAL', 'PRIORITY_LOW']
@@ -0,0 +1,170 @@
+"""
+Per-tool model routing.
+Each tool's calls go to the model configured for the tool (MODEL_<TOOL>, e.g.
+MODEL_SCANNING) or for its class (MODEL_LIGHT for high-volume analysis calls,
+MODEL_HEAVY for planning and Dockerfile writing), falling back to MODEL. A route
+may list fallbacks separated by commas; MODEL is always the last one. Every call
+is recorded in envgym/usage.jsonl with its route, and a finished run appends
+per-route latency, tokens and cost together with the run's outcome to a file
+shared by all repositories, so route changes can be compared on success rate.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add Agent directory to path for importing tool modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.stats.usage import load_usage_records
+
+DEFAULT_ROUTE_STATS_PATH = Path(__file__).parent.parent.parent.parent / "data" / "route_stats.jsonl"
+
+ROUTE_DEFAULT = "default"
+
+# Tool classes: analysis calls that can run on smaller, faster models, and the calls that write the environment
+TOOL_CLASSES = {
+    "light": ["hardware_checking", "hardware_adjustment", "scanning", "test_scanning", "summarize"],
+    "heavy": ["planning", "writing_docker_initial", "writing_docker_revision", "fused_revision"],
+}
+
+
+def _env_models(name: str) -> List[str]:
+    value = os.getenv(name, "").strip().strip('"').strip("'")
+    return [model.strip() for model in value.split(",") if model.strip()]
+
+
+def routing_enabled() -> bool:
+    """MODEL_ROUTING=off sends every call to MODEL (the iteration controller sets it when switching models)"""
+    return os.getenv("MODEL_ROUTING", "on").strip('"').strip("'").lower() not in ("0", "false", "no", "off")
+
+
+def tool_class(tool: str) -> Optional[str]:
+    return next((name for name, tools in TOOL_CLASSES.items() if tool in tools), None)
+
+
+def route_models(tool: str, default_model: str) -> Tuple[str, List[str]]:
+    """
+    Models to try for a tool's call, in order
+
+    Returns:
+        tuple: (route name: "tool:<tool>" | "class:<class>" | "default", [primary, fallbacks..., default_model])
+    """
+    route, models = ROUTE_DEFAULT, []
+    if routing_enabled():
+        category = tool_class(tool)
+        models = _env_models(f"MODEL_{tool.upper()}")
+        if models:
+            route = f"tool:{tool}"
+        elif category:
+            models = _env_models(f"MODEL_{category.upper()}")
+            if models:
+                route = f"class:{category}"
+    ordered = []
+    for model in models + [default_model]:
+        if model and model not in ordered:
+            ordered.append(model)
+    return route, ordered
+
+
+def route_stats_path() -> Path:
+    """Route outcome location, shared by all repositories of a sweep (ROUTE_STATS_PATH overrides)"""
+    return Path(os.getenv("ROUTE_STATS_PATH") or DEFAULT_ROUTE_STATS_PATH)
+
+
+def summarize_routes(records: List[Dict]) -> Dict[str, Dict]:
+    """Per route and model: requests, failed requests, fallbacks, tokens, cost and latency"""
+    routes: Dict[str, Dict] = {}
+    for record in records:
+        key = f"{record.get('route', ROUTE_DEFAULT)} {record.get('provider_name')}/{record.get('model')}"
+        bucket = routes.setdefault(key, {"requests": 0, "errors": 0, "fallbacks": 0, "total_tokens": 0,
+                                         "cost": 0.0, "latency": 0.0, "latencies": []})
+        bucket["requests"] += 1
+        bucket["errors"] += 1 if record.get("error") else 0
+        bucket["fallbacks"] += 1 if record.get("fallback") else 0
+        bucket["total_tokens"] += int(record.get("total_tokens", 0))
+        bucket["cost"] += float(record.get("cost", 0.0))
+        bucket["latencies"].append(float(record.get("latency", 0.0)))
+    for bucket in routes.values():
+        latencies = sorted(bucket.pop("latencies"))
+        bucket["latency"] = round(sum(latencies), 3)
+        bucket["avg_latency"] = round(sum(latencies) / len(latencies), 3)
+        bucket["p90_latency"] = round(latencies[min(len(latencies) - 1, int(0.9 * len(latencies)))], 3)
+        bucket["cost"] = round(bucket["cost"], 6)
+    return dict(sorted(routes.items()))
+
+
+def record_route_outcome(success: bool, since: Optional[str] = None, path: Optional[Path] = None) -> Dict[str, Dict]:
+    """Append this run's per-route usage and its outcome; failures to record never affect the run"""
+    routes = summarize_routes(load_usage_records(since=since))
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "repo": Path.cwd().name,
+        "success": success,
+        "routes": routes
+    }
+    path = Path(path or route_stats_path())
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Warning: could not record route stats: {e}")
+    return routes
+
+
+def route_report(path: Optional[Path] = None) -> Dict[str, Dict]:
+    """
+    Compare routes across runs
+
+    Returns:
+        dict: per "route provider/model": runs, success_rate, avg_latency, requests/tokens/cost per run, error_rate
+    """
+    report: Dict[str, Dict] = {}
+    path = Path(path or route_stats_path())
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            runs = [json.loads(line) for line in f if line.strip()]
+    except (OSError, json.JSONDecodeError):
+        runs = []
+    for run in runs:
+        for key, usage in run.get("routes", {}).items():
+            item = report.setdefault(key, {"runs": 0, "successes": 0, "requests": 0, "errors": 0,
+                                           "total_tokens": 0, "cost": 0.0, "latency": 0.0})
+            item["runs"] += 1
+            item["successes"] += 1 if run.get("success") else 0
+            for field in ("requests", "errors", "total_tokens", "cost", "latency"):
+                item[field] += usage.get(field, 0)
+    for item in report.values():
+        item["success_rate"] = round(item["successes"] / item["runs"], 3)
+        item["avg_latency"] = round(item["latency"] / item["requests"], 3) if item["requests"] else None
+        item["error_rate"] = round(item["errors"] / item["requests"], 3) if item["requests"] else None
+        item["tokens_per_run"] = round(item["total_tokens"] / item["runs"])
+        item["cost_per_run"] = round(item["cost"] / item["runs"], 6)
+    return dict(sorted(report.items()))
+
+
+__all__ = ['route_models', 'routing_enabled', 'tool_class', 'summarize_routes', 'record_route_outcome',
+           'route_report', 'TOOL_CLASSES', 'ROUTE_DEFAULT']
+
+
+def main():
+    """Print the per-route comparison across recorded runs"""
+    report = route_report()
+    if not report:
+        print(f"No route stats recorded yet ({route_stats_path()})")
+        return
+    print(f"{'route / model':<60} {'runs':>5} {'success':>8} {'avg s':>7} {'errors':>7} {'tokens/run':>11} {'$/run':>9}")
+    for key, item in report.items():
+        print(f"{key:<60} {item['runs']:>5} {item['success_rate']:>8.0%} {item['avg_latency'] or 0:>7.1f} "
+              f"{item['error_rate'] or 0:>7.0%} {item['tokens_per_run']:>11,} {item['cost_per_run']:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,113 @@
+"""
+Incremental validation of streamed LLM output.
+JSONArrayStreamValidator checks a streamed JSON array of strings character by
+character, so a malformed answer is detected (and the stream stopped) at the
+first bad token instead of after the whole answer has been generated.
+"""
+
+import json
+from typing import Callable, List, Optional
+
+
+class JSONArrayStreamValidator:
+    """
+    Validate a streamed `["a", "b", ...]` answer as it arrives
+
+    A leading markdown fence line (```json) and trailing whitespace / closing fence are
+    tolerated, as the blocking parsers do. feed() returns False once the output can no
+    longer be a JSON array of strings; pass it as on_delta to chat_completion_stream().
+    """
+
+    def __init__(self, on_item: Optional[Callable[[str], None]] = None):
+        self.on_item = on_item
+        self.items: List[str] = []
+        self.complete = False
+        self.error: Optional[str] = None
+        self.position = 0
+        self._state = "start"
+        self._token: List[str] = []
+        self._escaped = False
+
+    def _fail(self, char: str) -> bool:
+        self.error = f"unexpected {char!r} at offset {self.position} (state: {self._state})"
+        return False
+
+    def feed(self, delta: str) -> bool:
+        if self.error:
+            return False
+        for char in delta:
+            if not self._step(char):
+                return False
+            self.position += 1
+        return True
+
+    def _step(self, char: str) -> bool:
+        state = self._state
+        if state == "start":
+            if char.isspace():
+                return True
+            if char == "`":
+                self._state = "fence"
+                return True
+            if char == "[":
+                self._state = "value_or_end"
+                return True
+            return self._fail(char)
+
+        if state == "fence":
+            # Skip the rest of the opening fence line (```json)
+            if char == "\n":
+                self._state = "start"
+            return True
+
+        if state in ("value_or_end", "value"):
+            if char.isspace():
+                return True
+            if char == '"':
+                self._state = "string"
+                self._token = [char]
+                return True
+            if char == "]" and state == "value_or_end":
+                self.complete = True
+                self._state = "done"
+                return True
+            return self._fail(char)
+
+        if state == "string":
+            self._token.append(char)
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                try:
+                    item = json.loads("".join(self._token))
+                except json.JSONDecodeError:
+                    return self._fail(char)
+                self.items.append(item)
+                if self.on_item:
+                    self.on_item(item)
+                self._state = "separator"
+            elif char == "\n":
+                return self._fail(char)
+            return True
+
+        if state == "separator":
+            if char.isspace():
+                return True
+            if char == ",":
+                self._state = "value"
+                return True
+            if char == "]":
+                self.complete = True
+                self._state = "done"
+                return True
+            return self._fail(char)
+
+        # done: only whitespace and a closing fence may follow
+        if char.isspace() or char == "`":
+            return True
+        return self._fail(char)
+
+
+__all__ = ['JSONArrayStreamValidator']
@@ -0,0 +1,271 @@
+"""
+Structured JSON answers from the LLM.
+structured_completion() asks for output constrained by a JSON schema where the
+endpoint supports it (response_format json_schema, else json_object), repairs the
+usual malformations locally (markdown fences, prose around the JSON, trailing
+commas, an answer cut off inside the array) and validates the result against the
+schema. Only when that fails is the model asked again, with a short repair prompt
+that carries the broken answer and the error instead of the whole request.
+"""
+
+import ast
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional, Set
+
+# Add Agent directory to path for importing tool modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.llm.entry import chat_completion
+
+MODE_JSON_SCHEMA = "json_schema"
+MODE_JSON_OBJECT = "json_object"
+MODE_OFF = "off"
+MODES = [MODE_JSON_SCHEMA, MODE_JSON_OBJECT, MODE_OFF]
+
+DEFAULT_REPAIR_ATTEMPTS = 2
+MAX_REPAIR_CHARS = 20000
+
+# Response formats an endpoint rejected, per model, so they are not sent again in this process
+_rejected_modes: Dict[str, Set[str]] = {}
+
+
+class StructuredOutputError(ValueError):
+    """The answer could not be turned into JSON that matches the schema"""
+
+
+def string_list_schema(key: str = "files") -> Dict:
+    """Object schema with one list of strings (structured output needs an object at the top level)"""
+    return {
+        "type": "object",
+        "properties": {key: {"type": "array", "items": {"type": "string"}}},
+        "required": [key],
+        "additionalProperties": False
+    }
+
+
+FILE_LIST_SCHEMA = string_list_schema("files")
+
+
+def structured_output_mode() -> str:
+    """STRUCTURED_OUTPUT in the environment: json_schema (default), json_object or off"""
+    mode = os.getenv("STRUCTURED_OUTPUT", MODE_JSON_SCHEMA).strip('"').strip("'").lower()
+    if mode in ("0", "false", "no", "none"):
+        return MODE_OFF
+    return mode if mode in MODES else MODE_JSON_SCHEMA
+
+
+def repair_attempts() -> int:
+    value = os.getenv("STRUCTURED_REPAIR_ATTEMPTS", "").strip('"').strip("'")
+    try:
+        return max(0, int(value)) if value else DEFAULT_REPAIR_ATTEMPTS
+    except ValueError:
+        return DEFAULT_REPAIR_ATTEMPTS
+
+
+def response_format(mode: str, name: str, schema: Dict) -> Optional[Dict]:
+    if mode == MODE_JSON_SCHEMA:
+        return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+    if mode == MODE_JSON_OBJECT:
+        return {"type": "json_object"}
+    return None
+
+
+# ---- local repair ----
+
+def _strip_fences(text: str) -> str:
+    """Drop markdown fence lines (```json ... ```), also an unclosed or a lone closing one"""
+    return "\n".join(line for line in text.splitlines() if not line.strip().startswith("```")).strip()
+
+
+def _scan_brackets(text: str):
+    """Walk the text outside strings; yields (index, char, open brackets) for brackets and string ends"""
+    stack: List[str] = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                yield index, char, stack
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "[{":
+            stack.append("]" if char == "[" else "}")
+            yield index, char, stack
+        elif char in "]}":
+            if not stack or stack.pop() != char:
+                return
+            yield index, char, stack
+
+
+def _balanced_json(text: str) -> Optional[str]:
+    """The first JSON array or object in the text; an unterminated one is closed after its last complete value"""
+    start = min((index for index in (text.find("["), text.find("{")) if index != -1), default=-1)
+    if start == -1:
+        return None
+    text = text[start:]
+    last_complete, open_brackets = None, []
+    for index, char, stack in _scan_brackets(text):
+        if char in "]}" and not stack:
+            return text[:index + 1]
+        if char in '"]}':
+            last_complete, open_brackets = index, list(stack)
+    if last_complete is None:
+        return None
+    # Cut off mid-answer (output token limit): keep the complete values and close the brackets
+    return text[:last_complete + 1] + "".join(reversed(open_brackets))
+
+
+def _without_trailing_commas(text: str) -> str:
+    return re.sub(r",(\s*[\]}])", r"\1", text)
+
+
+def repair_json(text: str) -> Any:
+    """Parse a model answer as JSON, fixing fences, surrounding prose, trailing commas and truncation"""
+    text = (text or "").strip()
+    candidates = [text, _strip_fences(text)]
+    extracted = _balanced_json(candidates[-1])
+    if extracted:
+        candidates += [extracted, _without_trailing_commas(extracted)]
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except (json.JSONDecodeError, TypeError):
+            continue
+    # Python literal lists with single quotes
+    if extracted:
+        try:
+            value = ast.literal_eval(extracted)
+            if isinstance(value, (list, dict)):
+                return value
+        except (ValueError, SyntaxError):
+            pass
+    raise StructuredOutputError("answer contains no parseable JSON")
+
+
+def validate(value: Any, schema: Dict, path: str = "$") -> Optional[str]:
+    """First violation of the (type, properties, required, items) subset of JSON schema, or None"""
+    types = {"object": dict, "array": list, "string": str, "boolean": bool, "integer": int, "number": (int, float)}
+    expected = schema.get("type")
+    if expected in types and (not isinstance(value, types[expected]) or
+                              (expected in ("integer", "number") and isinstance(value, bool))):
+        return f"{path} should be {expected}, got {type(value).__name__}"
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in value:
+                return f"{path} is missing '{key}'"
+        for key, subschema in schema.get("properties", {}).items():
+            if key in value:
+                error = validate(value[key], subschema, f"{path}.{key}")
+                if error:
+                    return error
+    if expected == "array" and "items" in schema:
+        for index, item in enumerate(value):
+            error = validate(item, schema["items"], f"{path}[{index}]")
+            if error:
+                return error
+    return None
+
+
+def _coerce(value: Any, schema: Dict) -> Any:
+    """Accept the list alone for a single-list object schema, and a single-list object under another key"""
+    required = schema.get("required", [])
+    if schema.get("type") != "object" or len(required) != 1:
+        return value
+    key = required[0]
+    if schema.get("properties", {}).get(key, {}).get("type") != "array":
+        return value
+    if isinstance(value, list):
+        return {key: value}
+    if isinstance(value, dict) and key not in value:
+        lists = [item for item in value.values() if isinstance(item, list)]
+        if len(lists) == 1:
+            return {key: lists[0]}
+    return value
+
+
+def parse_structured(text: str, schema: Dict) -> Any:
+    """Repair and validate an answer; raises StructuredOutputError"""
+    value = _coerce(repair_json(text), schema)
+    error = validate(value, schema)
+    if error:
+        raise StructuredOutputError(error)
+    return value
+
+
+# ---- LLM calls ----
+
+def _format_rejected(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status in (400, 422) or type(error).__name__ in ("BadRequestError", "UnprocessableEntityError")
+
+
+def repair_messages(answer: str, schema: Dict, error: str) -> List[Dict[str, str]]:
+    """Short re-ask: the broken answer and what is wrong with it, not the original request"""
+    return [
+        {"role": "system", "content": "You fix malformed JSON. Return only the corrected JSON, no other text."},
+        {"role": "user", "content": f"This answer must be JSON matching the schema {json.dumps(schema)}\n"
+                                    f"Problem: {error}\n\nAnswer:\n{answer[:MAX_REPAIR_CHARS]}"}
+    ]
+
+
+def structured_completion(client, tool: str, model: str, messages: List[Dict[str, str]], schema: Dict,
+                          name: str = "answer", temperature: float = None, **kwargs) -> Any:
+    """
+    Ask for a JSON answer matching schema and return it parsed
+
+    Args:
+        name: Schema name sent with the json_schema response format
+        **kwargs: Extra arguments forwarded to chat_completion()
+
+    Raises:
+        StructuredOutputError: the answer is still invalid after local repair and the repair prompts
+    """
+    mode = structured_output_mode()
+    rejected = _rejected_modes.setdefault(model, set())
+    modes = [item for item in MODES[MODES.index(mode):] if item not in rejected] or [MODE_OFF]
+    response = None
+    for candidate in modes:
+        fmt = response_format(candidate, name, schema)
+        try:
+            response = chat_completion(client, tool, model, messages, temperature,
+                                       **({"response_format": fmt} if fmt else {}), **kwargs)
+            break
+        except Exception as e:
+            if candidate == MODE_OFF or not _format_rejected(e):
+                raise
+            rejected.add(candidate)
+            print(f"Warning: {candidate} output not accepted for {model} ({e}), trying without it")
+
+    return repair_answer(client, tool, model, response.choices[0].message.content or "", schema, temperature)
+
+
+def repair_answer(client, tool: str, model: str, answer: str, schema: Dict, temperature: float = None) -> Any:
+    """
+    Parse an answer, repairing it locally first and then with up to STRUCTURED_REPAIR_ATTEMPTS short re-asks
+
+    Raises:
+        StructuredOutputError: still invalid after the last repair attempt
+    """
+    attempts = repair_attempts()
+    for attempt in range(attempts + 1):
+        try:
+            return parse_structured(answer, schema)
+        except StructuredOutputError as e:
+            if attempt == attempts:
+                raise StructuredOutputError(f"{e} (after {attempts} repair attempts)") from e
+            print(f"Warning: {tool} answer is not valid JSON ({e}), asking for a repair")
+            answer = chat_completion(client, tool, model, repair_messages(answer, schema, str(e)),
+                                     temperature).choices[0].message.content or ""
+
+__all__ = ['structured_completion', 'repair_answer', 'parse_structured', 'repair_json', 'validate', 'string_list_schema',
+           'structured_output_mode', 'StructuredOutputError', 'FILE_LIST_SCHEMA']
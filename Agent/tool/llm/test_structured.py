@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for structured output: local repair, schema validation, response format fallback and repair prompts
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add Agent directory to path
+agent_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(agent_dir))
+
+from tool.llm.structured import (structured_completion, parse_structured, repair_json, validate,
+                                 StructuredOutputError, FILE_LIST_SCHEMA)
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+class FakeClient:
+    """Answers from a list; rejects response formats it does not support"""
+
+    def __init__(self, answers, supported=("json_object",)):
+        self.answers = list(answers)
+        self.supported = supported
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        fmt = kwargs.get("response_format")
+        if fmt and fmt["type"] not in self.supported:
+            raise BadRequestError(f"response_format {fmt['type']} is not supported")
+        message = SimpleNamespace(content=self.answers.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                               usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15})
+
+
+def test_local_repair():
+    """Fences, prose, trailing commas, truncation and single quotes are fixed without a call"""
+    print("=== Local repair ===")
+    cases = {
+        '["README.md", "setup.py"]': ["README.md", "setup.py"],
+        '```json\n["README.md", "setup.py"]\n```': ["README.md", "setup.py"],
+        '```json\n["README.md", "setup.py"]': ["README.md", "setup.py"],
+        'Here are the files:\n["README.md", "setup.py",]\nLet me know if you need more.': ["README.md", "setup.py"],
+        '["README.md", "setup.py", "requirem': ["README.md", "setup.py"],
+        "['README.md', 'setup.py']": ["README.md", "setup.py"],
+        '{"files": ["README.md"]}': ["README.md"],
+        '{"documents": ["README.md"]}': ["README.md"],
+        '["src/[x].py", "a \\"b\\".txt"]': ["src/[x].py", 'a "b".txt'],
+    }
+    for answer, expected in cases.items():
+        result = parse_structured(answer, FILE_LIST_SCHEMA)["files"]
+        print(f"{answer[:40]!r:45} -> {result}")
+        assert result == expected, (answer, result)
+
+    for answer in ["I could not find any files.", "", '["README.md", 3]', '{"a": [1], "b": [2]}']:
+        try:
+            parse_structured(answer, FILE_LIST_SCHEMA)
+        except StructuredOutputError as e:
+            print(f"{answer[:40]!r:45} -> error: {e}")
+        else:
+            raise AssertionError(f"accepted {answer!r}")
+    assert validate({"files": ["a"]}, FILE_LIST_SCHEMA) is None
+    assert repair_json('{"a": [1, 2,],}') == {"a": [1, 2]}
+    print("Local repair test passed")
+
+
+def test_structured_completion():
+    """Unsupported json_schema falls back to json_object; a broken answer gets a short repair prompt"""
+    print("\n=== Structured completion ===")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            messages = [{"role": "system", "content": "Return JSON."}, {"role": "user", "content": "x" * 5000}]
+            client = FakeClient(['{"files": ["README.md", "Dockerfile"]}'])
+            result = structured_completion(client, "scanning", "test-model", messages, FILE_LIST_SCHEMA)
+            assert result == {"files": ["README.md", "Dockerfile"]}
+            formats = [request.get("response_format", {}).get("type") for request in client.requests]
+            print(f"response formats tried: {formats}")
+            assert formats == ["json_schema", "json_object"]
+
+            # json_schema is remembered as rejected; the answer needs one repair round
+            client = FakeClient(["The files are README.md and Dockerfile.", '["README.md", "Dockerfile"]'])
+            result = structured_completion(client, "scanning", "test-model", messages, FILE_LIST_SCHEMA)
+            assert result["files"] == ["README.md", "Dockerfile"]
+            assert len(client.requests) == 2
+            repair_prompt = client.requests[1]["messages"][1]["content"]
+            print(f"repair prompt ({len(repair_prompt)} chars): {repair_prompt[:120]!r}")
+            assert "x" * 100 not in repair_prompt and "README.md and Dockerfile" in repair_prompt
+
+            client = FakeClient(["no", "still no", "nope"])
+            try:
+                structured_completion(client, "scanning", "test-model", messages, FILE_LIST_SCHEMA)
+            except StructuredOutputError as e:
+                print(f"gave up: {e}")
+            else:
+                raise AssertionError("invalid answers accepted")
+            assert len(client.requests) == 3
+            assert Path("envgym/usage.jsonl").exists()
+        finally:
+            os.chdir(cwd)
+    print("Structured completion test passed")
+
+
+if __name__ == "__main__":
+    test_local_repair()
+    test_structured_completion()
+    print("\nAll structured output tests passed")
@@ -11,6 +11,30 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.llm.entry import chat_completion
+from prompt.template import PromptTemplate
+from prompt.planning_initial import plan_instruction as initial_plan_instruction
+from prompt.planning import plan_instruction as update_plan_instruction
+
+INITIAL_PLAN_TEMPLATE = PromptTemplate(
+    instructions="I want to configure the environment. Please write an environment setup plan from the file provided below.\n"
+                 + initial_plan_instruction,
+    sections=[
+        ("file_path", "I have a file:"),
+        ("file_content", "File content:"),
+    ]
+)
+
+UPDATE_PLAN_TEMPLATE = PromptTemplate(
+    instructions="I want to configure the environment. Please modify or add to the plan content based on the existing "
+                 "plan and the content of the new file provided below.\n" + update_plan_instruction,
+    sections=[
+        ("existing_plan", "This is the existing configuration plan:"),
+        ("file_path", "Now there is a new file:"),
+        ("file_content", "File content:"),
+    ]
+)
+
 class PlanningTool:
     def __init__(self):
         # Try to load environment variables from multiple possible locations
@@ -70,7 +94,8 @@ class PlanningTool:
         # Initialize OpenAI client
         self.client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0  # retries happen once, in limited_call(), under the shared rate limit
         )
         
         # Configuration settings
@@ -125,71 +150,63 @@ class PlanningTool:
         with open(plan_path, 'w', encoding='utf-8') as f:
             f.write(plan_content)
     
-    def generate_initial_plan(self, file_path: str, file_content: str) -> str:
-        """Generate initial plan for the first file"""
-        from prompt.planning_initial import plan_instruction
-        
-        prompt = f"""I have a file: {file_path}
-
-File content:
-{file_content}
-
-I want to configure the environment. Please write an environment setup plan.
-
-{plan_instruction}
-"""
-        
+    def initial_plan_messages(self, file_path: str, file_content: str) -> List[Dict[str, str]]:
+        """Chat messages for the initial plan from the first file"""
         # Prepare system message based on language setting
         if self.system_language.lower() in ['chinese', 'zh', '中文']:
             system_msg = "你是一个专业的环境配置助手，能够根据文件内容分析并制定详细的环境搭建计划。"
         else:
             system_msg = "You are a professional environment configuration assistant who can analyze file content and create detailed environment setup plans."
             
-        response = self.client.chat.completions.create(
+        return INITIAL_PLAN_TEMPLATE.messages(system_msg, file_path=file_path, file_content=file_content)
+    
+    def generate_initial_plan(self, file_path: str, file_content: str) -> str:
+        """Generate initial plan for the first file"""
+        response = chat_completion(
+            self.client,
+            "planning",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self.initial_plan_messages(file_path, file_content),
             temperature=self.temperature
         )
         
         return response.choices[0].message.content
     
-    def update_plan(self, file_path: str, file_content: str, existing_plan: str) -> str:
-        """Update plan for subsequent files"""
-        from prompt.planning import plan_instruction
-        
-        prompt = f"""This is the existing configuration plan:
-{existing_plan}
-
-Now there is a new file: {file_path}
-
-File content:
-{file_content}
-
-I want to configure the environment. Please modify or add to the plan content based on the previous plan and the new content.
-
-{plan_instruction}
-"""
-        
+    def update_plan_messages(self, file_path: str, file_content: str, existing_plan: str) -> List[Dict[str, str]]:
+        """Chat messages for updating the plan with a subsequent file"""
         # Prepare system message based on language setting
         if self.system_language.lower() in ['chinese', 'zh', '中文']:
             system_msg = "你是一个专业的环境配置助手，能够根据新的文件内容更新现有的环境搭建计划。"
         else:
             system_msg = "You are a professional environment configuration assistant who can update existing environment setup plans based on new file content."
             
-        response = self.client.chat.completions.create(
+        return UPDATE_PLAN_TEMPLATE.messages(system_msg, existing_plan=existing_plan, file_path=file_path,
+                                             file_content=file_content)
+    
+    def update_plan(self, file_path: str, file_content: str, existing_plan: str) -> str:
+        """Update plan for subsequent files"""
+        response = chat_completion(
+            self.client,
+            "planning",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self.update_plan_messages(file_path, file_content, existing_plan),
             temperature=self.temperature
         )
         
         return response.choices[0].message.content
     
+    def order_documents(self, documents: List[str]) -> List[str]:
+        """Files in the order they are planned from: README.md first"""
+        documents = list(documents)
+        readme_files = [f for f in documents if os.path.basename(f).lower() == 'readme.md']
+        if readme_files:
+            readme_file = readme_files[0]  # Take the first README.md found
+            # Remove README.md from original position and put it at the beginning
+            documents.remove(readme_file)
+            documents.insert(0, readme_file)
+            print(f"Found README.md, prioritizing it for analysis: {readme_file}")
+        return documents
+    
     def run(self):
         """Execute planning tool"""
         try:
@@ -202,13 +219,7 @@ I want to configure the environment. Please modify or add to the plan content ba
                 return
             
             # Check if README.md exists and prioritize it
-            readme_files = [f for f in documents if os.path.basename(f).lower() == 'readme.md']
-            if readme_files:
-                readme_file = readme_files[0]  # Take the first README.md found
-                # Remove README.md from original position and put it at the beginning
-                documents.remove(readme_file)
-                documents.insert(0, readme_file)
-                print(f"Found README.md, prioritizing it for analysis: {readme_file}")
+            documents = self.order_documents(documents)
             
             # Process first file (now prioritized README.md if exists)
             first_file = documents[0]
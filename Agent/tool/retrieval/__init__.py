@@ -0,0 +1 @@
+# Retrieval Tool Module 
@@ -0,0 +1,286 @@
+"""
+Offline retrieval of successful Dockerfiles from past sweeps.
+Every <repo>/envgym directory under tests/backup* whose status.txt says SUCCESS
+becomes a document described by its manifests, plan, final Dockerfile and the
+errors it got past. A TF-IDF index over those terms (cached on disk, rebuilt when
+the backups change) returns the most similar Dockerfiles for few-shot prompts.
+"""
+
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add Agent directory to path for importing tool modules
+agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+if agent_dir not in sys.path:
+    sys.path.insert(0, agent_dir)
+
+from tool.failure_kb.entry import parse_history
+from tool.failure_kb.rules import primary_error_line, normalize_error
+
+ENVGYM_ROOT = Path(__file__).parent.parent.parent.parent
+DEFAULT_ROOTS = [str(ENVGYM_ROOT / "tests" / "backup*")]
+INDEX_CACHE_FILE = Path(tempfile.gettempdir()) / "envgym_retrieval" / "index.json"
+INDEX_VERSION = 1
+DEFAULT_TOP_K = 2
+MIN_SIMILARITY = 0.05
+MAX_PLAN_CHARS = 6000
+MAX_EXAMPLE_CHARS = 3000
+MAX_ERRORS_PER_DOC = 20
+
+# Field weights: manifests and base images say most about the ecosystem
+FIELD_WEIGHTS = {"manifest": 3.0, "image": 2.0, "pkg": 1.5, "err": 1.0, "word": 1.0}
+
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "are", "from", "you", "your", "will", "can", "use",
+    "using", "all", "any", "not", "have", "has", "into", "such", "must", "should", "may", "also",
+    "run", "install", "installed", "installation", "docker", "dockerfile", "container", "image",
+    "step", "steps", "file", "files", "project", "repository", "environment", "build", "setup",
+    "ensure", "required", "need", "needed", "make", "sure", "then", "used", "e.g", "etc",
+}
+WORD_PATTERN = re.compile(r'[a-z][a-z0-9+#.-]{1,30}')
+
+
+def _words(text: str) -> List[str]:
+    return [word.strip('.-') for word in WORD_PATTERN.findall(text.lower())
+            if word.strip('.-') not in STOPWORDS and len(word.strip('.-')) > 2]
+
+
+def dockerfile_terms(dockerfile_text: str) -> Counter:
+    """Base images (without tags) and installed packages of a Dockerfile"""
+    terms = Counter()
+    for match in re.finditer(r'^\s*FROM\s+(?:--\S+\s+)*([^\s:@]+)', dockerfile_text, re.MULTILINE | re.IGNORECASE):
+        image = match.group(1).lower().rsplit('/', 1)[-1]
+        if image != "scratch" and '$' not in image:
+            terms[f"image:{image}"] += 1
+    for command in re.findall(r'(?:apt-get|apt|apk|yum|dnf)\s+(?:-\S+\s+)*(?:install|add)\s+([^&;|\n]+)',
+                              dockerfile_text.replace("\\\n", " ")):
+        for token in command.split():
+            if not token.startswith('-') and re.match(r'^[a-z0-9][a-z0-9.+-]+$', token):
+                terms[f"pkg:{token}"] += 1
+    return terms
+
+
+def build_terms(plan_text: str = "", manifests: Optional[List[str]] = None, dockerfile_text: str = "",
+                error_lines: Optional[List[str]] = None) -> Dict[str, float]:
+    """Weighted term frequencies shared by documents and queries"""
+    terms = Counter()
+    for manifest in manifests or []:
+        terms[f"manifest:{Path(manifest).name.lower()}"] += 1
+    terms.update(dockerfile_terms(dockerfile_text))
+    for line in error_lines or []:
+        terms.update(f"err:{word}" for word in _words(normalize_error(line)))
+    terms.update(f"word:{word}" for word in _words(plan_text[:MAX_PLAN_CHARS]))
+
+    weighted = {}
+    for term, count in terms.items():
+        field = term.split(':', 1)[0]
+        weighted[term] = FIELD_WEIGHTS.get(field, 1.0) * (1 + math.log(count))
+    return weighted
+
+
+def _read(path: Path) -> str:
+    try:
+        return path.read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return ""
+
+
+def _run_date(envgym_dir: Path) -> datetime:
+    """
+    When the run was backed up: the date suffix of its backup directory (backup_20250724, backup_0728),
+    else the last iteration timestamp in history.txt, else the Dockerfile's modification time
+    """
+    stamps = re.findall(r'^=== Iteration \d+ - \[(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)\] ===$',
+                        _read(envgym_dir / "history.txt"), re.M)
+    history_date = datetime(*map(int, stamps[-1])) if stamps else None
+    name = envgym_dir.parent.parent.name
+    try:
+        match = re.search(r'(?<!\d)(\d{8})$', name)
+        if match:
+            return datetime.strptime(match.group(1), "%Y%m%d")
+        match = re.search(r'(?<!\d)(\d{4})$', name)
+        if match:
+            # MMDD suffix: the year is the one the run took place in
+            year = (history_date or datetime.fromtimestamp((envgym_dir / "envgym.dockerfile").stat().st_mtime)).year
+            return datetime.strptime(f"{year}{match.group(1)}", "%Y%m%d")
+    except ValueError:
+        pass
+    return history_date or datetime.fromtimestamp((envgym_dir / "envgym.dockerfile").stat().st_mtime)
+
+
+def _load_manifests(envgym_dir: Path) -> List[str]:
+    try:
+        documents = json.loads(_read(envgym_dir / "documents.json") or "[]")
+        return [str(item) for item in documents] if isinstance(documents, list) else []
+    except json.JSONDecodeError:
+        return []
+
+
+class DockerfileRetrievalIndex:
+    """TF-IDF index over the successful runs of past sweeps"""
+
+    def __init__(self, roots: Optional[List[str]] = None, cache_file: Optional[Path] = None):
+        env_roots = os.getenv("RETRIEVAL_ROOTS")
+        self.roots = roots or (env_roots.split(os.pathsep) if env_roots else DEFAULT_ROOTS)
+        self.cache_file = Path(cache_file or INDEX_CACHE_FILE)
+        self.documents: List[Dict] = []
+        self.idf: Dict[str, float] = {}
+
+    def successful_runs(self) -> List[Path]:
+        """envgym directories of successful runs, the most recent backup of each repository"""
+        runs = {}
+        for root in self.roots:
+            for status_file in sorted(glob.glob(os.path.join(root, "*", "envgym", "status.txt"))):
+                envgym_dir = Path(status_file).parent
+                if not (envgym_dir / "envgym.dockerfile").exists() or "SUCCESS" not in _read(Path(status_file)):
+                    continue
+                # Backup names mix date formats (backup_0728, backup_20250724): compare the dates, not the names
+                key = (_run_date(envgym_dir), str(envgym_dir))
+                repo = envgym_dir.parent.name.lower()
+                if repo not in runs or key > runs[repo][0]:
+                    runs[repo] = (key, envgym_dir)
+        return [runs[repo][1] for repo in sorted(runs)]
+
+    def _fingerprint(self, runs: List[Path]) -> str:
+        digest = hashlib.sha256(f"v{INDEX_VERSION}".encode())
+        for envgym_dir in runs:
+            stat = (envgym_dir / "envgym.dockerfile").stat()
+            digest.update(f"{envgym_dir}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+        return digest.hexdigest()
+
+    def _document(self, envgym_dir: Path) -> Dict:
+        dockerfile_text = _read(envgym_dir / "envgym.dockerfile")
+        errors = []
+        for iteration in parse_history(_read(envgym_dir / "history.txt")):
+            line = primary_error_line(iteration.get("LOG", ""))
+            if line and line not in errors:
+                errors.append(line)
+        terms = build_terms(_read(envgym_dir / "plan.txt"), _load_manifests(envgym_dir),
+                            dockerfile_text, errors[-MAX_ERRORS_PER_DOC:])
+        return {
+            "repo": envgym_dir.parent.name,
+            "path": str(envgym_dir),
+            "dockerfile": dockerfile_text,
+            "terms": terms
+        }
+
+    def load(self) -> "DockerfileRetrievalIndex":
+        """Load the cached index, rebuilding it when the set of successful runs changed"""
+        runs = self.successful_runs()
+        fingerprint = self._fingerprint(runs)
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("fingerprint") == fingerprint:
+                self.documents, self.idf = cached["documents"], cached["idf"]
+                return self
+        except (OSError, json.JSONDecodeError, KeyError):
+            pass
+
+        self.documents = [self._document(envgym_dir) for envgym_dir in runs]
+        document_frequency = Counter(term for document in self.documents for term in document["terms"])
+        total = len(self.documents)
+        self.idf = {term: math.log((total + 1) / (count + 1)) + 1 for term, count in document_frequency.items()}
+        for document in self.documents:
+            document["norm"] = self._norm(document["terms"])
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"fingerprint": fingerprint, "documents": self.documents, "idf": self.idf}, f)
+        os.replace(tmp_file, self.cache_file)
+        return self
+
+    def _norm(self, terms: Dict[str, float]) -> float:
+        return math.sqrt(sum((weight * self.idf.get(term, 0.0)) ** 2 for term, weight in terms.items()))
+
+    def search(self, query_terms: Dict[str, float], top_k: int = DEFAULT_TOP_K,
+               exclude_repo: Optional[str] = None) -> List[Dict]:
+        """
+        Most similar successful runs by TF-IDF cosine similarity
+
+        Returns:
+            list: {"repo", "path", "dockerfile", "score"} sorted by score
+        """
+        query_norm = self._norm(query_terms)
+        if not query_norm or top_k <= 0:
+            return []
+        exclude = (exclude_repo or "").lower()
+        results = []
+        for document in self.documents:
+            if document["repo"].lower() == exclude or not document.get("norm"):
+                continue
+            dot = sum(weight * document["terms"][term] * self.idf.get(term, 0.0) ** 2
+                      for term, weight in query_terms.items() if term in document["terms"])
+            score = dot / (query_norm * document["norm"])
+            if score >= MIN_SIMILARITY:
+                results.append({"repo": document["repo"], "path": document["path"],
+                                "dockerfile": document["dockerfile"], "score": round(score, 4)})
+        results.sort(key=lambda item: item["score"], reverse=True)
+        return results[:top_k]
+
+
+def retrieval_top_k() -> int:
+    """RETRIEVAL_TOP_K from the environment; 0 disables few-shot examples"""
+    try:
+        return max(0, int(os.getenv("RETRIEVAL_TOP_K", DEFAULT_TOP_K)))
+    except ValueError:
+        return DEFAULT_TOP_K
+
+
+def retrieve_similar_dockerfiles(include_current: bool = False, top_k: Optional[int] = None,
+                                 verbose: bool = False) -> List[Dict]:
+    """
+    Examples for the current repository (run from the repository root)
+
+    Args:
+        include_current: Also use the current dockerfile and the last failure (revision)
+    """
+    top_k = retrieval_top_k() if top_k is None else top_k
+    if top_k <= 0:
+        return []
+    try:
+        envgym_dir = Path("envgym")
+        dockerfile_text, error_lines = "", []
+        if include_current:
+            dockerfile_text = _read(envgym_dir / "envgym.dockerfile")
+            line = primary_error_line(_read(envgym_dir / "log_complete.txt") or _read(envgym_dir / "log.txt"))
+            error_lines = [line] if line else []
+        query = build_terms(_read(envgym_dir / "plan.txt"), _load_manifests(envgym_dir), dockerfile_text, error_lines)
+        examples = DockerfileRetrievalIndex().load().search(query, top_k, exclude_repo=Path.cwd().name)
+        if verbose:
+            for example in examples:
+                print(f"Retrieved example: {example['repo']} (similarity {example['score']:.2f})")
+        return examples
+    except Exception as e:
+        print(f"Warning: Dockerfile retrieval failed: {e}")
+        return []
+
+
+def format_examples_prompt(examples: List[Dict]) -> str:
+    """Prompt section with the retrieved Dockerfiles"""
+    if not examples:
+        return ""
+    sections = ["\nFor reference, these Dockerfiles built and ran successfully for similar repositories. "
+                "Reuse their base images, system packages and toolchain setup where they fit, but only "
+                "reference files that exist in this repository:"]
+    for number, example in enumerate(examples, 1):
+        dockerfile = example["dockerfile"].strip()
+        if len(dockerfile) > MAX_EXAMPLE_CHARS:
+            dockerfile = dockerfile[:MAX_EXAMPLE_CHARS] + "\n# ... (truncated)"
+        sections.append(f"\nExample {number} ({example['repo']}, similarity {example['score']:.2f}):\n{dockerfile}")
+    return "\n".join(sections) + "\n"
+
+
+__all__ = ['DockerfileRetrievalIndex', 'build_terms', 'retrieve_similar_dockerfiles',
+           'format_examples_prompt', 'retrieval_top_k']
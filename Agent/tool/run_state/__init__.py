@@ -0,0 +1 @@
+# Run State Tool Module 
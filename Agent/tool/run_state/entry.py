@@ -0,0 +1,191 @@
+"""
+Durable run-state journal for agent.py.
+Every completed setup phase (scan, hardware, plan, adjust) and every completed
+step of an iteration (write, run, summarize, update, control) is recorded in
+envgym/run_state.json together with a hash of the files it produced. When a run
+is interrupted, the next invocation in the same repository resumes at the first
+step that did not complete instead of rescanning, re-planning and restarting at
+iteration 1.
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+STATE_PATH = "envgym/run_state.json"
+STATE_VERSION = 1
+
+PHASE_SCAN = "scan"
+PHASE_HARDWARE = "hardware"
+PHASE_PLAN = "plan"
+PHASE_ADJUST = "adjust"
+
+STEP_WRITE = "write"
+STEP_RUN = "run"
+STEP_SUMMARIZE = "summarize"
+STEP_UPDATE = "update"
+STEP_CONTROL = "control"
+ITERATION_STEPS = [STEP_WRITE, STEP_RUN, STEP_SUMMARIZE, STEP_UPDATE, STEP_CONTROL]
+
+# Files each phase or step leaves behind; a missing one means the work has to be redone
+PHASE_ARTIFACTS = {
+    PHASE_SCAN: ["envgym/documents.json"],
+    PHASE_HARDWARE: ["envgym/hardware.txt"],
+    PHASE_PLAN: ["envgym/plan.txt"],
+    PHASE_ADJUST: ["envgym/plan.txt"],
+}
+STEP_ARTIFACTS = {
+    STEP_WRITE: ["envgym/envgym.dockerfile"],
+    STEP_RUN: ["envgym/log.txt"],
+    STEP_SUMMARIZE: ["envgym/next.txt"],
+    STEP_UPDATE: ["envgym/history.txt"],
+    STEP_CONTROL: [],
+}
+
+
+def file_digest(path: str) -> Optional[str]:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        return None
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+class RunJournal:
+    """Records completed phases and iteration steps so an interrupted run can resume"""
+
+    def __init__(self, path: str = STATE_PATH, fresh: bool = False):
+        self.path = path
+        state = None if fresh else self._load()
+        self.resumed = state is not None and self._has_progress(state)
+        if self.resumed:
+            self.state = state
+            self.state["resumes"] = int(state.get("resumes", 0)) + 1
+            self.state["resumed_at"] = _now()
+        else:
+            self.state = {
+                "version": STATE_VERSION,
+                "started_at": _now(),
+                "start_time": time.time(),
+                "resumes": 0,
+                "phases": {},
+                "iterations": {},
+                "last_completed_iteration": 0,
+                "finished": None
+            }
+        self.save()
+
+    # ---- persistence ----
+
+    def _load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            return None
+        return state
+
+    @staticmethod
+    def _has_progress(state: Dict) -> bool:
+        # A finished run has nothing left to resume; running again starts a new attempt
+        return not state.get("finished") and bool(state.get("phases") or state.get("iterations"))
+
+    def save(self):
+        """Write the journal atomically and flush it to disk, so a crash or reboot never leaves half a file"""
+        self.state["updated_at"] = _now()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # ---- setup phases ----
+
+    def phase_done(self, name: str) -> bool:
+        phase = self.state["phases"].get(name)
+        return phase is not None and all(os.path.exists(path) for path in phase["artifacts"])
+
+    def complete_phase(self, name: str):
+        self.state["phases"][name] = {
+            "completed_at": _now(),
+            "artifacts": {path: file_digest(path) for path in PHASE_ARTIFACTS.get(name, [])}
+        }
+        self.save()
+
+    # ---- iterations ----
+
+    @property
+    def start_time(self) -> float:
+        """Start of the run; set when agent.py first picks up a run prepared by batch mode"""
+        if not self.state.get("start_time"):
+            self.state["start_time"] = time.time()
+            self.save()
+        return float(self.state["start_time"])
+
+    @property
+    def next_iteration(self) -> int:
+        """First iteration with a step left to do"""
+        return int(self.state.get("last_completed_iteration", 0)) + 1
+
+    def step_done(self, iteration: int, step: str) -> bool:
+        steps = self.state["iterations"].get(str(iteration), {}).get("steps", {})
+        record = steps.get(step)
+        return record is not None and all(os.path.exists(path) for path in record["artifacts"])
+
+    def complete_step(self, iteration: int, step: str):
+        entry = self.state["iterations"].setdefault(str(iteration), {"steps": {}})
+        entry["steps"][step] = {
+            "completed_at": _now(),
+            "artifacts": {path: file_digest(path) for path in STEP_ARTIFACTS.get(step, [])}
+        }
+        if step == ITERATION_STEPS[-1]:
+            entry["completed_at"] = _now()
+            self.state["last_completed_iteration"] = max(iteration, self.next_iteration - 1)
+        self.save()
+
+    def changed_artifacts(self) -> List[str]:
+        """Files modified since the journal last recorded them (edited by hand between runs)"""
+        latest: Dict[str, Optional[str]] = {}
+        records = list(self.state["phases"].values())
+        for iteration in sorted(self.state["iterations"], key=int):
+            steps = self.state["iterations"][iteration]["steps"]
+            records.extend(steps[step] for step in ITERATION_STEPS if step in steps)
+        for record in sorted(records, key=lambda item: item["completed_at"]):
+            latest.update(record["artifacts"])
+        return [path for path, digest in latest.items() if file_digest(path) != digest]
+
+    # ---- completion ----
+
+    @property
+    def finished(self) -> Optional[Dict]:
+        return self.state.get("finished")
+
+    def finish(self, reason: str):
+        self.state["finished"] = {"reason": reason, "at": _now(),
+                                  "iterations": self.state.get("last_completed_iteration", 0)}
+        self.save()
+
+    def describe(self) -> str:
+        """One-line summary of where a resumed run picks up"""
+        phases = [name for name in (PHASE_SCAN, PHASE_HARDWARE, PHASE_PLAN, PHASE_ADJUST) if self.phase_done(name)]
+        iteration = self.next_iteration
+        steps = [step for step in ITERATION_STEPS if self.step_done(iteration, step)]
+        position = f"iteration {iteration}" + (f" after step {steps[-1]}" if steps else "")
+        return (f"resuming run started at {self.state.get('started_at')} "
+                f"(completed phases: {', '.join(phases) or 'none'}; continuing at {position})")
+
+
+__all__ = ['RunJournal', 'file_digest', 'STATE_PATH', 'ITERATION_STEPS',
+           'PHASE_SCAN', 'PHASE_HARDWARE', 'PHASE_PLAN', 'PHASE_ADJUST',
+           'STEP_WRITE', 'STEP_RUN', 'STEP_SUMMARIZE', 'STEP_UPDATE', 'STEP_CONTROL']
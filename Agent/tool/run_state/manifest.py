@@ -0,0 +1,247 @@
+"""
+Run manifest: skip repositories whose last successful run used the same inputs.
+The fingerprint covers the repository (git HEAD plus uncommitted changes, or a
+tree hash when the directory is not its own git checkout), the model settings,
+the prompt templates and the agent's own source. A finished run writes
+envgym/manifest.json and appends a record (with the successful Dockerfile) to a
+manifest shared by all repositories of a sweep, so a re-sweep only spends time on
+repositories that changed. A matching success is reused: from envgym/ when it is
+still there, else by restoring the recorded Dockerfile.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+AGENT_DIR = Path(__file__).parent.parent.parent
+DEFAULT_SHARED_PATH = AGENT_DIR.parent / "data" / "run_manifest.jsonl"
+MANIFEST_PATH = "envgym/manifest.json"
+DOCKERFILE_PATH = "envgym/envgym.dockerfile"
+STATUS_PATH = "envgym/status.txt"
+
+# Settings that change what the agent produces
+MODEL_SETTINGS = ["MODEL", "FALLBACK_MODEL", "AI_TEMPERATURE", "SYSTEM_LANGUAGE", "FUSED_REVISION", "RETRIEVAL_TOP_K",
+                  "MANIFEST_DETECTOR", "TEST_CLASSIFIER"]
+# Directories never part of the repository fingerprint
+IGNORED_DIRS = {"envgym", ".git", "__pycache__", "node_modules", ".venv", "target"}
+MAX_HASHED_FILE_SIZE = 1024 * 1024
+
+
+def shared_manifest_path() -> Path:
+    """Shared manifest location (RUN_MANIFEST_PATH overrides)"""
+    return Path(os.getenv("RUN_MANIFEST_PATH") or DEFAULT_SHARED_PATH)
+
+
+def _load_env():
+    possible_env_paths = [
+        AGENT_DIR / '.env',  # EnvGym/.env
+        AGENT_DIR.parent / '.env',  # parent of EnvGym
+        Path.cwd() / '.env',  # Current working directory
+    ]
+    for env_path in possible_env_paths:
+        if env_path.exists():
+            load_dotenv(env_path)
+            break
+
+
+def _git(root: Path, *args: str) -> Optional[str]:
+    try:
+        result = subprocess.run(["git", *args], cwd=root, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _hash_files(paths: List[Path], base: Path) -> str:
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(str(path.relative_to(base)).encode())
+        try:
+            size = path.stat().st_size
+            if size <= MAX_HASHED_FILE_SIZE:
+                digest.update(path.read_bytes())
+            else:
+                # Large data files: size and mtime are enough to notice a change
+                digest.update(f"{size}:{int(path.stat().st_mtime)}".encode())
+        except OSError:
+            continue
+    return digest.hexdigest()[:16]
+
+
+def repo_fingerprint(root: str = ".") -> Dict[str, str]:
+    """HEAD and working-tree changes of the repository's own checkout, else a hash of its files"""
+    root_path = Path(root).resolve()
+    toplevel = _git(root_path, "rev-parse", "--show-toplevel")
+    # A repository cloned without .git sits inside the EnvGym checkout; its HEAD says nothing
+    if toplevel and Path(toplevel.strip()).resolve() == root_path:
+        head = (_git(root_path, "rev-parse", "HEAD") or "").strip()
+        changes = _git(root_path, "status", "--porcelain", "--", ".", ":(exclude)envgym") or ""
+        diff = (_git(root_path, "diff", "HEAD", "--", ".", ":(exclude)envgym") or "") if changes else ""
+        if head:
+            dirty = hashlib.sha256((changes + diff).encode()).hexdigest()[:16] if changes else None
+            return {"kind": "git", "head": head, "dirty": dirty}
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root_path):
+        dirnames[:] = [name for name in dirnames if name not in IGNORED_DIRS]
+        files.extend(Path(dirpath) / name for name in filenames)
+    return {"kind": "tree", "tree": _hash_files(files, root_path)}
+
+
+def model_settings() -> Dict[str, str]:
+    """Model configuration, including per-tool routes (MODEL_<TOOL>, MODEL_LIGHT, ...) that are set"""
+    names = set(MODEL_SETTINGS) | {name for name in os.environ if name.startswith("MODEL_") and os.environ[name].strip()}
+    return {name: os.getenv(name, "").strip().strip('"').strip("'") for name in sorted(names)}
+
+
+def pipeline_fingerprint() -> Dict[str, str]:
+    """Prompt templates and agent source (tests excluded)"""
+    prompts = list((AGENT_DIR / "prompt").glob("*.py"))
+    sources = [path for path in AGENT_DIR.rglob("*.py")
+               if "prompt" not in path.relative_to(AGENT_DIR).parts[:1]
+               and not path.name.startswith(("test_", "quick_test"))
+               and "__pycache__" not in path.parts]
+    return {"prompts": _hash_files(prompts, AGENT_DIR), "tools": _hash_files(sources, AGENT_DIR)}
+
+
+class RunManifest:
+    """Fingerprint of the current repository and pipeline, and the runs recorded for it"""
+
+    def __init__(self, root: str = ".", shared_path: Optional[Path] = None):
+        _load_env()
+        self.root = Path(root)
+        self.repo = self.root.resolve().name
+        self.shared_path = Path(shared_path or shared_manifest_path())
+        self.components = {
+            "repo": repo_fingerprint(root),
+            "model": model_settings(),
+            **pipeline_fingerprint()
+        }
+        self.fingerprint = hashlib.sha256(
+            json.dumps(self.components, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _local(self) -> Optional[Dict]:
+        try:
+            with open(self.root / MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _shared(self) -> List[Dict]:
+        records = []
+        try:
+            with open(self.shared_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        except OSError:
+            pass
+        return [item for item in records if item.get("repo") == self.repo]
+
+    def _status_success(self) -> bool:
+        try:
+            with open(self.root / STATUS_PATH, 'r', encoding='utf-8') as f:
+                return "SUCCESS" in f.read()
+        except OSError:
+            return False
+
+    def previous_success(self) -> Optional[Dict]:
+        """
+        A successful run with the same fingerprint
+
+        Returns:
+            dict: the run record with "source": "local" (results still in envgym/) or "shared", or None
+        """
+        local = self._local()
+        if local and local.get("fingerprint") == self.fingerprint and local.get("success") and self._status_success():
+            return {**local, "source": "local"}
+        for record in reversed(self._shared()):
+            if record.get("fingerprint") == self.fingerprint and record.get("success") and record.get("dockerfile"):
+                return {**record, "source": "shared"}
+        return None
+
+    def reuse(self, record: Dict) -> bool:
+        """Restore the Dockerfile and status of a matching successful run into envgym/"""
+        if record.get("source") == "local":
+            return True
+        try:
+            (self.root / "envgym").mkdir(exist_ok=True)
+            (self.root / DOCKERFILE_PATH).write_text(record["dockerfile"], encoding='utf-8')
+            (self.root / STATUS_PATH).write_text("SUCCESS\n", encoding='utf-8')
+            self._write_local({**self._entry(True, "reused"), "reused_from": record.get("timestamp")})
+            return True
+        except OSError as e:
+            print(f"Warning: could not restore the previous result: {e}")
+            return False
+
+    def _entry(self, success: bool, reason: str) -> Dict:
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "repo": self.repo,
+            "fingerprint": self.fingerprint,
+            "components": self.components,
+            "success": success,
+            "reason": reason
+        }
+
+    def _write_local(self, entry: Dict):
+        (self.root / "envgym").mkdir(exist_ok=True)
+        with open(self.root / MANIFEST_PATH, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2, ensure_ascii=False)
+
+    def record(self, success: bool, reason: str):
+        """Record a finished run locally and in the shared manifest; failures to record never affect the run"""
+        entry = self._entry(success, reason)
+        if success:
+            try:
+                entry["dockerfile"] = (self.root / DOCKERFILE_PATH).read_text(encoding='utf-8')
+            except OSError:
+                pass
+        try:
+            self._write_local({key: value for key, value in entry.items() if key != "dockerfile"})
+            self.shared_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.shared_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Warning: could not record the run manifest: {e}")
+
+
+__all__ = ['RunManifest', 'repo_fingerprint', 'pipeline_fingerprint', 'shared_manifest_path']
+
+
+def main():
+    """Command line entry for sweep scripts"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check whether a repository is unchanged since its last successful run "
+                                                 "(exit status 0: skip it)")
+    parser.add_argument("action", choices=["check", "show"])
+    parser.add_argument("path", nargs="?", default=".", help="Repository directory")
+    args = parser.parse_args()
+
+    manifest = RunManifest(args.path)
+    if args.action == "show":
+        print(json.dumps({"repo": manifest.repo, "fingerprint": manifest.fingerprint,
+                          "components": manifest.components}, indent=2))
+        return 0
+    previous = manifest.previous_success()
+    # A match found only in the shared manifest is restored into envgym/ so the skipped repository has its result
+    if previous is None or not manifest.reuse(previous):
+        print(f"{manifest.repo}: no successful run with fingerprint {manifest.fingerprint}")
+        return 1
+    print(f"{manifest.repo}: unchanged since the successful run of {previous.get('timestamp')} "
+          f"(fingerprint {manifest.fingerprint}, {previous['source']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
@@ -12,6 +12,50 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.llm.entry import chat_completion_stream
+from tool.llm.stream import JSONArrayStreamValidator
+from tool.llm.structured import structured_completion, repair_answer, parse_structured, StructuredOutputError, FILE_LIST_SCHEMA
+from tool.scanning.manifests import detect_manifests, rankable_candidates, format_candidates, MAX_DIRECT_DOCUMENTS
+from prompt.template import PromptTemplate
+from prompt.scanning import scanning_instruction
+
+SCANNING_TEMPLATE = PromptTemplate(
+    instructions=scanning_instruction + """
+Please analyze the directory structure provided below and return ONLY a JSON array containing the relative paths of files that help with environment configuration. Please rank the files by importance. The format should be exactly like this(they are just examples):
+
+[
+  "README.md",
+  "Dockerfile", 
+  "requirements.txt",
+  "package.json"
+]
+""",
+    sections=[
+        ("directory_tree", None),
+        ("format_note", None),
+    ],
+    closing="IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or markdown formatting."
+)
+
+RANKING_TEMPLATE = PromptTemplate(
+    instructions="""
+The candidate files listed below were found by matching well-known README, manifest, build, container, toolchain and CI file names in the repository.
+Select the files that help with configuring the environment of this repository and rank them by importance, most important first. Prefer the root README and the manifests of the main project; leave out files of examples, tests and unrelated subprojects.
+Only use paths from the candidate list. Return ONLY a JSON array of the selected relative paths.
+""",
+    sections=[
+        ("reason", "The repository needs ranking because:"),
+        ("candidates", "Candidate files (path, kind, ecosystem):"),
+    ],
+    closing="IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or markdown formatting."
+)
+
+
+def manifest_detector_enabled() -> bool:
+    """MANIFEST_DETECTOR in the environment; the local detector is used unless explicitly disabled"""
+    return os.getenv("MANIFEST_DETECTOR", "true").strip('"').strip("'").lower() not in ("0", "false", "no", "off")
+
+
 class ScanningTool:
     def __init__(self, verbose: bool = False, use_json_tree: bool = True, max_depth: int = None):
         """Initialize scanning tool"""
@@ -78,7 +122,8 @@ class ScanningTool:
         # Initialize OpenAI client
         self.client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0  # retries happen once, in limited_call(), under the shared rate limit
         )
         
         # Configuration settings
@@ -173,10 +218,8 @@ class ScanningTool:
         tree_data = build_tree(current_dir)
         return json.dumps(tree_data, indent=2, ensure_ascii=False)
     
-    def scan_for_documents(self, directory_tree: str, is_json_format: bool = False) -> List[str]:
-        """Use AI to scan for configuration and documentation files"""
-        from prompt.scanning import scanning_instruction
-        
+    def build_scan_messages(self, directory_tree: str, is_json_format: bool = False) -> List[Dict[str, str]]:
+        """Chat messages asking the model for the environment configuration files of the tree"""
         if is_json_format:
             tree_description = "Here is the directory tree structure in JSON format:"
             format_note = "The directory structure is provided in JSON format with 'name', 'type', 'path', and 'children' fields."
@@ -184,54 +227,70 @@ class ScanningTool:
             tree_description = "Here is the directory tree structure of the current working directory:"
             format_note = "The directory structure is provided in traditional tree format."
         
-        prompt = f"""{tree_description}
-
-{directory_tree}
-
-{format_note}
-
-{scanning_instruction}
-
-Please analyze this directory structure and return ONLY a JSON array containing the relative paths of files that help with environment configuration. Please rank the files by importance. The format should be exactly like this(they are just examples):
-
-[
-  "README.md",
-  "Dockerfile", 
-  "requirements.txt",
-  "package.json"
-]
-
-IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or markdown formatting.
-"""
-        
         # Prepare system message based on language setting
         if self.system_language.lower() in ['chinese', 'zh', '中文']:
             system_msg = "You are a professional codebase scanning assistant who can identify environment configuration related files. Return only JSON format file list, no other content."
         else:
             system_msg = "You are a professional codebase scanning assistant who can identify environment configuration related files. Return only JSON format file list, no other content."
         
+        return SCANNING_TEMPLATE.messages(system_msg, directory_tree=f"{tree_description}\n\n{directory_tree}",
+                                          format_note=format_note)
+    
+    def scan_for_documents(self, directory_tree: str, is_json_format: bool = False) -> List[str]:
+        """Use AI to scan for configuration and documentation files"""
+        messages = self.build_scan_messages(directory_tree, is_json_format)
+        
         if self.verbose:
-            print("\n" + "="*60)
-            print("AI Interaction Details")
-            print("="*60)
-            print("\nSystem Message:")
-            print(f"'{system_msg}'")
-            print("\nUser Prompt:")
-            print(f"'{prompt}'")
             print("\nSending request to AI...")
             print(f"Model: {self.model}")
             print(f"Temperature: {self.temperature}")
-            
-        response = self.client.chat.completions.create(
+        
+        # Validate the JSON array while it streams; a malformed answer is cut off at the first bad token
+        validator = JSONArrayStreamValidator(
+            on_item=(lambda item: print(f"  streamed: {item}")) if self.verbose else None
+        )
+        response = chat_completion_stream(
+            self.client,
+            "scanning",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=self.temperature
+            messages=messages,
+            temperature=self.temperature,
+            on_delta=validator.feed
         )
         
-        response_content = response.choices[0].message.content.strip()
+        if validator.complete:
+            if self.verbose:
+                print(f"\nStreamed JSON array validated, found {len(validator.items)} files")
+            return validator.items
+        
+        try:
+            if response.choices[0].finish_reason != "stop_early":
+                # The whole answer arrived (streaming off, or cut off by the token limit): repair it
+                documents = repair_answer(self.client, "scanning", self.model,
+                                          response.choices[0].message.content or "", FILE_LIST_SCHEMA,
+                                          temperature=self.temperature)["files"]
+            else:
+                # The stream was stopped at the first bad token: ask again for schema-constrained output
+                print(f"Streamed response is not a JSON array ({validator.error}), asking again...")
+                documents = structured_completion(
+                    self.client,
+                    "scanning",
+                    model=self.model,
+                    messages=messages,
+                    schema=FILE_LIST_SCHEMA,
+                    name="file_list",
+                    temperature=self.temperature
+                )["files"]
+        except StructuredOutputError as e:
+            print(f"JSON parsing error: {e}")
+            return []
+        if self.verbose:
+            print(f"Successfully parsed JSON, found {len(documents)} files")
+        return documents
+    
+    def parse_documents(self, response_content: str) -> List[str]:
+        """Parse the model's answer into the file list, repairing fences, prose and truncation; empty when unusable"""
+        response_content = (response_content or "").strip()
         
         if self.verbose:
             print("\nAI Response:")
@@ -239,32 +298,74 @@ IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or mark
             print("\nParsing response...")
             print("="*60)
         
-        # Try to parse the JSON response
         try:
-            # Remove any potential markdown formatting
-            if response_content.startswith('```'):
-                if self.verbose:
-                    print("Detected markdown formatting, cleaning...")
-                lines = response_content.split('\n')
-                response_content = '\n'.join(lines[1:-1])
-                if self.verbose:
-                    print(f"Cleaned content: '{response_content}'")
-            
-            documents = json.loads(response_content)
-            if isinstance(documents, list):
-                if self.verbose:
-                    print(f"Successfully parsed JSON, found {len(documents)} files")
-                    for i, doc in enumerate(documents, 1):
-                        print(f"  {i}. {doc}")
-                return documents
-            else:
-                raise ValueError("Response is not a list")
-                
-        except json.JSONDecodeError as e:
+            documents = parse_structured(response_content, FILE_LIST_SCHEMA)["files"]
+        except StructuredOutputError as e:
             print(f"JSON parsing error: {e}")
             if self.verbose:
                 print(f"Original AI response: '{response_content}'")
             return []
+        
+        if self.verbose:
+            print(f"Successfully parsed JSON, found {len(documents)} files")
+            for i, doc in enumerate(documents, 1):
+                print(f"  {i}. {doc}")
+        return documents
+    
+    def prepare_scan(self) -> Dict:
+        """
+        Decide how the repository is scanned
+
+        Returns:
+            dict: "documents" when the manifest detector settles the scan without the model, else the chat
+                  "messages" to send and the "candidates" the answer is restricted to (None for a full tree scan)
+        """
+        detection = None
+        if manifest_detector_enabled():
+            detection = detect_manifests(".")
+            if detection["unambiguous"]:
+                return {"documents": detection["documents"], "detection": detection}
+            if rankable_candidates(detection):
+                messages = self.build_rank_messages(detection)
+                return {"messages": messages, "candidates": detection["documents"], "detection": detection}
+        
+        tree_format = "json" if self.use_json_tree else "text"
+        directory_tree = self.get_directory_tree(max_depth=self.max_depth, output_format=tree_format)
+        return {"messages": self.build_scan_messages(directory_tree, self.use_json_tree), "candidates": None,
+                "directory_tree": directory_tree, "detection": detection}
+    
+    def build_rank_messages(self, detection: Dict) -> List[Dict[str, str]]:
+        """Chat messages asking the model to rank the detector's candidates (instead of reading the whole tree)"""
+        system_msg = "You are a professional codebase scanning assistant who can identify environment configuration related files. Return only JSON format file list, no other content."
+        return RANKING_TEMPLATE.messages(system_msg, reason=detection["reason"], candidates=format_candidates(detection))
+    
+    def select_candidates(self, documents: List[str], scan: Dict) -> List[str]:
+        """Keep the ranked answer's paths that are detector candidates; the detector's order when none are"""
+        allowed = {item["path"] for item in rankable_candidates(scan["detection"])}
+        selected = []
+        for path in documents:
+            path = path.strip()
+            path = path[2:] if path.startswith("./") else path
+            if path in allowed and path not in selected:
+                selected.append(path)
+        return selected or scan["candidates"][:MAX_DIRECT_DOCUMENTS]
+    
+    def rank_candidates(self, scan: Dict) -> List[str]:
+        """Ask the model to rank the detector's candidates"""
+        try:
+            documents = structured_completion(
+                self.client,
+                "scanning",
+                model=self.model,
+                messages=scan["messages"],
+                schema=FILE_LIST_SCHEMA,
+                name="file_list",
+                temperature=self.temperature
+            )["files"]
+        except StructuredOutputError as e:
+            print(f"JSON parsing error: {e}, using the detector's ranking")
+            documents = []
+        return self.select_candidates(documents, scan)
     
     def save_documents(self, documents: List[str]):
         """Save document list to envgym/documents.json"""
@@ -283,20 +384,32 @@ IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or mark
                 print(f"JSON tree format: {self.use_json_tree}")
                 print(f"Current working directory: {os.getcwd()}")
             
-            # Get directory tree in specified format
-            tree_format = "json" if self.use_json_tree else "text"
-            directory_tree = self.get_directory_tree(max_depth=self.max_depth, output_format=tree_format)
-            print(f"Directory tree generated successfully ({'JSON' if self.use_json_tree else 'text'} format, max depth: {self.max_depth if self.max_depth != 99 else 'unlimited'})")
-            
-            if self.verbose:
-                print(f"\nDirectory tree structure ({'JSON' if self.use_json_tree else 'text'} format):")
-                print("-" * 40)
-                print(directory_tree)
-                print("-" * 40)
-            
-            # Ask AI to identify configuration files
-            print("Requesting AI to identify environment configuration files...")
-            documents = self.scan_for_documents(directory_tree, self.use_json_tree)
+            scan = self.prepare_scan()
+            detection = scan.get("detection")
+            if "documents" in scan:
+                # Unambiguous repository: the detector's ranking is the answer, no LLM call
+                print(f"Manifest detector: {detection['reason']} ({', '.join(detection['ecosystems']) or 'no ecosystem'}), "
+                      f"no AI request needed")
+                documents = scan["documents"]
+            elif scan["candidates"] is not None:
+                print(f"Manifest detector: {detection['reason']}, "
+                      f"requesting AI to rank {len(rankable_candidates(detection))} candidate files...")
+                documents = self.rank_candidates(scan)
+            else:
+                if detection:
+                    print(f"Manifest detector: {detection['reason']}, scanning the whole tree")
+                directory_tree = scan["directory_tree"]
+                print(f"Directory tree generated successfully ({'JSON' if self.use_json_tree else 'text'} format, max depth: {self.max_depth if self.max_depth != 99 else 'unlimited'})")
+                
+                if self.verbose:
+                    print(f"\nDirectory tree structure ({'JSON' if self.use_json_tree else 'text'} format):")
+                    print("-" * 40)
+                    print(directory_tree)
+                    print("-" * 40)
+                
+                # Ask AI to identify configuration files
+                print("Requesting AI to identify environment configuration files...")
+                documents = self.scan_for_documents(directory_tree, self.use_json_tree)
             
             if not documents:
                 print("No configuration files found or AI response parsing error")
@@ -0,0 +1,268 @@
+"""
+Local manifest detector for the scanning step.
+Most repositories announce their environment through a handful of well-known
+files: a README, a package manifest, a toolchain pin, a Dockerfile, a CI
+workflow. detect_manifests() walks the top levels of the repository, matches a
+ranked catalogue of those names per ecosystem and decides whether the result is
+unambiguous (a root README and root manifest, not a monorepo), in which case the
+ranked list becomes documents.json without any LLM call. Otherwise only the short
+candidate list, not the whole tree, is sent to the model for ranking.
+"""
+
+import fnmatch
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+KIND_README = "readme"
+KIND_DOCS = "docs"
+KIND_MANIFEST = "manifest"
+KIND_BUILD = "build"
+KIND_CONTAINER = "container"
+KIND_TOOLCHAIN = "toolchain"
+KIND_CI = "ci"
+KIND_LOCKFILE = "lockfile"
+
+# (pattern, kind, ecosystem, weight); patterns with a "/" match the relative path, others the file name
+CATALOGUE = [
+    ("README", KIND_README, None, 100),
+    ("README.*", KIND_README, None, 100),
+    ("INSTALL*", KIND_DOCS, None, 70),
+    ("BUILDING*", KIND_DOCS, None, 70),
+    ("CONTRIBUTING*", KIND_DOCS, None, 45),
+    ("docs/install*", KIND_DOCS, None, 60),
+    ("docs/*getting*started*", KIND_DOCS, None, 55),
+    ("doc/install*", KIND_DOCS, None, 60),
+
+    ("Dockerfile", KIND_CONTAINER, None, 86),
+    ("Dockerfile.*", KIND_CONTAINER, None, 80),
+    ("*.dockerfile", KIND_CONTAINER, None, 80),
+    ("docker-compose*.yml", KIND_CONTAINER, None, 70),
+    ("docker-compose*.yaml", KIND_CONTAINER, None, 70),
+    ("compose.yml", KIND_CONTAINER, None, 70),
+    ("compose.yaml", KIND_CONTAINER, None, 70),
+    (".devcontainer/devcontainer.json", KIND_CONTAINER, None, 75),
+    ("flake.nix", KIND_CONTAINER, "nix", 60),
+    ("shell.nix", KIND_CONTAINER, "nix", 60),
+
+    ("pyproject.toml", KIND_MANIFEST, "python", 90),
+    ("setup.py", KIND_MANIFEST, "python", 88),
+    ("requirements*.txt", KIND_MANIFEST, "python", 87),
+    ("environment.yml", KIND_MANIFEST, "python", 85),
+    ("environment.yaml", KIND_MANIFEST, "python", 85),
+    ("setup.cfg", KIND_MANIFEST, "python", 78),
+    ("Pipfile", KIND_MANIFEST, "python", 80),
+    ("tox.ini", KIND_BUILD, "python", 45),
+    (".python-version", KIND_TOOLCHAIN, "python", 70),
+    ("runtime.txt", KIND_TOOLCHAIN, "python", 55),
+    ("poetry.lock", KIND_LOCKFILE, "python", 20),
+    ("Pipfile.lock", KIND_LOCKFILE, "python", 20),
+    ("uv.lock", KIND_LOCKFILE, "python", 20),
+    ("pdm.lock", KIND_LOCKFILE, "python", 20),
+
+    ("package.json", KIND_MANIFEST, "node", 90),
+    (".nvmrc", KIND_TOOLCHAIN, "node", 70),
+    (".node-version", KIND_TOOLCHAIN, "node", 70),
+    ("package-lock.json", KIND_LOCKFILE, "node", 20),
+    ("yarn.lock", KIND_LOCKFILE, "node", 20),
+    ("pnpm-lock.yaml", KIND_LOCKFILE, "node", 20),
+
+    ("Cargo.toml", KIND_MANIFEST, "rust", 90),
+    ("rust-toolchain", KIND_TOOLCHAIN, "rust", 75),
+    ("rust-toolchain.toml", KIND_TOOLCHAIN, "rust", 75),
+    ("Cargo.lock", KIND_LOCKFILE, "rust", 20),
+
+    ("go.mod", KIND_MANIFEST, "go", 90),
+    ("go.work", KIND_MANIFEST, "go", 70),
+    ("go.sum", KIND_LOCKFILE, "go", 20),
+
+    ("pom.xml", KIND_MANIFEST, "java", 90),
+    ("build.gradle", KIND_MANIFEST, "java", 90),
+    ("build.gradle.kts", KIND_MANIFEST, "java", 90),
+    ("settings.gradle", KIND_BUILD, "java", 60),
+    ("settings.gradle.kts", KIND_BUILD, "java", 60),
+    ("gradle/wrapper/gradle-wrapper.properties", KIND_TOOLCHAIN, "java", 65),
+    (".java-version", KIND_TOOLCHAIN, "java", 60),
+    (".sdkmanrc", KIND_TOOLCHAIN, "java", 60),
+    ("gradle.lockfile", KIND_LOCKFILE, "java", 20),
+
+    ("CMakeLists.txt", KIND_MANIFEST, "cpp", 88),
+    ("meson.build", KIND_MANIFEST, "cpp", 85),
+    ("configure.ac", KIND_MANIFEST, "cpp", 80),
+    ("conanfile.txt", KIND_MANIFEST, "cpp", 80),
+    ("conanfile.py", KIND_MANIFEST, "cpp", 80),
+    ("vcpkg.json", KIND_MANIFEST, "cpp", 80),
+    ("MODULE.bazel", KIND_MANIFEST, "cpp", 75),
+    ("WORKSPACE", KIND_MANIFEST, "cpp", 70),
+    ("WORKSPACE.bazel", KIND_MANIFEST, "cpp", 70),
+    (".bazelversion", KIND_TOOLCHAIN, "cpp", 60),
+    ("Makefile", KIND_BUILD, "cpp", 72),
+    ("GNUmakefile", KIND_BUILD, "cpp", 72),
+
+    ("Gemfile", KIND_MANIFEST, "ruby", 90),
+    ("*.gemspec", KIND_MANIFEST, "ruby", 75),
+    (".ruby-version", KIND_TOOLCHAIN, "ruby", 70),
+    ("Gemfile.lock", KIND_LOCKFILE, "ruby", 20),
+
+    ("composer.json", KIND_MANIFEST, "php", 90),
+    ("composer.lock", KIND_LOCKFILE, "php", 20),
+
+    ("*.csproj", KIND_MANIFEST, "dotnet", 85),
+    ("*.sln", KIND_MANIFEST, "dotnet", 80),
+    ("global.json", KIND_TOOLCHAIN, "dotnet", 65),
+    ("packages.lock.json", KIND_LOCKFILE, "dotnet", 20),
+
+    ("mix.exs", KIND_MANIFEST, "elixir", 90),
+    ("mix.lock", KIND_LOCKFILE, "elixir", 20),
+    ("stack.yaml", KIND_MANIFEST, "haskell", 85),
+    ("*.cabal", KIND_MANIFEST, "haskell", 85),
+    ("Package.swift", KIND_MANIFEST, "swift", 90),
+    ("pubspec.yaml", KIND_MANIFEST, "dart", 90),
+    ("Project.toml", KIND_MANIFEST, "julia", 85),
+    ("build.sbt", KIND_MANIFEST, "scala", 90),
+
+    (".tool-versions", KIND_TOOLCHAIN, None, 70),
+    (".mise.toml", KIND_TOOLCHAIN, None, 70),
+    ("install*.sh", KIND_BUILD, None, 55),
+    ("build.sh", KIND_BUILD, None, 55),
+    ("bootstrap.sh", KIND_BUILD, None, 55),
+    ("setup.sh", KIND_BUILD, None, 55),
+
+    (".github/workflows/*.yml", KIND_CI, None, 50),
+    (".github/workflows/*.yaml", KIND_CI, None, 50),
+    (".gitlab-ci.yml", KIND_CI, None, 50),
+    (".travis.yml", KIND_CI, None, 50),
+    (".circleci/config.yml", KIND_CI, None, 48),
+    ("azure-pipelines.yml", KIND_CI, None, 45),
+    ("appveyor.yml", KIND_CI, None, 45),
+    ("Jenkinsfile", KIND_CI, None, 45),
+]
+
+# Kinds that describe how to build the repository (a root one makes the scan unambiguous)
+BUILD_KINDS = {KIND_MANIFEST, KIND_BUILD, KIND_CONTAINER}
+# Lockfiles identify the ecosystem but are not planning input: large, and derived from the manifest
+DOCUMENT_KINDS = {KIND_README, KIND_DOCS, KIND_MANIFEST, KIND_BUILD, KIND_CONTAINER, KIND_TOOLCHAIN, KIND_CI}
+
+IGNORED_DIRS = {"envgym", ".git", "node_modules", "vendor", "__pycache__", ".venv", "venv", "target", "dist",
+                "build", ".tox", ".mypy_cache", "testdata", "fixtures", "__fixtures__", "site-packages"}
+# Projects under these directories are samples of the main project, not part of its environment
+SAMPLE_DIRS = {"examples", "example", "samples", "sample", "demo", "demos", "tests", "test", "benchmarks", "docs"}
+# Hidden directories that hold configuration worth reading
+HIDDEN_DIRS = {".github", ".circleci", ".devcontainer"}
+
+MAX_DEPTH = 3
+DEPTH_PENALTY = 15
+MAX_CI_FILES = 2
+MAX_DIRECT_DOCUMENTS = 12
+MAX_MANIFEST_DIRS = 3
+MAX_CANDIDATES = 40
+
+
+def match_catalogue(relative_path: str) -> Optional[Dict]:
+    """Catalogue entry for a repository-relative path (first match wins)"""
+    name = relative_path.rsplit("/", 1)[-1]
+    for pattern, kind, ecosystem, weight in CATALOGUE:
+        target = relative_path if "/" in pattern else name
+        # README and docs names vary in case; manifest names are exact
+        if kind in (KIND_README, KIND_DOCS):
+            matched = fnmatch.fnmatch(target.lower(), pattern.lower())
+        else:
+            matched = fnmatch.fnmatchcase(target, pattern)
+        if matched:
+            return {"kind": kind, "ecosystem": ecosystem, "weight": weight, "anchored": "/" in pattern}
+    return None
+
+
+def _parent(relative_path: str) -> str:
+    return relative_path.rsplit("/", 1)[0] if "/" in relative_path else "."
+
+
+def _walk(root: Path, max_depth: int):
+    """Repository-relative file paths up to max_depth directories deep"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = Path(dirpath).relative_to(root)
+        depth = len(relative_dir.parts)
+        dirnames[:] = sorted(name for name in dirnames
+                             if name not in IGNORED_DIRS and (not name.startswith(".") or name in HIDDEN_DIRS)
+                             and depth < max_depth)
+        for name in sorted(filenames):
+            yield (relative_dir / name).as_posix()
+
+
+def detect_manifests(root: str = ".", max_depth: int = MAX_DEPTH) -> Dict:
+    """
+    Match the repository's files against the catalogue
+
+    Returns:
+        dict: candidates (ranked [{"path", "kind", "ecosystem", "score", "sample"}]), documents (ranked paths
+              worth planning from, without samples and lockfiles), ecosystems, unambiguous, reason
+    """
+    root_path = Path(root)
+    matches = [(path, entry) for path, entry in ((path, match_catalogue(path)) for path in _walk(root_path, max_depth))
+               if entry is not None]
+    project_dirs = {_parent(path) for path, entry in matches if entry["kind"] in (KIND_MANIFEST, KIND_CONTAINER)}
+
+    candidates = []
+    for path, entry in matches:
+        # Patterns with a directory (CI workflows, docs/, the Gradle wrapper) sit below the root by convention
+        depth = 0 if entry["anchored"] else path.count("/")
+        # A nested README, Makefile or toolchain pin only matters for a nested project
+        if depth and entry["kind"] not in (KIND_MANIFEST, KIND_CONTAINER) and _parent(path) not in project_dirs:
+            continue
+        candidates.append({"path": path, "kind": entry["kind"], "ecosystem": entry["ecosystem"],
+                           "score": entry["weight"] - DEPTH_PENALTY * depth,
+                           "sample": not entry["anchored"] and bool(SAMPLE_DIRS & set(path.split("/")[:-1]))})
+    candidates.sort(key=lambda item: (-item["score"], item["path"].count("/"), item["path"]))
+
+    documents, ci_files = [], 0
+    for item in candidates:
+        if item["kind"] not in DOCUMENT_KINDS or item["sample"]:
+            continue
+        if item["kind"] == KIND_CI:
+            ci_files += 1
+            if ci_files > MAX_CI_FILES:
+                continue
+        documents.append(item["path"])
+
+    ecosystems = sorted({item["ecosystem"] for item in candidates if item["ecosystem"]})
+    root_readme = any(item["kind"] == KIND_README and "/" not in item["path"] for item in candidates)
+    root_build = any(item["kind"] in BUILD_KINDS and "/" not in item["path"] for item in candidates)
+    manifest_dirs = {_parent(item["path"]) for item in candidates if item["kind"] == KIND_MANIFEST and not item["sample"]}
+
+    if not candidates:
+        reason = "no known configuration files"
+    elif not root_readme:
+        reason = "no README at the repository root"
+    elif not root_build:
+        reason = "no manifest or build file at the repository root"
+    elif len(manifest_dirs) > MAX_MANIFEST_DIRS:
+        reason = f"manifests in {len(manifest_dirs)} directories (monorepo)"
+    elif len(documents) > MAX_DIRECT_DOCUMENTS:
+        reason = f"{len(documents)} candidate files"
+    else:
+        reason = None
+
+    return {
+        "candidates": candidates[:MAX_CANDIDATES],
+        "documents": documents,
+        "ecosystems": ecosystems,
+        "unambiguous": reason is None,
+        "reason": reason or "root README and manifest"
+    }
+
+
+def rankable_candidates(detection: Dict) -> List[Dict]:
+    """Candidates the model may choose from when ranking (no lockfiles)"""
+    return [item for item in detection["candidates"] if item["kind"] in DOCUMENT_KINDS]
+
+
+def format_candidates(detection: Dict) -> str:
+    """Candidate list for the ranking prompt, one "path (kind, ecosystem)" per line"""
+    lines = []
+    for item in rankable_candidates(detection):
+        label = item["kind"] + (f", {item['ecosystem']}" if item["ecosystem"] else "")
+        lines.append(f"{item['path']} ({label})")
+    return "\n".join(lines)
+
+
+__all__ = ['detect_manifests', 'match_catalogue', 'rankable_candidates', 'format_candidates', 'CATALOGUE', 'MAX_CANDIDATES']
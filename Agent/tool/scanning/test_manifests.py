@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the manifest detector: catalogue matching, ranking and the unambiguous / monorepo decision
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add Agent directory to path
+agent_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(agent_dir))
+
+from tool.scanning.manifests import detect_manifests, match_catalogue, format_candidates
+
+
+def make_files(root: Path, paths):
+    for path in paths:
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text("")
+
+
+def test_catalogue():
+    """Names map to kinds and ecosystems; README matching ignores case, manifests do not"""
+    print("=== Catalogue ===")
+    assert match_catalogue("readme.rst")["kind"] == "readme"
+    assert match_catalogue("Cargo.toml")["ecosystem"] == "rust"
+    assert match_catalogue("cargo.toml") is None
+    assert match_catalogue("requirements-dev.txt")["ecosystem"] == "python"
+    assert match_catalogue(".github/workflows/ci.yml")["kind"] == "ci"
+    assert match_catalogue("yarn.lock")["kind"] == "lockfile"
+    assert match_catalogue("src/main.c") is None
+    print("Catalogue test passed")
+
+
+def test_single_project():
+    """A root README and manifest settle the scan without the model"""
+    print("\n=== Single project ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_files(root, ["README.md", "go.mod", "go.sum", "Dockerfile", ".github/workflows/a.yml",
+                          ".github/workflows/b.yml", ".github/workflows/c.yml", "cmd/tool/README.md",
+                          "examples/demo/go.mod", "node_modules/x/package.json", "envgym/plan.txt"])
+        detection = detect_manifests(tmp)
+        print(detection["reason"], detection["documents"])
+        assert detection["unambiguous"]
+        assert detection["documents"][:3] == ["README.md", "go.mod", "Dockerfile"]
+        assert "go.sum" not in detection["documents"], "lockfiles are not planning input"
+        assert "examples/demo/go.mod" not in detection["documents"]
+        assert "cmd/tool/README.md" not in detection["documents"], "README of a directory without a manifest"
+        assert len([path for path in detection["documents"] if path.startswith(".github")]) == 2
+        assert not any("node_modules" in item["path"] for item in detection["candidates"])
+        assert detection["ecosystems"] == ["go"]
+    print("Single project test passed")
+
+
+def test_ambiguous():
+    """Monorepos and repositories without a root manifest go to the model as a short candidate list"""
+    print("\n=== Ambiguous repositories ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_files(root, ["README.md", "package.json"] +
+                   [f"packages/{name}/{file}" for name in "abcd" for file in ("package.json", "README.md")])
+        detection = detect_manifests(tmp)
+        print(detection["reason"])
+        assert not detection["unambiguous"] and "monorepo" in detection["reason"]
+        listing = format_candidates(detection)
+        print(listing)
+        assert "packages/a/package.json (manifest, node)" in listing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_files(Path(tmp), ["README.md", "src/main.c"])
+        detection = detect_manifests(tmp)
+        assert not detection["unambiguous"] and detection["reason"] == "no manifest or build file at the repository root"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_files(Path(tmp), ["src/main.c"])
+        detection = detect_manifests(tmp)
+        assert not detection["candidates"] and detection["reason"] == "no known configuration files"
+    print("Ambiguous repositories test passed")
+
+
+if __name__ == "__main__":
+    test_catalogue()
+    test_single_project()
+    test_ambiguous()
+    print("\nAll manifest detector tests passed")
@@ -12,6 +12,9 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.stats.usage import load_usage_records, aggregate_usage
+from tool.llm.routing import summarize_routes
+
 class StatsTool:
     def __init__(self, verbose: bool = False):
         self.verbose = verbose
@@ -95,59 +98,6 @@ class StatsTool:
             print(f"Unexpected error getting API stats: {str(e)}")
             return None
     
-    def get_all_paginated_stats(self, session_start: str, session_end: str) -> Optional[List[Dict[str, Any]]]:
-        """获取指定时间范围内的统计数据"""
-        try:
-            if not self.api_key:
-                print("Error: FORGE_API_KEY not available")
-                return None
-            
-            # 使用新的API接口获取指定时间范围的统计数据
-            base_url = self.base_url.rstrip('/')
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            # 设置查询参数，与curl命令完全一致
-            params = {
-                "provider_name": self.provider,
-                "model_name": self.model,
-                "started_at": session_start,
-                "ended_at": session_end,
-                "limit": 2000
-            }
-            
-            if self.verbose:
-                print(f"Requesting data with params: {params}")
-            
-            response = requests.get(
-                f"{base_url}/statistic/usage/realtime",
-                headers=headers,
-                params=params,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                all_data = response.json()
-                if self.verbose:
-                    print(f"Retrieved {len(all_data)} total records")
-                return all_data
-            else:
-                print(f"Error getting data: HTTP {response.status_code}")
-                print(f"Response: {response.text}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
-            print(f"Network error getting paginated stats: {str(e)}")
-            return None
-        except json.JSONDecodeError as e:
-            print(f"Error parsing paginated API response: {str(e)}")
-            return None
-        except Exception as e:
-            print(f"Unexpected error getting paginated stats: {str(e)}")
-            return None
-    
     def load_existing_stats(self) -> Dict[str, Any]:
         """加载现有的统计文件"""
         if os.path.exists(self.stats_file):
@@ -247,7 +197,7 @@ class StatsTool:
             print(f"Starting from: 0 tokens, $0.000000")
     
     def record_session_end(self):
-        """记录会话结束时的统计信息"""
+        """记录会话结束时的统计信息（根据本地 usage.jsonl 聚合）"""
         print("Recording session end stats...")
         
         stats_data = self.load_existing_stats()
@@ -259,50 +209,64 @@ class StatsTool:
             print("Warning: No session start time found, using current time")
             session_start = current_time
         
-        # 获取会话时间范围内的所有分页数据
-        all_session_data = self.get_all_paginated_stats(session_start, current_time)
+        # 读取会话期间每次调用记录的用量
+        records = load_usage_records(since=session_start)
         
         stats_data["session_end"] = current_time
         
-        if all_session_data:
-            # 聚合会话时间范围内的所有数据
-            total_input_tokens = sum(item.get("input_tokens", 0) for item in all_session_data)
-            total_output_tokens = sum(item.get("output_tokens", 0) for item in all_session_data)
-            total_tokens = sum(item.get("tokens", 0) for item in all_session_data)
-            total_cost = sum(float(item.get("cost", 0)) for item in all_session_data)
-            requests_count = len(all_session_data)
+        if records:
+            usage = aggregate_usage(records)
+            totals = usage["totals"]
             
-            # 创建聚合统计
+            # 创建聚合统计，字段与原先的 API 统计保持一致
             session_stats = {
                 "provider_name": self.provider,
                 "model": self.model,
-                "input_tokens": total_input_tokens,
-                "output_tokens": total_output_tokens,
-                "total_tokens": total_tokens,
-                "requests_count": requests_count,
-                "cost": total_cost
+                "input_tokens": totals["input_tokens"],
+                "output_tokens": totals["output_tokens"],
+                "total_tokens": totals["total_tokens"],
+                "cached_tokens": totals["cached_tokens"],
+                "cache_hit_ratio": totals["cache_hit_ratio"],
+                "requests_count": totals["requests_count"],
+                "cost": totals["cost"]
             }
             
             stats_data["end_stats"] = [session_stats]
             stats_data["usage_delta"] = session_stats
+            stats_data["usage_by_tool"] = usage["by_tool"]
+            stats_data["usage_by_iteration"] = usage["by_iteration"]
+            stats_data["usage_by_route"] = summarize_routes(records)
             
             print(f"Session usage summary (from {session_start} to {current_time}):")
-            print(f"  - Total requests: {requests_count}")
-            print(f"  - Input tokens: {total_input_tokens:,}")
-            print(f"  - Output tokens: {total_output_tokens:,}")
-            print(f"  - Total tokens: {total_tokens:,}")
-            print(f"  - Cost: ${total_cost:.6f}")
+            print(f"  - Total requests: {totals['requests_count']}")
+            print(f"  - Input tokens: {totals['input_tokens']:,}")
+            print(f"  - Output tokens: {totals['output_tokens']:,}")
+            print(f"  - Total tokens: {totals['total_tokens']:,}")
+            print(f"  - Cached input tokens: {totals['cached_tokens']:,} ({totals['cache_hit_ratio']:.1%} cache hit)")
+            print(f"  - Cost: ${totals['cost']:.6f}")
+            
+            if self.verbose:
+                print("Usage by tool:")
+                for tool_name, tool_usage in usage["by_tool"].items():
+                    print(f"  - {tool_name}: {tool_usage['requests_count']} requests, "
+                          f"{tool_usage['total_tokens']:,} tokens, {tool_usage['cache_hit_ratio']:.1%} cache hit, "
+                          f"${tool_usage['cost']:.6f}")
+                print("Usage by route:")
+                for route_name, route_usage in stats_data["usage_by_route"].items():
+                    print(f"  - {route_name}: {route_usage['requests']} requests, {route_usage['errors']} failed, "
+                          f"avg {route_usage['avg_latency']:.1f}s, {route_usage['total_tokens']:,} tokens")
         else:
             stats_data["end_stats"] = []
             stats_data["usage_delta"] = None
+            stats_data["usage_by_tool"] = {}
+            stats_data["usage_by_iteration"] = {}
+            stats_data["usage_by_route"] = {}
             print("No usage data found for session time range")
         
         self.save_stats(stats_data)
         
         if self.verbose:
             print(f"Session end recorded at: {current_time}")
-            if all_session_data:
-                print(f"Session total usage: {sum(item.get('tokens', 0) for item in all_session_data):,} tokens, ${sum(float(item.get('cost', 0)) for item in all_session_data):.6f}")
     
     def run(self, action: str = "check"):
         """执行统计工具
@@ -0,0 +1,56 @@
+"""
+模型价格表，供本地成本计算和 data/ 下的统计脚本共用
+"""
+
+from typing import Dict, Optional, Tuple
+
+# Pricing dictionary for different providers and models ($ / 1M tokens)
+PRICING = {
+    "Azure": {
+        "gpt-4.1": {
+            "input": 2.00,  # $2.00 / 1M tokens
+            "cached_input": 0.50,  # $0.50 / 1M tokens
+            "output": 8.00  # $8.00 / 1M tokens
+        }
+    },
+    "OpenAI": {
+        "gpt-4.1": {
+            "input": 2.00,  # $2.00 / 1M tokens
+            "cached_input": 0.50,  # $0.50 / 1M tokens
+            "output": 8.00  # $8.00 / 1M tokens
+        },
+        "gpt-4.1-mini": {
+            "input": 0.40,  # $0.40 / 1M tokens
+            "cached_input": 0.10,  # $0.10 / 1M tokens
+            "output": 1.60  # $1.60 / 1M tokens
+        }
+    }
+}
+
+
+def split_model(model_config: str, default_provider: str = "OpenAI") -> Tuple[str, str]:
+    """把 "OpenAI/gpt-4.1" 拆成 (provider, model)"""
+    model_config = (model_config or "").strip('"').strip("'")
+    if '/' in model_config:
+        provider, model = model_config.split('/', 1)
+        return provider, model
+    return default_provider, model_config
+
+
+def get_pricing(provider: str, model: str) -> Optional[Dict[str, float]]:
+    """查找价格，未知模型返回 None"""
+    return PRICING.get(provider, {}).get(model)
+
+
+def calculate_cost(provider: str, model: str, input_tokens: int, output_tokens: int,
+                   cached_tokens: int = 0) -> float:
+    """按价格表计算成本（美元），缓存命中的输入 token 按 cached_input 计价，未知模型返回 0.0"""
+    pricing = get_pricing(provider, model)
+    if not pricing:
+        return 0.0
+    cached_tokens = min(cached_tokens, input_tokens)
+    uncached_tokens = input_tokens - cached_tokens
+    cost = (uncached_tokens / 1000000) * pricing["input"]
+    cost += (cached_tokens / 1000000) * pricing.get("cached_input", pricing["input"])
+    cost += (output_tokens / 1000000) * pricing["output"]
+    return cost
@@ -0,0 +1,182 @@
+"""
+本地 token / 成本记账
+每次 chat.completions 调用后把 response.usage 追加到 envgym/usage.jsonl，
+会话结束时由 StatsTool 按工具和迭代聚合，不再依赖 Forge 的分页统计接口。
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+try:
+    from .pricing import split_model, calculate_cost
+except ImportError:
+    from pricing import split_model, calculate_cost
+
+USAGE_FILE = "envgym/usage.jsonl"
+SETUP_ITERATION = "setup"
+
+# 当前迭代编号，由 agent.py 在每轮开始时设置；进入循环前的调用记为 "setup"
+_current_iteration: Optional[int] = None
+
+
+def set_iteration(iteration: Optional[int]):
+    """设置后续 LLM 调用所属的迭代编号"""
+    global _current_iteration
+    _current_iteration = iteration
+
+
+def get_iteration() -> Optional[int]:
+    """返回当前迭代编号"""
+    return _current_iteration
+
+
+def _usage_value(usage: Any, key: str) -> Any:
+    """兼容 openai 的 usage 对象和普通 dict"""
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get(key)
+    return getattr(usage, key, None)
+
+
+def extract_usage(response: Any) -> Dict[str, int]:
+    """从 chat.completions 响应中提取 token 数"""
+    usage = _usage_value(response, "usage")
+    input_tokens = _usage_value(usage, "prompt_tokens") or 0
+    output_tokens = _usage_value(usage, "completion_tokens") or 0
+    total_tokens = _usage_value(usage, "total_tokens") or (input_tokens + output_tokens)
+    details = _usage_value(usage, "prompt_tokens_details")
+    # OpenAI 兼容接口放在 prompt_tokens_details.cached_tokens，部分网关（DeepSeek、Anthropic 兼容层）用顶层字段
+    cached_tokens = (_usage_value(details, "cached_tokens")
+                     or _usage_value(usage, "prompt_cache_hit_tokens")
+                     or _usage_value(usage, "cache_read_input_tokens")
+                     or 0)
+    return {
+        "input_tokens": int(input_tokens),
+        "output_tokens": int(output_tokens),
+        "total_tokens": int(total_tokens),
+        "cached_tokens": int(cached_tokens)
+    }
+
+
+def record_usage(tool: str, model: str, response: Any, latency: float = 0.0,
+                 usage_file: str = USAGE_FILE, route: str = "default", fallback: bool = False,
+                 error: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """把一次调用的用量追加到 usage.jsonl，记账失败不影响主流程
+
+    route 为模型路由名，fallback 表示主模型失败后改用的模型，error 为失败调用的错误信息（response 为 None）
+    """
+    try:
+        provider, model_name = split_model(model)
+        tokens = extract_usage(response)
+        iteration = _current_iteration if _current_iteration is not None else SETUP_ITERATION
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "tool": tool,
+            "iteration": iteration,
+            "provider_name": provider,
+            "model": model_name,
+            **tokens,
+            "latency": round(latency, 3),
+            "cost": calculate_cost(provider, model_name, tokens["input_tokens"],
+                                   tokens["output_tokens"], tokens["cached_tokens"]),
+            "route": route,
+            "fallback": fallback
+        }
+        if error:
+            record["error"] = error[:200]
+
+        os.makedirs(os.path.dirname(usage_file), exist_ok=True)
+        with open(usage_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+    except Exception as e:
+        print(f"Warning: Could not record LLM usage: {str(e)}")
+        return None
+
+
+def load_usage_records(since: Optional[str] = None, usage_file: str = USAGE_FILE) -> List[Dict[str, Any]]:
+    """读取 usage.jsonl，since 为 ISO 时间时只保留之后的记录"""
+    if not os.path.exists(usage_file):
+        return []
+
+    since_time = None
+    if since:
+        try:
+            since_time = datetime.fromisoformat(since)
+        except ValueError:
+            since_time = None
+
+    records = []
+    with open(usage_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since_time is not None:
+                try:
+                    if datetime.fromisoformat(record.get("timestamp", "")) < since_time:
+                        continue
+                except ValueError:
+                    continue
+            records.append(record)
+    return records
+
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "cached_tokens": 0,
+        "requests_count": 0,
+        "cost": 0.0
+    }
+
+
+def _add_record(bucket: Dict[str, Any], record: Dict[str, Any]):
+    for key in ("input_tokens", "output_tokens", "total_tokens", "cached_tokens"):
+        bucket[key] += int(record.get(key, 0))
+    bucket["requests_count"] += 1
+    bucket["cost"] += float(record.get("cost", 0.0))
+
+
+def cache_hit_ratio(bucket: Dict[str, Any]) -> float:
+    """输入 token 中命中提供方前缀缓存的比例"""
+    input_tokens = int(bucket.get("input_tokens", 0))
+    return round(int(bucket.get("cached_tokens", 0)) / input_tokens, 4) if input_tokens else 0.0
+
+
+def aggregate_usage(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总总量、按工具和按迭代的用量，每组附带缓存命中率"""
+    totals = _empty_bucket()
+    by_tool: Dict[str, Dict[str, Any]] = {}
+    by_iteration: Dict[str, Dict[str, Any]] = {}
+
+    for record in records:
+        _add_record(totals, record)
+        _add_record(by_tool.setdefault(str(record.get("tool", "unknown")), _empty_bucket()), record)
+        _add_record(by_iteration.setdefault(str(record.get("iteration", SETUP_ITERATION)), _empty_bucket()), record)
+
+    # setup 排在最前，其余按迭代编号排序
+    def iteration_key(key: str):
+        return (0, 0) if key == SETUP_ITERATION else (1, int(key) if key.isdigit() else 0)
+
+    for bucket in [totals, *by_tool.values(), *by_iteration.values()]:
+        bucket["cache_hit_ratio"] = cache_hit_ratio(bucket)
+
+    return {
+        "totals": totals,
+        "by_tool": dict(sorted(by_tool.items())),
+        "by_iteration": {key: by_iteration[key] for key in sorted(by_iteration, key=iteration_key)}
+    }
+
+
+__all__ = ['set_iteration', 'get_iteration', 'extract_usage', 'record_usage',
+           'load_usage_records', 'aggregate_usage', 'cache_hit_ratio', 'USAGE_FILE']
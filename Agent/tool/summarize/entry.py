@@ -11,6 +11,26 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.llm.entry import chat_completion
+from prompt.template import PromptTemplate
+
+SUMMARY_TEMPLATE = PromptTemplate(
+    instructions="""
+Please summarize the current progress and the next steps for modifying the dockerfile, based on the plan, the current dockerfile and the Docker execution result log provided below.
+
+Format:
+current progress
+
+next step
+""",
+    sections=[
+        ("plan_content", "This is the complete plan:"),
+        ("dockerfile_content", "This is the current dockerfile:"),
+        ("log_content", "This is the previous Docker execution result log:"),
+    ],
+    closing="IMPORTANT: Return ONLY the summary in the specified format, no additional text or explanations."
+)
+
 class SummarizeTool:
     def __init__(self, verbose: bool = False):
         self.verbose = verbose
@@ -73,7 +93,8 @@ class SummarizeTool:
         # Initialize OpenAI client
         self.client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0  # retries happen once, in limited_call(), under the shared rate limit
         )
         
         # Configuration settings
@@ -131,39 +152,28 @@ class SummarizeTool:
     def generate_summary(self, plan_content: str, log_content: str, dockerfile_content: str) -> str:
         """Generate progress summary and next steps using AI"""
         
-        prompt = f"""This is the complete plan:
-{plan_content}
-
-This is the previous Docker execution result log:
-{log_content}
-
-This is the current dockerfile:
-{dockerfile_content}
-
-Please summarize the current progress and the next steps for modifying the dockerfile.
-
-Format:
-current progress
-
-next step
-
-IMPORTANT: Return ONLY the summary in the specified format, no additional text or explanations."""
-        
         # Prepare system message based on language setting
         if self.system_language.lower() in ['chinese', 'zh', '中文']:
             system_msg = "你是一个专业的项目进度分析师，能够根据计划、日志和配置文件分析当前进展并提出下一步行动建议。按照指定格式返回内容。"
         else:
             system_msg = "You are a professional project progress analyst who can analyze current progress based on plans, logs, and configuration files, and provide next step recommendations. Return content in the specified format."
         
+        messages = SUMMARY_TEMPLATE.messages(
+            system_msg,
+            plan_content=plan_content,
+            dockerfile_content=dockerfile_content,
+            log_content=log_content
+        )
+        
         if self.verbose:
             print("\n" + "="*80)
             print("AI Interaction Details - FULL CONVERSATION")
             print("="*80)
             print("\nSystem Message:")
-            print(system_msg)
+            print(messages[0]["content"])
             print("\n" + "-"*80)
             print("User Prompt (COMPLETE):")
-            print(prompt)
+            print(messages[1]["content"])
             print("\n" + "-"*80)
             print("Request Details:")
             print(f"Model: {self.model}")
@@ -171,12 +181,11 @@ IMPORTANT: Return ONLY the summary in the specified format, no additional text o
             print("Sending request to AI...")
             print("-"*80)
             
-        response = self.client.chat.completions.create(
+        response = chat_completion(
+            self.client,
+            "summarize",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
+            messages=messages,
             temperature=self.temperature
         )
         
@@ -0,0 +1,256 @@
+"""
+Local test-file classifier for the test scanning step.
+Test files follow the conventions of their language and build tool: tests/ and
+spec/ directories, *_test.go, src/test/java, *.spec.ts, Cargo's tests/, benches/
+and examples/ targets. classify_test_files() walks the repository once, applies
+those path conventions to source files and, for files whose name only hints at
+a test (check_*.py, run_example.sh), sniffs the first lines for a test framework
+import. Files that are still undecided are returned as leftovers, the only part
+that goes to the model.
+"""
+
+import fnmatch
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CATEGORY_UNIT = "unit_tests"
+CATEGORY_INTEGRATION = "integration_tests"
+CATEGORY_EXAMPLES = "examples"
+CATEGORY_BENCHMARKS = "benchmarks"
+CATEGORY_DEMOS = "demos"
+CATEGORY_OTHER = "other_tests"
+# Order of test.json: probes run the first files, so unit tests come before examples
+CATEGORIES = [CATEGORY_UNIT, CATEGORY_INTEGRATION, CATEGORY_EXAMPLES, CATEGORY_BENCHMARKS, CATEGORY_DEMOS,
+              CATEGORY_OTHER]
+
+# Files that can be run or compiled; images, data and docs under examples/ are not test files
+SOURCE_EXTENSIONS = {
+    ".py", ".ipynb", ".sh", ".bash", ".bats", ".js", ".mjs", ".cjs", ".jsx", ".ts", ".tsx", ".go", ".rs",
+    ".java", ".kt", ".kts", ".scala", ".groovy", ".c", ".cc", ".cpp", ".cxx", ".cu", ".rb", ".php", ".cs",
+    ".fs", ".swift", ".ex", ".exs", ".erl", ".hs", ".jl", ".r", ".lua", ".pl", ".dart", ".zig", ".nim"
+}
+
+# (file name pattern, category), checked in order; matched case-sensitively like the build tools do
+NAME_CONVENTIONS = [
+    ("*.e2e-spec.*", CATEGORY_INTEGRATION),
+    ("*.e2e.*", CATEGORY_INTEGRATION),
+    ("*IT.java", CATEGORY_INTEGRATION),
+    ("*IT.kt", CATEGORY_INTEGRATION),
+    ("*_bench.*", CATEGORY_BENCHMARKS),
+    ("bench_*", CATEGORY_BENCHMARKS),
+    ("*_benchmark.*", CATEGORY_BENCHMARKS),
+    ("benchmark_*", CATEGORY_BENCHMARKS),
+    ("test_*.py", CATEGORY_UNIT),
+    ("*_test.py", CATEGORY_UNIT),
+    ("*_tests.py", CATEGORY_UNIT),
+    ("*_test.go", CATEGORY_UNIT),
+    ("*.test.*", CATEGORY_UNIT),
+    ("*.spec.*", CATEGORY_UNIT),
+    ("*Test.java", CATEGORY_UNIT),
+    ("*Tests.java", CATEGORY_UNIT),
+    ("Test*.java", CATEGORY_UNIT),
+    ("*Test.kt", CATEGORY_UNIT),
+    ("*Spec.scala", CATEGORY_UNIT),
+    ("*Suite.scala", CATEGORY_UNIT),
+    ("*Test.scala", CATEGORY_UNIT),
+    ("*Spec.groovy", CATEGORY_UNIT),
+    ("*_spec.rb", CATEGORY_UNIT),
+    ("*_test.rb", CATEGORY_UNIT),
+    ("test_*.rb", CATEGORY_UNIT),
+    ("*Test.php", CATEGORY_UNIT),
+    ("*Tests.cs", CATEGORY_UNIT),
+    ("*Test.cs", CATEGORY_UNIT),
+    ("*Tests.swift", CATEGORY_UNIT),
+    ("*_test.exs", CATEGORY_UNIT),
+    ("*_test.dart", CATEGORY_UNIT),
+    ("*_test.c", CATEGORY_UNIT),
+    ("*_test.cc", CATEGORY_UNIT),
+    ("*_test.cpp", CATEGORY_UNIT),
+    ("*_unittest.cc", CATEGORY_UNIT),
+    ("*_unittest.cpp", CATEGORY_UNIT),
+    ("test_*.c", CATEGORY_UNIT),
+    ("test_*.cc", CATEGORY_UNIT),
+    ("test_*.cpp", CATEGORY_UNIT),
+    ("test_*.sh", CATEGORY_UNIT),
+    ("*_test.sh", CATEGORY_UNIT),
+    ("*.bats", CATEGORY_UNIT),
+]
+
+# Directory names (lowercase) whose source files are test files; the innermost match wins
+DIR_CONVENTIONS = {
+    "test": CATEGORY_UNIT, "tests": CATEGORY_UNIT, "__tests__": CATEGORY_UNIT, "spec": CATEGORY_UNIT,
+    "specs": CATEGORY_UNIT, "unittests": CATEGORY_UNIT, "unit_tests": CATEGORY_UNIT, "unit": CATEGORY_UNIT,
+    "integration": CATEGORY_INTEGRATION, "integration_tests": CATEGORY_INTEGRATION,
+    "integration-tests": CATEGORY_INTEGRATION, "it": CATEGORY_INTEGRATION, "e2e": CATEGORY_INTEGRATION,
+    "cypress": CATEGORY_INTEGRATION, "playwright": CATEGORY_INTEGRATION, "functional": CATEGORY_INTEGRATION,
+    "integrationtest": CATEGORY_INTEGRATION, "inttest": CATEGORY_INTEGRATION,
+    "bench": CATEGORY_BENCHMARKS, "benches": CATEGORY_BENCHMARKS, "benchmark": CATEGORY_BENCHMARKS,
+    "benchmarks": CATEGORY_BENCHMARKS, "jmh": CATEGORY_BENCHMARKS, "perf": CATEGORY_BENCHMARKS,
+    "example": CATEGORY_EXAMPLES, "examples": CATEGORY_EXAMPLES, "sample": CATEGORY_EXAMPLES,
+    "samples": CATEGORY_EXAMPLES, "tutorial": CATEGORY_EXAMPLES, "tutorials": CATEGORY_EXAMPLES,
+    "demo": CATEGORY_DEMOS, "demos": CATEGORY_DEMOS,
+}
+
+# Test framework imports and declarations in the first lines of a file
+HEADER_MARKERS = [
+    (re.compile(r"^\s*(import|from)\s+(pytest|unittest|nose2?|hypothesis)\b", re.M), CATEGORY_UNIT),
+    (re.compile(r"^\s*#include\s*[<\"](gtest|gmock|catch2?|doctest|boost/test|cppunit|check\.h|unity\.h|cmocka)", re.M),
+     CATEGORY_UNIT),
+    (re.compile(r"\bimport\s+(static\s+)?(org\.junit|org\.testng|io\.kotest|org\.scalatest|munit)\b"), CATEGORY_UNIT),
+    (re.compile(r"^\s*import\s+(\(\s*)?\"testing\"", re.M), CATEGORY_UNIT),
+    (re.compile(r"#\[(test|tokio::test)\]"), CATEGORY_UNIT),
+    (re.compile(r"#\[bench\]|\bcriterion_(group|main)!"), CATEGORY_BENCHMARKS),
+    (re.compile(r"\b(describe|it|test)\s*\(\s*['\"`]"), CATEGORY_UNIT),
+    (re.compile(r"require\s*\(?\s*['\"](minitest|rspec|test/unit)|\bRSpec\.describe\b"), CATEGORY_UNIT),
+    (re.compile(r"\bPHPUnit\\"), CATEGORY_UNIT),
+    (re.compile(r"\[(Fact|Theory|Test|TestMethod|TestFixture)\]"), CATEGORY_UNIT),
+    (re.compile(r"^\s*import\s+XCTest\b", re.M), CATEGORY_UNIT),
+    (re.compile(r"\bExUnit\.Case\b"), CATEGORY_UNIT),
+]
+# A hinted example or demo script is runnable when it has an entry point
+ENTRY_POINT = re.compile(r"if\s+__name__\s*==\s*['\"]__main__['\"]|^\s*func\s+main\s*\(|^\s*fn\s+main\s*\(|"
+                         r"\bint\s+main\s*\(|\bpublic\s+static\s+void\s+main\b|^#!", re.M)
+# Name or directory words that make a file worth a look (and, if still undecided, a question to the model)
+HINT_WORDS = re.compile(r"test|spec|check|verify|smoke|bench|example|sample|demo|tutorial")
+
+# Never test files, wherever they are
+EXCLUDED_NAMES = {"__init__.py", "conftest.py", "setup.py", "__main__.py"}
+IGNORED_DIRS = {"envgym", ".git", "node_modules", "vendor", "__pycache__", ".venv", "venv", "target", "dist",
+                "build", ".tox", ".mypy_cache", ".pytest_cache", "site-packages", "testdata", "fixtures",
+                "__fixtures__", "__snapshots__", "snapshots", "third_party", "3rdparty", "external", "deps"}
+
+HEADER_BYTES = 4096
+MAX_FILES = 100000
+MAX_LEFTOVERS = 200
+
+
+def keyword_category(relative_path: str) -> str:
+    """Category from keywords in the path, for files chosen without a convention (the model, the tree scan)"""
+    path = relative_path.lower()
+    if 'example' in path:
+        return CATEGORY_EXAMPLES
+    if 'demo' in path:
+        return CATEGORY_DEMOS
+    if 'benchmark' in path or 'bench' in path:
+        return CATEGORY_BENCHMARKS
+    if 'integration' in path:
+        return CATEGORY_INTEGRATION
+    if 'test' in path or 'spec' in path:
+        return CATEGORY_UNIT
+    return CATEGORY_OTHER
+
+
+def _source_extension(name: str) -> Optional[str]:
+    extension = os.path.splitext(name)[1].lower()
+    return extension if extension in SOURCE_EXTENSIONS else None
+
+
+def path_category(relative_path: str) -> Optional[str]:
+    """Category by naming convention: the innermost test directory and the file name"""
+    parts = relative_path.split("/")
+    name = parts[-1]
+    name_category = next((category for pattern, category in NAME_CONVENTIONS
+                          if fnmatch.fnmatchcase(name, pattern)), None)
+    dir_category = None
+    for directory in reversed(parts[:-1]):
+        dir_category = DIR_CONVENTIONS.get(directory.lower())
+        if dir_category:
+            # Cargo builds each file in a crate's tests/ directory as an integration test
+            if dir_category == CATEGORY_UNIT and directory == "tests" and name.endswith(".rs"):
+                dir_category = CATEGORY_INTEGRATION
+            break
+    # tests/integration/test_api.py is an integration test, examples/foo_test.go a unit test
+    if name_category == CATEGORY_UNIT and dir_category in (CATEGORY_INTEGRATION, CATEGORY_BENCHMARKS):
+        return dir_category
+    return name_category or dir_category
+
+
+def sniff_header(path: Path, relative_path: str) -> Optional[str]:
+    """Category from the first lines of the file: a test framework import, or an entry point of a hinted example"""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            header = f.read(HEADER_BYTES)
+    except OSError:
+        return None
+    for marker, category in HEADER_MARKERS:
+        if marker.search(header):
+            return category
+    category = keyword_category(relative_path)
+    if category in (CATEGORY_EXAMPLES, CATEGORY_DEMOS, CATEGORY_BENCHMARKS) and ENTRY_POINT.search(header):
+        return category
+    return None
+
+
+def _walk(root: Path):
+    """Repository-relative paths of source files, at most MAX_FILES files looked at"""
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames
+                             if name not in IGNORED_DIRS and not name.startswith("."))
+        relative_dir = Path(dirpath).relative_to(root)
+        for name in sorted(filenames):
+            count += 1
+            if count > MAX_FILES:
+                return
+            if _source_extension(name) and name not in EXCLUDED_NAMES:
+                yield (relative_dir / name).as_posix()
+
+
+def ordered_files(categories: Dict[str, List[str]]) -> List[str]:
+    """All files by category order, shallow paths first within a category"""
+    files, seen = [], set()
+    for category in CATEGORIES:
+        for path in sorted(categories.get(category, []), key=lambda item: (item.count("/"), item)):
+            if path not in seen:
+                files.append(path)
+                seen.add(path)
+    return files
+
+
+def add_files(categories: Dict[str, List[str]], files: List[str]) -> Dict[str, List[str]]:
+    """Categories with files chosen elsewhere added by keyword category (empty categories dropped)"""
+    merged = {category: list(categories.get(category, [])) for category in CATEGORIES}
+    known = {path for paths in merged.values() for path in paths}
+    for path in files:
+        if path not in known:
+            merged[keyword_category(path)].append(path)
+            known.add(path)
+    return {category: paths for category, paths in merged.items() if paths}
+
+
+def classify_test_files(root: str = ".") -> Dict:
+    """
+    Classify the repository's source files by test conventions
+
+    Returns:
+        dict: files (ordered test file paths), categories ({category: [paths]}), leftovers (hinted files
+              the conventions and headers could not decide, for the model), scanned (source files seen)
+    """
+    root_path = Path(root)
+    categories: Dict[str, List[str]] = {}
+    leftovers = []
+    scanned = 0
+    for relative_path in _walk(root_path):
+        scanned += 1
+        category = path_category(relative_path)
+        if category is None and HINT_WORDS.search(relative_path.lower()):
+            category = sniff_header(root_path / relative_path, relative_path)
+            if category is None:
+                leftovers.append(relative_path)
+                continue
+        if category:
+            categories.setdefault(category, []).append(relative_path)
+
+    categories = {category: categories[category] for category in CATEGORIES if category in categories}
+    return {
+        "files": ordered_files(categories),
+        "categories": categories,
+        "leftovers": leftovers,
+        "scanned": scanned
+    }
+
+
+__all__ = ['classify_test_files', 'path_category', 'sniff_header', 'keyword_category', 'add_files', 'ordered_files',
+           'CATEGORIES', 'MAX_LEFTOVERS']
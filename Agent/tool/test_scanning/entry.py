@@ -2,6 +2,7 @@ import json
 import os
 import sys
 import subprocess
+import time
 from pathlib import Path
 from typing import List, Dict
 from openai import OpenAI
@@ -13,6 +14,51 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.llm.structured import structured_completion, StructuredOutputError, FILE_LIST_SCHEMA
+from tool.test_scanning.classifier import (classify_test_files, add_files, ordered_files, keyword_category,
+                                           IGNORED_DIRS, MAX_LEFTOVERS)
+from prompt.template import PromptTemplate
+from prompt.test_scanning import test_scanning_instruction
+
+TEST_SCANNING_TEMPLATE = PromptTemplate(
+    instructions=test_scanning_instruction + """
+Please analyze the directory structure provided below and return ONLY a JSON array containing the relative paths of files that are clearly meant for testing the environment or functionality. The format should be exactly like this (they are just examples):
+
+[
+  "tests/test_example.py",
+  "test_script.py", 
+  "examples/demo.py",
+  "benchmark/test_performance.py"
+]
+""",
+    sections=[
+        ("directory_tree", "Here is the directory tree structure of the current working directory:"),
+    ],
+    closing="IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or markdown formatting."
+)
+
+LEFTOVER_TEMPLATE = PromptTemplate(
+    instructions=test_scanning_instruction + """
+The test files that follow the usual naming conventions have already been found. The candidate files listed below have names or directories that suggest testing, but neither their paths nor their first lines settle it.
+Select the candidates that are test, example, demo or benchmark files that can be run to verify the environment. Only use paths from the candidate list. Return ONLY a JSON array of the selected relative paths.
+""",
+    sections=[
+        ("found", "Test files already found (sample):"),
+        ("candidates", "Candidate files:"),
+    ],
+    closing="IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or markdown formatting."
+)
+
+# Lines of the directory tree sent by the full scan; the rest is summarised in one line
+MAX_TREE_LINES = 3000
+MAX_FOUND_SAMPLE = 20
+
+
+def test_classifier_enabled() -> bool:
+    """TEST_CLASSIFIER in the environment; the local classifier is used unless explicitly disabled"""
+    return os.getenv("TEST_CLASSIFIER", "true").strip('"').strip("'").lower() not in ("0", "false", "no", "off")
+
+
 class TestScanningTool:
     def __init__(self, verbose: bool = False):
         self.verbose = verbose
@@ -75,7 +121,8 @@ class TestScanningTool:
         # Initialize OpenAI client
         self.client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0  # retries happen once, in limited_call(), under the shared rate limit
         )
         
         # Configuration settings
@@ -91,13 +138,13 @@ class TestScanningTool:
             print(f"  - System Language: {self.system_language}")
     
     def get_directory_tree(self) -> str:
-        """Get directory tree structure using tree command or fallback to manual traversal"""
+        """Get directory tree structure using tree command or fallback to manual traversal (at most MAX_TREE_LINES lines)"""
         try:
-            # Try using tree command
-            result = subprocess.run(['tree', '-a', '-I', 'envgym'], 
+            # Try using tree command; dependency, build and VCS directories never hold the repository's tests
+            result = subprocess.run(['tree', '-a', '-I', '|'.join(sorted(IGNORED_DIRS))],
                                   capture_output=True, text=True, cwd='.')
             if result.returncode == 0:
-                return result.stdout
+                return self._truncate_tree(result.stdout.splitlines())
         except (subprocess.SubprocessError, FileNotFoundError):
             pass
         
@@ -106,11 +153,11 @@ class TestScanningTool:
         current_dir = Path('.')
         
         def walk_directory(path: Path, prefix: str = "", is_last: bool = True):
-            if path.name == 'envgym':
+            if path.name in IGNORED_DIRS or len(tree_lines) > MAX_TREE_LINES:
                 return
                 
             items = list(path.iterdir())
-            items = [item for item in items if item.name != 'envgym']
+            items = [item for item in items if item.name not in IGNORED_DIRS]
             items.sort(key=lambda x: (x.is_file(), x.name.lower()))
             
             for i, item in enumerate(items):
@@ -124,130 +171,118 @@ class TestScanningTool:
         
         tree_lines.append(str(current_dir.name))
         walk_directory(current_dir)
-        return "\n".join(tree_lines)
+        return self._truncate_tree(tree_lines)
+    
+    def _truncate_tree(self, tree_lines: List[str]) -> str:
+        if len(tree_lines) <= MAX_TREE_LINES:
+            return "\n".join(tree_lines)
+        return "\n".join(tree_lines[:MAX_TREE_LINES] + [f"... (tree truncated after {MAX_TREE_LINES} lines)"])
     
     def scan_for_test_files(self, directory_tree: str) -> List[str]:
         """Use AI to scan for test files"""
-        from prompt.test_scanning import test_scanning_instruction
-        
-        prompt = f"""Here is the directory tree structure of the current working directory:
-
-{directory_tree}
-
-{test_scanning_instruction}
-
-Please analyze this directory structure and return ONLY a JSON array containing the relative paths of files that are clearly meant for testing the environment or functionality. The format should be exactly like this (they are just examples):
-
-[
-  "tests/test_example.py",
-  "test_script.py", 
-  "examples/demo.py",
-  "benchmark/test_performance.py"
-]
-
-IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or markdown formatting.
-"""
-        
         # Prepare system message based on language setting
         if self.system_language.lower() in ['chinese', 'zh', '中文']:
             system_msg = "你是一个专业的代码库扫描助手，能够识别测试文件。仅返回JSON格式的文件列表，不要其他内容。"
         else:
             system_msg = "You are a professional codebase scanning assistant who can identify test files. Return only JSON format file list, no other content."
         
+        messages = TEST_SCANNING_TEMPLATE.messages(system_msg, directory_tree=directory_tree)
+        
         if self.verbose:
             print("\n" + "="*60)
             print("AI Interaction Details")
             print("="*60)
             print("\nSystem Message:")
-            print(f"'{system_msg}'")
+            print(f"'{messages[0]['content']}'")
             print("\nUser Prompt:")
-            print(f"'{prompt}'")
+            print(f"'{messages[1]['content']}'")
             print("\nSending request to AI...")
             print(f"Model: {self.model}")
             print(f"Temperature: {self.temperature}")
             
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=self.temperature
-        )
-        
-        response_content = response.choices[0].message.content.strip()
+        # Schema-constrained output where the endpoint supports it; malformed answers are repaired, not dropped
+        try:
+            test_files = structured_completion(
+                self.client,
+                "test_scanning",
+                model=self.model,
+                messages=messages,
+                schema=FILE_LIST_SCHEMA,
+                name="test_file_list",
+                temperature=self.temperature
+            )["files"]
+        except StructuredOutputError as e:
+            print(f"JSON parsing error: {e}")
+            return []
         
         if self.verbose:
-            print("\nAI Response:")
-            print(f"'{response_content}'")
-            print("\nParsing response...")
-            print("="*60)
-        
-        # Try to parse the JSON response
+            print(f"\nSuccessfully parsed JSON, found {len(test_files)} test files")
+            for i, test_file in enumerate(test_files, 1):
+                print(f"  {i}. {test_file}")
+        return test_files
+    
+    def classify_leftovers(self, leftovers: List[str], found: List[str]) -> List[str]:
+        """Ask the model which of the classifier's undecided candidates are test files"""
+        candidates = leftovers[:MAX_LEFTOVERS]
+        if self.system_language.lower() in ['chinese', 'zh', '中文']:
+            system_msg = "你是一个专业的代码库扫描助手，能够识别测试文件。仅返回JSON格式的文件列表，不要其他内容。"
+        else:
+            system_msg = "You are a professional codebase scanning assistant who can identify test files. Return only JSON format file list, no other content."
+
+        messages = LEFTOVER_TEMPLATE.messages(system_msg, found="\n".join(found[:MAX_FOUND_SAMPLE]),
+                                              candidates="\n".join(candidates))
+        if self.verbose:
+            print("\nUser Prompt:")
+            print(f"'{messages[1]['content']}'")
+
         try:
-            # Remove any potential markdown formatting
-            if response_content.startswith('```'):
-                if self.verbose:
-                    print("Detected markdown formatting, cleaning...")
-                lines = response_content.split('\n')
-                response_content = '\n'.join(lines[1:-1])
-                if self.verbose:
-                    print(f"Cleaned content: '{response_content}'")
-            
-            test_files = json.loads(response_content)
-            if isinstance(test_files, list):
-                if self.verbose:
-                    print(f"Successfully parsed JSON, found {len(test_files)} test files")
-                    for i, test_file in enumerate(test_files, 1):
-                        print(f"  {i}. {test_file}")
-                return test_files
-            else:
-                raise ValueError("Response is not a list")
-                
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {e}")
-            if self.verbose:
-                print(f"Original AI response: '{response_content}'")
+            selected = structured_completion(
+                self.client,
+                "test_scanning",
+                model=self.model,
+                messages=messages,
+                schema=FILE_LIST_SCHEMA,
+                name="test_file_list",
+                temperature=self.temperature
+            )["files"]
+        except StructuredOutputError as e:
+            print(f"JSON parsing error: {e}, keeping only the classified files")
             return []
+        allowed = set(candidates)
+        paths = [item.strip() for item in selected]
+        return [path for path in (path[2:] if path.startswith("./") else path for path in paths) if path in allowed]
     
-    def save_test_files(self, test_files: List[str]):
-        """Save test file list to envgym/test.json"""
+    def save_test_files(self, test_files: List[str], categories: Dict[str, List[str]] = None):
+        """Save test file list and its categories to envgym/test.json"""
         output_path = "envgym/test.json"
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Keep format consistent with documents.json - simple array
+        # {"files": [...], "categories": {...}}; readers of the old plain array use "files"
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(test_files, f, indent=2, ensure_ascii=False)
+            json.dump({"files": test_files, "categories": categories or self._categorize_test_files(test_files)},
+                      f, indent=2, ensure_ascii=False)
     
     def _categorize_test_files(self, test_files: List[str]) -> Dict[str, List[str]]:
         """Categorize test files by type"""
-        categories = {
-            "unit_tests": [],
-            "integration_tests": [],
-            "examples": [],
-            "benchmarks": [],
-            "demos": [],
-            "other_tests": []
-        }
-        
+        categories: Dict[str, List[str]] = {}
         for file_path in test_files:
-            file_lower = file_path.lower()
-            
-            if 'example' in file_lower or 'examples/' in file_lower:
-                categories["examples"].append(file_path)
-            elif 'demo' in file_lower or 'demos/' in file_lower:
-                categories["demos"].append(file_path)
-            elif 'benchmark' in file_lower or 'bench' in file_lower:
-                categories["benchmarks"].append(file_path)
-            elif 'integration' in file_lower:
-                categories["integration_tests"].append(file_path)
-            elif 'test' in file_lower or 'spec' in file_lower:
-                categories["unit_tests"].append(file_path)
-            else:
-                categories["other_tests"].append(file_path)
+            categories.setdefault(keyword_category(file_path), []).append(file_path)
+        return categories
+    
+    def scan_tree(self) -> List[str]:
+        """Send the directory tree to the model (no usable result from the classifier)"""
+        directory_tree = self.get_directory_tree()
+        print(f"Directory tree structure generated successfully")
+        
+        if self.verbose:
+            print("\nDirectory tree structure:")
+            print("-" * 40)
+            print(directory_tree)
+            print("-" * 40)
         
-        # Remove empty categories
-        return {k: v for k, v in categories.items() if v}
+        # Ask AI to identify test files
+        print("Requesting AI to identify test files...")
+        return self.scan_for_test_files(directory_tree)
     
     def run(self):
         """Execute test scanning tool"""
@@ -257,31 +292,40 @@ IMPORTANT: Return ONLY the JSON array, no additional text, explanations, or mark
                 print(f"Verbose mode enabled")
                 print(f"Current working directory: {os.getcwd()}")
             
-            # Get directory tree
-            directory_tree = self.get_directory_tree()
-            print(f"Directory tree structure generated successfully")
-            
-            if self.verbose:
-                print("\nDirectory tree structure:")
-                print("-" * 40)
-                print(directory_tree)
-                print("-" * 40)
-            
-            # Ask AI to identify test files
-            print("Requesting AI to identify test files...")
-            test_files = self.scan_for_test_files(directory_tree)
+            categories = None
+            if test_classifier_enabled():
+                started = time.perf_counter()
+                result = classify_test_files(".")
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                print(f"Test classifier: {len(result['files'])} test files among {result['scanned']} source files "
+                      f"({elapsed_ms:.0f} ms), {len(result['leftovers'])} undecided")
+                categories = result["categories"]
+                if result["leftovers"]:
+                    # Only the undecided files go to the model, not the directory tree
+                    shown = min(len(result["leftovers"]), MAX_LEFTOVERS)
+                    print(f"Requesting AI to classify {shown} undecided files...")
+                    categories = add_files(categories, self.classify_leftovers(result["leftovers"], result["files"]))
+                test_files = ordered_files(categories)
+                if not test_files and not result["leftovers"]:
+                    print("Test classifier found no test files, scanning the whole tree")
+                    test_files, categories = self.scan_tree(), None
+            else:
+                test_files = self.scan_tree()
             
             if not test_files:
                 print("No test files found or AI response parsing error")
                 return
             
             print(f"Found {len(test_files)} test files:")
-            for test_file in test_files:
-                print(f"  - {test_file}")
+            for category, paths in (categories or self._categorize_test_files(test_files)).items():
+                print(f"  {category}: {len(paths)}")
+            if self.verbose:
+                for test_file in test_files:
+                    print(f"  - {test_file}")
             
             # Save to envgym/test.json
             output_path = "envgym/test.json"
-            self.save_test_files(test_files)
+            self.save_test_files(test_files, categories)
             print(f"Test file list saved to {output_path}")
             
         except Exception as e:
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the local test-file classifier: path conventions per language, header sniffing and leftovers
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Add Agent directory to path
+agent_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(agent_dir))
+
+from tool.test_scanning.classifier import classify_test_files, path_category, add_files, ordered_files
+
+
+def make_files(root: Path, files):
+    for path, content in files.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(content)
+
+
+def test_path_conventions():
+    """File names and directories per language decide without reading the file"""
+    print("=== Path conventions ===")
+    cases = {
+        "pkg/server/handler_test.go": "unit_tests",
+        "src/test/java/org/app/ParserTest.java": "unit_tests",
+        "src/it/java/org/app/ServerIT.java": "integration_tests",
+        "web/src/button.spec.ts": "unit_tests",
+        "web/e2e/login.e2e-spec.ts": "integration_tests",
+        "lib/__tests__/util.js": "unit_tests",
+        "tests/cli.rs": "integration_tests",
+        "benches/parse.rs": "benchmarks",
+        "examples/simple.rs": "examples",
+        "tests/integration/test_api.py": "integration_tests",
+        "spec/models/user_spec.rb": "unit_tests",
+        "demo/app.py": "demos",
+        "src/main.py": None,
+    }
+    for path, expected in cases.items():
+        print(f"{path:45} -> {path_category(path)}")
+        assert path_category(path) == expected, path
+    print("Path conventions test passed")
+
+
+def test_classify_repository():
+    """Headers settle hinted files; undecided ones are left for the model; assets and vendored code are skipped"""
+    print("\n=== Repository classification ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        make_files(Path(tmp), {
+            "src/app.py": "print('app')\n",
+            "src/checker.py": "def check(x):\n    return x\n",
+            "tests/test_app.py": "import pytest\n",
+            "tests/__init__.py": "",
+            "check_env.py": "import unittest\n\nclass EnvTest(unittest.TestCase):\n    pass\n",
+            "scripts/run_example.sh": "#!/bin/bash\npython -m app\n",
+            "tools/smoke.c": "#include <stdio.h>\n",
+            "examples/demo.png": "",
+            "examples/basic.py": "print('hi')\n",
+            "node_modules/lib/index.test.js": "",
+            "envgym/test_plan.py": "",
+        })
+        result = classify_test_files(tmp)
+        print(result)
+        assert result["files"] == ["check_env.py", "tests/test_app.py", "examples/basic.py", "scripts/run_example.sh"]
+        assert sorted(result["categories"]["unit_tests"]) == ["check_env.py", "tests/test_app.py"]
+        assert result["categories"]["examples"] == ["examples/basic.py", "scripts/run_example.sh"]
+        assert result["leftovers"] == ["src/checker.py", "tools/smoke.c"]
+
+        categories = add_files(result["categories"], ["tools/smoke.c"])
+        assert categories["other_tests"] == ["tools/smoke.c"]
+        assert ordered_files(categories)[-1] == "tools/smoke.c"
+    print("Repository classification test passed")
+
+
+if __name__ == "__main__":
+    test_path_conventions()
+    test_classify_repository()
+    print("\nAll test classifier tests passed")
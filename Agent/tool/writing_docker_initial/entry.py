@@ -11,6 +11,24 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.llm.entry import chat_completion_stream
+from tool.dockerrun.prefetch import DockerfilePrefetcher, format_prefetch_report
+from tool.retrieval.entry import retrieve_similar_dockerfiles, format_examples_prompt
+from prompt.template import PromptTemplate
+
+INITIAL_TEMPLATE = PromptTemplate(
+    instructions="""
+Please write a detailed dockerfile to configure this repository based on the plan provided below.
+You should only return the dockerfile content, no other content.
+Please create a Dockerfile that, when built, puts me in a /bin/bash cli setting at the root of the repository, with the repository installed and ready to use.
+""",
+    sections=[
+        ("plan_content", "Here is a detailed plan:"),
+        ("examples", None),
+    ],
+    closing="IMPORTANT: Return ONLY the dockerfile content, no explanations, no markdown formatting, no additional text."
+)
+
 class WritingDockerInitialTool:
     def __init__(self, verbose: bool = False):
         self.verbose = verbose
@@ -73,7 +91,8 @@ class WritingDockerInitialTool:
         # Initialize OpenAI client
         self.client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0  # retries happen once, in limited_call(), under the shared rate limit
         )
         
         # Configuration settings
@@ -115,31 +134,28 @@ class WritingDockerInitialTool:
     def generate_dockerfile(self, plan_content: str) -> str:
         """Generate dockerfile content based on plan using AI"""
         
-        prompt = f"""Here is a detailed plan:
-{plan_content}
-
-Please write a detailed dockerfile to configure this repository based on the plan.
-You should only return the dockerfile content, no other content.
-Please create a Dockerfile that, when built, puts me in a /bin/bash cli setting at the root of the repository, with the repository installed and ready to use.
-IMPORTANT: 
-
-Return ONLY the dockerfile content, no explanations, no markdown formatting, no additional text."""
-        
         # Prepare system message based on language setting
         if self.system_language.lower() in ['chinese', 'zh', '中文']:
             system_msg = "你是一个专业的Docker配置专家，能够根据环境配置计划编写详细的Dockerfile。只返回Dockerfile内容，不要其他任何内容。"
         else:
             system_msg = "You are a professional Docker configuration expert who can write detailed Dockerfiles based on environment configuration plans. Return only the Dockerfile content, no other content."
         
+        # Few-shot: successful Dockerfiles of similar repositories from past sweeps
+        messages = INITIAL_TEMPLATE.messages(
+            system_msg,
+            plan_content=plan_content,
+            examples=format_examples_prompt(retrieve_similar_dockerfiles(verbose=self.verbose))
+        )
+        
         if self.verbose:
             print("\n" + "="*80)
             print("AI Interaction Details - FULL CONVERSATION")
             print("="*80)
             print("\nSystem Message:")
-            print(system_msg)
+            print(messages[0]["content"])
             print("\n" + "-"*80)
             print("User Prompt (COMPLETE):")
-            print(prompt)
+            print(messages[1]["content"])
             print("\n" + "-"*80)
             print("Request Details:")
             print(f"Model: {self.model}")
@@ -147,14 +163,17 @@ Return ONLY the dockerfile content, no explanations, no markdown formatting, no
             print("Sending request to AI...")
             print("-"*80)
             
-        response = self.client.chat.completions.create(
+        # Stream the answer so the base image pull and context hashing start before generation finishes
+        prefetcher = DockerfilePrefetcher(verbose=self.verbose)
+        response = chat_completion_stream(
+            self.client,
+            "writing_docker_initial",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=self.temperature
+            messages=messages,
+            temperature=self.temperature,
+            on_delta=prefetcher.feed
         )
+        print(format_prefetch_report(prefetcher.finish()))
         
         response_content = response.choices[0].message.content.strip()
         
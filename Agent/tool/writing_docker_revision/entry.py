@@ -12,6 +12,37 @@ agent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
 if agent_dir not in sys.path:
     sys.path.insert(0, agent_dir)
 
+from tool.llm.entry import chat_completion_stream
+from tool.dockerrun.prefetch import DockerfilePrefetcher, format_prefetch_report
+from tool.retrieval.entry import retrieve_similar_dockerfiles, format_examples_prompt
+from tool.iteration_control.entry import load_strategy, format_strategy_prompt
+from tool.dockerrun.checkpoint import load_checkpoint, expand_checkpoint_reference, format_checkpoint_prompt
+from prompt.template import PromptTemplate
+
+REVISION_TEMPLATE = PromptTemplate(
+    instructions="""
+Please modify the dockerfile based on the failure log and next steps recommendations.
+
+IMPORTANT REQUIREMENTS:
+1. ONLY reference files and directories that exist in the directory tree provided below
+2. Do NOT add COPY or ADD commands for files that don't exist
+3. Verify all file paths against the directory structure
+4. Return ONLY the revised dockerfile content, no explanations, no markdown formatting, no additional text
+5. Please create a Dockerfile that, when built, puts me in a /bin/bash cli setting at the root of the repository, with the repository installed and ready to use.
+""",
+    sections=[
+        ("directory_tree", "This is the current working directory structure:"),
+        ("format_info", None),
+        ("examples", None),
+        ("strategy", None),
+        ("checkpoint", None),
+        ("dockerfile_content", "This is the current dockerfile:"),
+        ("log_content", "This is the previous failure log:"),
+        ("next_content", "This is the summary and next steps:"),
+    ],
+    closing="Only return the new dockerfile content, nothing else."
+)
+
 class WritingDockerRevisionTool:
     def __init__(self, verbose: bool = False, use_json_tree: bool = True, max_depth: int = None):
         self.verbose = verbose
@@ -76,7 +107,8 @@ class WritingDockerRevisionTool:
         # Initialize OpenAI client
         self.client = OpenAI(
             base_url=base_url,
-            api_key=api_key
+            api_key=api_key,
+            max_retries=0  # retries happen once, in limited_call(), under the shared rate limit
         )
         
         # Configuration settings
@@ -232,51 +264,18 @@ class WritingDockerRevisionTool:
         
         return self.read_file_content(next_path)
     
-    def revise_dockerfile(self, dockerfile_content: str, log_content: str, next_content: str, directory_tree: str, is_json_format: bool = False) -> str:
+    def load_checkpoint(self):
+        """Load the last-good-layer checkpoint from envgym/checkpoint.json"""
+        return load_checkpoint(Path("envgym"))
+    
+    def revise_dockerfile(self, dockerfile_content: str, log_content: str, next_content: str, directory_tree: str, is_json_format: bool = False, checkpoint: dict = None) -> str:
         """Revise dockerfile based on current dockerfile, failure log, next steps, and directory structure using AI"""
         
-        # Define the prompt directly in the code
-        write_docker_instruction = """
-This is the current working directory structure:
-{directory_tree}
-
-This is the current dockerfile:
-{dockerfile_content}
-
-This is the previous failure log:
-{log_content}
-
-This is the summary and next steps:
-{next_content}
-
-Please modify the dockerfile based on the failure log and next steps recommendations. 
-
-IMPORTANT REQUIREMENTS:
-1. ONLY reference files and directories that exist in the directory tree shown above
-2. Do NOT add COPY or ADD commands for files that don't exist
-3. Verify all file paths against the directory structure
-4. Return ONLY the revised dockerfile content, no explanations, no markdown formatting, no additional text
-5. Please create a Dockerfile that, when built, puts me in a /bin/bash cli setting at the root of the repository, with the repository installed and ready to use.
-
-IMPORTANT: 
-
-
-Only return the new dockerfile content, nothing else.
-"""
-        
         # Add format information to the prompt
         if is_json_format:
-            format_info = "\nNote: The directory tree is provided in JSON format with 'name', 'type', 'path', and 'children' fields."
+            format_info = "Note: The directory tree is provided in JSON format with 'name', 'type', 'path', and 'children' fields."
         else:
-            format_info = "\nNote: The directory tree is provided in traditional text tree format."
-        
-        # Format the prompt with actual content and format information
-        prompt = write_docker_instruction.format(
-            dockerfile_content=dockerfile_content,
-            log_content=log_content,
-            next_content=next_content,
-            directory_tree=directory_tree
-        ) + format_info
+            format_info = "Note: The directory tree is provided in traditional text tree format."
         
         # Prepare system message based on language setting
         if self.system_language.lower() in ['chinese', 'zh', '中文']:
@@ -284,15 +283,28 @@ Only return the new dockerfile content, nothing else.
         else:
             system_msg = "You are a professional Docker configuration expert who can modify Dockerfiles based on failure logs and recommendations. Return only the modified Dockerfile content, no other content."
         
+        # Instructions go first so every revision call shares the cached prefix; the repository data follows
+        messages = REVISION_TEMPLATE.messages(
+            system_msg,
+            directory_tree=directory_tree,
+            format_info=format_info,
+            examples=format_examples_prompt(retrieve_similar_dockerfiles(include_current=True, verbose=self.verbose)),
+            strategy=format_strategy_prompt(load_strategy()),
+            checkpoint=format_checkpoint_prompt(checkpoint),
+            dockerfile_content=dockerfile_content,
+            log_content=log_content,
+            next_content=next_content
+        )
+        
         if self.verbose:
             print("\n" + "="*80)
             print("AI Interaction Details - FULL CONVERSATION")
             print("="*80)
             print("\nSystem Message:")
-            print(system_msg)
+            print(messages[0]["content"])
             print("\n" + "-"*80)
             print("User Prompt (COMPLETE):")
-            print(prompt)
+            print(messages[1]["content"])
             print("\n" + "-"*80)
             print("Request Details:")
             print(f"Model: {self.model}")
@@ -301,14 +313,17 @@ Only return the new dockerfile content, nothing else.
             print("Sending request to AI...")
             print("-"*80)
             
-        response = self.client.chat.completions.create(
+        # Stream the answer so the base image pull and context hashing start before generation finishes
+        prefetcher = DockerfilePrefetcher(verbose=self.verbose)
+        response = chat_completion_stream(
+            self.client,
+            "writing_docker_revision",
             model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=self.temperature
+            messages=messages,
+            temperature=self.temperature,
+            on_delta=prefetcher.feed
         )
+        print(format_prefetch_report(prefetcher.finish()))
         
         response_content = response.choices[0].message.content.strip()
         
@@ -372,8 +387,15 @@ Only return the new dockerfile content, nothing else.
                 print(f"Log length: {len(log_content)} characters")
                 print(f"Next steps length: {len(next_content)} characters")
             
+            checkpoint = self.load_checkpoint()
+            if checkpoint:
+                print(f"Checkpoint available: {checkpoint['image']} (steps 1-{checkpoint['step']})")
+            
             print("Revising dockerfile based on logs, recommendations, and directory structure...")
-            revised_dockerfile = self.revise_dockerfile(dockerfile_content, log_content, next_content, directory_tree, self.use_json_tree)
+            revised_dockerfile = self.revise_dockerfile(dockerfile_content, log_content, next_content, directory_tree, self.use_json_tree, checkpoint)
+            
+            # A revision written as "FROM <checkpoint>" + remaining steps is expanded back to the full dockerfile
+            revised_dockerfile = expand_checkpoint_reference(revised_dockerfile, checkpoint)
             
             print("Saving revised dockerfile...")
             self.save_dockerfile(revised_dockerfile)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+EnvBench - Parallel Benchmark Runner
+Discovers every scripts/<repo>/envbench.sh, runs them against data/<repo> with a
+worker pool and per-script timeouts, and streams PASS/FAIL/WARN counts into one
+consolidated results file.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import argparse
+import subprocess
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ENVBENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_SCRIPTS_DIR = ENVBENCH_DIR / 'scripts'
+DEFAULT_DATA_DIR = ENVBENCH_DIR.parent / 'data'
+DEFAULT_TIMEOUT = 3600
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+STATUS_LINE = re.compile(r'^\[(PASS|FAIL|WARN)\]')
+
+
+def discover_scripts(scripts_dir, repos=None):
+    """Return {repo_name: script_path} for every scripts/<repo>/envbench.sh"""
+    scripts = {}
+    for script in sorted(Path(scripts_dir).glob('*/envbench.sh')):
+        repo_name = script.parent.name
+        if repos and repo_name not in repos:
+            continue
+        scripts[repo_name] = script.resolve()
+    return scripts
+
+
+def count_from_output(output):
+    """Fallback counts from [PASS]/[FAIL]/[WARN] lines when envbench.json is missing"""
+    counts = {'PASS': 0, 'FAIL': 0, 'WARN': 0}
+    for line in output.splitlines():
+        match = STATUS_LINE.match(ANSI_ESCAPE.sub('', line).strip())
+        if match:
+            counts[match.group(1)] += 1
+    return counts
+
+
+def read_envbench_json(repo_dir):
+    """Read envgym/envbench.json written by the benchmark script"""
+    json_file = Path(repo_dir) / 'envgym' / 'envbench.json'
+    if not json_file.exists():
+        return None
+    try:
+        with open(json_file, 'r') as f:
+            data = json.load(f)
+        return {key: int(data.get(key, 0)) for key in ('PASS', 'FAIL', 'WARN')}
+    except (json.JSONDecodeError, ValueError, OSError):
+        return None
+
+
+def run_script(repo_name, script, data_dir, timeout, log_dir=None):
+    """Run one benchmark script inside data/<repo> and return its result record"""
+    repo_dir = Path(data_dir).resolve() / repo_name
+    record = {
+        'repo': repo_name,
+        'script': str(script),
+        'status': 'SKIPPED',
+        'PASS': 0,
+        'FAIL': 0,
+        'WARN': 0,
+        'exit_code': None,
+        'duration': 0.0,
+        'source': None,
+        'error': ''
+    }
+
+    if not repo_dir.is_dir():
+        record['error'] = f'Repository directory not found: {repo_dir}'
+        return record
+
+    # Remove stale results so a crashed script is not credited with an old score
+    stale_json = repo_dir / 'envgym' / 'envbench.json'
+    if stale_json.exists():
+        stale_json.unlink()
+
+    start = time.time()
+    output = ''
+    try:
+        # New session so a timeout can kill the whole process group (docker builds, subshells)
+        process = subprocess.Popen(
+            ['bash', str(script)],
+            cwd=repo_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            errors='replace',
+            start_new_session=True
+        )
+        try:
+            output, _ = process.communicate(timeout=timeout)
+            record['exit_code'] = process.returncode
+            record['status'] = 'COMPLETED'
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            output, _ = process.communicate()
+            record['status'] = 'TIMEOUT'
+            record['error'] = f'Script timeout ({timeout} seconds)'
+    except Exception as e:
+        record['status'] = 'ERROR'
+        record['error'] = str(e)
+    record['duration'] = round(time.time() - start, 2)
+
+    counts = read_envbench_json(repo_dir)
+    if counts is not None:
+        record['source'] = 'envbench.json'
+    else:
+        counts = count_from_output(output or '')
+        record['source'] = 'output'
+    record.update(counts)
+
+    if log_dir:
+        log_file = Path(log_dir) / f'{repo_name}.log'
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write(output or '')
+
+    return record
+
+
+class ResultsWriter:
+    """Thread-safe consolidated results file, rewritten after every finished script"""
+
+    def __init__(self, output_file, total):
+        self.output_file = Path(output_file)
+        self.lock = threading.Lock()
+        self.data = {
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'total_scripts': total,
+            'completed_scripts': 0,
+            'totals': {'PASS': 0, 'FAIL': 0, 'WARN': 0},
+            'results': {}
+        }
+        self._write()
+
+    def add(self, record):
+        with self.lock:
+            self.data['results'][record['repo']] = record
+            self.data['completed_scripts'] += 1
+            for key in ('PASS', 'FAIL', 'WARN'):
+                self.data['totals'][key] += record[key]
+            self._write()
+
+    def finish(self):
+        with self.lock:
+            self.data['finished_at'] = datetime.now().isoformat()
+            self._write()
+        return self.data
+
+    def _write(self):
+        # Write to a temp file first so readers never see a half-written file
+        tmp_file = self.output_file.with_suffix(self.output_file.suffix + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.output_file)
+
+
+def run_all(scripts, data_dir, output_file, workers, timeout, log_dir=None):
+    """Run all scripts with a worker pool, streaming results into output_file"""
+    writer = ResultsWriter(output_file, len(scripts))
+    if log_dir:
+        Path(log_dir).mkdir(parents=True, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_script, repo_name, script, data_dir, timeout, log_dir): repo_name
+            for repo_name, script in scripts.items()
+        }
+        for future in as_completed(futures):
+            record = future.result()
+            writer.add(record)
+            done = writer.data['completed_scripts']
+            print(f"[{done}/{len(scripts)}] {record['repo']}: {record['status']} "
+                  f"PASS={record['PASS']} FAIL={record['FAIL']} WARN={record['WARN']} ({record['duration']}s)"
+                  + (f" - {record['error']}" if record['error'] else ''))
+
+    return writer.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EnvBench - Parallel Benchmark Runner')
+    parser.add_argument('--data-dir', default=str(DEFAULT_DATA_DIR), help='Directory containing the repositories')
+    parser.add_argument('--scripts-dir', default=str(DEFAULT_SCRIPTS_DIR), help='Directory containing <repo>/envbench.sh')
+    parser.add_argument('--output', default='envbench_results.json', help='Consolidated results file')
+    parser.add_argument('--log-dir', default=None, help='Directory to store each script output')
+    parser.add_argument('--workers', '-j', type=int, default=os.cpu_count() or 4, help='Number of parallel scripts')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help='Timeout per script in seconds')
+    parser.add_argument('repos', nargs='*', help='Only run these repositories')
+
+    args = parser.parse_args()
+
+    scripts = discover_scripts(args.scripts_dir, set(args.repos) if args.repos else None)
+    if not scripts:
+        print(f"No benchmark scripts found in {args.scripts_dir}")
+        sys.exit(1)
+
+    print(f"Running {len(scripts)} benchmark scripts with {args.workers} workers (timeout {args.timeout}s)")
+    print(f"Data directory: {args.data_dir}")
+    print(f"Results file: {args.output}")
+    print("=" * 60)
+
+    data = run_all(scripts, args.data_dir, args.output, args.workers, args.timeout, args.log_dir)
+
+    totals = data['totals']
+    total_tests = sum(totals.values())
+    print("=" * 60)
+    print(f"PASS: {totals['PASS']}  FAIL: {totals['FAIL']}  WARN: {totals['WARN']}")
+    if total_tests:
+        print(f"Accuracy: {totals['PASS'] / total_tests:.1%}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -52,8 +52,10 @@ def find_test_script(repo_name):
     if not envbench_path.exists():
         raise FileNotFoundError(f"EnvBench directory not found: {envbench_path}")
     
-    # Look for the test script
-    test_script = envbench_path / 'scripts' / f'{repo_name}.sh'
+    # Look for the test script (scripts/<repo>/envbench.sh, or the older scripts/<repo>.sh)
+    test_script = envbench_path / 'scripts' / repo_name / 'envbench.sh'
+    if not test_script.exists():
+        test_script = envbench_path / 'scripts' / f'{repo_name}.sh'
     
     if not test_script.exists():
         raise FileNotFoundError(f"Test script not found: {test_script}")
@@ -110,8 +112,9 @@ def main():
             scripts_dir = envbench_path / 'scripts'
             
             if scripts_dir.exists():
-                for script in scripts_dir.glob('*.sh'):
-                    print(f"  - {script.stem}")
+                for script in sorted(scripts_dir.glob('*/envbench.sh')):
+                    print(f"  - {script.parent.name}")
+                print("\nTo run all scripts in parallel: python EnvBench/runner.py")
             else:
                 print("  No scripts directory found")
         except Exception:
@@ -11,6 +11,10 @@ from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+# Pricing table is shared with the agent's local usage accounting
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Agent" / "tool" / "stats"))
+from pricing import PRICING, calculate_cost
+
 def load_env_config(env_file: Path) -> Dict[str, str]:
     """Load configuration from .env file"""
     config = {}
@@ -41,24 +45,6 @@ class Colors:
     BOLD = '\033[1m'
     END = '\033[0m'
 
-# Pricing dictionary for different providers and models
-PRICING = {
-    "Azure": {
-        "gpt-4.1": {
-            "input": 2.00,  # $2.00 / 1M tokens
-            "cached_input": 0.50,  # $0.50 / 1M tokens
-            "output": 8.00  # $8.00 / 1M tokens
-        }
-    },
-    "OpenAI": {
-        "gpt-4.1": {
-            "input": 2.00,  # $2.00 / 1M tokens
-            "cached_input": 0.50,  # $0.50 / 1M tokens
-            "output": 8.00  # $8.00 / 1M tokens
-        }
-    }
-}
-
 def load_stat_file(file_path: Path) -> Optional[Dict[str, Any]]:
     """Load a single stat.json file"""
     try:
@@ -180,10 +166,8 @@ def print_summary_table(collected_data: List[Dict[str, Any]], max_name_length: i
             provider, model_name = current_model.split("/", 1) if "/" in current_model else ("Azure", "gpt-4.1")
             
             if model_name in PRICING.get(provider, {}):
-                pricing = PRICING[provider][model_name]
-                input_cost = (input_tokens / 1000000) * pricing["input"]
-                output_cost = (output_tokens / 1000000) * pricing["output"]
-                cost = input_cost + output_cost
+                cost = calculate_cost(provider, model_name, input_tokens, output_tokens,
+                                      delta.get("cached_tokens", 0))
             
             # Calculate duration from session start and end times
             duration = "N/A"
@@ -235,11 +219,35 @@ def print_summary_table(collected_data: List[Dict[str, Any]], max_name_length: i
     
     if provider in PRICING and model_name in PRICING[provider]:
         pricing = PRICING[provider][model_name]
-        print(f"{Colors.YELLOW}Pricing ({current_model}): Input ${pricing['input']:.2f}/1M tokens, Output ${pricing['output']:.2f}/1M tokens{Colors.END}")
+        print(f"{Colors.YELLOW}Pricing ({current_model}): Input ${pricing['input']:.2f}/1M tokens, "
+              f"Cached input ${pricing.get('cached_input', pricing['input']):.2f}/1M tokens, "
+              f"Output ${pricing['output']:.2f}/1M tokens{Colors.END}")
     else:
         print(f"{Colors.YELLOW}Warning: No pricing found for {current_model}{Colors.END}")
     print(f"Collection time: {datetime.now().isoformat()}")
 
+def print_cache_report(collected_data: List[Dict[str, Any]]):
+    """Print the prompt cache hit ratio per tool across all repositories (usage_by_tool of stat.json)"""
+    by_tool: Dict[str, Dict[str, int]] = {}
+    for repo_data in collected_data:
+        for tool, usage in (repo_data["data"].get("usage_by_tool") or {}).items():
+            bucket = by_tool.setdefault(tool, {"requests": 0, "input_tokens": 0, "cached_tokens": 0})
+            bucket["requests"] += usage.get("requests_count", 0)
+            bucket["input_tokens"] += usage.get("input_tokens", 0)
+            bucket["cached_tokens"] += usage.get("cached_tokens", 0)
+    if not by_tool:
+        return
+    print(f"\n{Colors.BOLD}PROMPT CACHE BY TOOL{Colors.END}")
+    print(f"{'Tool':<28} {'Requests':<10} {'Input Tokens':<15} {'Cached Tokens':<15} {'Cache Hit':<10}")
+    total_input = total_cached = 0
+    for tool, bucket in sorted(by_tool.items()):
+        ratio = bucket["cached_tokens"] / bucket["input_tokens"] if bucket["input_tokens"] else 0.0
+        print(f"{tool:<28} {bucket['requests']:<10,} {bucket['input_tokens']:<15,} {bucket['cached_tokens']:<15,} {ratio:<10.1%}")
+        total_input += bucket["input_tokens"]
+        total_cached += bucket["cached_tokens"]
+    ratio = total_cached / total_input if total_input else 0.0
+    print(f"{Colors.BOLD}{'TOTAL':<28} {'':<10} {total_input:<15,} {total_cached:<15,} {ratio:<10.1%}{Colors.END}")
+
 def save_data(collected_data: List[Dict[str, Any]], output_dir: Path, max_name_length: int = 20):
     """Save data to files"""
     output_dir.mkdir(exist_ok=True)
@@ -346,6 +354,7 @@ def main():
     
     # Print summary table
     print_summary_table(collected_data, max_name_length)
+    print_cache_report(collected_data)
     
     # Save data
     output_dir = Path("collected_stats")
@@ -3,6 +3,13 @@
 # Get the directory where this script is located
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 AGENT_SCRIPT="$SCRIPT_DIR/../Agent/agent.py"
+MANIFEST_SCRIPT="$SCRIPT_DIR/../Agent/tool/run_state/manifest.py"
+
+# --force re-runs repositories that are unchanged since their last successful run
+FORCE_ARG=""
+if [ "$1" = "--force" ]; then
+    FORCE_ARG="--force"
+fi
 
 # Check if agent.py exists
 if [ ! -f "$AGENT_SCRIPT" ]; then
@@ -98,9 +105,17 @@ for repo_name in "${repos[@]}"; do
         continue
     fi
     
+    # Skip repositories whose repo, model, prompts and tools match a previous successful run
+    if [ -z "$FORCE_ARG" ] && python "$MANIFEST_SCRIPT" check .; then
+        echo "↷ $repo_name unchanged, skipped"
+        cd "$SCRIPT_DIR"
+        echo ""
+        continue
+    fi
+    
     # Execute agent.py script
-    echo "Executing: python $AGENT_SCRIPT"
-    python "$AGENT_SCRIPT"
+    echo "Executing: python $AGENT_SCRIPT $FORCE_ARG"
+    python "$AGENT_SCRIPT" $FORCE_ARG
     
     # Check execution result
     if [ $? -eq 0 ]; then
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Results Warehouse - Incrementally ingest envgym run artifacts into a SQLite store
+Every run's stats, usage delta, iteration count, build timings and EnvBench scores are
+stored keyed by (sweep, repo, model, run timestamp), so cross-sweep comparisons become
+queries instead of directory crawls.
+
+Usage:
+    python warehouse.py ingest <root> [<root> ...] [--sweep NAME]
+    python warehouse.py summary
+    python warehouse.py compare <sweep_a> <sweep_b>
+"""
+
+import json
+import re
+import sqlite3
+import sys
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from collect_stats import calculate_cost
+
+DEFAULT_DB = Path(__file__).resolve().parent / "warehouse.db"
+
+RESULT_FILE_PATTERN = re.compile(r"docker_result_.*_(\d{8}_\d{6})\.json$")
+BACKUP_DIR_PATTERN = re.compile(r"^envgym-(\d{8}_\d{6})$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    sweep TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    model TEXT NOT NULL,
+    run_timestamp TEXT NOT NULL,
+    provider TEXT,
+    status TEXT,
+    session_start TEXT,
+    session_end TEXT,
+    duration_seconds REAL,
+    requests INTEGER,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    total_tokens INTEGER,
+    cost REAL,
+    iterations INTEGER,
+    build_successes INTEGER,
+    total_build_seconds REAL,
+    total_iteration_seconds REAL,
+    envbench_pass INTEGER,
+    envbench_fail INTEGER,
+    envbench_warn INTEGER,
+    source_dir TEXT,
+    PRIMARY KEY (sweep, repo, model, run_timestamp)
+);
+CREATE TABLE IF NOT EXISTS builds (
+    sweep TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    model TEXT NOT NULL,
+    run_timestamp TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    finished_at TEXT,
+    build_success INTEGER,
+    run_success INTEGER,
+    iteration_seconds REAL,
+    build_seconds REAL,
+    PRIMARY KEY (sweep, repo, model, run_timestamp, iteration)
+);
+CREATE TABLE IF NOT EXISTS sources (
+    source_dir TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_repo ON runs (repo);
+"""
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def migrate(conn: sqlite3.Connection):
+    """
+    Bring an older warehouse up to the current schema
+
+    builds.interval_seconds (time between consecutive results, i.e. a whole iteration)
+    became iteration_seconds next to the real build_seconds, and runs.total_build_seconds
+    now sums real build durations. Sources are forgotten so the next ingest refreshes them.
+    """
+    build_columns = _columns(conn, "builds")
+    if "interval_seconds" in build_columns:
+        conn.execute("ALTER TABLE builds RENAME COLUMN interval_seconds TO iteration_seconds")
+    if "build_seconds" not in build_columns:
+        conn.execute("ALTER TABLE builds ADD COLUMN build_seconds REAL")
+        conn.execute("UPDATE runs SET total_build_seconds = NULL")
+        conn.execute("DELETE FROM sources")
+    if "total_iteration_seconds" not in _columns(conn, "runs"):
+        conn.execute("ALTER TABLE runs ADD COLUMN total_iteration_seconds REAL")
+    conn.commit()
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Open the warehouse and make sure the schema exists"""
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    migrate(conn)
+    return conn
+
+
+def load_json(file_path: Path) -> Optional[Any]:
+    """Load a JSON file, returning None on any error"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError, UnicodeDecodeError):
+        return None
+
+
+def read_text(file_path: Path) -> Optional[str]:
+    """Read a small text file, returning None if missing or empty"""
+    try:
+        content = file_path.read_text(encoding='utf-8').strip()
+        return content or None
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def directory_signature(envgym_dir: Path) -> str:
+    """Cheap change signature from the name, size and mtime of every top-level file"""
+    parts = []
+    for item in sorted(envgym_dir.iterdir()):
+        if item.is_file():
+            stat = item.stat()
+            parts.append(f"{item.name}:{stat.st_size}:{int(stat.st_mtime)}")
+    return "|".join(parts)
+
+
+def find_envgym_dirs(root: Path) -> List[Dict[str, str]]:
+    """
+    Find envgym directories under a sweep root
+
+    Supports <root>/<repo>/envgym (data/, tests/backup_*) and
+    <root>/<repo>/envgym-<timestamp> (tests/backup).
+    """
+    found = []
+    for repo_dir in sorted(root.iterdir()):
+        if not repo_dir.is_dir() or repo_dir.name.startswith('.'):
+            continue
+        for child in sorted(repo_dir.iterdir()):
+            if not child.is_dir():
+                continue
+            if child.name == "envgym":
+                found.append({"repo": repo_dir.name, "dir": child, "backup_timestamp": None})
+            else:
+                match = BACKUP_DIR_PATTERN.match(child.name)
+                if match:
+                    found.append({"repo": repo_dir.name, "dir": child, "backup_timestamp": match.group(1)})
+    return found
+
+
+def parse_build_results(envgym_dir: Path) -> List[Dict[str, Any]]:
+    """Per-iteration build records from docker_result_*.json, ordered by finish time"""
+    results = []
+    for result_file in envgym_dir.glob("docker_result_*.json"):
+        match = RESULT_FILE_PATTERN.search(result_file.name)
+        if not match:
+            continue
+        finished_at = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        data = load_json(result_file) or {}
+        build = data.get("build", {})
+        results.append({
+            "finished_at": finished_at,
+            "build_success": bool(build.get("success")),
+            "run_success": bool(data.get("run", {}).get("success")),
+            # Measured build time; results written before it was recorded have none
+            "build_seconds": build.get("duration")
+        })
+    results.sort(key=lambda r: r["finished_at"])
+
+    previous = None
+    for iteration, result in enumerate(results, 1):
+        result["iteration"] = iteration
+        # Time since the previous result: the whole iteration (LLM calls and build), unknown for the first
+        result["iteration_seconds"] = (result["finished_at"] - previous).total_seconds() if previous else None
+        previous = result["finished_at"]
+    return results
+
+
+def count_history_iterations(envgym_dir: Path) -> int:
+    """Count iteration markers in history.txt"""
+    history_file = envgym_dir / "history.txt"
+    if not history_file.exists():
+        return 0
+    count = 0
+    with open(history_file, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line.startswith("=== Iteration "):
+                count += 1
+    return count
+
+
+def build_run_record(sweep: str, repo: str, envgym_dir: Path, backup_timestamp: Optional[str]) -> Dict[str, Any]:
+    """Collect one run's row from an envgym directory"""
+    stat = load_json(envgym_dir / "stat.json") or {}
+    envbench = load_json(envgym_dir / "envbench.json") or {}
+    builds = parse_build_results(envgym_dir)
+
+    api_info = stat.get("api_info") or {}
+    provider = api_info.get("provider_name") or "unknown"
+    model = api_info.get("model") or "unknown"
+    delta = stat.get("usage_delta") or {}
+
+    session_start = stat.get("session_start")
+    session_end = stat.get("session_end")
+    duration = None
+    if session_start and session_end:
+        try:
+            duration = (datetime.fromisoformat(session_end) - datetime.fromisoformat(session_start)).total_seconds()
+        except ValueError:
+            duration = None
+
+    # Run key: session start, else backup folder timestamp, else last build, else folder mtime
+    if session_start:
+        run_timestamp = session_start
+    elif backup_timestamp:
+        run_timestamp = datetime.strptime(backup_timestamp, "%Y%m%d_%H%M%S").isoformat()
+    elif builds:
+        run_timestamp = builds[-1]["finished_at"].isoformat()
+    else:
+        run_timestamp = datetime.fromtimestamp(envgym_dir.stat().st_mtime).isoformat()
+
+    input_tokens = delta.get("input_tokens", 0) or 0
+    output_tokens = delta.get("output_tokens", 0) or 0
+    cost = float(delta.get("cost", 0) or 0)
+    if not cost:
+        cost = calculate_cost(provider, model, input_tokens, output_tokens, delta.get("cached_tokens", 0) or 0)
+
+    return {
+        "sweep": sweep,
+        "repo": repo,
+        "model": model,
+        "run_timestamp": run_timestamp,
+        "provider": provider,
+        "status": read_text(envgym_dir / "status.txt"),
+        "session_start": session_start,
+        "session_end": session_end,
+        "duration_seconds": duration,
+        "requests": delta.get("requests_count", 0) or 0,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": delta.get("total_tokens", 0) or 0,
+        "cost": cost,
+        "iterations": len(builds) or count_history_iterations(envgym_dir),
+        "build_successes": sum(1 for b in builds if b["build_success"]),
+        "total_build_seconds": (sum(b["build_seconds"] for b in builds if b["build_seconds"] is not None)
+                                if any(b["build_seconds"] is not None for b in builds) else None),
+        "total_iteration_seconds": sum(b["iteration_seconds"] or 0 for b in builds),
+        "envbench_pass": envbench.get("PASS"),
+        "envbench_fail": envbench.get("FAIL"),
+        "envbench_warn": envbench.get("WARN"),
+        "source_dir": str(envgym_dir.resolve()),
+        "_builds": builds
+    }
+
+
+def ingest(conn: sqlite3.Connection, root: Path, sweep: Optional[str] = None, force: bool = False) -> Dict[str, int]:
+    """Ingest every envgym directory under root, skipping unchanged ones"""
+    sweep = sweep or root.resolve().name
+    counts = {"ingested": 0, "unchanged": 0}
+
+    for entry in find_envgym_dirs(root):
+        envgym_dir = entry["dir"]
+        source_dir = str(envgym_dir.resolve())
+        signature = directory_signature(envgym_dir)
+
+        row = conn.execute("SELECT signature FROM sources WHERE source_dir = ?", (source_dir,)).fetchone()
+        if row and row["signature"] == signature and not force:
+            counts["unchanged"] += 1
+            continue
+
+        record = build_run_record(sweep, entry["repo"], envgym_dir, entry["backup_timestamp"])
+        builds = record.pop("_builds")
+        key = (record["sweep"], record["repo"], record["model"], record["run_timestamp"])
+
+        # Replace the previous version of this source directory (its key may have changed)
+        conn.execute("DELETE FROM runs WHERE source_dir = ?", (source_dir,))
+        columns = ", ".join(record.keys())
+        placeholders = ", ".join("?" for _ in record)
+        conn.execute(f"INSERT OR REPLACE INTO runs ({columns}) VALUES ({placeholders})", tuple(record.values()))
+
+        conn.execute("DELETE FROM builds WHERE sweep = ? AND repo = ? AND model = ? AND run_timestamp = ?", key)
+        conn.executemany(
+            "INSERT INTO builds (sweep, repo, model, run_timestamp, iteration, finished_at, build_success, "
+            "run_success, iteration_seconds, build_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [key + (b["iteration"], b["finished_at"].isoformat(), int(b["build_success"]),
+                    int(b["run_success"]), b["iteration_seconds"], b["build_seconds"]) for b in builds]
+        )
+        conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                     (source_dir, signature, datetime.now().isoformat()))
+        counts["ingested"] += 1
+
+    conn.commit()
+    return counts
+
+
+def print_rows(rows: List[sqlite3.Row]):
+    """Print query rows as a simple aligned table"""
+    if not rows:
+        print("No rows")
+        return
+    headers = rows[0].keys()
+    table = [[("" if v is None else (f"{v:.2f}" if isinstance(v, float) else str(v))) for v in row] for row in rows]
+    widths = [max(len(h), *(len(r[i]) for r in table)) for i, h in enumerate(headers)]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    print("-" * (sum(widths) + 2 * (len(widths) - 1)))
+    for r in table:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def summary(conn: sqlite3.Connection):
+    """Per-sweep aggregate numbers"""
+    rows = conn.execute("""
+        SELECT sweep, model, COUNT(*) AS runs,
+               SUM(status = 'SUCCESS') AS success,
+               ROUND(AVG(iterations), 1) AS avg_iters,
+               SUM(total_tokens) AS tokens,
+               SUM(cost) AS cost,
+               SUM(envbench_pass) AS pass, SUM(envbench_fail) AS fail, SUM(envbench_warn) AS warn
+        FROM runs GROUP BY sweep, model ORDER BY sweep, model
+    """).fetchall()
+    print_rows(rows)
+
+
+def compare(conn: sqlite3.Connection, sweep_a: str, sweep_b: str):
+    """Side-by-side per-repo comparison of the latest run in two sweeps"""
+    rows = conn.execute("""
+        WITH latest AS (
+            SELECT * FROM runs r
+            WHERE run_timestamp = (SELECT MAX(run_timestamp) FROM runs
+                                   WHERE sweep = r.sweep AND repo = r.repo)
+        )
+        SELECT COALESCE(a.repo, b.repo) AS repo,
+               a.status AS status_a, b.status AS status_b,
+               a.iterations AS iters_a, b.iterations AS iters_b,
+               a.total_tokens AS tokens_a, b.total_tokens AS tokens_b,
+               a.envbench_pass AS pass_a, b.envbench_pass AS pass_b
+        FROM (SELECT * FROM latest WHERE sweep = ?) a
+        LEFT JOIN (SELECT * FROM latest WHERE sweep = ?) b ON a.repo = b.repo
+        UNION
+        SELECT b.repo, NULL, b.status, NULL, b.iterations, NULL, b.total_tokens, NULL, b.envbench_pass
+        FROM (SELECT * FROM latest WHERE sweep = ?) b
+        WHERE b.repo NOT IN (SELECT repo FROM latest WHERE sweep = ?)
+        ORDER BY repo
+    """, (sweep_a, sweep_b, sweep_b, sweep_a)).fetchall()
+    print(f"A = {sweep_a}, B = {sweep_b}")
+    print_rows(rows)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Incremental results warehouse for sweep statistics")
+    parser.add_argument("--db", default=str(DEFAULT_DB), help=f"SQLite database path (default: {DEFAULT_DB})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest sweep directories")
+    ingest_parser.add_argument("roots", nargs="+", help="Sweep roots, e.g. data tests/backup_20250724")
+    ingest_parser.add_argument("--sweep", default=None, help="Sweep name (default: root directory name)")
+    ingest_parser.add_argument("--force", action="store_true", help="Re-ingest unchanged directories")
+
+    subparsers.add_parser("summary", help="Per-sweep aggregates")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two sweeps per repository")
+    compare_parser.add_argument("sweep_a")
+    compare_parser.add_argument("sweep_b")
+
+    args = parser.parse_args()
+    conn = connect(Path(args.db))
+
+    try:
+        if args.command == "ingest":
+            for root in args.roots:
+                root_path = Path(root)
+                if not root_path.is_dir():
+                    print(f"Warning: Not a directory: {root}")
+                    continue
+                counts = ingest(conn, root_path, args.sweep, args.force)
+                print(f"{root}: ingested {counts['ingested']}, unchanged {counts['unchanged']}")
+        elif args.command == "summary":
+            summary(conn)
+        elif args.command == "compare":
+            compare(conn, args.sweep_a, args.sweep_b)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 """
 EnvGym实验结果收集工具
-用法: python3 collect_envgym_results.py [list|clean]
+用法: python3 collect_envgym_results.py [full|list|clean]
+
+默认使用增量备份: 每个文件只哈希一次, 与上一次快照内容相同的文件直接硬链接,
+并在快照目录中写入 .manifest.json 记录每个文件的哈希和统计信息。
 """
 
 import os
+import json
 import shutil
+import hashlib
 import datetime
 import sys
 from pathlib import Path
@@ -13,12 +18,102 @@ from pathlib import Path
 # 配置
 DATA_DIR = "/home/cc/EnvGym/data"
 BACKUP_DIR = "/home/cc/EnvGym/tests/backup"
+MANIFEST_NAME = ".manifest.json"
 
 def get_timestamp():
     """获取时间戳"""
     return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
-def collect_results():
+def hash_file(file_path):
+    """计算文件的 sha256"""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def load_manifest(snapshot_dir):
+    """读取快照的 manifest，不存在时返回 None"""
+    manifest_file = snapshot_dir / MANIFEST_NAME
+    if not manifest_file.exists():
+        return None
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+
+def find_previous_snapshot(repo_backup_dir):
+    """找到最近一个带 manifest 的快照"""
+    snapshots = sorted(
+        (d for d in repo_backup_dir.iterdir() if d.is_dir() and d.name.startswith('envgym-')),
+        key=lambda d: d.name,
+        reverse=True
+    )
+    for snapshot in snapshots:
+        manifest = load_manifest(snapshot)
+        if manifest is not None:
+            return snapshot, manifest
+    return None, None
+
+def snapshot_incremental(envgym_dir, snapshot_dir, previous_dir=None, previous_manifest=None):
+    """
+    创建增量快照: 未变化的文件沿用上次的哈希, 内容相同的文件硬链接到上一个快照
+    返回 manifest
+    """
+    previous_files = (previous_manifest or {}).get("files", {})
+    # 按哈希索引上一个快照的文件, 改名或移动的文件同样可以去重
+    previous_by_hash = {info["sha256"]: rel for rel, info in previous_files.items()}
+
+    files = {}
+    stats = {"files": 0, "bytes": 0, "linked": 0, "copied": 0, "new_bytes": 0}
+
+    for src in sorted(envgym_dir.rglob('*')):
+        if not src.is_file():
+            continue
+        rel = src.relative_to(envgym_dir).as_posix()
+        src_stat = src.stat()
+
+        # 大小和修改时间都没变时直接复用上次的哈希, 不再读取文件
+        previous = previous_files.get(rel)
+        if previous and previous["size"] == src_stat.st_size and previous["mtime_ns"] == src_stat.st_mtime_ns:
+            digest = previous["sha256"]
+        else:
+            digest = hash_file(src)
+
+        dest = snapshot_dir / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+
+        linked = False
+        if previous_dir is not None and digest in previous_by_hash:
+            try:
+                os.link(previous_dir / previous_by_hash[digest], dest)
+                linked = True
+            except OSError:
+                linked = False
+        if not linked:
+            shutil.copy2(src, dest)
+            stats["copied"] += 1
+            stats["new_bytes"] += src_stat.st_size
+        else:
+            stats["linked"] += 1
+
+        files[rel] = {"sha256": digest, "size": src_stat.st_size, "mtime_ns": src_stat.st_mtime_ns}
+        stats["files"] += 1
+        stats["bytes"] += src_stat.st_size
+
+    manifest = {
+        "created_at": datetime.datetime.now().isoformat(),
+        "source": str(envgym_dir),
+        "previous_snapshot": previous_dir.name if previous_dir is not None else None,
+        "stats": stats,
+        "files": files
+    }
+    with open(snapshot_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+def collect_results(incremental=True):
     """收集实验结果"""
     data_path = Path(DATA_DIR)
     backup_path = Path(BACKUP_DIR)
@@ -53,10 +148,18 @@ def collect_results():
         timestamp_dir = repo_backup_dir / f"envgym-{get_timestamp()}"
         
         try:
-            shutil.copytree(envgym_dir, timestamp_dir)
-            file_count = sum(1 for _ in timestamp_dir.rglob('*') if _.is_file())
-            size_mb = sum(f.stat().st_size for f in timestamp_dir.rglob('*') if f.is_file()) / (1024*1024)
-            print(f"✅ {file_count}文件 {size_mb:.1f}MB")
+            if incremental:
+                previous_dir, previous_manifest = find_previous_snapshot(repo_backup_dir)
+                timestamp_dir.mkdir()
+                stats = snapshot_incremental(envgym_dir, timestamp_dir, previous_dir, previous_manifest)["stats"]
+                size_mb = stats["bytes"] / (1024*1024)
+                new_mb = stats["new_bytes"] / (1024*1024)
+                print(f"✅ {stats['files']}文件 {size_mb:.1f}MB (新增{new_mb:.1f}MB, 硬链接{stats['linked']}个)")
+            else:
+                shutil.copytree(envgym_dir, timestamp_dir)
+                file_count = sum(1 for _ in timestamp_dir.rglob('*') if _.is_file())
+                size_mb = sum(f.stat().st_size for f in timestamp_dir.rglob('*') if f.is_file()) / (1024*1024)
+                print(f"✅ {file_count}文件 {size_mb:.1f}MB")
             collected += 1
         except Exception as e:
             print(f"❌ 失败: {e}")
@@ -90,8 +193,13 @@ def list_results():
         print(f"📁 {repo_dir.name}:")
         
         for envgym_dir in sorted(envgym_dirs, reverse=True):
-            files = sum(1 for _ in envgym_dir.rglob('*') if _.is_file())
-            size = sum(f.stat().st_size for f in envgym_dir.rglob('*') if f.is_file()) / (1024*1024)
+            manifest = load_manifest(envgym_dir)
+            if manifest is not None:
+                files = manifest["stats"]["files"]
+                size = manifest["stats"]["bytes"] / (1024*1024)
+            else:
+                files = sum(1 for _ in envgym_dir.rglob('*') if _.is_file())
+                size = sum(f.stat().st_size for f in envgym_dir.rglob('*') if f.is_file()) / (1024*1024)
             timestamp = envgym_dir.name.replace('envgym-', '')
             print(f"  └── {timestamp} ({files}文件, {size:.1f}MB)")
             total_files += files
@@ -143,9 +251,12 @@ def main():
             list_results()
         elif cmd == "clean":
             clean_old()
+        elif cmd == "full":
+            collect_results(incremental=False)
         elif cmd == "help" or cmd == "-h":
             print("用法:")
-            print("  python3 collect_envgym_results.py        # 收集新结果")
+            print("  python3 collect_envgym_results.py        # 收集新结果 (增量, 硬链接去重)")
+            print("  python3 collect_envgym_results.py full   # 收集新结果 (完整复制)")
             print("  python3 collect_envgym_results.py list   # 列出已收集结果")
             print("  python3 collect_envgym_results.py clean  # 清理旧备份")
         else: